@@ -15,6 +15,15 @@ parent_dir = str(Path(__file__).resolve().parent.parent)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
+# Subpackages are imported when first accessed as attributes (PEP 562), so
+# ``import dualgpuopt`` stays cheap for the CLI
+from dualgpuopt import _lazy  # noqa: E402
+
+__getattr__, __dir__ = _lazy.attach(
+    __name__,
+    submodules=("engine", "gpu", "memory", "serve", "services", "telemetry", "tracing"),
+)
+
 # Functions for mock mode control, but don't enable by default
 MOCK_MODE = False
 
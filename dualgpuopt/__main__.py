@@ -19,19 +19,21 @@ logging.basicConfig(
 
 logger = logging.getLogger("DualGPUOpt.Main")
 
-# Create a logs directory if it doesn't exist
-try:
-    logs_dir = Path("logs")
-    logs_dir.mkdir(exist_ok=True)
-    # Add file handler to log to a file as well
-    file_handler = logging.FileHandler(logs_dir / "dualgpuopt.log")
-    file_handler.setFormatter(
-        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    )
-    logging.getLogger().addHandler(file_handler)
-    logger.info(f"Logging to {(logs_dir / 'dualgpuopt.log').absolute()}")
-except Exception as e:
-    logger.warning(f"Could not set up file logging: {e}")
+
+def setup_file_logging():
+    """Also log to logs/dualgpuopt.log, creating the logs directory if needed"""
+    try:
+        logs_dir = Path("logs")
+        logs_dir.mkdir(exist_ok=True)
+        # Add file handler to log to a file as well
+        file_handler = logging.FileHandler(logs_dir / "dualgpuopt.log")
+        file_handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+        logging.getLogger().addHandler(file_handler)
+        logger.info(f"Logging to {(logs_dir / 'dualgpuopt.log').absolute()}")
+    except Exception as e:
+        logger.warning(f"Could not set up file logging: {e}")
 
 
 def check_module_availability(module_name):
@@ -52,7 +54,8 @@ def check_module_availability(module_name):
 def parse_args():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(
-        description="DualGPUOptimizer - GPU optimization for ML model inference"
+        description="DualGPUOptimizer - GPU optimization for ML model inference",
+        epilog="Plan many models at once with: python -m dualgpuopt plan MANIFEST (see plan -h)",
     )
     parser.add_argument("--cli", action="store_true", help="Run in CLI mode")
     parser.add_argument("-m", "--model", help="Model path or HuggingFace identifier")
@@ -194,7 +197,14 @@ def handle_chat_module():
 
 def main():
     """Main entry point"""
+    # Batch planning is headless: no GUI, dependency checks or log file
+    if sys.argv[1:2] == ["plan"]:
+        from dualgpuopt.commands.plan import main as plan_main
+
+        sys.exit(plan_main(sys.argv[2:]))
+
     args = parse_args()
+    setup_file_logging()
 
     # Set verbose logging if requested
     if args.verbose:
@@ -205,61 +215,63 @@ def main():
     logger.info("==== DualGPUOptimizer ====")
 
     try:
-        # Import dependency_manager first - will be the same regardless of other imports
-        try:
-            from dualgpuopt.dependency_manager import (
-                DynamicImporter,
-                get_missing_dependencies,
-                initialize_dependency_status,
-                install_dependencies,
-                print_dependency_status,
-                verify_core_dependencies,
-            )
-
-            logger.debug("Dependency manager imported successfully")
-
-            # Initialize dependency state
-            initialize_dependency_status()
-
-            # Handle dependency checking and installation if requested
-            if args.check_deps:
-                print_dependency_status(include_errors=args.verbose)
-                return
+        # The CLI needs none of the GUI dependencies, so it skips checking them all
+        # up front unless asked to
+        check_dependencies = not args.cli or args.check_deps or args.install_deps
 
-            if args.install_deps:
-                missing = get_missing_dependencies()
-                if missing:
-                    logger.info("Installing missing dependencies...")
-                    success = install_dependencies(missing)
-                    if success:
-                        logger.info("Dependencies installed successfully")
+        if check_dependencies:
+            # Import dependency_manager first - will be the same regardless of other imports
+            try:
+                from dualgpuopt.dependency_manager import (
+                    DynamicImporter,
+                    get_missing_dependencies,
+                    initialize_dependency_status,
+                    install_dependencies,
+                    print_dependency_status,
+                    verify_core_dependencies,
+                )
+
+                logger.debug("Dependency manager imported successfully")
+
+                # Initialize dependency state
+                initialize_dependency_status()
+
+                # Handle dependency checking and installation if requested
+                if args.check_deps:
+                    print_dependency_status(include_errors=args.verbose)
+                    return
+
+                if args.install_deps:
+                    missing = get_missing_dependencies()
+                    if missing:
+                        logger.info("Installing missing dependencies...")
+                        success = install_dependencies(missing)
+                        if success:
+                            logger.info("Dependencies installed successfully")
+                        else:
+                            logger.error("Some dependencies could not be installed")
                     else:
-                        logger.error("Some dependencies could not be installed")
-                else:
-                    logger.info("All dependencies are already installed")
-                return
+                        logger.info("All dependencies are already installed")
+                    return
 
-            # Verify required dependencies first
-            core_available, critical_missing = verify_core_dependencies()
-            if not core_available:
-                logger.error(f"Critical dependencies missing: {', '.join(critical_missing)}")
-                logger.error("Run with --install-deps to attempt installation")
-                sys.exit(1)
+                # Verify required dependencies first
+                core_available, critical_missing = verify_core_dependencies()
+                if not core_available:
+                    logger.error(f"Critical dependencies missing: {', '.join(critical_missing)}")
+                    logger.error("Run with --install-deps to attempt installation")
+                    sys.exit(1)
 
-        except ImportError as e:
-            logger.error(f"Could not import dependency manager: {e}")
-            logger.warning("Continuing with basic dependency checks...")
-            # Run our own basic dependency check
-            dependency_status = check_and_warn_missing_modules()
+            except ImportError as e:
+                logger.error(f"Could not import dependency manager: {e}")
+                logger.warning("Continuing with basic dependency checks...")
+                # Run our own basic dependency check
+                dependency_status = check_and_warn_missing_modules()
 
         # Enable mock mode if requested
         mock_enabled = setup_mock_mode(args)
         if args.mock and not mock_enabled:
             logger.warning("Mock mode was requested but could not be enabled")
 
-        # Handle missing chat module dependencies
-        handle_chat_module()
-
         # Handle CLI mode
         if args.cli:
             logger.info("Running in CLI mode")
@@ -289,6 +301,9 @@ def main():
         else:
             logger.info("Starting GUI application")
 
+            # Handle missing chat module dependencies
+            handle_chat_module()
+
             # Try to use our new dependency manager for tkinter checking
             try:
                 if "DynamicImporter" in locals():
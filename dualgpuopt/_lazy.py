@@ -0,0 +1,56 @@
+"""
+Lazy package attributes (PEP 562).
+
+Packages declare which submodules and re-exported names they offer and get
+module-level ``__getattr__``/``__dir__`` functions that import them on first
+access, so importing a package does not import everything it can provide.
+"""
+
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def _import(module: str) -> Any:
+    # The import statement machinery, unlike importlib.import_module, is what
+    # ``-X importtime`` times, so lazily loaded modules show up in its reports
+    __import__(module)
+    return sys.modules[module]
+
+
+def attach(
+    package: str,
+    submodules: Iterable[str] = (),
+    exports: Optional[Dict[str, str]] = None,
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    Build ``__getattr__`` and ``__dir__`` for a package
+
+    Args:
+    ----
+        package: The package's ``__name__``
+        submodules: Submodules available as attributes of the package
+        exports: Re-exported names mapped to the module that defines them
+
+    Returns:
+    -------
+        (``__getattr__``, ``__dir__``) to assign in the package
+    """
+    submodules = set(submodules)
+    exports = dict(exports or {})
+    namespace = sys.modules[package].__dict__
+
+    def __getattr__(name: str) -> Any:
+        if name in submodules:
+            value = _import(f"{package}.{name}")
+        elif name in exports:
+            value = getattr(_import(exports[name]), name)
+        else:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        # Cache it so later lookups are plain attribute reads
+        namespace[name] = value
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | submodules | set(exports))
+
+    return __getattr__, __dir__
@@ -4,8 +4,18 @@ Batch processing module for optimizing inference workloads.
 
 # Re-export key components
 try:
-    from .smart_batch import optimize_batch_size
+    from .oom_store import OOMLimitStore
+    from .scheduler import ContinuousBatchScheduler, Priority, Request
+    from .smart_batch import SmartBatcher, TokenLengthEstimator, optimize_batch_size
 
-    __all__ = ["optimize_batch_size"]
+    __all__ = [
+        "optimize_batch_size",
+        "SmartBatcher",
+        "TokenLengthEstimator",
+        "ContinuousBatchScheduler",
+        "Priority",
+        "Request",
+        "OOMLimitStore",
+    ]
 except ImportError:
     __all__ = []
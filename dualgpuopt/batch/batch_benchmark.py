@@ -0,0 +1,182 @@
+"""
+Batch formation benchmark: character-length vs token-accurate grouping
+
+Groups a synthetic, long-tailed distribution of French legal prompts with the
+legacy character-length grouping and with the token-accurate ``SmartBatcher``
+(sampled estimates and exact counts) and reports padding waste, batches that
+exceed the token budget, grouping time and simulated tokens/sec. Throughput is
+simulated with a fixed cost per batch plus a cost per padded token, so it
+reflects batch shapes, not a real model.
+
+Usage:
+    python -m dualgpuopt.batch.batch_benchmark [--n 2000] [--tokenizer NAME]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from typing import Callable, List, Sequence, Tuple
+
+from dualgpuopt.batch.smart_batch import (
+    DEFAULT_MAX_BATCH_TOKENS,
+    SmartBatcher,
+    TokenLengthEstimator,
+)
+
+# Simulated cost model of one forward pass
+BATCH_OVERHEAD_S = 0.015
+PADDED_TOKEN_S = 2e-6
+
+_VOCABULARY = (
+    "le la les du des au aux et ou en par pour sur dans attendu que considérant "
+    "article alinéa code civil pénal cour d'appel cassation juridiction arrêt jugement "
+    "demandeur défendeur requérant intimé appelant conclusions moyen pourvoi rejet "
+    "responsabilité contractuelle délictuelle préjudice indemnisation dommages-intérêts "
+    "prescription quinquennale nullité résolution obligation créancier débiteur société "
+    "administrateur judiciaire liquidation procédure collective ordonnance référé "
+    "constitutionnalité législateur réglementaire décret n° 2016-131 l. 1231-1 1240"
+).split()
+
+
+def synthetic_prompts(n: int, seed: int = 0) -> List[str]:
+    """Long-tailed (log-normal) prompt lengths over a French legal vocabulary"""
+    rng = random.Random(seed)
+    prompts = []
+    for _ in range(n):
+        words = max(3, int(rng.lognormvariate(4.5, 0.9)))
+        prompts.append(" ".join(rng.choice(_VOCABULARY) for _ in range(words)))
+    return prompts
+
+
+def synthetic_tokenizer(text: str) -> int:
+    """
+    Deterministic stand-in for a BPE tokenizer
+
+    Words split into pieces of about four characters; accented characters and
+    punctuation cost a piece of their own, as with English-centric vocabularies.
+    """
+    tokens = 0
+    for word in text.split():
+        plain = sum(1 for c in word if c.isascii() and c.isalnum())
+        tokens += max(1, math.ceil(plain / 4)) + (len(word) - plain)
+    return tokens
+
+
+def legacy_batches(
+    sequences: Sequence[Tuple[str, int]],
+    max_batch_size: int = 32,
+    length_threshold: int = 256,
+    max_token_sum: int = DEFAULT_MAX_BATCH_TOKENS,
+) -> List[List[int]]:
+    """The former grouping: character lengths and a constant unpadded sum"""
+    sorted_seqs = sorted(((len(text), seq_id) for text, seq_id in sequences), key=lambda x: x[0])
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_length = 0
+    current_sum = 0
+    for length, seq_id in sorted_seqs:
+        if current and (
+            len(current) >= max_batch_size
+            or (length > length_threshold and length > 2 * current_length)
+            or current_sum + length > max_token_sum
+        ):
+            batches.append(current)
+            current, current_length, current_sum = [seq_id], length, length
+        else:
+            current.append(seq_id)
+            current_length = max(current_length, length)
+            current_sum += length
+    if current:
+        batches.append(current)
+    return batches
+
+
+def evaluate(
+    batches: List[List[int]], token_counts: Sequence[int], budget: int = DEFAULT_MAX_BATCH_TOKENS
+) -> dict:
+    """Padding waste, over-budget batches and simulated throughput of a grouping"""
+    real = padded = over = 0
+    for batch in batches:
+        lengths = [token_counts[i] for i in batch]
+        real += sum(lengths)
+        size = len(batch) * max(lengths)
+        padded += size
+        over += size > budget
+    seconds = len(batches) * BATCH_OVERHEAD_S + padded * PADDED_TOKEN_S
+    return {
+        "batches": len(batches),
+        "padding_waste": 1 - real / padded if padded else 0.0,
+        "over_budget": over,
+        "tokens_per_s": real / seconds if seconds else 0.0,
+    }
+
+
+def run(n: int = 2000, tokenizer: Callable | None = None, seed: int = 0) -> dict:
+    """
+    Compare the groupings on ``n`` synthetic prompts
+
+    Args:
+    ----
+        n: Number of prompts
+        tokenizer: Tokenizer to count tokens with (default: synthetic tokenizer)
+        seed: Random seed of the prompt distribution
+
+    Returns:
+    -------
+        Metrics per grouping
+    """
+    tokenizer = tokenizer or synthetic_tokenizer
+    prompts = synthetic_prompts(n, seed)
+    sequences = [(text, i) for i, text in enumerate(prompts)]
+    exact = TokenLengthEstimator(tokenizer, exact=True)
+    token_counts = exact.counts(prompts)
+
+    results = {}
+    t0 = time.perf_counter()
+    old = legacy_batches(sequences)
+    results["legacy"] = {**evaluate(old, token_counts), "grouping_ms": _ms_since(t0)}
+
+    for name, estimator in (
+        ("token_est", TokenLengthEstimator(tokenizer)),
+        ("token_exact", TokenLengthEstimator(tokenizer, exact=True)),
+    ):
+        batcher = SmartBatcher(
+            max_batch_tokens=DEFAULT_MAX_BATCH_TOKENS, length_estimator=estimator
+        )
+        t0 = time.perf_counter()
+        new = batcher.optimize_batches(sequences)
+        results[name] = {**evaluate(new, token_counts), "grouping_ms": _ms_since(t0)}
+    return results
+
+
+def _ms_since(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--n", type=int, default=2000, help="number of prompts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tokenizer", help="HF tokenizer name (default: synthetic)")
+    args = parser.parse_args()
+
+    tokenizer = None
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    results = run(args.n, tokenizer, args.seed)
+    print(f"{'grouping':<12} {'batches':>8} {'waste':>8} {'over':>6} {'tok/s':>10} {'ms':>8}")
+    for name, r in results.items():
+        print(
+            f"{name:<12} {r['batches']:>8} {r['padding_waste']:>8.1%} {r['over_budget']:>6} "
+            f"{r['tokens_per_s']:>10.0f} {r['grouping_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
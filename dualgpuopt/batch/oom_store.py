@@ -0,0 +1,244 @@
+"""
+Persistent OOM backpressure shared by all workers on a node
+
+Safe batch limits learned from out-of-memory errors are stored per
+(model, GPU, context length) in a small SQLite database. Every process that
+batches for the same key reads the same limits, so one worker's OOM protects
+the others. Stored limits decay back toward the optimistic values with a
+configurable half-life, so after a deploy or a driver change the fleet probes
+its way back to the largest safe batch instead of staying throttled forever.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger("DualGPUOpt.OOMStore")
+
+DEFAULT_DB_PATH = os.path.expanduser("~/.dualgpuopt/oom_limits.db")
+ENV_OOM_DB = os.environ.get("DUALGPUOPT_OOM_DB", DEFAULT_DB_PATH)
+# Share learned limits between processes (set to 0 to keep them in-process)
+ENV_OOM_SHARED = os.environ.get("DUALGPUOPT_OOM_SHARED", "1") == "1"
+# Seconds for half of the distance to the optimistic limits to be recovered
+ENV_OOM_HALF_LIFE = float(os.environ.get("DUALGPUOPT_OOM_HALF_LIFE", "1800"))
+
+# Shrink applied per OOM, and the lowest scale it can reach
+OOM_SHRINK = 0.75
+MIN_SCALE = 0.25
+
+
+@dataclass(frozen=True)
+class OOMKey:
+    """Identity of a learned limit"""
+
+    model: str
+    gpu: str
+    context: int = 0
+
+
+@dataclass
+class SafeLimits:
+    """Learned limits after decay; None means unconstrained"""
+
+    scale: float = 1.0
+    max_batch: Optional[int] = None
+    max_tokens: Optional[int] = None
+    oom_count: int = 0
+
+
+def oom_key(model: str, gpu_id: int = 0, context: int = 0) -> OOMKey:
+    """Build a key from a model path, a device index and a context length"""
+    from dualgpuopt.profile_cache import gpu_identity
+
+    gpu_name, _driver = gpu_identity(gpu_id)
+    return OOMKey(model=model, gpu=f"{gpu_name}#{gpu_id}", context=int(context))
+
+
+class OOMLimitStore:
+    """SQLite store of safe batch limits with exponential decay"""
+
+    def __init__(self, db_path: str = ENV_OOM_DB, half_life_s: float = ENV_OOM_HALF_LIFE):
+        """
+        Initialize the store
+
+        Args:
+        ----
+            db_path: Database file, shared by every process on the node
+            half_life_s: Half-life of learned limits in seconds
+        """
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.half_life_s = half_life_s
+        self._lock = threading.Lock()
+        # Autocommit mode; read-modify-write sections open their own transaction
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS oom_limits(
+                model TEXT, gpu TEXT, context INT,
+                scale REAL, max_batch INT, max_tokens INT, oom_count INT, updated REAL,
+                PRIMARY KEY(model, gpu, context)
+            )
+            """
+        )
+
+    def _decay(self, age_s: float) -> float:
+        """Share of the learned restriction that remains after ``age_s`` seconds"""
+        if self.half_life_s <= 0:
+            return 1.0
+        return 0.5 ** (max(0.0, age_s) / self.half_life_s)
+
+    def _decayed(self, row: Optional[tuple], now: float) -> SafeLimits:
+        if row is None:
+            return SafeLimits()
+        scale, max_batch, max_tokens, oom_count, updated = row
+        remaining = self._decay(now - updated)
+        # Move the scale back toward 1 and let absolute limits grow again
+        grow = 1 / remaining if remaining > 0 else math.inf
+        return SafeLimits(
+            scale=1 - (1 - scale) * remaining,
+            max_batch=_grown(max_batch, grow),
+            max_tokens=_grown(max_tokens, grow),
+            oom_count=oom_count,
+        )
+
+    def _row(self, key: OOMKey) -> Optional[tuple]:
+        return self._conn.execute(
+            "SELECT scale, max_batch, max_tokens, oom_count, updated FROM oom_limits "
+            "WHERE model=? AND gpu=? AND context=?",
+            (key.model, key.gpu, key.context),
+        ).fetchone()
+
+    def get(self, key: OOMKey) -> SafeLimits:
+        """
+        Current (decayed) limits for a key
+
+        Args:
+        ----
+            key: Model, GPU and context the limits apply to
+
+        Returns:
+        -------
+            The learned limits, or unconstrained limits if none are stored
+        """
+        with self._lock:
+            row = self._row(key)
+        return self._decayed(row, time.time())
+
+    def record_oom(
+        self,
+        key: OOMKey,
+        batch_size: Optional[int] = None,
+        tokens: Optional[int] = None,
+    ) -> SafeLimits:
+        """
+        Tighten the limits of a key after an OOM
+
+        The read-modify-write runs in an immediate transaction, so concurrent
+        OOMs from several workers each tighten the shared limit once.
+
+        Args:
+        ----
+            key: Model, GPU and context the OOM happened with
+            batch_size: Size of the batch that failed, if known
+            tokens: Padded tokens of the batch that failed, if known
+
+        Returns:
+        -------
+            The tightened limits
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._decayed(self._row(key), now)
+                limits = SafeLimits(
+                    scale=max(MIN_SCALE, current.scale * OOM_SHRINK),
+                    max_batch=_tighten(current.max_batch, batch_size),
+                    max_tokens=_tighten(current.max_tokens, tokens),
+                    oom_count=current.oom_count + 1,
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO oom_limits"
+                    "(model, gpu, context, scale, max_batch, max_tokens, oom_count, updated) "
+                    "VALUES(?,?,?,?,?,?,?,?)",
+                    (
+                        key.model,
+                        key.gpu,
+                        key.context,
+                        limits.scale,
+                        limits.max_batch,
+                        limits.max_tokens,
+                        limits.oom_count,
+                        now,
+                    ),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        logger.warning(
+            f"OOM limits for {key.model} on {key.gpu} (ctx {key.context}): "
+            f"scale={limits.scale:.2f}, batch<={limits.max_batch}, tokens<={limits.max_tokens}"
+        )
+        return limits
+
+    def reset(self, key: Optional[OOMKey] = None) -> None:
+        """Forget the limits of a key, or of every key"""
+        with self._lock:
+            if key is None:
+                self._conn.execute("DELETE FROM oom_limits")
+            else:
+                self._conn.execute(
+                    "DELETE FROM oom_limits WHERE model=? AND gpu=? AND context=?",
+                    (key.model, key.gpu, key.context),
+                )
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def _grown(limit: Optional[int], factor: float) -> Optional[int]:
+    if limit is None or math.isinf(factor):
+        return None
+    return max(1, int(limit * factor))
+
+
+def _tighten(limit: Optional[int], failed: Optional[int]) -> Optional[int]:
+    """Largest value believed safe after a failure at ``failed``"""
+    if not failed:
+        return limit
+    safe = max(1, int(failed * OOM_SHRINK))
+    return safe if limit is None else min(limit, safe)
+
+
+_store: Optional[OOMLimitStore] = None
+_store_lock = threading.Lock()
+
+
+def get_oom_store() -> Optional[OOMLimitStore]:
+    """The node-wide store, or None when sharing is disabled or unavailable"""
+    global _store
+    if not ENV_OOM_SHARED:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = OOMLimitStore()
+            except Exception as e:
+                logger.warning(f"OOM limit store unavailable: {e}")
+                return None
+        return _store
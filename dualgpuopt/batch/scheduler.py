@@ -0,0 +1,601 @@
+"""
+Continuous-batching request scheduler
+
+Admits concurrent streaming requests into the running batch as slots free up
+instead of grouping a static list up front. Admissions are capped by a batch
+size and by a KV-cache memory budget, both scaled down by the ``SmartBatcher``
+OOM backpressure. Waiting requests are served by priority class first, and
+within a class by the tenant that has been granted the fewest KV tokens so far.
+
+Two modes share the same admission queue:
+
+- ``stream`` only gates a request (HTTP servers such as llama.cpp and vLLM do
+  their own batching; the scheduler keeps them from being flooded)
+- ``run`` decodes requests one token per iteration on a single loop thread,
+  so new requests join between decode steps
+
+With a ``BatchDecoder`` the running sequences advance together: each iteration
+is one ``step`` call over the whole running batch, which in-process backends
+fuse into one forward pass. Without one, ``run`` drives a per-request decode
+iterator and the loop advances the iterators in turn, so requests interleave
+but every step is still its own forward pass.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Iterator, Optional, Protocol
+
+from dualgpuopt.batch.smart_batch import BatchStats, SmartBatcher
+
+logger = logging.getLogger("DualGPUOpt.Scheduler")
+
+# Maximum number of concurrently running requests
+ENV_SCHED_MAX_BATCH = int(os.environ.get("DUALGPUOPT_SCHED_MAX_BATCH", "16"))
+# Seconds a request may wait for admission in gating mode (0 waits forever)
+ENV_SCHED_QUEUE_TIMEOUT = float(os.environ.get("DUALGPUOPT_SCHED_QUEUE_TIMEOUT", "300"))
+
+# Decode iterations aggregated into one BatchStats record
+STATS_WINDOW = 16
+DEFAULT_MAX_TOKENS = 128
+
+_DONE = object()
+_ids = itertools.count()
+
+
+class Priority(IntEnum):
+    """Priority classes, served strictly in this order"""
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BATCH = 2
+
+
+@dataclass(eq=False)
+class Request:
+    """A generation request as seen by the scheduler"""
+
+    prompt: str
+    max_tokens: int = DEFAULT_MAX_TOKENS
+    tenant: str = "default"
+    priority: Priority = Priority.NORMAL
+    prompt_tokens: int = 0  # estimated from the prompt when 0
+    id: int = field(default_factory=lambda: next(_ids))
+    arrival: float = field(default_factory=time.monotonic)
+    admitted_at: Optional[float] = None  # monotonic time of admission
+    inference_id: str = ""  # carried through the serving path; generated when empty
+
+    def __post_init__(self):
+        if self.prompt_tokens <= 0:
+            self.prompt_tokens = max(1, len(self.prompt.split()))
+        self.priority = Priority(self.priority)
+        if not self.inference_id:
+            self.inference_id = f"{random.getrandbits(64):016x}"
+
+    @property
+    def kv_tokens(self) -> int:
+        """Tokens of KV cache the request holds at most"""
+        return self.prompt_tokens + self.max_tokens
+
+
+class BatchDecoder(Protocol):
+    """Backend that advances every running sequence with one forward pass per step"""
+
+    def step(self, sequences: list[Any]) -> list[Optional[str]]:
+        """
+        Decode one token for each sequence
+
+        Args:
+        ----
+            sequences: Sequence states returned by the requests' ``start``; new
+                ones are prefilled in the same step
+
+        Returns:
+        -------
+            New text per sequence, in order; None once a sequence has finished
+        """
+        ...
+
+    def finish(self, sequence: Any) -> None:
+        """Free the KV cache of a sequence that finished or was dropped"""
+        ...
+
+
+def is_oom_error(exc: BaseException) -> bool:
+    """Whether an exception signals that the GPU ran out of memory"""
+    if isinstance(exc, MemoryError) or type(exc).__name__ == "OutOfMemoryError":
+        return True
+    return "out of memory" in str(exc).lower()
+
+
+@dataclass(eq=False)
+class _Ticket:
+    """A queued or running request and its mode-specific state"""
+
+    request: Request
+    admitted: threading.Event = field(default_factory=threading.Event)
+    # Iteration mode only
+    start: Optional[Callable[[], Any]] = None
+    steps: Any = None  # decode-step iterator, or the sequence state of a BatchDecoder
+    out: Optional[queue.Queue] = None
+    cancelled: bool = False
+
+
+# Finished (ticket, result) pairs, OOM seen, prompt tokens started, tokens decoded
+_StepResult = tuple[list[tuple[_Ticket, Any]], bool, int, int]
+
+
+class ContinuousBatchScheduler:
+    """
+    Iteration-level scheduler with KV-memory admission control
+
+    Thread-safe; one instance is meant to front one engine.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = ENV_SCHED_MAX_BATCH,
+        kv_budget_mb: Optional[float] = None,
+        per_token_mb: float = 0.0,
+        batcher: Optional[SmartBatcher] = None,
+        queue_timeout: float = ENV_SCHED_QUEUE_TIMEOUT,
+        decoder: Optional[BatchDecoder] = None,
+    ):
+        """
+        Initialize the scheduler
+
+        Args:
+        ----
+            max_batch_size: Maximum number of concurrently running requests
+            kv_budget_mb: KV-cache memory available to running requests (None: no cap)
+            per_token_mb: KV-cache memory per token, e.g. from
+                ``Optimizer.calculate_per_token_memory``
+            batcher: Batcher whose OOM backpressure scales both caps
+            queue_timeout: Seconds to wait for admission in gating mode (0: forever)
+            decoder: Steps the whole running batch at once in iteration mode;
+                ``run`` then takes a ``start`` that returns a sequence state
+        """
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.kv_budget_mb = kv_budget_mb
+        self.per_token_mb = max(0.0, float(per_token_mb))
+        self.batcher = batcher or SmartBatcher(max_batch_size=self.max_batch_size)
+        self.queue_timeout = queue_timeout
+        self.decoder = decoder
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        # priority -> tenant -> FIFO of waiting tickets
+        self._waiting: dict[Priority, dict[str, list[_Ticket]]] = {p: {} for p in Priority}
+        self._running: dict[int, _Ticket] = {}
+        self._active: list[_Ticket] = []  # running tickets driven by the loop
+        self._kv_in_use_mb = 0.0
+        self._tenant_usage: dict[str, int] = {}
+
+        self._loop_thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._loop_error: Optional[BaseException] = None  # why the loop stopped, if it crashed
+
+        # Statistics
+        self.admitted = 0
+        self.completed = 0
+        self.oom_events = 0
+        self.timeouts = 0
+
+    # ------------------------------------------------------------------ #
+    # Caps
+    # ------------------------------------------------------------------ #
+    def _scale(self) -> float:
+        return self.batcher.current_scale_factor if self.batcher.backpressure_active else 1.0
+
+    @property
+    def running_count(self) -> int:
+        """Number of requests currently admitted"""
+        return len(self._running)
+
+    def slot_limit(self) -> int:
+        """Concurrent requests allowed under the current backpressure"""
+        limit = int(self.max_batch_size * self._scale())
+        if self.batcher.shared_max_batch is not None:
+            limit = min(limit, self.batcher.shared_max_batch)
+        return max(1, limit)
+
+    def kv_limit_mb(self) -> Optional[float]:
+        """KV-cache memory allowed under the current backpressure"""
+        limits = []
+        if self.kv_budget_mb is not None:
+            limits.append(self.kv_budget_mb * self._scale())
+        if self.batcher.shared_max_tokens is not None and self.per_token_mb > 0:
+            limits.append(self.batcher.shared_max_tokens * self.per_token_mb)
+        return min(limits) if limits else None
+
+    def kv_cost_mb(self, request: Request) -> float:
+        """KV-cache memory a request holds at its maximum length"""
+        return request.kv_tokens * self.per_token_mb
+
+    # ------------------------------------------------------------------ #
+    # Queueing and admission
+    # ------------------------------------------------------------------ #
+    def _enqueue_locked(self, ticket: _Ticket) -> None:
+        request = ticket.request
+        backlogged = {t for tenants in self._waiting.values() for t, q in tenants.items() if q}
+        if request.tenant not in backlogged and backlogged:
+            # A tenant that was idle does not bank credit for the time it was away
+            floor = min(self._tenant_usage.get(t, 0) for t in backlogged)
+            self._tenant_usage[request.tenant] = max(
+                self._tenant_usage.get(request.tenant, 0), floor
+            )
+        self._waiting[request.priority].setdefault(request.tenant, []).append(ticket)
+
+    def _dequeue_locked(self, ticket: _Ticket) -> bool:
+        tenants = self._waiting[ticket.request.priority]
+        pending = tenants.get(ticket.request.tenant, [])
+        if ticket not in pending:
+            return False
+        pending.remove(ticket)
+        if not pending:
+            del tenants[ticket.request.tenant]
+        return True
+
+    def _next_locked(self) -> Optional[_Ticket]:
+        """Head of the highest priority class, from its least served tenant"""
+        for priority in Priority:
+            tenants = self._waiting[priority]
+            if tenants:
+                tenant = min(
+                    tenants,
+                    key=lambda t: (self._tenant_usage.get(t, 0), tenants[t][0].request.arrival),
+                )
+                return tenants[tenant][0]
+        return None
+
+    def _admit_locked(self) -> None:
+        """Admit waiting requests while a slot and KV memory are free"""
+        kv_limit = self.kv_limit_mb()
+        while len(self._running) < self.slot_limit():
+            ticket = self._next_locked()
+            if ticket is None:
+                return
+            cost = self.kv_cost_mb(ticket.request)
+            # Head-of-line blocking keeps large requests from starving; a request
+            # larger than the whole budget still runs once the batch is empty
+            if kv_limit is not None and self._running and self._kv_in_use_mb + cost > kv_limit:
+                return
+
+            self._dequeue_locked(ticket)
+            request = ticket.request
+            self._running[request.id] = ticket
+            self._kv_in_use_mb += cost
+            self._tenant_usage[request.tenant] = (
+                self._tenant_usage.get(request.tenant, 0) + request.kv_tokens
+            )
+            self.admitted += 1
+            request.admitted_at = time.monotonic()
+            if ticket.start is not None:
+                self._active.append(ticket)
+            ticket.admitted.set()
+            self._cond.notify_all()
+
+    def _release_locked(self, ticket: _Ticket) -> None:
+        if self._running.pop(ticket.request.id, None) is None:
+            return
+        self._kv_in_use_mb = max(0.0, self._kv_in_use_mb - self.kv_cost_mb(ticket.request))
+        if ticket in self._active:
+            self._active.remove(ticket)
+        self.completed += 1
+        self._admit_locked()
+
+    def _running_tokens_locked(self) -> int:
+        return sum(t.request.kv_tokens for t in self._running.values())
+
+    def _record_locked(self, stats: BatchStats) -> None:
+        if stats.oom_events:
+            self.oom_events += stats.oom_events
+        self.batcher.record_batch_stats(stats)
+
+    # ------------------------------------------------------------------ #
+    # Gating mode
+    # ------------------------------------------------------------------ #
+    def stream(self, request: Request, generate: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """
+        Run ``generate`` once the request is admitted and stream its tokens
+
+        Args:
+        ----
+            request: Scheduling metadata of the request
+            generate: Starts the generation and returns its token iterator
+
+        Yields:
+        ------
+            Generated tokens
+
+        Raises:
+        ------
+            TimeoutError: If the request is not admitted within ``queue_timeout``
+        """
+        ticket = _Ticket(request)
+        with self._cond:
+            self._enqueue_locked(ticket)
+            self._admit_locked()
+
+        if not ticket.admitted.wait(self.queue_timeout or None):
+            with self._cond:
+                if self._dequeue_locked(ticket):
+                    self.timeouts += 1
+                    raise TimeoutError(
+                        f"Request {request.id} not admitted within {self.queue_timeout:.0f}s"
+                    )
+            # Admitted while we were giving up
+
+        t0 = time.monotonic()
+        tokens_out = 0
+        oom = 0
+        try:
+            for tok in generate():
+                tokens_out += 1
+                yield tok
+        except Exception as e:
+            oom = int(is_oom_error(e))
+            raise
+        finally:
+            with self._cond:
+                self._record_locked(
+                    BatchStats(
+                        request.prompt_tokens,
+                        tokens_out,
+                        time.monotonic() - t0,
+                        oom,
+                        batch_size=len(self._running),
+                        batch_tokens=self._running_tokens_locked(),
+                    )
+                )
+                self._release_locked(ticket)
+
+    # ------------------------------------------------------------------ #
+    # Iteration mode
+    # ------------------------------------------------------------------ #
+    def run(self, request: Request, start: Callable[[], Any]) -> Iterator[str]:
+        """
+        Decode a request on the scheduler loop, one step per iteration
+
+        ``start`` is called on the loop thread after admission, so the KV cache
+        is only allocated once the request fits. With a ``decoder`` it returns
+        the sequence state the decoder steps together with the rest of the
+        batch. Otherwise it returns an iterator whose every ``next()`` performs
+        one decode step and may yield an empty string; such iterators take
+        turns on the loop thread rather than sharing a forward pass.
+
+        Args:
+        ----
+            request: Scheduling metadata of the request
+            start: Creates the request's sequence state or decode-step iterator
+
+        Yields:
+        ------
+            Generated tokens
+        """
+        ticket = _Ticket(request, start=start, out=queue.Queue())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed") from self._loop_error
+            self._enqueue_locked(ticket)
+            self._admit_locked()
+            self._ensure_loop_locked()
+            self._cond.notify_all()
+
+        try:
+            while True:
+                item = ticket.out.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # The consumer may stop early; the loop drops the sequence
+            with self._cond:
+                ticket.cancelled = True
+                self._dequeue_locked(ticket)
+
+    def _ensure_loop_locked(self) -> None:
+        if self._loop_thread is None or not self._loop_thread.is_alive():
+            self._loop_thread = threading.Thread(
+                target=self._loop, daemon=True, name="BatchScheduler"
+            )
+            self._loop_thread.start()
+
+    def _fail_pending_locked(self, message: str, cause: Optional[BaseException] = None) -> None:
+        """Fail every running or waiting iteration-mode request and release its slot"""
+        waiting = [t for ts in self._waiting.values() for q in ts.values() for t in q]
+        for ticket in self._active + waiting:
+            if ticket.out is None:
+                continue
+            if ticket in self._active:
+                try:
+                    self._close_steps(ticket)
+                except Exception as e:
+                    logger.debug(f"Failed to free decode state: {e}")
+                if self._running.pop(ticket.request.id, None) is not None:
+                    self._kv_in_use_mb = max(
+                        0.0, self._kv_in_use_mb - self.kv_cost_mb(ticket.request)
+                    )
+            else:
+                self._dequeue_locked(ticket)
+            error = RuntimeError(message)
+            error.__cause__ = cause
+            ticket.out.put(error)
+        self._active.clear()
+
+    def _loop(self) -> None:
+        """Run the decode loop; if it crashes, fail pending requests and stop"""
+        try:
+            self._decode_loop()
+        except Exception as e:
+            logger.exception(f"Scheduler loop failed: {e}")
+            with self._cond:
+                self._closed = True
+                self._loop_error = e
+                self._fail_pending_locked(f"Scheduler loop failed: {e}", e)
+                self._cond.notify_all()
+
+    def _decode_loop(self) -> None:
+        """Admit between iterations and advance every running sequence by one step"""
+        window_start = time.monotonic()
+        window_in = window_out = iterations = 0
+
+        while True:
+            with self._cond:
+                self._admit_locked()
+                while not self._active and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    self._fail_pending_locked("Scheduler is closed")
+                    return
+                batch = list(self._active)
+
+            if self.decoder is not None:
+                finished, oom, tokens_in, tokens_out = self._step_batch(batch)
+            else:
+                finished, oom, tokens_in, tokens_out = self._step_iterators(batch)
+            window_in += tokens_in
+            window_out += tokens_out
+
+            for ticket, result in finished:
+                self._close_steps(ticket)
+                if result is not None:
+                    ticket.out.put(result)
+
+            iterations += 1
+            stats = None
+            if oom or iterations >= STATS_WINDOW:
+                elapsed = time.monotonic() - window_start
+                stats = BatchStats(
+                    window_in,
+                    window_out,
+                    elapsed,
+                    int(oom),
+                    batch_size=len(batch),
+                    batch_tokens=sum(t.request.kv_tokens for t in batch),
+                )
+                window_start = time.monotonic()
+                window_in = window_out = iterations = 0
+
+            with self._cond:
+                if stats is not None:
+                    self._record_locked(stats)
+                for ticket, _ in finished:
+                    self._release_locked(ticket)
+            if oom:
+                self.batcher.reset_cache()
+
+    def _step_iterators(self, batch: list[_Ticket]) -> _StepResult:
+        """Advance each request's own decode iterator by one step, in turn"""
+        finished: list[tuple[_Ticket, Any]] = []
+        oom = False
+        tokens_in = tokens_out = 0
+        for ticket in batch:
+            if ticket.cancelled:
+                finished.append((ticket, None))
+                continue
+            try:
+                if ticket.steps is None:
+                    ticket.steps = iter(ticket.start())
+                    tokens_in += ticket.request.prompt_tokens
+                tok = next(ticket.steps)
+            except StopIteration:
+                finished.append((ticket, _DONE))
+            except Exception as e:
+                oom = oom or is_oom_error(e)
+                finished.append((ticket, e))
+            else:
+                tokens_out += 1
+                if tok:
+                    ticket.out.put(tok)
+        return finished, oom, tokens_in, tokens_out
+
+    def _step_batch(self, batch: list[_Ticket]) -> _StepResult:
+        """Advance every running sequence with a single decoder step"""
+        finished: list[tuple[_Ticket, Any]] = []
+        oom = False
+        tokens_in = tokens_out = 0
+        live = []
+        for ticket in batch:
+            if ticket.cancelled:
+                finished.append((ticket, None))
+                continue
+            if ticket.steps is None:
+                try:
+                    ticket.steps = ticket.start()
+                except Exception as e:
+                    oom = oom or is_oom_error(e)
+                    finished.append((ticket, e))
+                    continue
+                tokens_in += ticket.request.prompt_tokens
+            live.append(ticket)
+        if not live:
+            return finished, oom, tokens_in, tokens_out
+
+        try:
+            chunks = self.decoder.step([ticket.steps for ticket in live])
+        except Exception as e:
+            # The sequences shared the forward pass, so they fail together
+            oom = oom or is_oom_error(e)
+            finished.extend((ticket, e) for ticket in live)
+            return finished, oom, tokens_in, tokens_out
+
+        for ticket, chunk in zip(live, chunks):
+            if chunk is None:
+                finished.append((ticket, _DONE))
+            else:
+                tokens_out += 1
+                if chunk:
+                    ticket.out.put(chunk)
+        return finished, oom, tokens_in, tokens_out
+
+    def _close_steps(self, ticket: _Ticket) -> None:
+        """Drop a ticket's decode state, and the KV cache with it"""
+        steps, ticket.steps = ticket.steps, None
+        if steps is None:
+            return
+        if self.decoder is not None:
+            self.decoder.finish(steps)
+            return
+        close = getattr(steps, "close", None)
+        if close is not None:
+            close()
+
+    def close(self) -> None:
+        """Stop the loop thread; running iteration-mode requests fail"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._loop_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+
+    # ------------------------------------------------------------------ #
+    def get_stats(self) -> dict[str, Any]:
+        """Queue, admission and backpressure counters"""
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "waiting": sum(
+                    len(q) for tenants in self._waiting.values() for q in tenants.values()
+                ),
+                "slot_limit": self.slot_limit(),
+                "kv_in_use_mb": self._kv_in_use_mb,
+                "kv_limit_mb": self.kv_limit_mb(),
+                "admitted": self.admitted,
+                "completed": self.completed,
+                "oom_events": self.oom_events,
+                "timeouts": self.timeouts,
+                "scale_factor": self._scale(),
+                "tenant_kv_tokens": dict(self._tenant_usage),
+            }
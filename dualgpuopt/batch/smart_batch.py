@@ -2,12 +2,30 @@
 Smart batching system for length-aware inference scheduling
 """
 import logging
+import math
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Any, Callable, List, Optional, Sequence, Tuple
 
 # Initialize logger
 logger = logging.getLogger("DualGPUOpt.SmartBatch")
 
+# Token budget per batch when neither a limit nor a memory profile is given
+DEFAULT_MAX_BATCH_TOKENS = 16384
+# Characters per token assumed before any calibration sample is seen
+DEFAULT_CHARS_PER_TOKEN = 4.0
+# Standard deviations of sampled tokens-per-char added to estimates, so that an
+# estimated batch rarely exceeds its budget
+ESTIMATE_MARGIN_SIGMAS = 1.0
+# Share of free GPU memory the batch may plan for
+MEMORY_SAFETY_FACTOR = 0.9
+# Seconds between reads of the shared OOM limits
+SHARED_LIMITS_REFRESH_S = 5.0
+# Scale above which backpressure is released
+BACKPRESSURE_RELEASE_SCALE = 0.9
+
 
 def optimize_batch_size(
     gpu_memory_gb: float,
@@ -70,6 +88,144 @@ def optimize_batch_size(
     return batch_size
 
 
+class TokenLengthEstimator:
+    """
+    Token counts of texts for batch formation
+
+    With a tokenizer, texts are tokenized exactly until ``min_samples`` samples
+    have been seen and then one text in ``sample_every``; the others are
+    estimated from the tokens-per-character density calibrated on those
+    samples, padded by ``ESTIMATE_MARGIN_SIGMAS`` of its spread.
+    ``exact=True`` tokenizes every text. Exact counts are cached.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Any = None,
+        exact: bool = False,
+        sample_every: int = 20,
+        min_samples: int = 16,
+        cache_size: int = 8192,
+        chars_per_token: float = DEFAULT_CHARS_PER_TOKEN,
+    ) -> None:
+        """
+        Initialize the estimator
+
+        Args:
+        ----
+            tokenizer: Object with ``encode(text)`` (HF, tiktoken, sentencepiece) or a
+                callable returning token ids or a count; None uses ``chars_per_token``
+            exact: Tokenize every text instead of sampling
+            sample_every: Tokenize one text in this many once calibrated
+            min_samples: Texts tokenized before estimates are used
+            cache_size: Number of exact counts to keep
+            chars_per_token: Ratio used until calibration samples exist
+        """
+        self.tokenizer = tokenizer
+        self.exact = exact
+        self.sample_every = max(1, sample_every)
+        self.min_samples = min_samples
+        self.cache_size = cache_size
+        self.default_chars_per_token = chars_per_token
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        self._sample_chars = 0
+        self._sample_tokens = 0
+        self._density_sum = 0.0
+        self._density_sq_sum = 0.0
+        self._samples = 0
+        self._seen = 0
+
+    @property
+    def chars_per_token(self) -> float:
+        """Calibrated characters per token"""
+        with self._lock:
+            if not self._sample_tokens:
+                return self.default_chars_per_token
+            return self._sample_chars / self._sample_tokens
+
+    def tokenize_count(self, text: str) -> int:
+        """Exact token count from the tokenizer"""
+        encode = getattr(self.tokenizer, "encode", None)
+        if encode is not None:
+            try:
+                ids = encode(text, add_special_tokens=False)
+            except TypeError:
+                ids = encode(text)
+        else:
+            ids = self.tokenizer(text)
+        if isinstance(ids, int):
+            return ids
+        if isinstance(ids, dict) or hasattr(ids, "input_ids"):
+            ids = ids["input_ids"]
+        return len(ids)
+
+    def calibrate(self, texts: Sequence[str]) -> float:
+        """
+        Tokenize sample texts to calibrate the chars-per-token ratio
+
+        Returns
+        -------
+            The calibrated characters per token
+        """
+        for text in texts:
+            self._measure(text)
+        return self.chars_per_token
+
+    def _measure(self, text: str) -> int:
+        n = self.tokenize_count(text)
+        key = (len(text), hash(text))
+        density = n / max(1, len(text))
+        with self._lock:
+            self._sample_chars += len(text)
+            self._sample_tokens += n
+            self._density_sum += density
+            self._density_sq_sum += density * density
+            self._samples += 1
+            self._cache[key] = n
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return n
+
+    def count(self, text: str) -> int:
+        """Token count of one text, exact or estimated"""
+        if self.tokenizer is None:
+            return max(1, math.ceil(len(text) / self.default_chars_per_token))
+
+        key = (len(text), hash(text))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            self._seen += 1
+            sample = (
+                self.exact
+                or self._samples < self.min_samples
+                or self._seen % self.sample_every == 0
+            )
+            density = self._estimate_density_locked()
+
+        if sample or not density:
+            return max(1, self._measure(text))
+        return max(1, math.ceil(len(text) * density))
+
+    def _estimate_density_locked(self) -> float:
+        """Tokens per character for estimates: pooled mean plus a spread margin"""
+        if not self._sample_tokens:
+            return 0.0
+        mean = self._density_sum / self._samples
+        variance = max(0.0, self._density_sq_sum / self._samples - mean * mean)
+        return self._sample_tokens / self._sample_chars + ESTIMATE_MARGIN_SIGMAS * math.sqrt(
+            variance
+        )
+
+    def counts(self, texts: Sequence[str]) -> List[int]:
+        """Token counts of several texts"""
+        return [self.count(text) for text in texts]
+
+
 @dataclass
 class BatchStats:
     """Statistics for a processed batch"""
@@ -78,6 +234,8 @@ class BatchStats:
     tokens_out: int
     processing_time: float
     oom_events: int
+    batch_size: int = 0  # sequences in the batch, if known
+    batch_tokens: int = 0  # padded tokens of the batch, if known
 
     @property
     def tokens_per_second(self) -> float:
@@ -101,6 +259,14 @@ class SmartBatcher:
         length_threshold: int = 256,
         adaptive_sizing: bool = True,
         oom_recovery: bool = True,
+        tokenizer: Any = None,
+        length_estimator: Optional[TokenLengthEstimator] = None,
+        max_batch_tokens: Optional[int] = None,
+        memory_profile: Any = None,
+        gpu_id: int = 0,
+        free_memory_fn: Optional[Callable[[], Optional[int]]] = None,
+        oom_store: Any = None,
+        oom_key: Any = None,
     ) -> None:
         """
         Initialize the smart batcher
@@ -108,14 +274,29 @@ class SmartBatcher:
         Args:
         ----
             max_batch_size: Maximum number of sequences in a batch
-            length_threshold: Threshold for considering sequences as "long"
+            length_threshold: Threshold in tokens for considering sequences as "long"
             adaptive_sizing: Whether to dynamically adjust batch size based on performance
             oom_recovery: Whether to enable automatic OOM recovery
+            tokenizer: Tokenizer used to count tokens (see TokenLengthEstimator)
+            length_estimator: Token counter to use instead of one built from ``tokenizer``
+            max_batch_tokens: Fixed padded-token budget per batch
+            memory_profile: ``MemoryProfile`` deriving the budget from free memory
+                when ``max_batch_tokens`` is not given
+            gpu_id: GPU whose free memory bounds the batch
+            free_memory_fn: Returns free GPU memory in bytes (defaults to the
+                memory monitor)
+            oom_store: ``OOMLimitStore`` sharing learned limits between processes
+            oom_key: ``OOMKey`` of the model, GPU and context batched for
         """
         self.max_batch_size = max_batch_size
         self.length_threshold = length_threshold
         self.adaptive_sizing = adaptive_sizing
         self.oom_recovery = oom_recovery
+        self.length_estimator = length_estimator or TokenLengthEstimator(tokenizer)
+        self.max_batch_tokens = max_batch_tokens
+        self.memory_profile = memory_profile
+        self.gpu_id = gpu_id
+        self.free_memory_fn = free_memory_fn
 
         # Performance tracking
         self.batch_stats: List[BatchStats] = []
@@ -123,6 +304,89 @@ class SmartBatcher:
         self.oom_count = 0
         self.current_scale_factor = 1.0
 
+        # Limits shared with other workers through the OOM store
+        self.oom_store = oom_store if oom_key is not None else None
+        self.oom_key = oom_key
+        self.shared_max_batch: Optional[int] = None
+        self.shared_max_tokens: Optional[int] = None
+        self._shared_checked = 0.0
+        self.refresh_shared_limits(force=True)
+
+    def refresh_shared_limits(self, force: bool = False) -> None:
+        """
+        Adopt the limits other workers learned for the same model, GPU and context
+
+        Args:
+        ----
+            force: Read the store even if it was read recently
+        """
+        if self.oom_store is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._shared_checked < SHARED_LIMITS_REFRESH_S:
+            return
+        self._shared_checked = now
+        try:
+            limits = self.oom_store.get(self.oom_key)
+        except Exception as e:
+            logger.debug(f"Could not read shared OOM limits: {e}")
+            return
+        self._apply_shared_limits(limits)
+
+    def _apply_shared_limits(self, limits: Any) -> None:
+        self.shared_max_batch = limits.max_batch
+        self.shared_max_tokens = limits.max_tokens
+        if limits.scale <= BACKPRESSURE_RELEASE_SCALE:
+            if not self.backpressure_active or limits.scale < self.current_scale_factor:
+                self.current_scale_factor = limits.scale
+            self.backpressure_active = True
+
+    def _free_memory(self) -> Optional[int]:
+        """Free memory of the batching GPU in bytes, if known"""
+        if self.free_memory_fn is not None:
+            return self.free_memory_fn()
+        try:
+            from dualgpuopt.memory.metrics import MemoryUnit
+            from dualgpuopt.memory.monitor import get_memory_monitor
+
+            stats = get_memory_monitor().get_memory_stats(self.gpu_id, MemoryUnit.BYTES)
+            return int(stats["free"]) if stats else None
+        except Exception as e:
+            logger.debug(f"Free memory unavailable for batching: {e}")
+            return None
+
+    def token_budget_fn(self) -> Callable[[int], int]:
+        """
+        Padded-token budget of a batch as a function of its size
+
+        An explicit ``max_batch_tokens`` wins; otherwise the memory profile
+        bounds ``batch_size * padded_length`` by the current free memory. The
+        budget shrinks with the backpressure scale factor.
+
+        Returns
+        -------
+            Function mapping a batch size to its maximum padded token count
+        """
+        scale = self.current_scale_factor if self.backpressure_active else 1.0
+        cap = self.shared_max_tokens if self.shared_max_tokens is not None else math.inf
+        if self.max_batch_tokens is not None:
+            budget = int(min(self.max_batch_tokens * scale, cap))
+            return lambda _batch_size: budget
+
+        profile = self.memory_profile
+        free = self._free_memory() if profile is not None else None
+        if profile is None or not free or profile.per_token_usage <= 0:
+            budget = int(min(DEFAULT_MAX_BATCH_TOKENS * scale, cap))
+            return lambda _batch_size: budget
+
+        available = free * MEMORY_SAFETY_FACTOR * scale - profile.base_usage
+
+        def budget_for(batch_size: int) -> int:
+            token_memory = available - profile.per_batch_usage * batch_size
+            return max(0, int(min(token_memory / profile.per_token_usage, cap)))
+
+        return budget_for
+
     def optimize_batches(
         self,
         sequences: List[Tuple[str, int]],
@@ -130,6 +394,9 @@ class SmartBatcher:
         """
         Group sequences into optimized batches
 
+        Sequences are binned by token count and a batch is closed when its padded
+        size (batch size times longest sequence) would exceed the token budget.
+
         Args:
         ----
             sequences: List of (text, sequence_id) tuples
@@ -141,43 +408,42 @@ class SmartBatcher:
         if not sequences:
             return []
 
-        # Sort sequences by length for more efficient processing
-        seq_lengths = [(len(seq[0]), seq[1]) for seq in sequences]
-        sorted_seqs = sorted(seq_lengths, key=lambda x: x[0])
+        # Sort sequences by token count so batches need little padding
+        counts = self.length_estimator.counts([seq[0] for seq in sequences])
+        sorted_seqs = sorted(zip(counts, (seq[1] for seq in sequences)), key=lambda x: x[0])
 
         # Apply backpressure if active (reduce effective batch size)
+        self.refresh_shared_limits()
         effective_batch_size = self.max_batch_size
         if self.backpressure_active:
             effective_batch_size = max(1, int(effective_batch_size * self.current_scale_factor))
             logger.info(f"Backpressure active: reduced batch size to {effective_batch_size}")
+        if self.shared_max_batch is not None:
+            effective_batch_size = min(effective_batch_size, self.shared_max_batch)
+
+        token_budget = self.token_budget_fn()
 
-        # Group into batches with enhanced logic
         batches: List[List[int]] = []
         current_batch: List[int] = []
         current_length = 0
-        current_token_sum = 0
-        max_token_sum = 16384  # Maximum total tokens in a batch
 
         for length, seq_id in sorted_seqs:
-            # Check if adding this sequence would exceed constraints:
-            # 1. Batch size limit
-            # 2. Large length difference from current batch
-            # 3. Total token count exceeds maximum
-            if (
+            # Close the batch when:
+            # 1. It is full
+            # 2. The sequence is long and much longer than the batch so far
+            # 3. Padding everything to this length exceeds the token budget
+            padded = (len(current_batch) + 1) * max(current_length, length)
+            if current_batch and (
                 len(current_batch) >= effective_batch_size
-                or (
-                    length > self.length_threshold and current_batch and length > 2 * current_length
-                )
-                or (current_token_sum + length > max_token_sum)
+                or (length > self.length_threshold and length > 2 * current_length)
+                or padded > token_budget(len(current_batch) + 1)
             ):
                 batches.append(current_batch)
                 current_batch = [seq_id]
                 current_length = length
-                current_token_sum = length
             else:
                 current_batch.append(seq_id)
                 current_length = max(current_length, length)
-                current_token_sum += length
 
         # Add the last batch if not empty
         if current_batch:
@@ -209,6 +475,15 @@ class SmartBatcher:
             logger.warning(
                 f"OOM detected: activating backpressure, scale={self.current_scale_factor:.2f}"
             )
+            if self.oom_store is not None:
+                try:
+                    limits = self.oom_store.record_oom(
+                        self.oom_key, stats.batch_size or None, stats.batch_tokens or None
+                    )
+                    self._shared_checked = time.monotonic()
+                    self._apply_shared_limits(limits)
+                except Exception as e:
+                    logger.debug(f"Could not share OOM limits: {e}")
         else:
             # Gradually recover if we've processed 5 batches without OOM
             if (
@@ -223,10 +498,13 @@ class SmartBatcher:
                 )
 
                 # Deactivate backpressure if we're close to normal
-                if self.current_scale_factor > 0.9:
+                if self.current_scale_factor > BACKPRESSURE_RELEASE_SCALE:
                     self.backpressure_active = False
                     logger.info("Backpressure deactivated")
 
+            # Local recovery never goes past what other workers learned
+            self.refresh_shared_limits()
+
     def reset_cache(self) -> None:
         """Reset CUDA cache to recover from OOM conditions"""
         try:
@@ -0,0 +1,664 @@
+"""
+Headless batch planning of launch parameters for many models
+
+Reads a manifest of models (local GGUF files, Hugging Face checkpoint
+directories or hub ids, each with one or more quantization variants) and a
+GPU inventory (live, mock or a JSON file), reads each model's metadata and
+plans its GPU split and context length in parallel, then writes llama.cpp and
+vLLM launch parameters as JSON or CSV.
+
+Usage
+-----
+python -m dualgpuopt plan models.json --gpus mock -o plans.csv
+python -m dualgpuopt plan models.txt --gpus inventory.json --format json
+
+Manifests are JSON (a list, or {"models": [...]}), JSON lines, CSV with a
+``model`` column, or text with one ``model [quant ...]`` per line. Entries
+carry ``model`` and optionally ``quant`` (a name or a list of variants),
+``size_gb`` and ``params_b`` for models whose size cannot be read.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import re
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Sequence, Tuple
+
+from dualgpuopt.commands.gpu_commands import generate_llama_cpp_cmd, generate_vllm_cmd
+from dualgpuopt.ctx_size import model_params_from_name
+from dualgpuopt.model import vram_fit
+
+logger = logging.getLogger("DualGPUOpt.Plan")
+
+MB = 1024 * 1024
+
+# Worker threads reading metadata and planning entries
+PLAN_WORKERS = int(os.environ.get("DUALGPUOPT_PLAN_WORKERS", "0")) or min(
+    32, (os.cpu_count() or 1) + 4
+)
+
+# Bits per weight of each quantization, including scales and other overhead
+BITS_PER_WEIGHT = {
+    "f32": 32.0,
+    "f16": 16.0,
+    "bf16": 16.0,
+    "fp8": 8.0,
+    "int8": 8.0,
+    "q8_0": 8.5,
+    "q6_k": 6.56,
+    "q5_1": 6.0,
+    "q5_k_m": 5.69,
+    "q5_k_s": 5.54,
+    "q5_0": 5.5,
+    "q4_1": 5.0,
+    "q4_k_m": 4.85,
+    "q4_k_s": 4.58,
+    "q4_0": 4.5,
+    "q3_k_l": 4.27,
+    "q3_k_m": 3.91,
+    "q3_k_s": 3.5,
+    "q2_k": 3.35,
+    "awq": 4.25,
+    "gptq": 4.25,
+    "int4": 4.25,
+}
+_QUANT_ALIASES = {
+    "fp16": "f16",
+    "float16": "f16",
+    "bfloat16": "bf16",
+    "fp32": "f32",
+    "float32": "f32",
+    "none": "f16",
+}
+# GGUF general.file_type values
+_GGUF_FILE_TYPES = {
+    0: "f32",
+    1: "f16",
+    2: "q4_0",
+    3: "q4_1",
+    7: "q8_0",
+    8: "q5_0",
+    9: "q5_1",
+    10: "q2_k",
+    11: "q3_k_s",
+    12: "q3_k_m",
+    13: "q3_k_l",
+    14: "q4_k_s",
+    15: "q4_k_m",
+    16: "q5_k_s",
+    17: "q5_k_m",
+    18: "q6_k",
+    32: "bf16",
+}
+# Quantizations vLLM has to be told about; GGUF files and fp16/bf16 need no flag
+_VLLM_QUANTIZATION = {"awq": "awq", "gptq": "gptq", "fp8": "fp8", "int8": "bitsandbytes"}
+
+_QUANT_NAMES = sorted(set(BITS_PER_WEIGHT) | set(_QUANT_ALIASES) - {"none"}, key=len, reverse=True)
+_QUANT_PATTERN = re.compile(r"(?<![a-z0-9])(" + "|".join(_QUANT_NAMES) + r")(?![a-z0-9])")
+_MOE_PATTERN = re.compile(r"(?<![a-z0-9.])(\d+)x(\d+(?:\.\d+)?)b(?![a-z0-9])")
+_PARAMS_PATTERN = re.compile(r"(?<![a-z0-9.])(\d+(?:\.\d+)?)b(?![a-z0-9])")
+
+# Loggers that log every planned model; quietened for batch runs unless verbose
+_CHATTY_LOGGERS = ("dualgpuopt.model.vram_fit", "DualGPUOpt.CtxSize", "DualGPUOpt.Commands")
+
+
+@dataclass
+class ManifestEntry:
+    """One model and quantization to plan"""
+
+    model: str
+    quant: Optional[str] = None
+    size_gb: Optional[float] = None
+    params_b: Optional[float] = None
+
+
+@dataclass
+class ModelInfo:
+    """What is known about a model's size and shape"""
+
+    model: str
+    quant: str
+    format: str  # "gguf" or "hf"
+    source: str  # where the shape came from: "gguf", "config" or "name"
+    size_bytes: int
+    params_b: Optional[float] = None
+    layers: Optional[int] = None
+    heads: Optional[int] = None
+    kv_heads: Optional[int] = None
+    head_dim: Optional[int] = None
+    n_ctx_train: Optional[int] = None
+
+    @property
+    def kv_bytes_per_token(self) -> Optional[int]:
+        """fp16 K and V cache bytes per token over all layers"""
+        if not (self.layers and self.kv_heads and self.head_dim):
+            return None
+        return 2 * self.layers * self.kv_heads * self.head_dim * 2
+
+
+@dataclass
+class PlanRow:
+    """Launch parameters planned for one manifest entry"""
+
+    model: str
+    quant: Optional[str] = None
+    format: Optional[str] = None
+    source: Optional[str] = None
+    size_mb: Optional[int] = None
+    params_b: Optional[float] = None
+    kv_bytes_per_token: Optional[int] = None
+    n_ctx_train: Optional[int] = None
+    backend: Optional[str] = None
+    llama_fits: Optional[bool] = None
+    llama_ctx_size: Optional[int] = None
+    llama_tensor_split: Optional[str] = None
+    llama_command: Optional[str] = None
+    vllm_fits: Optional[bool] = None
+    vllm_tensor_parallel_size: Optional[int] = None
+    vllm_max_model_len: Optional[int] = None
+    vllm_gpu_memory_utilization: Optional[float] = None
+    vllm_quantization: Optional[str] = None
+    vllm_cuda_visible_devices: Optional[str] = None
+    vllm_command: Optional[str] = None
+    error: Optional[str] = None
+
+
+# ------------------------------------------------------------------ manifest
+
+
+def normalize_quant(quant: Optional[str]) -> Optional[str]:
+    """Canonical lower-case quantization name, e.g. "Q4_K_M" -> "q4_k_m", "fp16" -> "f16" """
+    if not quant:
+        return None
+    quant = quant.strip().lower().replace("-", "_")
+    return _QUANT_ALIASES.get(quant, quant)
+
+
+def quant_from_name(name: str) -> Optional[str]:
+    """Quantization named in a model path or id, if any"""
+    match = _QUANT_PATTERN.search(os.path.basename(name.rstrip("/\\")).lower().replace("-", "_"))
+    return normalize_quant(match.group(1)) if match else None
+
+
+def _entries(model: str, quant: Any = None, size_gb: Any = None, params_b: Any = None):
+    """Manifest entries of one model, one per quantization variant"""
+    if isinstance(quant, str):
+        quant = re.split(r"[;|]", quant) if re.search(r"[;|]", quant) else [quant]
+    variants = [q.strip() for q in quant or [] if q and q.strip()] or [None]
+    size_gb = float(size_gb) if size_gb not in (None, "") else None
+    params_b = float(params_b) if params_b not in (None, "") else None
+    return [ManifestEntry(model.strip(), q, size_gb, params_b) for q in variants]
+
+
+def parse_manifest(text: str, fmt: str = "text") -> List[ManifestEntry]:
+    """
+    Parse a manifest
+
+    Args:
+    ----
+        text: Manifest contents
+        fmt: "json", "jsonl", "csv" or "text"
+
+    Returns:
+    -------
+        Entries in manifest order, quantization variants expanded
+    """
+    if fmt == "json":
+        data = json.loads(text)
+        items = data.get("models", []) if isinstance(data, dict) else data
+    elif fmt == "jsonl":
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    elif fmt == "csv":
+        items = list(csv.DictReader(io.StringIO(text)))
+    else:
+        items = []
+        for line in text.splitlines():
+            parts = line.split("#", 1)[0].split()
+            if parts:
+                items.append({"model": parts[0], "quant": parts[1:]})
+
+    entries = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"model": item}
+        if not item.get("model"):
+            raise ValueError(f"Manifest entry without a model: {item!r}")
+        entries.extend(
+            _entries(item["model"], item.get("quant"), item.get("size_gb"), item.get("params_b"))
+        )
+    return entries
+
+
+def load_manifest(path: str) -> List[ManifestEntry]:
+    """Load a manifest file (format from its suffix), or standard input for "-" """
+    if path == "-":
+        text = sys.stdin.read()
+        stripped = text.lstrip()
+        fmt = "json" if stripped.startswith(("[", "{")) else "text"
+    else:
+        text = Path(path).read_text(encoding="utf-8")
+        suffix = Path(path).suffix.lower()
+        fmt = {".json": "json", ".jsonl": "jsonl", ".csv": "csv"}.get(suffix, "text")
+    return parse_manifest(text, fmt)
+
+
+# ----------------------------------------------------------------- inventory
+
+
+def _normalize_gpu(index: int, gpu: Dict[str, Any]) -> Dict[str, Any]:
+    if "memory_total" in gpu:
+        total = gpu["memory_total"]
+    elif "mem_total" in gpu:
+        total = gpu["mem_total"]
+    elif "memory_gb" in gpu:
+        total = float(gpu["memory_gb"]) * 1024
+    else:
+        raise ValueError(f"GPU {index} has no memory_total (MB), mem_total or memory_gb")
+    return {
+        "id": int(gpu.get("id", index)),
+        "name": gpu.get("name", f"GPU {index}"),
+        "memory_total": int(total),
+        "memory_free": int(gpu.get("memory_free", gpu.get("mem_free", total))),
+    }
+
+
+def load_gpus(spec: str = "live") -> List[Dict[str, Any]]:
+    """
+    GPU inventory to plan for
+
+    Args:
+    ----
+        spec: "live" (nvidia-smi), "mock" or "mock:N" (N mock GPUs, default 2), or
+            the path of a JSON list of GPUs (or {"gpus": [...]}) with memory_total in MB
+
+    Returns:
+    -------
+        GPUs with id, name, memory_total and memory_free (MB)
+    """
+    if spec == "live":
+        gpus = vram_fit._detect_gpus()
+        if not gpus:
+            raise RuntimeError("No GPUs detected; use --gpus mock or a JSON inventory")
+    elif spec == "mock" or spec.startswith("mock:"):
+        from dualgpuopt.gpu.mock import generate_mock_gpus
+
+        count = int(spec.partition(":")[2] or 2)
+        gpus = generate_mock_gpus(count)
+    else:
+        data = json.loads(Path(spec).read_text(encoding="utf-8"))
+        gpus = data.get("gpus", []) if isinstance(data, dict) else data
+        if not gpus:
+            raise ValueError(f"No GPUs in inventory {spec}")
+    return [_normalize_gpu(i, gpu) for i, gpu in enumerate(gpus)]
+
+
+# ------------------------------------------------------------------ metadata
+
+_GGUF_SCALARS = {
+    0: "<B",
+    1: "<b",
+    2: "<H",
+    3: "<h",
+    4: "<I",
+    5: "<i",
+    6: "<f",
+    7: "<?",
+    10: "<Q",
+    11: "<q",
+    12: "<d",
+}
+_GGUF_STRING, _GGUF_ARRAY = 8, 9
+
+
+def _unpack(f: IO[bytes], fmt: str) -> Any:
+    size = struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("Truncated GGUF header")
+    return struct.unpack(fmt, data)[0]
+
+
+def _gguf_value(f: IO[bytes], vtype: int, len_fmt: str) -> Any:
+    """Read a value, skipping arrays (returned as None) without decoding them"""
+    if vtype in _GGUF_SCALARS:
+        return _unpack(f, _GGUF_SCALARS[vtype])
+    if vtype == _GGUF_STRING:
+        return f.read(_unpack(f, len_fmt)).decode("utf-8", "replace")
+    if vtype == _GGUF_ARRAY:
+        item_type, count = _unpack(f, "<I"), _unpack(f, len_fmt)
+        if item_type in _GGUF_SCALARS:
+            f.seek(count * struct.calcsize(_GGUF_SCALARS[item_type]), os.SEEK_CUR)
+        else:
+            for _ in range(count):
+                _gguf_value(f, item_type, len_fmt)
+        return None
+    raise ValueError(f"Unknown GGUF value type {vtype}")
+
+
+def read_gguf_metadata(path: str) -> Dict[str, Any]:
+    """
+    Read the key/value metadata of a GGUF file up to its tokenizer section
+
+    Args:
+    ----
+        path: GGUF file
+
+    Returns:
+    -------
+        Scalar and string metadata by key (arrays are skipped)
+    """
+    metadata: Dict[str, Any] = {}
+    with open(path, "rb") as f:
+        if f.read(4) != b"GGUF":
+            raise ValueError(f"{path} is not a GGUF file")
+        version = _unpack(f, "<I")
+        # Version 1 used 32-bit counts and lengths
+        len_fmt = "<I" if version == 1 else "<Q"
+        _unpack(f, len_fmt)  # tensor count
+        for _ in range(_unpack(f, len_fmt)):
+            key = f.read(_unpack(f, len_fmt)).decode("utf-8", "replace")
+            # The vocabulary follows the model keys and is most of the header
+            if key.startswith("tokenizer."):
+                break
+            metadata[key] = _gguf_value(f, _unpack(f, "<I"), len_fmt)
+    return metadata
+
+
+def _shape_from_gguf(info: ModelInfo, metadata: Dict[str, Any]) -> None:
+    arch = metadata.get("general.architecture", "llama")
+    heads = metadata.get(f"{arch}.attention.head_count")
+    hidden = metadata.get(f"{arch}.embedding_length")
+    info.layers = metadata.get(f"{arch}.block_count")
+    info.heads = heads
+    info.kv_heads = metadata.get(f"{arch}.attention.head_count_kv") or heads
+    info.head_dim = metadata.get(f"{arch}.attention.key_length") or (
+        hidden // heads if hidden and heads else None
+    )
+    info.n_ctx_train = metadata.get(f"{arch}.context_length")
+
+
+def _shape_from_config(info: ModelInfo, config: Dict[str, Any]) -> None:
+    heads = config.get("num_attention_heads")
+    hidden = config.get("hidden_size")
+    info.layers = config.get("num_hidden_layers")
+    info.heads = heads
+    info.kv_heads = config.get("num_key_value_heads") or heads
+    info.head_dim = config.get("head_dim") or (hidden // heads if hidden and heads else None)
+    info.n_ctx_train = config.get("max_position_embeddings")
+
+
+def _params_from_name(name: str) -> Optional[float]:
+    """Parameter count in billions named in a model id, e.g. "13b" or "8x7b" """
+    basename = os.path.basename(name.rstrip("/\\")).lower()
+    moe = _MOE_PATTERN.search(basename)
+    if moe:
+        # Experts share attention weights, so this is an upper bound
+        return int(moe.group(1)) * float(moe.group(2))
+    match = _PARAMS_PATTERN.search(basename)
+    return float(match.group(1)) if match else None
+
+
+def _local_checkpoint(path: Path, quant: Optional[str]) -> Optional[Path]:
+    """GGUF file of a directory matching ``quant`` (or the only one), if any"""
+    ggufs = sorted(path.glob("*.gguf"))
+    if quant:
+        ggufs = [g for g in ggufs if quant_from_name(g.name) == quant]
+    return ggufs[0] if len(ggufs) == 1 or (ggufs and quant) else None
+
+
+def read_model_info(entry: ManifestEntry) -> ModelInfo:
+    """
+    Size and shape of a manifest entry
+
+    Reads GGUF headers of local GGUF files and config.json of local checkpoint
+    directories; hub ids and missing files fall back to the parameter count and
+    shape named in the id, with the size from the quantization's bits per weight.
+
+    Args:
+    ----
+        entry: Manifest entry
+
+    Returns:
+    -------
+        Model information
+
+    Raises:
+    ------
+        ValueError: If the model size cannot be determined
+    """
+    quant = normalize_quant(entry.quant) or quant_from_name(entry.model)
+    path = Path(entry.model).expanduser()
+    if path.is_dir():
+        path = _local_checkpoint(path, quant) or path
+
+    size_bytes = 0
+    if path.is_file() and path.suffix.lower() == ".gguf":
+        metadata = read_gguf_metadata(str(path))
+        quant = quant or _GGUF_FILE_TYPES.get(metadata.get("general.file_type"))
+        info = ModelInfo(str(path), quant or "f16", "gguf", "gguf", path.stat().st_size)
+        _shape_from_gguf(info, metadata)
+    elif path.exists():
+        root = path if path.is_dir() else path.parent
+        weights = sorted(root.glob("*.safetensors")) or sorted(root.glob("*.bin"))
+        size_bytes = path.stat().st_size if path.is_file() else sum(
+            w.stat().st_size for w in weights
+        )
+        config_path = root / "config.json"
+        config = {}
+        if config_path.is_file():
+            config = json.loads(config_path.read_text(encoding="utf-8"))
+        method = (config.get("quantization_config") or {}).get("quant_method")
+        quant = quant or normalize_quant(method) or normalize_quant(config.get("torch_dtype"))
+        info = ModelInfo(entry.model, quant or "f16", "hf", "config" if config else "name", 0)
+        if config:
+            _shape_from_config(info, config)
+    else:
+        fmt = "gguf" if path.suffix.lower() == ".gguf" or (quant or "").startswith("q") else "hf"
+        info = ModelInfo(entry.model, quant or "f16", fmt, "name", 0)
+
+    bits = BITS_PER_WEIGHT.get(info.quant, 16.0)
+    info.params_b = entry.params_b or _params_from_name(entry.model)
+    if entry.size_gb:
+        info.size_bytes = int(entry.size_gb * 1024 * MB)
+    elif not info.size_bytes:
+        info.size_bytes = size_bytes or int((info.params_b or 0) * 1e9 * bits / 8)
+    if not info.size_bytes:
+        raise ValueError(f"Cannot determine the size of {entry.model}; set size_gb or params_b")
+    if not info.params_b:
+        info.params_b = round(info.size_bytes * 8 / bits / 1e9, 2)
+
+    if info.kv_bytes_per_token is None:
+        layers, heads, kv_heads, hidden, _moe = model_params_from_name(entry.model)
+        if layers and heads and hidden:
+            info.layers, info.heads, info.kv_heads = layers, heads, kv_heads or heads
+            info.head_dim = hidden // heads
+    return info
+
+
+# ------------------------------------------------------------------ planning
+
+
+def _vllm_layout(
+    info: ModelInfo, gpus: List[Dict[str, Any]], kv_bytes: int, utilization: float
+) -> Tuple[int, List[Dict[str, Any]], int]:
+    """(tensor parallel size, GPUs, KV cache tokens) with the most KV cache tokens"""
+    # vLLM shards weights evenly, so the smallest GPU of the group bounds each shard
+    by_memory = sorted(gpus, key=lambda g: g["memory_total"], reverse=True)
+    best = (1, by_memory[:1], -1)
+    tp = 1
+    while tp <= len(gpus):
+        if not info.heads or info.heads % tp == 0:
+            group = by_memory[:tp]
+            budget_mb = min(g["memory_total"] for g in group) * utilization
+            kv_mb = (budget_mb - info.size_bytes / MB / tp) * tp
+            tokens = int(kv_mb * MB / kv_bytes)
+            if tokens >= best[2]:
+                best = (tp, group, tokens)
+        tp *= 2
+    return best
+
+
+def plan_model(info: ModelInfo, gpus: List[Dict[str, Any]]) -> PlanRow:
+    """
+    Plan llama.cpp and vLLM launch parameters of one model
+
+    Args:
+    ----
+        info: Model information from :func:`read_model_info`
+        gpus: GPU inventory from :func:`load_gpus`
+
+    Returns:
+    -------
+        The planned row; llama.cpp parameters only for GGUF models, and
+        commands only for layouts that fit
+    """
+    kv_bytes = info.kv_bytes_per_token or vram_fit._estimate_kv_bytes_per_token(info.size_bytes)
+    row = PlanRow(
+        model=info.model,
+        quant=info.quant,
+        format=info.format,
+        source=info.source,
+        size_mb=int(info.size_bytes / MB),
+        params_b=info.params_b,
+        kv_bytes_per_token=kv_bytes,
+        n_ctx_train=info.n_ctx_train,
+        backend="llama.cpp" if info.format == "gguf" else "vllm",
+    )
+
+    if info.format == "gguf":
+        ratios, split = vram_fit.calculate_gpu_split(info.size_bytes, gpus)
+        ctx = vram_fit.calculate_max_context_size(info.size_bytes, gpus, kv_bytes)
+        row.llama_fits = split["fits_in_memory"]
+        row.llama_ctx_size = min(ctx, info.n_ctx_train or ctx)
+        row.llama_tensor_split = ",".join(f"{r:.2f}" for r in ratios)
+        if row.llama_fits:
+            row.llama_command = generate_llama_cpp_cmd(
+                info.model, gpu_split=ratios, ctx_size=row.llama_ctx_size
+            )
+
+    utilization = round(1.0 - vram_fit.SAFETY_MARGIN, 2)
+    tp, group, tokens = _vllm_layout(info, gpus, kv_bytes, utilization)
+    row.vllm_fits = tokens >= vram_fit.MIN_CONTEXT_SIZE
+    row.vllm_tensor_parallel_size = tp
+    row.vllm_gpu_memory_utilization = utilization
+    row.vllm_quantization = _VLLM_QUANTIZATION.get(info.quant)
+    row.vllm_cuda_visible_devices = ",".join(str(g["id"]) for g in group)
+    if row.vllm_fits:
+        row.vllm_max_model_len = min(tokens, info.n_ctx_train or tokens)
+        row.vllm_command = generate_vllm_cmd(
+            info.model,
+            tensor_parallel_size=tp,
+            max_model_len=row.vllm_max_model_len,
+            gpu_memory_utilization=utilization,
+            quantization=row.vllm_quantization,
+        )
+    return row
+
+
+def _plan_entry(entry: ManifestEntry, gpus: List[Dict[str, Any]]) -> PlanRow:
+    try:
+        return plan_model(read_model_info(entry), gpus)
+    except Exception as e:
+        logger.debug(f"Could not plan {entry.model}", exc_info=True)
+        return PlanRow(model=entry.model, quant=normalize_quant(entry.quant), error=str(e))
+
+
+def plan_manifest(
+    entries: Sequence[ManifestEntry],
+    gpus: List[Dict[str, Any]],
+    workers: Optional[int] = None,
+) -> List[PlanRow]:
+    """
+    Plan every manifest entry in parallel
+
+    Args:
+    ----
+        entries: Manifest entries
+        gpus: GPU inventory, as from :func:`load_gpus` or with memory_total in MB
+        workers: Worker threads (default PLAN_WORKERS)
+
+    Returns:
+    -------
+        One row per entry, in manifest order; entries that fail carry an error
+    """
+    if not gpus:
+        raise ValueError("No GPU information provided")
+    gpus = [_normalize_gpu(i, gpu) for i, gpu in enumerate(gpus)]
+    with ThreadPoolExecutor(max_workers=workers or PLAN_WORKERS) as pool:
+        return list(pool.map(lambda entry: _plan_entry(entry, gpus), entries))
+
+
+# -------------------------------------------------------------------- output
+
+
+def write_json(rows: Sequence[PlanRow], gpus: List[Dict[str, Any]], out: IO[str]) -> None:
+    json.dump({"gpus": gpus, "plans": [asdict(row) for row in rows]}, out, indent=2)
+    out.write("\n")
+
+
+def write_csv(rows: Sequence[PlanRow], out: IO[str]) -> None:
+    writer = csv.DictWriter(out, fieldnames=[f.name for f in fields(PlanRow)])
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(asdict(row))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m dualgpuopt plan",
+        description="Plan llama.cpp and vLLM launch parameters for a manifest of models",
+    )
+    parser.add_argument("manifest", help="JSON, JSON lines, CSV or text manifest; - for stdin")
+    parser.add_argument(
+        "--gpus", default="live", help="live, mock, mock:N or a JSON inventory (default: live)"
+    )
+    parser.add_argument("--format", choices=("json", "csv"), help="default: from -o, else json")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, help=f"worker threads (default: {PLAN_WORKERS})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every planned model")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        for name in _CHATTY_LOGGERS:
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    start = time.perf_counter()
+    try:
+        entries = load_manifest(args.manifest)
+        gpus = load_gpus(args.gpus)
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.error(str(e))
+        return 2
+    rows = plan_manifest(entries, gpus, args.workers)
+
+    fmt = args.format or ("csv" if (args.output or "").lower().endswith(".csv") else "json")
+    output = open(args.output, "w", newline="", encoding="utf-8") if args.output else None
+    with output or nullcontext(sys.stdout) as out:
+        if fmt == "csv":
+            write_csv(rows, out)
+        else:
+            write_json(rows, gpus, out)
+
+    errors = sum(1 for row in rows if row.error)
+    print(
+        f"Planned {len(rows)} entries on {len(gpus)} GPUs in "
+        f"{time.perf_counter() - start:.2f} s ({errors} errors)",
+        file=sys.stderr,
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,31 @@
 from __future__ import annotations
 
+import os
 import pathlib
 import shutil
 import socket
-import subprocess
 import time
-from typing import Iterable
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+
+from dualgpuopt import tracing
+from dualgpuopt.batch.oom_store import get_oom_store, oom_key
+from dualgpuopt.batch.scheduler import (
+    ENV_SCHED_MAX_BATCH,
+    ContinuousBatchScheduler,
+    Priority,
+    Request,
+)
+from dualgpuopt.batch.smart_batch import SmartBatcher
+from dualgpuopt.engine.startup import (
+    LLAMACPP_READY_MARKERS,
+    LLAMACPP_WEIGHTS_MARKERS,
+    STARTUP_TIMEOUT,
+    VLLM_READY_MARKERS,
+    VLLM_WEIGHTS_MARKERS,
+    ServerStartup,
+    record_startup,
+)
 
 
 # ------------------------------------------------------ #
@@ -15,18 +35,44 @@ def _port_open(port: int) -> bool:
         return s.connect_ex(("127.0.0.1", port)) == 0
 
 
+def _child_env(cuda_devices):
+    """Environment for a server process, optionally pinned to some GPUs"""
+    if cuda_devices is None:
+        return None
+    return {**os.environ, "CUDA_VISIBLE_DEVICES": str(cuda_devices)}
+
+
 # ------------------------------------------------------ #
 class LlamaCppBackend:
-    def load(self, model: str, *, port=8001, gpu_layers=None, offload_dir=None, **_kw):
+    def load(
+        self,
+        model: str,
+        *,
+        port=8001,
+        gpu_layers=None,
+        offload_dir=None,
+        startup_timeout=STARTUP_TIMEOUT,
+        cuda_devices=None,
+        **_kw,
+    ):
         self.port = port
         args = ["llama.cpp", "-m", model, "--server", "--port", str(port)]
         if gpu_layers is not None:
             args += ["--gpu-layers", str(gpu_layers)]
         if offload_dir:  # mmap enables OS‑level SSD paging
             args += ["--mmap"]
-        self.proc = subprocess.Popen(args, stdout=subprocess.DEVNULL)
-        while not _port_open(port):
-            time.sleep(0.25)
+        self.startup = ServerStartup(
+            args,
+            port,
+            ready_markers=LLAMACPP_READY_MARKERS,
+            weights_markers=LLAMACPP_WEIGHTS_MARKERS,
+            health_paths=("/health",),
+            timeout=startup_timeout,
+            env=_child_env(cuda_devices),
+            name="llama.cpp",
+        )
+        self.proc = self.startup.start()
+        record_startup(model, "llama.cpp", self.startup.timings)
 
     def stream(self, prompt, **kw) -> Iterable[str]:
         import json
@@ -54,7 +100,18 @@ class LlamaCppBackend:
 
 # ------------------------------------------------------ #
 class VLLMBackend:
-    def load(self, model, *, port=8000, gpu_util=0.88, swap=0, quant=None, **_kw):
+    def load(
+        self,
+        model,
+        *,
+        port=8000,
+        gpu_util=0.88,
+        swap=0,
+        quant=None,
+        startup_timeout=STARTUP_TIMEOUT,
+        cuda_devices=None,
+        **_kw,
+    ):
         self.port = port
         cmd = [
             shutil.which("python"),
@@ -71,9 +128,18 @@ class VLLMBackend:
             cmd += ["--swap-space", str(swap)]
         if quant == "awq":
             cmd += ["--quantization", "awq", "--dtype", "auto"]
-        self.proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
-        while not _port_open(port):
-            time.sleep(0.25)
+        self.startup = ServerStartup(
+            cmd,
+            port,
+            ready_markers=VLLM_READY_MARKERS,
+            weights_markers=VLLM_WEIGHTS_MARKERS,
+            health_paths=("/health", "/v1/models"),
+            timeout=startup_timeout,
+            env=_child_env(cuda_devices),
+            name="vLLM",
+        )
+        self.proc = self.startup.start()
+        record_startup(model, "vllm", self.startup.timings)
 
     def stream(self, prompt, **kw):
         import json
@@ -106,10 +172,66 @@ class VLLMBackend:
 
 
 # ------------------------------------------------------ #
+@dataclass(eq=False)
+class _HFSequence:
+    """Decode state of one request in the HF running batch"""
+
+    prompt_ids: list[int]
+    max_tokens: int
+    past: Any = None  # legacy KV cache of this sequence alone; None until prefilled
+    length: int = 0  # tokens held in the KV cache
+    last: int = 0  # token fed to the next decode step
+    generated: list[int] = field(default_factory=list)
+    # Incremental detokenization window over ``generated``
+    prefix_offset: int = 0
+    read_offset: int = 0
+    done: bool = False
+
+
+def _legacy_cache(past):
+    """Per-layer (key, value) tuples of a model's KV cache"""
+    return past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+
+
+def _model_cache(legacy):
+    """KV cache in the form the installed transformers version expects"""
+    try:
+        from transformers import DynamicCache
+    except ImportError:
+        return legacy
+    return DynamicCache.from_legacy_cache(legacy)
+
+
+def _unpad(past, row: int, offset: int):
+    """One row of a batched cache, without its left padding"""
+    return tuple((k[row : row + 1, :, offset:], v[row : row + 1, :, offset:]) for k, v in past)
+
+
+def _detokenize(tok, seq: _HFSequence) -> str:
+    """
+    Text added by the newest token, decoding only a short window
+
+    Decoding the full output every step costs O(n^2) over a request. The
+    window starts a few tokens back so merges with earlier tokens (leading
+    spaces, multi-byte characters) still come out right; a trailing
+    replacement character means the character is incomplete and is held back.
+    """
+    prefix = tok.decode(
+        seq.generated[seq.prefix_offset : seq.read_offset], skip_special_tokens=True
+    )
+    text = tok.decode(seq.generated[seq.prefix_offset :], skip_special_tokens=True)
+    if len(text) <= len(prefix) or text.endswith("\ufffd"):
+        return ""
+    seq.prefix_offset, seq.read_offset = seq.read_offset, len(seq.generated)
+    return text[len(prefix) :]
+
+
 class HFBackend:
-    def load(self, model: str, *, device_map="auto", offload_dir=None, **_kw):
+    def load(self, model: str, *, device_map="auto", offload_dir=None, cuda_devices=None, **_kw):
         from transformers import AutoModelForCausalLM, AutoTokenizer
 
+        if cuda_devices is not None and device_map == "auto":
+            device_map = {"": f"cuda:{cuda_devices}"}
         if offload_dir:
             pathlib.Path(offload_dir).mkdir(parents=True, exist_ok=True)
         self.tok = AutoTokenizer.from_pretrained(model, trust_remote_code=True)
@@ -121,11 +243,144 @@ class HFBackend:
             offload_folder=offload_dir,
         )
 
+    def kv_model(self):
+        """Per-token KV-cache MB of the loaded model and the free GPU memory for it"""
+        import torch
+
+        from dualgpuopt.optimizer import ModelParameters, get_optimizer
+
+        cfg = self.model.config
+        params = ModelParameters(
+            name=getattr(cfg, "_name_or_path", "hf"),
+            context_length=getattr(cfg, "max_position_embeddings", 4096),
+            hidden_size=cfg.hidden_size,
+            num_layers=cfg.num_hidden_layers,
+            num_heads=cfg.num_attention_heads,
+            kv_heads=getattr(cfg, "num_key_value_heads", None),
+        )
+        optimizer = get_optimizer()
+        per_token_mb = optimizer.calculate_per_token_memory(params)
+        free, _total = torch.cuda.mem_get_info(self.model.device)
+        budget_mb = free / (1024 * 1024) * (1 - optimizer.memory_overhead["safety_margin"])
+        return per_token_mb, budget_mb
+
+    # Running batch: the scheduler steps every admitted sequence at once
+    def start(self, prompt, max_tokens=128, **_kw) -> _HFSequence:
+        """Tokenize a request; its prefill runs with the next batched step"""
+        return _HFSequence(self.tok(prompt).input_ids, max_tokens)
+
+    def step(self, sequences: list[_HFSequence]) -> list[Optional[str]]:
+        """
+        Greedy-decode one token for every sequence
+
+        New sequences are prefilled together in one left-padded forward pass,
+        running ones decode together in another: their KV caches are
+        left-padded to a common length and masked out, and explicit position
+        IDs keep the padding from shifting positions.
+        """
+        import torch
+
+        results: list[Optional[str]] = [None] * len(sequences)
+        new = [i for i, seq in enumerate(sequences) if not seq.done and seq.past is None]
+        running = [i for i, seq in enumerate(sequences) if not seq.done and seq.past is not None]
+        with torch.no_grad():
+            for indices, forward in ((running, self._decode_step), (new, self._prefill)):
+                if not indices:
+                    continue
+                tokens = forward([sequences[i] for i in indices])
+                for i, token in zip(indices, tokens):
+                    results[i] = self._emit(sequences[i], token)
+        return results
+
+    def finish(self, sequence: _HFSequence) -> None:
+        """Drop a sequence's KV cache"""
+        sequence.past = None
+        sequence.done = True
+
+    def _prefill(self, sequences: list[_HFSequence]) -> list[int]:
+        import torch
+
+        width = max(len(seq.prompt_ids) for seq in sequences)
+        pad = self.tok.pad_token_id
+        if pad is None:
+            pad = self.tok.eos_token_id or 0
+        device = self.model.device
+        input_ids = torch.tensor(
+            [[pad] * (width - len(seq.prompt_ids)) + seq.prompt_ids for seq in sequences],
+            device=device,
+        )
+        mask = torch.tensor(
+            [[0] * (width - len(seq.prompt_ids)) + [1] * len(seq.prompt_ids) for seq in sequences],
+            device=device,
+        )
+        positions = (mask.cumsum(-1) - 1).clamp(min=0)
+        out = self.model(
+            input_ids=input_ids, attention_mask=mask, position_ids=positions, use_cache=True
+        )
+        past = _legacy_cache(out.past_key_values)
+        for row, seq in enumerate(sequences):
+            seq.length = len(seq.prompt_ids)
+            seq.past = _unpad(past, row, width - seq.length)
+        return out.logits[:, -1, :].argmax(dim=-1).tolist()
+
+    def _decode_step(self, sequences: list[_HFSequence]) -> list[int]:
+        import torch
+        import torch.nn.functional as F
+
+        width = max(seq.length for seq in sequences)
+        device = self.model.device
+        # Left-pad every cache along the sequence axis (dim -2) to the longest one
+        past = tuple(
+            tuple(
+                torch.cat(
+                    [F.pad(seq.past[layer][kv], (0, 0, width - seq.length, 0)) for seq in sequences]
+                )
+                for kv in (0, 1)
+            )
+            for layer in range(len(sequences[0].past))
+        )
+        mask = torch.tensor(
+            [[0] * (width - seq.length) + [1] * (seq.length + 1) for seq in sequences],
+            device=device,
+        )
+        out = self.model(
+            input_ids=torch.tensor([[seq.last] for seq in sequences], device=device),
+            attention_mask=mask,
+            position_ids=torch.tensor([[seq.length] for seq in sequences], device=device),
+            past_key_values=_model_cache(past),
+            use_cache=True,
+        )
+        past = _legacy_cache(out.past_key_values)
+        for row, seq in enumerate(sequences):
+            seq.past = _unpad(past, row, width - seq.length)
+            seq.length += 1
+        return out.logits[:, -1, :].argmax(dim=-1).tolist()
+
+    def _emit(self, seq: _HFSequence, token: int) -> Optional[str]:
+        """Record a decoded token and return its text; None at end of sequence"""
+        if token == self.tok.eos_token_id:
+            seq.done = True
+            return None
+        seq.last = token
+        seq.generated.append(token)
+        if len(seq.generated) >= seq.max_tokens:
+            seq.done = True
+        return _detokenize(self.tok, seq)
+
+    def decode(self, prompt, **kw):
+        """Greedy decode of a single request, one token per ``next()``"""
+        seq = self.start(prompt, **kw)
+        try:
+            while True:
+                chunk = self.step([seq])[0]
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            self.finish(seq)
+
     def stream(self, prompt, **kw):
-        ids = self.tok(prompt, return_tensors="pt").to("cuda")
-        gen = self.model.generate(**ids, max_new_tokens=kw.get("max_tokens", 128))
-        out = self.tok.decode(gen[0], skip_special_tokens=True)
-        yield out[len(prompt) :]
+        yield from self.decode(prompt, **kw)
 
     def unload(self):
         del self.model
@@ -134,6 +389,71 @@ class HFBackend:
         return True
 
 
+# ------------------------------------------------------ #
+def _traced_stream(tokens: Iterator[str], request: Request, span) -> Iterator[str]:
+    """
+    Pass tokens through while recording queue wait, time to first token and decode
+
+    The child spans are recorded after the fact from the request's timestamps,
+    since the stream may be consumed on a different context than it was made.
+    """
+    first_ns = None
+    count = 0
+    try:
+        for tok in tokens:
+            if first_ns is None:
+                first_ns = time.monotonic_ns()
+            count += 1
+            yield tok
+    except BaseException as e:
+        span.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        admitted_ns = None
+        if request.admitted_at is not None:
+            admitted_ns = int(request.admitted_at * 1e9)
+            tracing.span("scheduler.queue", span, int(request.arrival * 1e9)).end(admitted_ns)
+        if first_ns is not None:
+            start_ns = admitted_ns or span.start_ns
+            tracing.span("engine.prefill", span, start_ns).end(first_ns)
+            tracing.span("engine.decode", span, first_ns, tokens=count).end()
+            span.set(ttft_ms=(first_ns - span.start_ns) / 1e6)
+        span.set(tokens=count)
+        span.end()
+
+
+def _attributed_stream(
+    tokens: Iterator[str],
+    request: Request,
+    scheduler: ContinuousBatchScheduler,
+    tracker,
+    model_path: str,
+    backend_name: str,
+) -> Iterator[str]:
+    """Pass tokens through while the memory profiler attributes memory to the request"""
+    tracker.begin(
+        request.inference_id,
+        model=model_path,
+        prompt_tokens=request.prompt_tokens,
+        batch_size=scheduler.running_count + 1,
+        backend=backend_name,
+    )
+    count = 0
+    error = None
+    try:
+        for tok in tokens:
+            if count == 0:
+                # Prefilled: sample the KV cache it holds and the batch it decodes in
+                tracker.update(request.inference_id, batch_size=scheduler.running_count)
+            count += 1
+            yield tok
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        tracker.end(request.inference_id, completion_tokens=count, error=error)
+
+
 # ------------------------------------------------------ #
 class Engine:
     _cls_map = {
@@ -143,17 +463,109 @@ class Engine:
         "bin": HFBackend,
     }
 
+    scheduler: ContinuousBatchScheduler | None = None
+    model_path: str = ""
+
     def load(self, path_or_id: str, **kw):
         suf = pathlib.Path(path_or_id).suffix.lower().lstrip(".")
         if suf == "safetensors" and "awq" in path_or_id.lower():
             suf = "awq"
         self.backend = self._cls_map.get(suf, HFBackend)()
         self.backend.load(path_or_id, **kw)
+        self.model_path = path_or_id
+        self.scheduler = self._make_scheduler(path_or_id, **kw)
+
+    def _make_scheduler(
+        self,
+        model_path=None,
+        *,
+        max_batch_size=None,
+        kv_budget_mb=None,
+        per_token_mb=0.0,
+        cuda_devices=None,
+        ctx_size=0,
+        **_kw,
+    ) -> ContinuousBatchScheduler:
+        """Scheduler capped by the backend's KV-memory model, or by explicit limits"""
+        if kv_budget_mb is None and hasattr(self.backend, "kv_model"):
+            try:
+                per_token_mb, kv_budget_mb = self.backend.kv_model()
+            except Exception:
+                pass
+        max_batch_size = max_batch_size or ENV_SCHED_MAX_BATCH
+
+        # OOM lessons are shared with every worker serving the same model and GPU
+        store = get_oom_store() if model_path else None
+        key = None
+        if store is not None:
+            gpu = int(str(cuda_devices).split(",")[0]) if cuda_devices is not None else 0
+            key = oom_key(model_path, gpu, ctx_size)
+        batcher = SmartBatcher(max_batch_size=max_batch_size, oom_store=store, oom_key=key)
+        return ContinuousBatchScheduler(
+            max_batch_size=max_batch_size,
+            kv_budget_mb=kv_budget_mb,
+            per_token_mb=per_token_mb,
+            batcher=batcher,
+            decoder=self.backend if hasattr(self.backend, "step") else None,
+        )
 
-    def stream(self, prompt: str, **kw):
-        return self.backend.stream(prompt, **kw)
+    def get_scheduler(self) -> ContinuousBatchScheduler:
+        """The engine's request scheduler, created with default limits if needed"""
+        if self.scheduler is None:
+            self.scheduler = self._make_scheduler()
+        return self.scheduler
+
+    def stream(
+        self,
+        prompt: str,
+        *,
+        tenant="default",
+        priority=Priority.NORMAL,
+        inference_id: str | None = None,
+        **kw,
+    ):
+        scheduler = self.get_scheduler()
+        request = Request(
+            prompt,
+            max_tokens=kw.get("max_tokens", 128),
+            tenant=tenant,
+            priority=priority,
+            inference_id=inference_id or "",
+        )
+        # In-process backends decode on the scheduler loop, as one running batch
+        # when they can step several sequences at once; servers batch on their own
+        # and are only gated
+        if hasattr(self.backend, "step"):
+            tokens = scheduler.run(request, lambda: self.backend.start(prompt, **kw))
+        elif hasattr(self.backend, "decode"):
+            tokens = scheduler.run(request, lambda: self.backend.decode(prompt, **kw))
+        else:
+            tokens = scheduler.stream(request, lambda: self.backend.stream(prompt, **kw))
+
+        # Memory attribution runs while a profiling session is active
+        from dualgpuopt.memory.attribution import get_inference_tracker
+
+        tracker = get_inference_tracker()
+        if tracker.enabled:
+            tokens = _attributed_stream(
+                tokens, request, scheduler, tracker, self.model_path, type(self.backend).__name__
+            )
+
+        span = tracing.span(
+            "engine.stream",
+            backend=type(self.backend).__name__,
+            tenant=tenant,
+            prompt_tokens=request.prompt_tokens,
+            inference_id=request.inference_id,
+        )
+        if not span.recording:
+            return tokens
+        return _traced_stream(tokens, request, span)
 
     def unload(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
+            self.scheduler = None
         self.backend.unload()
 
     def health(self):
@@ -0,0 +1,369 @@
+"""
+dualgpuopt.engine.bench_report
+Regression detection and comparisons over the benchmark history.
+
+Every (model, backend, config) combination in the benchmark database is a
+time series of tokens/sec. This module summarizes each series with a rolling
+median, finds level shifts by binary segmentation, flags the series whose
+current level dropped beyond the measurement noise, and compares two series
+with a permutation test.
+
+    python -m dualgpuopt.engine.bench_report report [--model PATH]
+    python -m dualgpuopt.engine.bench_report compare MODEL BACKEND --a CFG --b CFG
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("DualGPUOpt.BenchReport")
+
+ROLLING_WINDOW = 10
+# Standardized mean shift a split must reach to count as a change point
+CHANGE_THRESHOLD = 5.0
+MIN_SEGMENT = 5
+# Relative level changes smaller than these are ignored
+MIN_SHIFT = 0.03
+MIN_REGRESSION = 0.05
+PERMUTATIONS = 10_000
+_PERMUTATION_CHUNK = 1000
+
+
+def rolling_median(values: Sequence[float], window: int = ROLLING_WINDOW) -> np.ndarray:
+    """
+    Median of every ``window`` consecutive values
+
+    Returns
+    -------
+        Array of length ``len(values) - window + 1``, or the overall median
+        when there are fewer values than the window
+    """
+    x = np.asarray(values, dtype=float)
+    if len(x) == 0:
+        return x
+    if len(x) < window:
+        return np.array([np.median(x)])
+    return np.median(np.lib.stride_tricks.sliding_window_view(x, window), axis=1)
+
+
+def noise_scale(values: Sequence[float]) -> float:
+    """
+    Robust standard deviation of the measurement noise
+
+    Uses the MAD of first differences, so level shifts barely inflate it.
+    """
+    x = np.asarray(values, dtype=float)
+    if len(x) < 3:
+        return 0.0
+    diffs = np.diff(x)
+    return float(1.4826 * np.median(np.abs(diffs - np.median(diffs))) / math.sqrt(2))
+
+
+def change_points(
+    values: Sequence[float],
+    min_size: int = MIN_SEGMENT,
+    threshold: float = CHANGE_THRESHOLD,
+    min_shift: float = MIN_SHIFT,
+) -> list[int]:
+    """
+    Find level shifts by binary segmentation
+
+    Each segment is split where the difference of the means on both sides,
+    in units of its standard error, is largest; the split is kept if it
+    exceeds ``threshold`` and moves the level by at least ``min_shift``.
+
+    Args:
+    ----
+        values: Measurements in time order
+        min_size: Minimum number of measurements between change points
+        threshold: Standardized shift a split has to reach
+        min_shift: Minimum relative change of the mean
+
+    Returns:
+    -------
+        Sorted indices where a new level starts
+    """
+    x = np.asarray(values, dtype=float)
+    sigma = max(noise_scale(x), 1e-12)
+    found: list[int] = []
+
+    def split(lo: int, hi: int) -> None:
+        n = hi - lo
+        if n < 2 * min_size:
+            return
+        sums = np.cumsum(x[lo:hi])
+        k = np.arange(min_size, n - min_size + 1)
+        left = sums[k - 1] / k
+        right = (sums[-1] - sums[k - 1]) / (n - k)
+        stat = np.abs(left - right) / (sigma * np.sqrt(1 / k + 1 / (n - k)))
+        best = int(np.argmax(stat))
+        before, after = left[best], right[best]
+        if stat[best] < threshold or abs(after - before) < min_shift * abs(before):
+            return
+        at = lo + int(k[best])
+        found.append(at)
+        split(lo, at)
+        split(at, hi)
+
+    split(0, len(x))
+    return sorted(found)
+
+
+@dataclass
+class Regression:
+    """A drop of the current level below the previous one"""
+
+    index: int
+    timestamp: Optional[int]
+    before: float  # median of the previous level
+    after: float  # median of the current level
+    drop_pct: float
+
+
+@dataclass
+class SeriesAnalysis:
+    """Summary of one tokens/sec series"""
+
+    count: int
+    latest_median: float
+    overall_median: float
+    noise: float
+    change_points: list[int] = field(default_factory=list)
+    regression: Optional[Regression] = None
+
+
+def analyze_series(
+    values: Sequence[float],
+    timestamps: Optional[Sequence[int]] = None,
+    window: int = ROLLING_WINDOW,
+    min_regression: float = MIN_REGRESSION,
+    **change_kw: Any,
+) -> SeriesAnalysis:
+    """
+    Summarize a series and check its current level for a regression
+
+    Args:
+    ----
+        values: Tokens/sec in time order
+        timestamps: Optional timestamps of the values
+        window: Rolling median window
+        min_regression: Minimum relative drop reported as a regression
+        **change_kw: Passed to :func:`change_points`
+
+    Returns:
+    -------
+        The analysis; ``regression`` is set when the last level is lower
+        than the one before by at least ``min_regression``
+    """
+    x = np.asarray(values, dtype=float)
+    if len(x) == 0:
+        return SeriesAnalysis(0, math.nan, math.nan, 0.0)
+    points = change_points(x, **change_kw)
+    analysis = SeriesAnalysis(
+        count=len(x),
+        latest_median=float(rolling_median(x, window)[-1]),
+        overall_median=float(np.median(x)),
+        noise=noise_scale(x),
+        change_points=points,
+    )
+    if points:
+        last = points[-1]
+        previous = points[-2] if len(points) > 1 else 0
+        before = float(np.median(x[previous:last]))
+        after = float(np.median(x[last:]))
+        drop = (before - after) / before if before > 0 else 0.0
+        if drop >= min_regression:
+            analysis.regression = Regression(
+                index=last,
+                timestamp=int(timestamps[last]) if timestamps is not None else None,
+                before=before,
+                after=after,
+                drop_pct=drop * 100,
+            )
+    return analysis
+
+
+@dataclass
+class Comparison:
+    """Outcome of comparing two series"""
+
+    n_a: int
+    n_b: int
+    mean_a: float
+    mean_b: float
+    median_a: float
+    median_b: float
+    delta_pct: float  # change of B's mean relative to A's
+    p_value: float
+    significant: bool
+
+
+def compare_samples(
+    a: Sequence[float],
+    b: Sequence[float],
+    alpha: float = 0.05,
+    permutations: int = PERMUTATIONS,
+    seed: int = 0,
+) -> Comparison:
+    """
+    Compare the means of two samples with a two-sided permutation test
+
+    Makes no normality assumption, which suits throughput samples with
+    outliers and few repetitions.
+
+    Args:
+    ----
+        a: Baseline sample
+        b: Candidate sample
+        alpha: Significance level
+        permutations: Number of random relabelings
+        seed: Random seed, so that reports are reproducible
+
+    Returns:
+    -------
+        Means, medians, relative change and p-value
+    """
+    xa = np.asarray(a, dtype=float)
+    xb = np.asarray(b, dtype=float)
+    if len(xa) == 0 or len(xb) == 0:
+        raise ValueError("Both samples need at least one value")
+    observed = abs(xb.mean() - xa.mean())
+
+    p_value = 1.0
+    if len(xa) > 1 and len(xb) > 1:
+        pooled = np.concatenate([xa, xb])
+        rng = np.random.default_rng(seed)
+        extreme = 0
+        done = 0
+        while done < permutations:
+            m = min(_PERMUTATION_CHUNK, permutations - done)
+            shuffled = rng.permuted(np.tile(pooled, (m, 1)), axis=1)
+            split = len(xa)
+            diffs = np.abs(shuffled[:, split:].mean(axis=1) - shuffled[:, :split].mean(axis=1))
+            # Tolerance so that ties with the observed split count as extreme
+            extreme += int(np.count_nonzero(diffs >= observed - 1e-12 * max(1.0, observed)))
+            done += m
+        p_value = (extreme + 1) / (permutations + 1)
+
+    mean_a = float(xa.mean())
+    return Comparison(
+        n_a=len(xa),
+        n_b=len(xb),
+        mean_a=mean_a,
+        mean_b=float(xb.mean()),
+        median_a=float(np.median(xa)),
+        median_b=float(np.median(xb)),
+        delta_pct=(float(xb.mean()) - mean_a) / mean_a * 100 if mean_a else math.nan,
+        p_value=p_value,
+        significant=p_value < alpha,
+    )
+
+
+def report(
+    db: Any,
+    model_path: Optional[str] = None,
+    backend: Optional[str] = None,
+    limit: int = 1000,
+    window: int = ROLLING_WINDOW,
+) -> list[dict[str, Any]]:
+    """
+    Analyze every matching series in a benchmark database
+
+    Args:
+    ----
+        db: Benchmark database
+        model_path: Optional model filter
+        backend: Optional backend filter
+        limit: Most recent records analyzed per series
+        window: Rolling median window
+
+    Returns:
+    -------
+        Series records with an ``analysis`` entry, regressions first
+    """
+    rows = []
+    for series in db.list_series(model_path, backend):
+        points = db.get_series(series["model_path"], series["backend"], series["config"], limit)
+        timestamps = [ts for ts, _ in points]
+        values = [tps for _, tps in points]
+        rows.append({**series, "analysis": analyze_series(values, timestamps, window)})
+    rows.sort(key=lambda r: r["analysis"].regression is None)
+    return rows
+
+
+def _config_arg(text: Optional[str]) -> Optional[dict[str, Any]]:
+    return json.loads(text) if text else None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark history analytics")
+    parser.add_argument("--db", help="benchmark database path (default: ~/.dualgpuopt)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rep = sub.add_parser("report", help="rolling medians and regressions per series")
+    rep.add_argument("--model", help="only series of this model")
+    rep.add_argument("--backend", help="only series of this backend")
+    rep.add_argument("--limit", type=int, default=1000, help="records per series")
+    rep.add_argument("--window", type=int, default=ROLLING_WINDOW)
+
+    cmp_ = sub.add_parser("compare", help="significance test between two configs")
+    cmp_.add_argument("model")
+    cmp_.add_argument("backend")
+    cmp_.add_argument("--a", help="baseline config as JSON (default: no config)")
+    cmp_.add_argument("--b", help="candidate config as JSON (default: no config)")
+    cmp_.add_argument("--model-b", help="candidate model, if it differs")
+    cmp_.add_argument("--backend-b", help="candidate backend, if it differs")
+    cmp_.add_argument("--limit", type=int, default=100, help="recent records per config")
+    cmp_.add_argument("--alpha", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    from dualgpuopt.engine.benchmark import BenchmarkDB, benchmark_db
+
+    db = BenchmarkDB(args.db) if args.db else benchmark_db
+
+    if args.command == "report":
+        rows = report(db, args.model, args.backend, args.limit, args.window)
+        print(f"{'model':<32} {'backend':<10} {'config':<28} {'n':>6} {'median':>9} {'latest':>9}")
+        for row in rows:
+            a = row["analysis"]
+            config = json.dumps(row["config"], sort_keys=True) if row["config"] else "-"
+            print(
+                f"{row['model_path'][-32:]:<32} {row['backend']:<10} {config[:28]:<28} "
+                f"{a.count:>6} {a.overall_median:>9.1f} {a.latest_median:>9.1f}"
+            )
+            if a.regression:
+                r = a.regression
+                when = datetime.fromtimestamp(r.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+                print(
+                    f"  REGRESSION since {when}: {r.before:.1f} -> {r.after:.1f} tok/s "
+                    f"(-{r.drop_pct:.1f}%)"
+                )
+        return 1 if any(row["analysis"].regression for row in rows) else 0
+
+    series_a = db.get_series(args.model, args.backend, _config_arg(args.a), args.limit)
+    series_b = db.get_series(
+        args.model_b or args.model, args.backend_b or args.backend, _config_arg(args.b), args.limit
+    )
+    a = [tps for _, tps in series_a]
+    b = [tps for _, tps in series_b]
+    if not a or not b:
+        print("No benchmark records for " + ("A" if not a else "B"))
+        return 2
+    result = compare_samples(a, b, alpha=args.alpha)
+    print(f"A: n={result.n_a} mean={result.mean_a:.1f} median={result.median_a:.1f} tok/s")
+    print(f"B: n={result.n_b} mean={result.mean_b:.1f} median={result.median_b:.1f} tok/s")
+    verdict = "significant" if result.significant else "not significant"
+    print(f"B vs A: {result.delta_pct:+.1f}% (p={result.p_value:.4f}, {verdict})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,443 @@
+"""
+dualgpuopt.engine.bench_runner
+Statistical end-to-end benchmark harness for inference engines.
+
+Sweeps prompt length, output length, concurrency and batch size over an
+:class:`~dualgpuopt.engine.backend.Engine`. Every configuration gets warmup
+requests, then is repeated until the 95% confidence interval of its tokens/sec
+is narrow enough (or a trial limit is hit). Time to first token, inter-token
+latency percentiles, tokens/sec and the GPU memory peak sampled from telemetry
+are stored in the benchmark database.
+
+``StubBackend`` simulates prefill and decode timing so the whole pipeline runs
+without a GPU:
+
+    python -m dualgpuopt.engine.bench_runner --stub --concurrency 1 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import math
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from itertools import product
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("DualGPUOpt.BenchRunner")
+
+# Two-sided 97.5% quantiles of Student's t by degrees of freedom
+_T_975 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+    9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042,
+}  # fmt: skip
+
+MEMORY_SAMPLE_INTERVAL = 0.05  # seconds
+
+
+def t_quantile(df: int) -> float:
+    """97.5% quantile of Student's t, conservative between table entries"""
+    if df < 1:
+        return math.inf
+    if df > max(_T_975):
+        return 1.96
+    return _T_975[max(k for k in _T_975 if k <= df)]
+
+
+def confidence_halfwidth(samples: Sequence[float]) -> float:
+    """Half-width of the 95% confidence interval of the mean"""
+    if len(samples) < 2:
+        return math.inf
+    return t_quantile(len(samples) - 1) * statistics.stdev(samples) / math.sqrt(len(samples))
+
+
+@dataclass(frozen=True)
+class BenchConfig:
+    """One point of the sweep"""
+
+    prompt_tokens: int
+    output_tokens: int
+    concurrency: int = 1
+    batch_size: Optional[int] = None  # scheduler batch cap; None keeps the engine's
+
+
+@dataclass
+class BenchResult:
+    """Aggregated measurements of one configuration"""
+
+    config: BenchConfig
+    trials: int
+    tokens_per_second: float
+    tps_ci95: float
+    ttft_ms: float  # median
+    itl_p50_ms: float
+    itl_p90_ms: float
+    itl_p99_ms: float
+    memory_peak_mb: Optional[float]
+    converged: bool
+    trial_tps: list[float] = field(default_factory=list)
+
+    def as_record(self) -> dict[str, Any]:
+        """Keyword arguments for :meth:`BenchmarkDB.add_benchmark`"""
+        return {
+            "tokens_per_second": self.tokens_per_second,
+            "config": {k: v for k, v in asdict(self.config).items() if v is not None},
+            "memory_used": self.memory_peak_mb,
+            "latency_ms": self.ttft_ms,
+            "prompt_tokens": self.config.prompt_tokens,
+            "output_tokens": self.config.output_tokens,
+            "batch_size": self.config.batch_size,
+            "ttft_ms": self.ttft_ms,
+            "itl_p50_ms": self.itl_p50_ms,
+            "itl_p90_ms": self.itl_p90_ms,
+            "itl_p99_ms": self.itl_p99_ms,
+            "concurrency": self.config.concurrency,
+            "tps_ci95": self.tps_ci95,
+            "trials": self.trials,
+        }
+
+
+def gpu_memory_used_mb() -> Optional[float]:
+    """Total used GPU memory in MB from NVML telemetry; None with mock telemetry"""
+    try:
+        from dualgpuopt.gpu import common, get_mock_mode, query
+
+        if get_mock_mode() or not common.NVML_INITIALIZED:
+            return None
+        return float(sum(g["mem_used"] for g in query()))
+    except Exception:
+        return None
+
+
+class _MemorySampler:
+    """Background sampler keeping the peak of a memory reading"""
+
+    def __init__(self, memory_fn: Callable[[], Optional[float]], interval: float):
+        self.memory_fn = memory_fn
+        self.interval = interval
+        self.peak: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="MemorySampler")
+
+    def __enter__(self) -> _MemorySampler:
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self._sample()
+
+    def _sample(self) -> None:
+        value = self.memory_fn()
+        if value is not None:
+            self.peak = value if self.peak is None else max(self.peak, value)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+
+class BenchmarkRunner:
+    """Repeat benchmark configurations until their throughput estimate converges"""
+
+    def __init__(
+        self,
+        engine: Any,
+        model_path: str,
+        backend: Optional[str] = None,
+        warmup: int = 2,
+        min_trials: int = 3,
+        max_trials: int = 20,
+        rel_ci: float = 0.05,
+        memory_fn: Optional[Callable[[], Optional[float]]] = None,
+        db: Any = None,
+    ):
+        """
+        Initialize the runner
+
+        Args:
+        ----
+            engine: Loaded engine to benchmark
+            model_path: Model identifier stored with the results
+            backend: Backend name stored with the results (defaults to the class name)
+            warmup: Untimed requests sent before each configuration
+            min_trials: Trials always run per configuration
+            max_trials: Trials after which an unconverged configuration is recorded anyway
+            rel_ci: Target CI half-width relative to the mean tokens/sec
+            memory_fn: Returns used GPU memory in MB (defaults to NVML telemetry)
+            db: Benchmark store (defaults to the global one; False disables storing)
+        """
+        self.engine = engine
+        self.model_path = model_path
+        self.backend = backend or type(getattr(engine, "backend", engine)).__name__
+        self.warmup = warmup
+        self.min_trials = max(2, min_trials)
+        self.max_trials = max(self.min_trials, max_trials)
+        self.rel_ci = rel_ci
+        self.memory_fn = memory_fn or gpu_memory_used_mb
+        if db is None:
+            from dualgpuopt.engine.benchmark import benchmark_db as db
+        self.db = db or None
+
+    @staticmethod
+    def make_prompt(tokens: int) -> str:
+        """A prompt of roughly ``tokens`` tokens"""
+        return " ".join(f"w{i % 97}" for i in range(max(1, tokens)))
+
+    def _request(self, prompt: str, max_tokens: int, out: list) -> None:
+        """Stream one completion, appending (ttft, inter-token gaps, tokens)"""
+        start = time.perf_counter()
+        last = None
+        ttft = None
+        gaps: list[float] = []
+        tokens = 0
+        for _tok in self.engine.stream(prompt, max_tokens=max_tokens):
+            now = time.perf_counter()
+            if ttft is None:
+                ttft = now - start
+            else:
+                gaps.append(now - last)
+            last = now
+            tokens += 1
+        out.append((ttft, gaps, tokens))
+
+    def _trial(self, config: BenchConfig) -> tuple[float, list]:
+        """Run ``concurrency`` requests at once; return tokens/sec and per-request data"""
+        prompt = self.make_prompt(config.prompt_tokens)
+        out: list = []
+        threads = [
+            threading.Thread(target=self._request, args=(prompt, config.output_tokens, out))
+            for _ in range(config.concurrency)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        if len(out) < config.concurrency:
+            raise RuntimeError(f"{config.concurrency - len(out)} request(s) failed")
+        tokens = sum(n for _, _, n in out)
+        return tokens / elapsed if elapsed > 0 else 0.0, out
+
+    def run_config(self, config: BenchConfig) -> BenchResult:
+        """
+        Benchmark one configuration until its tokens/sec CI converges
+
+        Args:
+        ----
+            config: Configuration to measure
+
+        Returns:
+        -------
+            Aggregated result, also written to the benchmark store
+        """
+        # The batch-size override only lasts for this configuration
+        scheduler = self.engine.get_scheduler()
+        limits = scheduler.max_batch_size, scheduler.batcher.max_batch_size
+        if config.batch_size is not None:
+            scheduler.max_batch_size = config.batch_size
+            scheduler.batcher.max_batch_size = config.batch_size
+        try:
+            prompt = self.make_prompt(config.prompt_tokens)
+            for _ in range(self.warmup):
+                for _tok in self.engine.stream(prompt, max_tokens=config.output_tokens):
+                    pass
+
+            trial_tps: list[float] = []
+            ttfts: list[float] = []
+            gaps: list[float] = []
+            converged = False
+            with _MemorySampler(self.memory_fn, MEMORY_SAMPLE_INTERVAL) as sampler:
+                while len(trial_tps) < self.max_trials:
+                    tps, requests = self._trial(config)
+                    trial_tps.append(tps)
+                    for ttft, request_gaps, _ in requests:
+                        if ttft is not None:
+                            ttfts.append(ttft)
+                        gaps.extend(request_gaps)
+                    if len(trial_tps) >= self.min_trials:
+                        mean = statistics.fmean(trial_tps)
+                        if confidence_halfwidth(trial_tps) <= self.rel_ci * mean:
+                            converged = True
+                            break
+        finally:
+            scheduler.max_batch_size, scheduler.batcher.max_batch_size = limits
+
+        itl = np.percentile(gaps, [50, 90, 99]) * 1000 if gaps else [math.nan] * 3
+        result = BenchResult(
+            config=config,
+            trials=len(trial_tps),
+            tokens_per_second=statistics.fmean(trial_tps),
+            tps_ci95=confidence_halfwidth(trial_tps),
+            ttft_ms=statistics.median(ttfts) * 1000 if ttfts else math.nan,
+            itl_p50_ms=float(itl[0]),
+            itl_p90_ms=float(itl[1]),
+            itl_p99_ms=float(itl[2]),
+            memory_peak_mb=sampler.peak,
+            converged=converged,
+            trial_tps=trial_tps,
+        )
+        if not converged:
+            logger.warning(
+                f"{config}: CI ±{result.tps_ci95:.1f} tok/s did not converge "
+                f"within {self.max_trials} trials"
+            )
+        if self.db is not None:
+            self.db.add_benchmark(self.model_path, self.backend, **result.as_record())
+        return result
+
+    def sweep(
+        self,
+        prompt_tokens: Sequence[int] = (128,),
+        output_tokens: Sequence[int] = (128,),
+        concurrency: Sequence[int] = (1,),
+        batch_sizes: Sequence[Optional[int]] = (None,),
+    ) -> list[BenchResult]:
+        """
+        Benchmark the cross product of the given parameter values
+
+        Returns
+        -------
+            One result per configuration, in sweep order
+        """
+        results = []
+        for p, o, c, b in product(prompt_tokens, output_tokens, concurrency, batch_sizes):
+            result = self.run_config(BenchConfig(p, o, c, b))
+            logger.info(
+                f"prompt={p} output={o} concurrency={c} batch={b}: "
+                f"{result.tokens_per_second:.1f}±{result.tps_ci95:.1f} tok/s, "
+                f"TTFT {result.ttft_ms:.1f} ms, ITL p99 {result.itl_p99_ms:.2f} ms"
+            )
+            results.append(result)
+        return results
+
+
+class StubBackend:
+    """
+    Timing simulator standing in for a real backend
+
+    Prefill costs a fixed latency plus a per-prompt-token cost; decode steps
+    slow down once more requests run than the backend has slots. Memory grows
+    with the tokens held by running requests.
+    """
+
+    def __init__(
+        self,
+        ttft_s: float = 0.01,
+        prefill_per_token_s: float = 2e-5,
+        itl_s: float = 0.002,
+        slots: int = 8,
+        base_memory_mb: float = 4000.0,
+        per_token_mb: float = 0.125,
+    ):
+        self.ttft_s = ttft_s
+        self.prefill_per_token_s = prefill_per_token_s
+        self.itl_s = itl_s
+        self.slots = slots
+        self.base_memory_mb = base_memory_mb
+        self.per_token_mb = per_token_mb
+        self._lock = threading.Lock()
+        self._active = 0
+        self._held_tokens = 0
+
+    def load(self, *_a, **_kw) -> None: ...
+
+    def unload(self) -> None: ...
+
+    def health(self) -> bool:
+        return True
+
+    def memory_used_mb(self) -> float:
+        """Simulated GPU memory in use"""
+        with self._lock:
+            return self.base_memory_mb + self._held_tokens * self.per_token_mb
+
+    def stream(self, prompt: str, **kw):
+        prompt_tokens = len(prompt.split())
+        max_tokens = kw.get("max_tokens", 128)
+        with self._lock:
+            self._active += 1
+            self._held_tokens += prompt_tokens
+        try:
+            time.sleep(self.ttft_s + prompt_tokens * self.prefill_per_token_s)
+            for i in range(max_tokens):
+                if i:
+                    time.sleep(self.itl_s * max(1.0, self._active / self.slots))
+                with self._lock:
+                    self._held_tokens += 1
+                yield f"t{i} "
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._held_tokens -= prompt_tokens + max_tokens
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end inference benchmark sweep")
+    parser.add_argument("--model", default="stub", help="model path or HF id to load")
+    parser.add_argument("--stub", action="store_true", help="use the timing simulator")
+    parser.add_argument("--prompt-tokens", type=int, nargs="+", default=[128])
+    parser.add_argument("--output-tokens", type=int, nargs="+", default=[64])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[None])
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--min-trials", type=int, default=3)
+    parser.add_argument("--max-trials", type=int, default=20)
+    parser.add_argument("--rel-ci", type=float, default=0.05)
+    parser.add_argument("--db", help="benchmark database path (default: ~/.dualgpuopt)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from dualgpuopt.engine.backend import Engine
+    from dualgpuopt.engine.benchmark import BenchmarkDB
+
+    engine = Engine()
+    memory_fn = None
+    if args.stub:
+        engine.backend = StubBackend()
+        memory_fn = engine.backend.memory_used_mb
+    else:
+        engine.load(args.model)
+
+    runner = BenchmarkRunner(
+        engine,
+        args.model,
+        warmup=args.warmup,
+        min_trials=args.min_trials,
+        max_trials=args.max_trials,
+        rel_ci=args.rel_ci,
+        memory_fn=memory_fn,
+        db=BenchmarkDB(args.db) if args.db else None,
+    )
+    try:
+        results = runner.sweep(
+            args.prompt_tokens, args.output_tokens, args.concurrency, args.batch_size
+        )
+    finally:
+        engine.unload()
+
+    print(
+        f"{'prompt':>7} {'output':>7} {'conc':>5} {'batch':>6} {'tok/s':>14} "
+        f"{'TTFT ms':>8} {'ITL p50':>8} {'ITL p99':>8} {'peak MB':>8} {'n':>3}"
+    )
+    for r in results:
+        c = r.config
+        peak = f"{r.memory_peak_mb:.0f}" if r.memory_peak_mb is not None else "-"
+        print(
+            f"{c.prompt_tokens:>7} {c.output_tokens:>7} {c.concurrency:>5} "
+            f"{str(c.batch_size or '-'):>6} "
+            f"{r.tokens_per_second:>8.1f}±{r.tps_ci95:<5.1f} {r.ttft_ms:>8.1f} "
+            f"{r.itl_p50_ms:>8.2f} {r.itl_p99_ms:>8.2f} {peak:>8} {r.trials:>3}"
+        )
+
+
+if __name__ == "__main__":
+    main()
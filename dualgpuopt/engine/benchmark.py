@@ -4,72 +4,209 @@ Benchmark tracking system for model inference performance.
 
 Tracks and persists performance metrics for different models, providing
 historical data for model comparison and optimization.
+
+All records live in one versioned schema (``PRAGMA user_version``) that is
+migrated on first use, including databases written by the former module-level
+``models``/``bench`` tables. Each thread reuses its own connection. Records
+from the serving path are queued and committed in batches by a background
+writer so that storing them never blocks generation.
 """
 
 from __future__ import annotations
 
+import atexit
 import json
 import logging
 import os
+import queue
 import sqlite3
 import threading
 import time
 from datetime import datetime
-from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 logger = logging.getLogger("dualgpuopt.engine.benchmark")
 
 # Default location for the benchmark database
 DEFAULT_DB_PATH = os.path.expanduser("~/.dualgpuopt/benchmarks.db")
 
-DB = Path.home() / ".dualgpuopt" / "benchmarks.db"
-DB.parent.mkdir(exist_ok=True)
+# Background writer: rows per transaction and longest wait before a commit
+WRITE_BATCH_SIZE = 256
+WRITE_FLUSH_INTERVAL = 0.5  # seconds
+# Queued rows beyond this are dropped rather than growing memory without bound
+WRITE_QUEUE_MAX = 100_000
+
+_BENCHMARK_COLUMNS = (
+    "gpu_utilization",
+    "memory_used",
+    "latency_ms",
+    "prompt_tokens",
+    "output_tokens",
+    "temperature",
+    "batch_size",
+    "context_size",
+    "ttft_ms",
+    "itl_p50_ms",
+    "itl_p90_ms",
+    "itl_p99_ms",
+    "concurrency",
+    "tps_ci95",
+    "trials",
+)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+_SCHEMA_V1 = (
+    """
+    CREATE TABLE IF NOT EXISTS models (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        model_path TEXT NOT NULL,
+        backend TEXT NOT NULL,
+        config TEXT,
+        UNIQUE(model_path, backend, config)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS benchmarks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        model_id INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL,
+        tokens_per_second REAL NOT NULL,
+        gpu_utilization REAL,
+        memory_used REAL,
+        latency_ms REAL,
+        prompt_tokens INTEGER,
+        output_tokens INTEGER,
+        temperature REAL,
+        batch_size INTEGER,
+        context_size INTEGER,
+        FOREIGN KEY (model_id) REFERENCES models(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS startups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        model_path TEXT NOT NULL,
+        backend TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        spawn_s REAL,
+        weights_s REAL,
+        ready_s REAL NOT NULL,
+        ready_via TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_benchmarks_model_id ON benchmarks(model_id)",
+    "CREATE INDEX IF NOT EXISTS idx_benchmarks_timestamp ON benchmarks(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_startups_model ON startups(model_path, timestamp)",
+)
+
+
+def _migrate_v1(conn: sqlite3.Connection) -> None:
+    """Create the unified schema, absorbing the legacy ``models``/``bench`` tables"""
+    legacy = "model" in _columns(conn, "models")
+    if legacy:
+        # The former BenchmarkDB created its (empty) benchmarks table next to the
+        # legacy ones; its foreign key must keep naming models, not follow the rename
+        conn.execute("PRAGMA legacy_alter_table=ON")
+        try:
+            conn.execute("ALTER TABLE models RENAME TO legacy_models")
+        finally:
+            conn.execute("PRAGMA legacy_alter_table=OFF")
+
+    for statement in _SCHEMA_V1:
+        conn.execute(statement)
+
+    if legacy:
+        # Keep the ids so that legacy bench rows still point at their model; rows
+        # differing only in a NULL cfg are all copied and folded below
+        conn.execute(
+            "INSERT INTO models (id, model_path, backend, config) "
+            "SELECT id, model, backend, cfg FROM legacy_models"
+        )
+        conn.execute("DROP TABLE legacy_models")
+    if _columns(conn, "bench"):
+        # Without legacy models the legacy inserts could not have succeeded
+        if legacy:
+            conn.execute(
+                "INSERT INTO benchmarks "
+                "(model_id, timestamp, tokens_per_second, gpu_utilization, memory_used) "
+                "SELECT mid, ts, tok, util, mem FROM bench"
+            )
+        conn.execute("DROP TABLE bench")
+
+    # NULL configs never compared equal under the UNIQUE constraint, so the
+    # same model was registered once per record, and configs were serialized
+    # without sorted keys: point the records at the first registration of each
+    # canonical config, drop the others and only then rewrite the configs
+    first: dict[tuple[str, str, str], int] = {}
+    duplicates: dict[int, int] = {}
+    for model_id, model_path, backend, config in conn.execute(
+        "SELECT id, model_path, backend, config FROM models ORDER BY id"
+    ).fetchall():
+        keep = first.setdefault((model_path, backend, _canonical_config(config)), model_id)
+        if keep != model_id:
+            duplicates[model_id] = keep
+    conn.executemany(
+        "UPDATE benchmarks SET model_id = ? WHERE model_id = ?",
+        [(keep, model_id) for model_id, keep in duplicates.items()],
+    )
+    conn.executemany("DELETE FROM models WHERE id = ?", [(model_id,) for model_id in duplicates])
+    conn.executemany(
+        "UPDATE models SET config = ? WHERE id = ?",
+        [(config, model_id) for (_, _, config), model_id in first.items()],
+    )
 
-_conn = sqlite3.connect(DB, check_same_thread=False, timeout=30)
-_conn.execute("PRAGMA journal_mode=WAL")
-_lock = threading.Lock()
 
-# --- schema creation only once ---
-with _lock, _conn:
-    _conn.executescript(
-        """
-        CREATE TABLE IF NOT EXISTS models(
-            id INTEGER PRIMARY KEY, model TEXT, backend TEXT, cfg TEXT,
-            UNIQUE(model,backend,cfg)
-        );
-        CREATE TABLE IF NOT EXISTS bench(
-            id INTEGER PRIMARY KEY, mid INT, ts INT,
-            tok REAL, util REAL, mem REAL,
-            FOREIGN KEY(mid) REFERENCES models(id) ON DELETE CASCADE
-        );
-        CREATE INDEX IF NOT EXISTS ix_bench_mid_ts ON bench(mid,ts DESC);
-    """,
+def _migrate_v2(conn: sqlite3.Connection) -> None:
+    """Add the latency distribution and repetition statistics of the harness"""
+    existing = _columns(conn, "benchmarks")
+    for column, kind in (
+        ("ttft_ms", "REAL"),
+        ("itl_p50_ms", "REAL"),
+        ("itl_p90_ms", "REAL"),
+        ("itl_p99_ms", "REAL"),
+        ("concurrency", "INTEGER"),
+        ("tps_ci95", "REAL"),
+        ("trials", "INTEGER"),
+    ):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE benchmarks ADD COLUMN {column} {kind}")
+
+
+def _migrate_v3(conn: sqlite3.Connection) -> None:
+    """Replace the model_id index with one covering per-series history and aggregates"""
+    conn.execute("DROP INDEX IF EXISTS idx_benchmarks_model_id")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_benchmarks_series ON benchmarks "
+        "(model_id, timestamp, id, tokens_per_second, gpu_utilization, memory_used)"
     )
 
 
-def _get_mid(model: str, backend: str, cfg: str) -> int:
-    with _lock, _conn:
-        cur = _conn.execute(
-            "SELECT id FROM models WHERE model=? AND backend=? AND cfg=?",
-            (model, backend, cfg),
-        ).fetchone()
-        if cur:
-            return cur[0]
-        return _conn.execute(
-            "INSERT INTO models(model,backend,cfg) VALUES(?,?,?)",
-            (model, backend, cfg),
-        ).lastrowid
+# Schema migrations, applied in order; the schema version is their count
+MIGRATIONS: list[Callable[[sqlite3.Connection], None]] = [_migrate_v1, _migrate_v2, _migrate_v3]
 
 
-def add(model: str, backend: str, tokps: float, **kw):
-    cfg_json = json.dumps(kw.get("cfg")) if kw.get("cfg") is not None else None
-    mid = _get_mid(model, backend, cfg_json)
-    with _lock, _conn:
-        _conn.execute(
-            "INSERT INTO bench(mid,ts,tok,util,mem) VALUES(?,?,?,?,?)",
-            (mid, int(time.time()), tokps, kw.get("util"), kw.get("mem")),
-        )
+def _config_key(config: Optional[dict[str, Any]]) -> str:
+    """Canonical text of a config; '' for none so the UNIQUE key matches"""
+    return json.dumps(config, sort_keys=True) if config else ""
+
+
+def _canonical_config(text: Optional[str]) -> str:
+    """Stored config text re-serialized as _config_key writes it"""
+    if not text:
+        return ""
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return text
+    return _config_key(value) if value is None or isinstance(value, dict) else text
+
+
+def _config_value(text: Optional[str]) -> Optional[dict[str, Any]]:
+    return json.loads(text) if text else None
 
 
 class BenchmarkDB:
@@ -84,61 +221,208 @@ class BenchmarkDB:
         """
         Initialize the benchmark database.
 
+        Nothing is opened until the first query.
+
         Args:
         ----
             db_path: Path to the database file (defaults to ~/.dualgpuopt/benchmarks.db)
         """
         self.db_path = db_path or DEFAULT_DB_PATH
-        self._ensure_db_exists()
-
-    def _ensure_db_exists(self):
-        """Ensure the database file exists and has the required schema."""
-        # Create parent directory if needed
-        db_dir = os.path.dirname(self.db_path)
-        os.makedirs(db_dir, exist_ok=True)
-
-        # Connect and create tables if needed
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS models (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    model_path TEXT NOT NULL,
-                    backend TEXT NOT NULL,
-                    config TEXT,
-                    UNIQUE(model_path, backend, config)
-                )
+        self._local = threading.local()
+        self._conns: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._migrated = False
+        self._model_ids: dict[tuple[str, str, str], int] = {}
+
+        self._queue: queue.Queue = queue.Queue(maxsize=WRITE_QUEUE_MAX)
+        self._writer: Optional[threading.Thread] = None
+        self.dropped_writes = 0
+
+    # ------------------------------------------------------------------ #
+    # Connections and schema
+    # ------------------------------------------------------------------ #
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening and migrating on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            if not self._migrated:
+                self._migrate(conn)
+                self._migrated = True
+            self._conns.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Bring the schema up to the latest version in one transaction"""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+            return
+        # The write lock also keeps other processes from migrating concurrently
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                logger.info(f"Migrated benchmark database to schema version {target}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    @property
+    def schema_version(self) -> int:
+        """Schema version of the database"""
+        return self._connect().execute("PRAGMA user_version").fetchone()[0]
+
+    def _model_id(self, conn: sqlite3.Connection, model_path: str, backend: str, config: str):
+        """Get or create the id of a (model, backend, config) triple"""
+        key = (model_path, backend, config)
+        model_id = self._model_ids.get(key)
+        if model_id is not None:
+            return model_id
+        conn.execute(
+            "INSERT OR IGNORE INTO models (model_path, backend, config) VALUES (?, ?, ?)", key
+        )
+        model_id = conn.execute(
+            "SELECT id FROM models WHERE model_path = ? AND backend = ? AND config = ?", key
+        ).fetchone()[0]
+        self._model_ids[key] = model_id
+        return model_id
+
+    def _insert_benchmark(self, conn: sqlite3.Connection, row: dict[str, Any]) -> int:
+        model_id = self._model_id(conn, row["model_path"], row["backend"], row["config"])
+        cursor = conn.execute(
+            f"""
+            INSERT INTO benchmarks (
+                model_id, timestamp, tokens_per_second, {", ".join(_BENCHMARK_COLUMNS)}
+            ) VALUES (?, ?, ?, {", ".join("?" * len(_BENCHMARK_COLUMNS))})
             """,
-            )
+            (
+                model_id,
+                row["timestamp"],
+                row["tokens_per_second"],
+                *(row.get(column) for column in _BENCHMARK_COLUMNS),
+            ),
+        )
+        return cursor.lastrowid
 
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS benchmarks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    model_id INTEGER NOT NULL,
-                    timestamp INTEGER NOT NULL,
-                    tokens_per_second REAL NOT NULL,
-                    gpu_utilization REAL,
-                    memory_used REAL,
-                    latency_ms REAL,
-                    prompt_tokens INTEGER,
-                    output_tokens INTEGER,
-                    temperature REAL,
-                    batch_size INTEGER,
-                    context_size INTEGER,
-                    FOREIGN KEY (model_id) REFERENCES models(id)
+    @staticmethod
+    def _benchmark_row(
+        model_path: str,
+        backend: str,
+        tokens_per_second: float,
+        config: Optional[dict[str, Any]],
+        metrics: dict[str, Any],
+    ) -> dict[str, Any]:
+        unknown = set(metrics) - set(_BENCHMARK_COLUMNS)
+        if unknown:
+            raise TypeError(f"Unknown benchmark fields: {', '.join(sorted(unknown))}")
+        return {
+            "model_path": model_path,
+            "backend": backend,
+            "config": _config_key(config),
+            "timestamp": int(time.time()),
+            "tokens_per_second": tokens_per_second,
+            **metrics,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Background writer
+    # ------------------------------------------------------------------ #
+    def submit_benchmark(
+        self,
+        model_path: str,
+        backend: str,
+        tokens_per_second: float,
+        config: Optional[dict[str, Any]] = None,
+        **metrics: Any,
+    ) -> None:
+        """
+        Queue a benchmark record for the background writer.
+
+        Returns immediately; the record is committed with others in a batch.
+        Takes the same arguments as :meth:`add_benchmark`.
+        """
+        row = self._benchmark_row(model_path, backend, tokens_per_second, config, metrics)
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped_writes += 1
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._write_loop, daemon=True, name="BenchmarkWriter"
                 )
-            """,
-            )
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        """Commit queued records in batches of up to ``WRITE_BATCH_SIZE``"""
+        while True:
+            rows = [self._queue.get()]
+            deadline = time.monotonic() + WRITE_FLUSH_INTERVAL
+            while len(rows) < WRITE_BATCH_SIZE:
+                try:
+                    rows.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                conn = self._connect()
+                with conn:
+                    for row in rows:
+                        self._insert_benchmark(conn, row)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} benchmark records: {e}")
+                self._model_ids.clear()
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Wait until queued records are committed.
 
-            # Create index for faster model lookups
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_benchmarks_model_id ON benchmarks(model_id)",
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_benchmarks_timestamp ON benchmarks(timestamp)",
-            )
+        Args:
+        ----
+            timeout: Maximum seconds to wait
 
+        Returns:
+        -------
+            True if the queue was drained in time
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self) -> None:
+        """Flush queued records and close every connection."""
+        self.flush()
+        with self._lock:
+            conns, self._conns = self._conns, []
+            self._migrated = False
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+        self._model_ids.clear()
+
+    # ------------------------------------------------------------------ #
+    # Writes
+    # ------------------------------------------------------------------ #
     def add_benchmark(
         self,
         model_path: str,
@@ -153,10 +437,20 @@ class BenchmarkDB:
         temperature: Optional[float] = None,
         batch_size: Optional[int] = None,
         context_size: Optional[int] = None,
+        ttft_ms: Optional[float] = None,
+        itl_p50_ms: Optional[float] = None,
+        itl_p90_ms: Optional[float] = None,
+        itl_p99_ms: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        tps_ci95: Optional[float] = None,
+        trials: Optional[int] = None,
     ) -> int:
         """
         Add a benchmark record to the database.
 
+        Commits synchronously; the serving path should use
+        :meth:`submit_benchmark` instead.
+
         Args:
         ----
             model_path: Path or identifier of the model
@@ -171,60 +465,108 @@ class BenchmarkDB:
             temperature: Optional temperature setting
             batch_size: Optional batch size
             context_size: Optional context size
+            ttft_ms: Optional median time to first token in milliseconds
+            itl_p50_ms: Optional median inter-token latency in milliseconds
+            itl_p90_ms: Optional 90th percentile inter-token latency
+            itl_p99_ms: Optional 99th percentile inter-token latency
+            concurrency: Optional number of concurrent requests
+            tps_ci95: Optional half-width of the 95% confidence interval of tokens/sec
+            trials: Optional number of repetitions behind the record
 
         Returns:
         -------
             The ID of the newly created benchmark record
         """
-        # Serialize config to JSON if provided
-        config_json = json.dumps(config) if config else None
+        row = self._benchmark_row(
+            model_path,
+            backend,
+            tokens_per_second,
+            config,
+            {
+                "gpu_utilization": gpu_utilization,
+                "memory_used": memory_used,
+                "latency_ms": latency_ms,
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "temperature": temperature,
+                "batch_size": batch_size,
+                "context_size": context_size,
+                "ttft_ms": ttft_ms,
+                "itl_p50_ms": itl_p50_ms,
+                "itl_p90_ms": itl_p90_ms,
+                "itl_p99_ms": itl_p99_ms,
+                "concurrency": concurrency,
+                "tps_ci95": tps_ci95,
+                "trials": trials,
+            },
+        )
+        conn = self._connect()
+        with conn:
+            return self._insert_benchmark(conn, row)
 
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+    def add_startup(
+        self,
+        model_path: str,
+        backend: str,
+        ready_s: float,
+        spawn_s: Optional[float] = None,
+        weights_s: Optional[float] = None,
+        ready_via: Optional[str] = None,
+    ) -> int:
+        """
+        Add the startup phase timings of a server launch.
 
-            # Get or create model ID
-            cursor = conn.execute(
-                "SELECT id FROM models WHERE model_path = ? AND backend = ? AND config = ?",
-                (model_path, backend, config_json),
-            )
-            model_row = cursor.fetchone()
-
-            if model_row:
-                model_id = model_row["id"]
-            else:
-                cursor = conn.execute(
-                    "INSERT INTO models (model_path, backend, config) VALUES (?, ?, ?)",
-                    (model_path, backend, config_json),
-                )
-                model_id = cursor.lastrowid
+        Args:
+        ----
+            model_path: Path or identifier of the model
+            backend: Backend used (e.g., "vllm", "llama.cpp")
+            ready_s: Seconds from launch until the server was ready
+            spawn_s: Optional seconds until the process was spawned
+            weights_s: Optional seconds until the weights were loaded
+            ready_via: Optional readiness signal ("marker" or "probe")
 
-            # Insert benchmark
-            timestamp = int(time.time())
+        Returns:
+        -------
+            The ID of the newly created startup record
+        """
+        conn = self._connect()
+        with conn:
             cursor = conn.execute(
                 """
-                INSERT INTO benchmarks (
-                    model_id, timestamp, tokens_per_second, gpu_utilization,
-                    memory_used, latency_ms, prompt_tokens, output_tokens,
-                    temperature, batch_size, context_size
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO startups (
+                    model_path, backend, timestamp, spawn_s, weights_s, ready_s, ready_via
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
                 """,
-                (
-                    model_id,
-                    timestamp,
-                    tokens_per_second,
-                    gpu_utilization,
-                    memory_used,
-                    latency_ms,
-                    prompt_tokens,
-                    output_tokens,
-                    temperature,
-                    batch_size,
-                    context_size,
-                ),
+                (model_path, backend, int(time.time()), spawn_s, weights_s, ready_s, ready_via),
             )
-
             return cursor.lastrowid
 
+    # ------------------------------------------------------------------ #
+    # Queries (pending queued records are flushed first)
+    # ------------------------------------------------------------------ #
+    def get_startup_timings(self, model_path: str, limit: int = 10) -> list[dict[str, Any]]:
+        """
+        Get recent startup phase timings for a model.
+
+        Args:
+        ----
+            model_path: Path or identifier of the model
+            limit: Maximum number of records to return (default 10)
+
+        Returns:
+        -------
+            List of startup records, newest first
+        """
+        cursor = self._connect().execute(
+            """
+            SELECT model_path, backend, timestamp, spawn_s, weights_s, ready_s, ready_via
+            FROM startups WHERE model_path = ?
+            ORDER BY timestamp DESC, id DESC LIMIT ?
+            """,
+            (model_path, limit),
+        )
+        return [dict(row) for row in cursor]
+
     def get_model_benchmarks(
         self,
         model_path: str,
@@ -244,41 +586,37 @@ class BenchmarkDB:
         -------
             List of benchmark records
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-
-            query = """
-                SELECT
-                    b.id, b.timestamp, b.tokens_per_second, b.gpu_utilization,
-                    b.memory_used, b.latency_ms, b.prompt_tokens, b.output_tokens,
-                    b.temperature, b.batch_size, b.context_size,
-                    m.model_path, m.backend, m.config
-                FROM benchmarks b
-                JOIN models m ON b.model_id = m.id
-                WHERE m.model_path = ?
-            """
-            params = [model_path]
-
-            if backend:
-                query += " AND m.backend = ?"
-                params.append(backend)
+        self.flush()
+        query = """
+            SELECT
+                b.id, b.timestamp, b.tokens_per_second, b.gpu_utilization,
+                b.memory_used, b.latency_ms, b.prompt_tokens, b.output_tokens,
+                b.temperature, b.batch_size, b.context_size, b.ttft_ms,
+                b.itl_p50_ms, b.itl_p90_ms, b.itl_p99_ms, b.concurrency, b.tps_ci95, b.trials,
+                m.model_path, m.backend, m.config
+            FROM benchmarks b
+            JOIN models m ON b.model_id = m.id
+            WHERE m.model_path = ?
+        """
+        params: list[Any] = [model_path]
 
-            query += " ORDER BY b.timestamp DESC LIMIT ?"
-            params.append(limit)
+        if backend:
+            query += " AND m.backend = ?"
+            params.append(backend)
 
-            cursor = conn.execute(query, params)
+        query += " ORDER BY b.timestamp DESC, b.id DESC LIMIT ?"
+        params.append(limit)
 
-            result = []
-            for row in cursor:
-                record = dict(row)
-                if record["config"]:
-                    record["config"] = json.loads(record["config"])
-                timestamp = record.pop("timestamp")
-                record["timestamp"] = timestamp
-                record["datetime"] = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-                result.append(record)
+        result = []
+        for row in self._connect().execute(query, params):
+            record = dict(row)
+            record["config"] = _config_value(record["config"])
+            record["datetime"] = datetime.fromtimestamp(record["timestamp"]).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            result.append(record)
 
-            return result
+        return result
 
     def get_latest_benchmark(
         self,
@@ -312,40 +650,123 @@ class BenchmarkDB:
         -------
             List of model records with average performance metrics
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-
-            query = """
-                SELECT
-                    m.model_path, m.backend, m.config,
-                    AVG(b.tokens_per_second) as avg_tokens_per_second,
-                    MAX(b.tokens_per_second) as max_tokens_per_second,
-                    AVG(b.gpu_utilization) as avg_gpu_utilization,
-                    AVG(b.memory_used) as avg_memory_used,
-                    COUNT(b.id) as benchmark_count,
-                    MAX(b.timestamp) as last_benchmark
-                FROM models m
-                JOIN benchmarks b ON m.id = b.model_id
-                GROUP BY m.id
-                ORDER BY avg_tokens_per_second DESC
-                LIMIT ?
-            """
+        self.flush()
+        query = """
+            SELECT
+                m.model_path, m.backend, m.config,
+                AVG(b.tokens_per_second) as avg_tokens_per_second,
+                MAX(b.tokens_per_second) as max_tokens_per_second,
+                AVG(b.gpu_utilization) as avg_gpu_utilization,
+                AVG(b.memory_used) as avg_memory_used,
+                COUNT(b.id) as benchmark_count,
+                MAX(b.timestamp) as last_benchmark
+            FROM models m
+            JOIN benchmarks b ON m.id = b.model_id
+            GROUP BY m.id
+            ORDER BY avg_tokens_per_second DESC
+            LIMIT ?
+        """
 
-            cursor = conn.execute(query, (limit,))
-
-            result = []
-            for row in cursor:
-                record = dict(row)
-                if record["config"]:
-                    record["config"] = json.loads(record["config"])
-                timestamp = record.pop("last_benchmark")
-                record["last_benchmark"] = timestamp
-                record["last_benchmark_datetime"] = datetime.fromtimestamp(timestamp).strftime(
-                    "%Y-%m-%d %H:%M:%S",
-                )
-                result.append(record)
+        result = []
+        for row in self._connect().execute(query, (limit,)):
+            record = dict(row)
+            record["config"] = _config_value(record["config"])
+            record["last_benchmark_datetime"] = datetime.fromtimestamp(
+                record["last_benchmark"]
+            ).strftime("%Y-%m-%d %H:%M:%S")
+            result.append(record)
+
+        return result
+
+    def list_series(
+        self,
+        model_path: Optional[str] = None,
+        backend: Optional[str] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        List the recorded (model, backend, config) series.
+
+        Args:
+        ----
+            model_path: Optional model filter
+            backend: Optional backend filter
+
+        Returns:
+        -------
+            One record per series with its last benchmark timestamp
+        """
+        self.flush()
+        query = """
+            SELECT
+                m.model_path, m.backend, m.config,
+                (SELECT MAX(b.timestamp) FROM benchmarks b WHERE b.model_id = m.id)
+                    AS last_benchmark
+            FROM models m
+        """
+        where_clauses = []
+        params: list[Any] = []
+        if model_path:
+            where_clauses.append("m.model_path = ?")
+            params.append(model_path)
+        if backend:
+            where_clauses.append("m.backend = ?")
+            params.append(backend)
+        if where_clauses:
+            query += " WHERE " + " AND ".join(where_clauses)
+        query += " ORDER BY m.model_path, m.backend, m.config"
+
+        result = []
+        for row in self._connect().execute(query, params):
+            if row["last_benchmark"] is None:
+                continue
+            record = dict(row)
+            record["config"] = _config_value(record["config"])
+            result.append(record)
+        return result
+
+    def get_series(
+        self,
+        model_path: str,
+        backend: str,
+        config: Optional[dict[str, Any]] = None,
+        limit: int = 1000,
+        since: Optional[int] = None,
+    ) -> list[tuple[int, float]]:
+        """
+        Get the tokens/sec history of one (model, backend, config) series.
 
-            return result
+        Reads only the covering series index, so the cost depends on ``limit``
+        and not on the size of the table.
+
+        Args:
+        ----
+            model_path: Path or identifier of the model
+            backend: Backend the series was recorded with
+            config: Configuration dictionary of the series (None for no config)
+            limit: Maximum number of most recent records to return
+            since: Optional timestamp of the oldest record to return
+
+        Returns:
+        -------
+            (timestamp, tokens_per_second) pairs, oldest first
+        """
+        self.flush()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT id FROM models WHERE model_path = ? AND backend = ? AND config = ?",
+            (model_path, backend, _config_key(config)),
+        ).fetchone()
+        if row is None:
+            return []
+        cursor = conn.execute(
+            """
+            SELECT timestamp, tokens_per_second FROM benchmarks
+            WHERE model_id = ? AND timestamp >= ?
+            ORDER BY timestamp DESC, id DESC LIMIT ?
+            """,
+            (row[0], since or 0, limit),
+        )
+        return [(ts, tps) for ts, tps in cursor][::-1]
 
     def clear_benchmarks(
         self,
@@ -364,37 +785,62 @@ class BenchmarkDB:
         -------
             Number of benchmark records deleted
         """
-        with sqlite3.connect(self.db_path) as conn:
-            query = "DELETE FROM benchmarks"
-            params = []
+        self.flush()
+        query = "DELETE FROM benchmarks"
+        params: list[Any] = []
 
-            where_clauses = []
+        where_clauses = []
 
-            if model_path:
-                where_clauses.append("model_id IN (SELECT id FROM models WHERE model_path = ?)")
-                params.append(model_path)
+        if model_path:
+            where_clauses.append("model_id IN (SELECT id FROM models WHERE model_path = ?)")
+            params.append(model_path)
 
-            if older_than_days:
-                cutoff_timestamp = int(time.time()) - (older_than_days * 86400)
-                where_clauses.append("timestamp < ?")
-                params.append(cutoff_timestamp)
+        if older_than_days:
+            cutoff_timestamp = int(time.time()) - (older_than_days * 86400)
+            where_clauses.append("timestamp < ?")
+            params.append(cutoff_timestamp)
 
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
+        if where_clauses:
+            query += " WHERE " + " AND ".join(where_clauses)
 
-            cursor = conn.execute(query, params)
-            return cursor.rowcount
+        conn = self._connect()
+        with conn:
+            return conn.execute(query, params).rowcount
 
 
-# Global benchmark database instance
+# Global benchmark database instance (opened lazily)
 benchmark_db = BenchmarkDB()
+atexit.register(benchmark_db.flush, 2.0)
 
 
-def record_benchmark(model_path: str, backend: str, tokens_per_second: float, **kwargs) -> int:
+def add(model: str, backend: str, tokps: float, **kw):
+    """
+    Queue a benchmark record (former module-level API).
+
+    Args:
+    ----
+        model: Path or identifier of the model
+        backend: Backend used
+        tokps: Measured tokens per second
+        **kw: Optional ``cfg``, ``util`` and ``mem`` values
+    """
+    benchmark_db.submit_benchmark(
+        model,
+        backend,
+        tokps,
+        config=kw.get("cfg"),
+        gpu_utilization=kw.get("util"),
+        memory_used=kw.get("mem"),
+    )
+
+
+def record_benchmark(model_path: str, backend: str, tokens_per_second: float, **kwargs) -> None:
     """
     Record a benchmark for a model.
 
     Convenience function that uses the global benchmark database instance.
+    The record is queued for the background writer, so this never blocks on
+    the database.
 
     Args:
     ----
@@ -402,12 +848,8 @@ def record_benchmark(model_path: str, backend: str, tokens_per_second: float, **
         backend: Backend used (e.g., "vllm", "llama.cpp", "hf")
         tokens_per_second: Measured tokens per second
         **kwargs: Additional benchmark metrics
-
-    Returns:
-    -------
-        The ID of the newly created benchmark record
     """
-    return benchmark_db.add_benchmark(model_path, backend, tokens_per_second, **kwargs)
+    benchmark_db.submit_benchmark(model_path, backend, tokens_per_second, **kwargs)
 
 
 def get_model_performance(
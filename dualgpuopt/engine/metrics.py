@@ -153,12 +153,33 @@ if PROMETHEUS_AVAILABLE:
         ["model_name", "backend"],
     )
 
-    # Initialize HTTP server if not already initialized
-    PORT = int(os.getenv("DUALGPUOPT_METRICS_PORT", 0))
-    if PORT and not getattr(prom, "_dgp_srv_started", False):
-        prom.start_http_server(PORT)
+# Port of the metrics HTTP server; 0 leaves it off
+PORT = int(os.getenv("DUALGPUOPT_METRICS_PORT", 0))
+
+
+def start_metrics_server(port: Optional[int] = None) -> bool:
+    """
+    Start the Prometheus HTTP server once per process.
+
+    Called when the engine pool starts publishing metrics rather than at
+    import, so importing this module never binds a port.
+
+    Args:
+    ----
+        port: Port to listen on (defaults to DUALGPUOPT_METRICS_PORT)
+
+    Returns:
+    -------
+        True if the server is running
+    """
+    port = PORT if port is None else port
+    if not PROMETHEUS_AVAILABLE or not port:
+        return False
+    if not getattr(prom, "_dgp_srv_started", False):
+        prom.start_http_server(port)
         prom._dgp_srv_started = True
-        logger.info("Prometheus on %d", PORT)
+        logger.info("Prometheus on %d", port)
+    return True
 
 
 def _label(path: str) -> str:
@@ -1,6 +1,6 @@
 """
 dualgpuopt.engine.pool
-Hot-reload Engine cache (LRU) + watchdog.
+Hot-reload Engine cache (VRAM-aware GreedyDual-Size) + watchdog.
 
 Provides a caching layer for Engine instances with automatic health monitoring
 and recovery. This allows immediate switching between models that are already
@@ -17,21 +17,30 @@ from __future__ import annotations
 
 import atexit
 import contextlib
+import logging
+import os
+import random
 import socket
 import threading
 import time
 from collections import OrderedDict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
+from enum import Enum
 from typing import Any, Optional
 
+from dualgpuopt import tracing
 from dualgpuopt.engine.backend import Engine
+from dualgpuopt.engine.prewarm import PREWARM_ENABLED, Prewarmer
+from dualgpuopt.engine.replicas import ReplicaGroup
+from dualgpuopt.engine.startup import http_ok as _http_ok
 from dualgpuopt.services.event_bus import event_bus
 
 # Optional imports for metrics and benchmarking
 try:
     from dualgpuopt.engine.metrics import (
         record_model_load_time,
+        start_metrics_server,
         update_model_metrics,
         update_pool_metrics,
     )
@@ -47,14 +56,30 @@ try:
 except ImportError:
     BENCHMARK_AVAILABLE = False
 
+logger = logging.getLogger("DualGPUOpt.EnginePool")
+
 # Configuration constants
 MAX_FAIL = 3  # health failures before reboot
 CHECK_INT = 10.0  # seconds
-CACHE_SIZE = 2  # LRU cache size
+HEALTH_TTL = float(os.environ.get("DUALGPUOPT_HEALTH_TTL", "30.0"))  # seconds a verdict stays fresh
+BREAKER_COOLDOWN = float(os.environ.get("DUALGPUOPT_BREAKER_COOLDOWN", "30.0"))  # open -> half-open
+MAX_RESTARTS = 5  # restart attempts before an engine is marked failed
+RESTART_BACKOFF_BASE = 1.0  # seconds before the first retry, doubled per attempt
+RESTART_BACKOFF_MAX = 60.0  # seconds
+# Seconds a request waits for a restarting engine; 0 fails fast
+RESTART_WAIT = float(os.environ.get("DUALGPUOPT_RESTART_WAIT", "30.0"))
+CACHE_SIZE = int(os.environ.get("DUALGPUOPT_ENGINE_CACHE_SIZE", "2"))  # max resident engines
+# VRAM kept free on every GPU when admitting engines
+VRAM_RESERVE_MB = int(os.environ.get("DUALGPUOPT_ENGINE_VRAM_RESERVE_MB", "1024"))
 METRICS_UPDATE_INT = 30.0  # seconds
 
 _pool_lock = threading.Lock()
 _executor = ThreadPoolExecutor(max_workers=2)
+# Restarts of independent engines run concurrently, away from the pool lock
+_restart_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="EngineRestart")
+
+# In-flight loads keyed by model path; guarded by _pool_lock
+_inflight: dict[str, Future] = {}
 
 # Stats tracking
 _stats = {
@@ -65,28 +90,106 @@ _stats = {
     "health_checks": 0,
     "health_failures": 0,
     "auto_restarts": 0,
+    "coalesced_loads": 0,
+    "rejected_loads": 0,
+    "prewarm_loads": 0,
+    "prewarm_hits": 0,
+    "failed_restarts": 0,
 }
 
+# Last measured VRAM footprint (MB per GPU) of every model loaded so far
+_footprints: dict[str, dict[int, float]] = {}
+
+
+class EngineState(str, Enum):
+    """Supervisor state of a cached engine"""
+
+    HEALTHY = "healthy"
+    DEGRADED = "degraded"  # failing probes, breaker still closed
+    RESTARTING = "restarting"
+    FAILED = "failed"  # gave up after MAX_RESTARTS attempts
+
+
+class EngineUnavailableError(RuntimeError):
+    """Raised when a requested engine is restarting and cannot be waited for"""
+
+
+def _ready_event() -> threading.Event:
+    event = threading.Event()
+    event.set()
+    return event
+
+
+@dataclass
+class _Health:
+    """Cached health verdict of an engine with a consecutive-failure circuit breaker"""
+
+    healthy: bool = True
+    checked: float = field(default_factory=time.monotonic)
+    fails: int = 0
+    opened: float = 0.0  # when the breaker opened, 0 while closed
+
+    def record(self, ok: bool) -> None:
+        """
+        Store a probe result; MAX_FAIL consecutive failures open the breaker
+
+        A failed probe while half-open re-opens the breaker for another cooldown.
+        Call with the pool lock held.
+        """
+        now = time.monotonic()
+        self.healthy = ok
+        self.checked = now
+        if ok:
+            self.fails = 0
+            self.opened = 0.0
+            return
+        self.fails += 1
+        if self.fails >= MAX_FAIL and not self.is_open():
+            self.opened = now
+
+    def is_open(self) -> bool:
+        """Whether the breaker is open and probes should be skipped"""
+        return bool(self.opened) and time.monotonic() - self.opened < BREAKER_COOLDOWN
+
+    def is_fresh(self) -> bool:
+        """Whether the cached verdict can be trusted without probing"""
+        return time.monotonic() - self.checked < HEALTH_TTL
+
 
 @dataclass
 class _Entry:
-    """Internal cache entry for the LRU pool"""
+    """Internal cache entry for the engine pool"""
 
     engine: Engine
     model_path: str
     kwargs: dict[str, Any]
     last_used: float = field(default_factory=time.time)
-    fails: int = 0
+    health: _Health = field(default_factory=_Health)
     load_time: float = 0.0
     benchmarks: dict[str, float] = field(default_factory=dict)
+    vram_mb: dict[int, float] = field(default_factory=dict)  # footprint per GPU
+    priority: float = 0.0  # GreedyDual-Size value
+    prewarmed: bool = False  # loaded speculatively and not requested yet
+    state: EngineState = EngineState.HEALTHY
+    restarts: int = 0  # consecutive failed restart attempts
+    ready: threading.Event = field(default_factory=_ready_event)  # cleared while restarting
 
 
 class _LRUPool:
-    """LRU dictionary: key=model_path, value=_Entry. Maintains order based on access."""
+    """
+    Cost-aware engine cache: key=model_path, value=_Entry.
+
+    Eviction follows GreedyDual-Size: each entry is valued at
+    ``L + load_time / vram`` when inserted or hit, and the lowest valued entry
+    is evicted, raising the inflation ``L`` to its value. Cheap-to-reload and
+    large models go first, while recency is preserved through ``L``. With equal
+    costs and sizes this reduces to LRU, whose order breaks ties.
+    """
 
     def __init__(self, maxsize: int):
         self._max = maxsize
         self._data: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflation = 0.0
 
     @property
     def size(self) -> int:
@@ -103,31 +206,89 @@ class _LRUPool:
         """Set the maximum size of the cache and evict if necessary"""
         if value < 1:
             raise ValueError("Cache size must be at least 1")
-        old_max = self._max
         self._max = value
-        # Evict if necessary
-        if value < old_max:
-            while len(self._data) > self._max:
-                _, old = self._data.popitem(last=False)
-                _executor.submit(old.engine.unload)
-                _stats["total_unloads"] += 1
+        while len(self._data) > self._max:
+            self._evict_one()
+
+    def _value(self, ent: _Entry) -> float:
+        """GreedyDual-Size value of an entry: reload cost per MB of VRAM held"""
+        size_mb = max(sum(ent.vram_mb.values()), 1.0)
+        return self._inflation + max(ent.load_time, 1e-3) / size_mb
+
+    def _evict_one(self) -> Future:
+        """Evict the lowest valued entry and return its unload future"""
+        # min() keeps the first of equal values, i.e. the least recently used
+        key = min(self._data, key=lambda k: self._data[k].priority)
+        old = self._data.pop(key)
+        self._inflation = old.priority
+        _stats["total_unloads"] += 1
+        logger.info(f"Evicting {key} ({sum(old.vram_mb.values()):.0f} MB)")
+        return _executor.submit(old.engine.unload)
 
     def get(self, key: str) -> Optional[_Entry]:
-        """Get an entry from the cache and update its position in the LRU order"""
+        """Get an entry from the cache and refresh its value and recency"""
         ent = self._data.get(key)
         if ent:
             ent.last_used = time.time()
+            ent.priority = self._value(ent)
             self._data.move_to_end(key)
         return ent
 
+    def peek(self, key: str) -> Optional[_Entry]:
+        """Get an entry without touching its value or recency"""
+        return self._data.get(key)
+
     def put(self, key: str, val: _Entry):
-        """Add an entry to the cache, evicting oldest entries if necessary"""
+        """Add an entry to the cache, evicting the lowest valued entries if necessary"""
+        # Speculative entries are valued at the floor so they are evicted first
+        val.priority = self._inflation if val.prewarmed else self._value(val)
         self._data[key] = val
         self._data.move_to_end(key)
-        if len(self._data) > self._max:
-            _, old = self._data.popitem(last=False)
-            _executor.submit(old.engine.unload)
-            _stats["total_unloads"] += 1
+        while len(self._data) > self._max:
+            self._evict_one()
+
+    def resident_mb(self) -> dict[int, float]:
+        """VRAM held by cached engines, in MB per GPU"""
+        resident: dict[int, float] = {}
+        for ent in self._data.values():
+            for gpu, mb in ent.vram_mb.items():
+                resident[gpu] = resident.get(gpu, 0.0) + mb
+        return resident
+
+    def make_room(self, need: dict[int, float], budget: dict[int, float]) -> list[Future]:
+        """
+        Evict entries until a model of the given footprint fits
+
+        Args:
+        ----
+            need: Expected footprint of the new model in MB per GPU
+            budget: Usable VRAM for cached engines in MB per GPU
+
+        Returns:
+        -------
+            Unload futures of the evicted engines
+
+        Raises:
+        ------
+            MemoryError: If the model cannot fit even with the cache empty
+        """
+        for gpu, mb in need.items():
+            if mb > budget.get(gpu, 0.0):
+                raise MemoryError(
+                    f"Model needs {mb:.0f} MB on GPU {gpu} but only "
+                    f"{budget.get(gpu, 0.0):.0f} MB can be made available"
+                )
+
+        unloads = []
+        while self._data:
+            resident = self.resident_mb()
+            over = any(
+                resident.get(gpu, 0.0) + mb > budget.get(gpu, 0.0) for gpu, mb in need.items()
+            )
+            if not over and len(self._data) < self._max:
+                break
+            unloads.append(self._evict_one())
+        return unloads
 
     def values(self):
         """Get all entries in the cache"""
@@ -155,7 +316,7 @@ class _LRUPool:
 
 class EnginePool:
     """
-    Manages a pool of Engine instances with LRU caching and health monitoring.
+    Manages a pool of Engine instances with cost-aware caching and health monitoring.
 
     The pool maintains a cache of loaded models for immediate reuse. When a new model
     is requested, it's either retrieved from the cache or loaded and added to the cache.
@@ -167,12 +328,19 @@ class EnginePool:
     _cache = _LRUPool(CACHE_SIZE)
     _watch_started = False
     _metrics_update_started = False
+    _prewarmer: Optional[Prewarmer] = None
+    _groups: dict[str, ReplicaGroup] = {}
 
     @classmethod
     def get(cls, model_path: str, **kwargs) -> Engine:
         """
         Get an Engine instance for the given model, either from cache or newly loaded.
 
+        Loads are single-flight: only one load per model path runs at a time and
+        concurrent callers for the same path wait on its future. The pool lock is
+        never held while loading or health checking, so requests for other
+        models are not blocked.
+
         Args:
         ----
             model_path: Path to the model file or HF model identifier
@@ -182,45 +350,247 @@ class EnginePool:
         -------
             A ready-to-use Engine instance
         """
+        with tracing.span("pool.get", model=model_path) as span:
+            return cls._get(model_path, kwargs, span)
+
+    @classmethod
+    def _get(cls, model_path: str, kwargs: dict[str, Any], span) -> Engine:
+        prewarmer = cls._get_prewarmer()
+        prewarmer.record(model_path, kwargs)
+        if PREWARM_ENABLED:
+            prewarmer.start()
+
         with _pool_lock:
-            # Try to get from cache
             ent = cls._cache.get(model_path)
-            if ent and cls._healthy(ent):
+
+        if ent and ent.state is EngineState.RESTARTING:
+            cls._await_restart(ent)
+
+        # Degraded engines keep serving while the supervisor watches them
+        if ent and (
+            ent.state is EngineState.DEGRADED
+            or (ent.state is not EngineState.FAILED and cls._healthy(ent))
+        ):
+            with _pool_lock:
                 _stats["hits"] += 1
-                return ent.engine
+                cls._claim_prewarmed(ent)
+            span.set(outcome="hit")
+            return ent.engine
 
-            # Count as a miss
-            _stats["misses"] += 1
+        gpus = _gpu_memory()
+        with _pool_lock:
+            # The supervisor may have started restarting the entry in the meantime
+            restarting = (
+                ent is not None
+                and cls._cache.peek(model_path) is ent
+                and ent.state is EngineState.RESTARTING
+            )
+            # Drop the unhealthy entry unless another caller already replaced it
+            if ent and not restarting and cls._cache.peek(model_path) is ent:
+                cls._cache.remove(model_path)
+
+            if not restarting:
+                future = _inflight.get(model_path)
+                leader = future is None
+                if leader:
+                    try:
+                        unloads = cls._admit(model_path, gpus)
+                    except MemoryError:
+                        _stats["rejected_loads"] += 1
+                        raise
+                    future = Future()
+                    _inflight[model_path] = future
+                    _stats["misses"] += 1
+                else:
+                    _stats["coalesced_loads"] += 1
+
+        if restarting:
+            span.set(outcome="restart")
+            cls._await_restart(ent)
+            if ent.state is EngineState.FAILED:
+                raise EngineUnavailableError(f"Restart of {model_path} failed")
+            return ent.engine
+
+        if not leader:
+            span.set(outcome="coalesced")
+            eng = future.result()
+            with _pool_lock:
+                ent = cls._cache.peek(model_path)
+                if ent is not None:
+                    cls._claim_prewarmed(ent)
+            return eng
 
-            # If unhealthy, unload it
-            if ent:
-                _executor.submit(ent.engine.unload)
-                _stats["total_unloads"] += 1
+        span.set(outcome="load", evictions=len(unloads))
+        try:
+            # Evicted engines must release their memory before the new load
+            for unload in unloads:
+                with contextlib.suppress(Exception):
+                    unload.result()
+            eng = cls._load(model_path, kwargs)
+        except BaseException as e:
+            with _pool_lock:
+                _inflight.pop(model_path, None)
+            future.set_exception(e)
+            raise
 
-            # Create new engine
-            eng = Engine()
+        with _pool_lock:
+            _inflight.pop(model_path, None)
+        future.set_result(eng)
+        return eng
 
-            # Load in executor thread but wait for completion
-            start_time = time.time()
-            _executor.submit(eng.load, model_path, **kwargs).result()
-            load_time = time.time() - start_time
-            _stats["total_loads"] += 1
+    @classmethod
+    def _admit(cls, model_path: str, gpus: dict[int, tuple[int, int]]) -> list[Future]:
+        """
+        Make room for a model before loading it; call with the pool lock held
 
-            # Record metrics
-            if METRICS_AVAILABLE:
-                try:
-                    backend_cls = eng.backend.__class__.__name__
-                    record_model_load_time(model_path, backend_cls, load_time)
-                except Exception:
-                    pass
-
-            # Add to cache
-            ent = _Entry(
-                engine=eng,
-                model_path=model_path,
-                kwargs=kwargs,
-                load_time=load_time,
-            )
+        Args:
+        ----
+            model_path: Model about to be loaded
+            gpus: Live telemetry from :func:`_gpu_memory`
+
+        Returns:
+        -------
+            Unload futures of engines evicted to make room
+
+        Raises:
+        ------
+            MemoryError: If the model cannot fit even after evicting everything
+        """
+        need = _estimate_footprint(model_path, gpus)
+        if not gpus or not need:
+            # Footprint or capacity unknown: only the entry limit applies
+            return cls._cache.make_room({}, {})
+        return cls._cache.make_room(need, cls._budget(gpus))
+
+    @classmethod
+    def _budget(cls, gpus: dict[int, tuple[int, int]]) -> dict[int, float]:
+        """VRAM usable by cached engines per GPU; call with the pool lock held"""
+        resident = cls._cache.resident_mb()
+        budget = {}
+        for gpu, (used, total) in gpus.items():
+            # Memory held by other processes is not ours to reclaim
+            foreign = max(0.0, used - resident.get(gpu, 0.0))
+            budget[gpu] = total - VRAM_RESERVE_MB - foreign
+        return budget
+
+    @classmethod
+    def prewarm(cls, model_path: str, **kwargs) -> bool:
+        """
+        Load a model speculatively if it fits without evicting anything
+
+        Prewarming yields to demand: it is skipped while any other load is in
+        flight, when the cache has no free slot, without live GPU telemetry, or
+        when the model's footprint is unknown or exceeds the spare VRAM.
+        Prewarmed engines are the first to be evicted until they are requested.
+
+        Args:
+        ----
+            model_path: Path to the model file or HF model identifier
+            **kwargs: Arguments to pass to the engine's load method
+
+        Returns:
+        -------
+            True if the model was loaded
+        """
+        gpus = _gpu_memory()
+        if not gpus:
+            # A speculative load must never be what runs a GPU out of memory
+            return False
+        with _pool_lock:
+            if cls._cache.peek(model_path) is not None or _inflight:
+                return False
+            if cls._cache.size >= cls._cache.max_size:
+                return False
+            need = _estimate_footprint(model_path, gpus)
+            budget = cls._budget(gpus)
+            resident = cls._cache.resident_mb()
+            if not need or any(
+                resident.get(gpu, 0.0) + mb > budget.get(gpu, 0.0) for gpu, mb in need.items()
+            ):
+                return False
+            future = Future()
+            _inflight[model_path] = future
+
+        try:
+            eng = cls._load(model_path, kwargs, prewarmed=True)
+        except Exception as e:
+            with _pool_lock:
+                _inflight.pop(model_path, None)
+            future.set_exception(e)
+            return False
+
+        with _pool_lock:
+            _inflight.pop(model_path, None)
+            _stats["prewarm_loads"] += 1
+        future.set_result(eng)
+        return True
+
+    @staticmethod
+    def _claim_prewarmed(ent: _Entry) -> None:
+        """Count the first request served by a prewarmed engine; call with the pool lock held"""
+        if ent.prewarmed:
+            ent.prewarmed = False
+            _stats["prewarm_hits"] += 1
+
+    @classmethod
+    def _get_prewarmer(cls) -> Prewarmer:
+        """Get the prewarmer, creating it on first use"""
+        if cls._prewarmer is None:
+            cls._prewarmer = Prewarmer(lambda path, kwargs: cls.prewarm(path, **kwargs))
+        return cls._prewarmer
+
+    @classmethod
+    def start_prewarm(cls) -> None:
+        """Start prewarming likely next models in the background"""
+        cls._get_prewarmer().start()
+
+    @classmethod
+    def stop_prewarm(cls) -> None:
+        """Stop background prewarming"""
+        if cls._prewarmer is not None:
+            cls._prewarmer.stop()
+
+    @classmethod
+    def _load(cls, model_path: str, kwargs: dict[str, Any], prewarmed: bool = False) -> Engine:
+        """Load a new engine outside the pool lock and add it to the cache"""
+        eng = Engine()
+
+        before = _gpu_memory()
+        start_time = time.time()
+        eng.load(model_path, **kwargs)
+        load_time = time.time() - start_time
+        after = _gpu_memory()
+
+        # Telemetry delta around the load; overlapping loads of other models
+        # inflate it, so the estimate is used when no telemetry is available
+        if before and after:
+            vram_mb = {
+                gpu: float(max(0, after[gpu][0] - before[gpu][0]))
+                for gpu in after
+                if gpu in before
+            }
+        else:
+            vram_mb = _estimate_footprint(model_path, {})
+        _footprints[model_path] = vram_mb
+
+        # Record metrics
+        if METRICS_AVAILABLE:
+            try:
+                backend_cls = eng.backend.__class__.__name__
+                record_model_load_time(model_path, backend_cls, load_time)
+            except Exception:
+                pass
+
+        ent = _Entry(
+            engine=eng,
+            model_path=model_path,
+            kwargs=kwargs,
+            load_time=load_time,
+            vram_mb=vram_mb,
+            prewarmed=prewarmed,
+        )
+        with _pool_lock:
+            _stats["total_loads"] += 1
             cls._cache.put(model_path, ent)
 
             # Start watchdog if not already running
@@ -230,7 +600,7 @@ class EnginePool:
             if METRICS_AVAILABLE and not cls._metrics_update_started:
                 cls._start_metrics_update()
 
-            return eng
+        return eng
 
     @classmethod
     def evict(cls, model_path: str) -> bool:
@@ -250,9 +620,66 @@ class EnginePool:
 
     @classmethod
     def clear(cls) -> None:
-        """Remove all models from the cache"""
+        """Remove all models from the cache and unload all replica groups"""
         with _pool_lock:
             cls._cache.clear()
+            groups, cls._groups = list(cls._groups.values()), {}
+        for group in groups:
+            _executor.submit(group.unload)
+
+    @classmethod
+    def get_replicas(
+        cls,
+        model_path: str,
+        replicas: Optional[int] = None,
+        gpus: Optional[list[int]] = None,
+        **kwargs,
+    ) -> ReplicaGroup:
+        """
+        Get a replica group serving the model from several engines, one per GPU
+
+        Replica groups live beside the engine cache and are not subject to its
+        eviction; they stay loaded until scaled down or cleared.
+
+        Args:
+        ----
+            model_path: Path to the model file or HF model identifier
+            replicas: Desired number of replicas (default: one per GPU for a new group,
+                unchanged for an existing one)
+            gpus: GPU indices to place replicas on (default: all GPUs)
+            **kwargs: Arguments to pass to each engine's load method
+
+        Returns:
+        -------
+            A replica group whose ``stream`` routes to the least loaded replica
+        """
+        with _pool_lock:
+            group = cls._groups.get(model_path)
+            if group is None:
+                group = ReplicaGroup(model_path, gpus=gpus, **kwargs)
+                cls._groups[model_path] = group
+
+        if replicas is None and group.size == 0:
+            replicas = len(group.gpus)
+        if replicas is not None and replicas != group.size:
+            group.scale(replicas)
+        return group
+
+    @classmethod
+    def set_replicas(cls, model_path: str, replicas: int) -> None:
+        """
+        Change the replica count of an existing replica group at runtime
+
+        Args:
+        ----
+            model_path: Model of the replica group
+            replicas: Desired number of replicas (at least 1)
+        """
+        with _pool_lock:
+            group = cls._groups.get(model_path)
+        if group is None:
+            raise KeyError(f"No replica group for {model_path}")
+        group.scale(replicas)
 
     @classmethod
     def get_stats(cls) -> dict[str, Any]:
@@ -266,6 +693,7 @@ class EnginePool:
             - max_size: Maximum cache size
             - hit_rate: Cache hit rate as a percentage
             - models: List of cached model paths
+            - vram_mb: VRAM held by cached engines in MB per GPU
             - total_loads: Total number of model loads
             - total_unloads: Total number of model unloads
             - hits: Number of cache hits
@@ -273,11 +701,21 @@ class EnginePool:
             - health_checks: Number of health checks performed
             - health_failures: Number of health check failures
             - auto_restarts: Number of automatic restarts
+            - coalesced_loads: Requests that waited on another caller's load
+            - rejected_loads: Loads refused because the model cannot fit
+            - prewarm_loads: Models loaded speculatively by the prewarmer
+            - prewarm_hits: Prewarmed models that were later requested
+            - prewarm_hit_rate: Prewarm hits as a percentage of prewarm loads
+            - failed_restarts: Engines given up on after MAX_RESTARTS attempts
+            - engine_states: Supervisor state of each cached model
+            - replica_groups: Routing counters of each replica group
         """
         with _pool_lock:
             # Calculate hit rate
             total = _stats["hits"] + _stats["misses"]
             hit_rate = (_stats["hits"] / total * 100) if total > 0 else 0
+            prewarms = _stats["prewarm_loads"]
+            prewarm_hit_rate = (_stats["prewarm_hits"] / prewarms * 100) if prewarms > 0 else 0
 
             # Get models currently in cache
             models = cls._cache.keys()
@@ -288,6 +726,10 @@ class EnginePool:
                 "max_size": cls._cache.max_size,
                 "hit_rate": hit_rate,
                 "models": models,
+                "vram_mb": cls._cache.resident_mb(),
+                "prewarm_hit_rate": prewarm_hit_rate,
+                "engine_states": {ent.model_path: ent.state.value for ent in cls._cache.values()},
+                "replica_groups": {path: group.stats() for path, group in cls._groups.items()},
                 **_stats,
             }
 
@@ -347,48 +789,140 @@ class EnginePool:
             except Exception:
                 pass
 
+    @classmethod
+    def _healthy(cls, ent: _Entry) -> bool:
+        """
+        Health verdict for the hot path
+
+        Returns the watchdog's cached verdict while it is fresh and fails fast
+        while the circuit breaker is open; only a stale verdict (or a half-open
+        breaker) costs a probe.
+        """
+        health = ent.health
+        if health.is_open():
+            return False
+        if health.is_fresh() and not health.opened:
+            return health.healthy
+        return cls._probe(ent)
+
     @staticmethod
-    def _healthy(ent: _Entry) -> bool:
-        """Check if an engine is healthy by pinging its backend"""
-        _stats["health_checks"] += 1
+    def _probe(ent: _Entry) -> bool:
+        """
+        Probe an engine's backend and record the result in its health state
+
+        The ping runs without the pool lock; the lock is taken only to update
+        the stats and health state, which requests and the watchdog share.
+        """
         try:
             result = _ping_backend(ent.engine)
+        except Exception:
+            result = False
+        with _pool_lock:
+            _stats["health_checks"] += 1
             if not result:
                 _stats["health_failures"] += 1
-            return result
-        except Exception:
-            _stats["health_failures"] += 1
-            return False
+            ent.health.record(result)
+        return result
+
+    @staticmethod
+    def _await_restart(ent: _Entry) -> None:
+        """
+        Wait for a restarting engine, up to RESTART_WAIT seconds
+
+        Raises
+        ------
+            EngineUnavailableError: If waiting is disabled or the restart takes too long
+        """
+        if RESTART_WAIT <= 0 or not ent.ready.wait(RESTART_WAIT):
+            raise EngineUnavailableError(f"Engine for {ent.model_path} is restarting")
 
     @classmethod
     def _watch(cls):
-        """Watchdog thread that monitors engine health and restarts failing engines"""
+        """Watchdog thread that refreshes health verdicts and drives engine states"""
         while True:
             time.sleep(CHECK_INT)
             with _pool_lock:
-                for ent in cls._cache.values():
-                    if cls._healthy(ent):
-                        ent.fails = 0
+                entries = [
+                    ent
+                    for ent in cls._cache.values()
+                    if ent.state not in (EngineState.RESTARTING, EngineState.FAILED)
+                ]
+
+            # Probes run outside the lock so requests never wait on them
+            for ent in entries:
+                ok = not ent.health.is_open() and cls._probe(ent)
+                with _pool_lock:
+                    if cls._cache.peek(ent.model_path) is not ent:
                         continue
+                    if ent.state is EngineState.RESTARTING:
+                        continue
+                    if ok:
+                        ent.state = EngineState.HEALTHY
+                    elif ent.health.fails < MAX_FAIL:
+                        ent.state = EngineState.DEGRADED
+                    else:
+                        cls._schedule_restart(ent)
+
+    @classmethod
+    def _schedule_restart(cls, ent: _Entry) -> None:
+        """Hand an engine to the restart executor; call with the pool lock held"""
+        ent.state = EngineState.RESTARTING
+        ent.ready.clear()
+        _restart_executor.submit(cls._restart, ent)
 
-                    ent.fails += 1
-                    if ent.fails >= MAX_FAIL:
-                        # Publish alert
-                        event_bus.publish(
-                            "alert",
-                            {
-                                "level": "CRITICAL",
-                                "message": f"Backend restart: {ent.engine.backend.__class__.__name__}",
-                            },
-                        )
-
-                        # Restart engine
-                        _executor.submit(ent.engine.unload).result()
-                        start_time = time.time()
-                        _executor.submit(ent.engine.load, ent.model_path, **ent.kwargs).result()
-                        ent.load_time = time.time() - start_time
-                        ent.fails = 0
-                        _stats["auto_restarts"] += 1
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Jittered exponential delay before restart attempt ``attempt`` (0 = immediate)"""
+        if attempt <= 0:
+            return 0.0
+        delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    @classmethod
+    def _restart(cls, ent: _Entry) -> None:
+        """Restart a failing engine with backoff; runs on the restart executor"""
+        backend_cls = ent.engine.backend.__class__.__name__
+        event_bus.publish(
+            "alert",
+            {"level": "CRITICAL", "message": f"Backend restart: {backend_cls}"},
+        )
+
+        try:
+            while True:
+                time.sleep(cls._backoff(ent.restarts))
+                with _pool_lock:
+                    if cls._cache.peek(ent.model_path) is not ent:
+                        # Evicted or replaced while waiting
+                        return
+
+                with contextlib.suppress(Exception):
+                    ent.engine.unload()
+                try:
+                    start_time = time.time()
+                    ent.engine.load(ent.model_path, **ent.kwargs)
+                    load_time = time.time() - start_time
+                except Exception as e:
+                    logger.warning(f"Restart of {ent.model_path} failed: {e}")
+                    with _pool_lock:
+                        ent.restarts += 1
+                        if ent.restarts < MAX_RESTARTS:
+                            continue
+                        ent.state = EngineState.FAILED
+                        _stats["failed_restarts"] += 1
+                    message = f"Backend failed after {MAX_RESTARTS} restarts: {backend_cls}"
+                    event_bus.publish("alert", {"level": "CRITICAL", "message": message})
+                    return
+
+                with _pool_lock:
+                    ent.load_time = load_time
+                    ent.health = _Health()
+                    ent.restarts = 0
+                    ent.state = EngineState.HEALTHY
+                    _stats["auto_restarts"] += 1
+                logger.info(f"Restarted {ent.model_path} in {load_time:.1f}s")
+                return
+        finally:
+            ent.ready.set()
 
     @classmethod
     def _update_metrics(cls):
@@ -416,11 +950,57 @@ class EnginePool:
         """Start the metrics update thread if not already running"""
         if cls._metrics_update_started:
             return
+        try:
+            start_metrics_server()
+        except Exception as e:
+            logger.warning(f"Could not start metrics server: {e}")
         t = threading.Thread(target=cls._update_metrics, daemon=True)
         t.start()
         cls._metrics_update_started = True
 
 
+# ------------------------------------------------------------------ #
+#           VRAM accounting helpers
+# ------------------------------------------------------------------ #
+def _gpu_memory() -> dict[int, tuple[int, int]]:
+    """
+    Return live (used MB, total MB) per GPU
+
+    Empty when only mock telemetry is available, since its numbers say nothing
+    about what a load consumed.
+    """
+    try:
+        from dualgpuopt.gpu import common, get_mock_mode, query
+
+        if get_mock_mode() or not common.NVML_INITIALIZED:
+            return {}
+        return {int(g["id"]): (int(g["mem_used"]), int(g["mem_total"])) for g in query()}
+    except Exception as e:
+        logger.debug(f"GPU telemetry unavailable: {e}")
+        return {}
+
+
+def _estimate_footprint(model_path: str, gpus: dict[int, tuple[int, int]]) -> dict[int, float]:
+    """
+    Expected VRAM footprint of a model in MB per GPU
+
+    Uses the footprint measured at the model's last load; otherwise the size of
+    the model file spread over the GPUs by capacity. Empty when neither is known.
+    """
+    if model_path in _footprints:
+        return dict(_footprints[model_path])
+
+    try:
+        size_mb = os.path.getsize(model_path) / (1024 * 1024)
+    except OSError:
+        return {}
+
+    if not gpus:
+        return {0: size_mb}
+    total = sum(t for _, t in gpus.values()) or 1
+    return {gpu: size_mb * t / total for gpu, (_, t) in gpus.items()}
+
+
 # ------------------------------------------------------------------ #
 #           backend-specific health-probe helpers
 # ------------------------------------------------------------------ #
@@ -431,21 +1011,30 @@ def _port_open(port: int) -> bool:
         return s.connect_ex(("127.0.0.1", port)) == 0
 
 
+# Application-level endpoints probed per server backend, first success wins
+_HEALTH_PATHS = {
+    "LlamaCppBackend": ("/health",),
+    "VLLMBackend": ("/health", "/v1/models"),
+}
+
+
 def _ping_backend(engine: Engine) -> bool:
     """Check if an engine's backend is healthy based on its type"""
-    if not engine.backend:
+    backend = getattr(engine, "backend", None)
+    if not backend:
         return False
 
-    backend_cls = engine.backend.__class__.__name__
+    backend_cls = backend.__class__.__name__
 
-    if backend_cls == "VLLMBackend":
-        return _port_open(8000)
-    if backend_cls == "LlamaCppBackend":
-        return _port_open(8080)
+    # Server backends: ask the server itself on the port it was launched with
+    paths = _HEALTH_PATHS.get(backend_cls)
+    if paths:
+        port = getattr(backend, "port", None)
+        return port is not None and any(_http_ok(port, path) for path in paths)
 
-    # HFBackend has no server to check, assume healthy if object exists
-    if backend_cls == "HFBackend":
-        return True
+    # In-process backends (HFBackend and friends) report their own health
+    if callable(getattr(backend, "health", None)):
+        return bool(backend.health())
 
     # Unknown backend, conservative assumption
     return False
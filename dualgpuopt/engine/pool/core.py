@@ -23,12 +23,6 @@ try:
 
     HAVE_PROMETHEUS = True
 
-    # Only start Prometheus server if explicitly enabled via environment variable
-    if os.getenv("DUALGPUOPT_METRICS_PORT"):
-        prom_port = int(os.getenv("DUALGPUOPT_METRICS_PORT"))
-        prom.start_http_server(prom_port)
-        logger.info(f"Prometheus metrics server started on port {prom_port}")
-
     # Define metrics
     ENGINE_CACHE_SIZE = prom.Gauge("engine_cache_size", "Number of models in cache")
     ENGINE_CACHE_HITS = prom.Counter("engine_cache_hits_total", "Total cache hits", ["model"])
@@ -66,6 +60,8 @@ except ImportError:
     ENGINE_HEALTH_CHECKS = DummyMetric()
     ENGINE_HEALTH_FAILURES = DummyMetric()
 
+from dualgpuopt.engine.metrics import start_metrics_server
+
 
 # Sanitize model path for use as metric label (safe for Prometheus)
 def _sanitize_label(path: str) -> str:
@@ -209,6 +205,8 @@ class EnginePool:
                     atexit.register(cls._shutdown)
                     # Start health check thread
                     cls._start_health_thread()
+                    # Expose metrics once the pool is in use, not on import
+                    start_metrics_server()
 
         # Sanitize model path for metrics
         model_label = _sanitize_label(model_path)
@@ -0,0 +1,182 @@
+"""
+dualgpuopt.engine.prewarm
+Predictive prewarming for the engine pool.
+
+Learns which model tends to be requested next from the request history
+(model-to-model transitions and time-of-day frequencies) and loads the likely
+next model in the background while the pool is idle and has spare VRAM.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("DualGPUOpt.Prewarm")
+
+# Prewarming is opt-in since it loads models nobody asked for yet
+PREWARM_ENABLED = os.environ.get("DUALGPUOPT_PREWARM", "0") == "1"
+# Minimum predicted probability before a model is prewarmed
+PREWARM_MIN_PROB = float(os.environ.get("DUALGPUOPT_PREWARM_MIN_PROB", "0.3"))
+# Seconds without requests before prewarming starts, so demand loads go first
+PREWARM_IDLE_S = float(os.environ.get("DUALGPUOPT_PREWARM_IDLE_S", "2.0"))
+
+HISTORY_SIZE = 1000
+# Weight of the transition model against the time-of-day model
+TRANSITION_WEIGHT = 0.7
+
+
+class Prewarmer:
+    """
+    Request-history model of model switches plus a background prewarm worker
+
+    The worker calls ``prewarm_fn(model_path, kwargs)``, which is expected to load
+    the model only if it fits without evicting anything and to return whether
+    it did.
+    """
+
+    def __init__(
+        self,
+        prewarm_fn: Callable[[str, dict[str, Any]], bool],
+        min_probability: float = PREWARM_MIN_PROB,
+        idle_s: float = PREWARM_IDLE_S,
+    ):
+        """
+        Initialize the prewarmer
+
+        Args:
+        ----
+            prewarm_fn: Callback that loads a model without evicting others
+            min_probability: Minimum predicted probability to prewarm a model
+            idle_s: Seconds without requests before prewarming starts
+        """
+        self.prewarm_fn = prewarm_fn
+        self.min_probability = min_probability
+        self.idle_s = idle_s
+
+        self._lock = threading.Lock()
+        self.history: deque[tuple[float, str]] = deque(maxlen=HISTORY_SIZE)
+        self._transitions: defaultdict[str, Counter] = defaultdict(Counter)
+        self._by_hour: defaultdict[int, Counter] = defaultdict(Counter)
+        self._kwargs: dict[str, dict[str, Any]] = {}
+        self._last: Optional[str] = None
+        self._last_request = 0.0
+
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, model_path: str, kwargs: dict[str, Any], when: Optional[float] = None):
+        """
+        Record a model request
+
+        Args:
+        ----
+            model_path: Requested model
+            kwargs: Load arguments, reused when the model is prewarmed
+            when: Request time (defaults to now)
+        """
+        when = time.time() if when is None else when
+        with self._lock:
+            self.history.append((when, model_path))
+            if self._last is not None and self._last != model_path:
+                self._transitions[self._last][model_path] += 1
+            self._by_hour[time.localtime(when).tm_hour][model_path] += 1
+            self._kwargs[model_path] = dict(kwargs)
+            self._last = model_path
+            self._last_request = time.monotonic()
+        self._wake.set()
+
+    def predict(
+        self, current: Optional[str] = None, when: Optional[float] = None
+    ) -> list[tuple[str, float]]:
+        """
+        Rank models by the probability that they are requested next
+
+        Args:
+        ----
+            current: Model requested last (defaults to the last recorded one)
+            when: Time of the next request (defaults to now)
+
+        Returns:
+        -------
+            (model_path, probability) pairs, most likely first, excluding ``current``
+        """
+        when = time.time() if when is None else when
+        with self._lock:
+            current = self._last if current is None else current
+            transitions = self._transitions.get(current, Counter())
+            hourly = self._by_hour.get(time.localtime(when).tm_hour, Counter())
+            n_transitions = sum(transitions.values())
+            n_hourly = sum(count for model, count in hourly.items() if model != current)
+
+            # Fall back to whichever signal exists when the other has no data
+            weight = TRANSITION_WEIGHT if n_hourly else 1.0
+            if not n_transitions:
+                weight = 0.0
+
+            scores: dict[str, float] = {}
+            for model in set(transitions) | set(hourly):
+                if model == current:
+                    continue
+                p_next = transitions[model] / n_transitions if n_transitions else 0.0
+                p_hour = hourly[model] / n_hourly if n_hourly else 0.0
+                scores[model] = weight * p_next + (1 - weight) * p_hour
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def prewarm_once(self) -> Optional[str]:
+        """
+        Prewarm the most likely next model if it is probable enough
+
+        Returns
+        -------
+            The prewarmed model path, or None
+        """
+        for model_path, probability in self.predict():
+            if probability < self.min_probability:
+                break
+            with self._lock:
+                kwargs = dict(self._kwargs.get(model_path, {}))
+            try:
+                if self.prewarm_fn(model_path, kwargs):
+                    logger.info(f"Prewarmed {model_path} (p={probability:.2f})")
+                    return model_path
+            except Exception as e:
+                logger.debug(f"Prewarming {model_path} failed: {e}")
+        return None
+
+    def start(self) -> None:
+        """Start the background prewarm worker"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="Prewarmer")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background prewarm worker"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def _run(self) -> None:
+        """Worker loop: after each burst of requests, wait for idle then prewarm"""
+        while not self._stop_event.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            while not self._stop_event.is_set():
+                idle = time.monotonic() - self._last_request
+                if idle >= self.idle_s:
+                    break
+                self._stop_event.wait(self.idle_s - idle)
+            if self._stop_event.is_set():
+                break
+            self.prewarm_once()
@@ -0,0 +1,267 @@
+"""
+dualgpuopt.engine.replicas
+Replica groups: several engines serving the same model.
+
+For a small model on several GPUs it is often faster to run one server per GPU
+than to tensor-split it. A replica group launches N engines pinned to
+different GPUs through ``CUDA_VISIBLE_DEVICES`` on distinct ports and routes each
+request to the replica with the fewest outstanding tokens.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import socket
+import threading
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from dualgpuopt.engine.backend import Engine
+
+logger = logging.getLogger("DualGPUOpt.Replicas")
+
+DEFAULT_BASE_PORT = 8001
+DEFAULT_MAX_TOKENS = 128
+
+# Ports held by replicas of any group in this process, from reservation to unload
+_ports_lock = threading.Lock()
+_reserved_ports: set[int] = set()
+
+
+def _port_free(port: int) -> bool:
+    """Whether nothing, in this process or another, is bound to the port"""
+    with socket.socket() as s:
+        try:
+            s.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+
+def _reserve_port(start: int) -> int:
+    """Reserve the first port from ``start`` that no replica holds and that is free"""
+    with _ports_lock:
+        port = start
+        while port in _reserved_ports or not _port_free(port):
+            port += 1
+        _reserved_ports.add(port)
+        return port
+
+
+def _release_port(port: int) -> None:
+    with _ports_lock:
+        _reserved_ports.discard(port)
+
+
+@dataclass
+class _Replica:
+    """One engine of a replica group and its routing counters"""
+
+    engine: Engine
+    gpu: int
+    port: int
+    outstanding_tokens: int = 0  # prompt + remaining output tokens of active requests
+    active: int = 0  # queue depth
+    served: int = 0
+    draining: bool = False
+
+
+class ReplicaGroup:
+    """
+    N engines for the same model, one per GPU, behind least-outstanding-tokens routing
+
+    ``stream`` has the same signature as :meth:`Engine.stream`, so a group can be
+    used wherever an engine is.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        gpus: Optional[list[int]] = None,
+        **kwargs: Any,
+    ):
+        """
+        Initialize an empty replica group
+
+        Args:
+        ----
+            model_path: Path to the model file or HF model identifier
+            gpus: GPU indices to place replicas on, round-robin (default: all GPUs)
+            **kwargs: Arguments to pass to each engine's load method; "port" is
+                the first port tried, replicas take the next ports that no replica
+                of any group holds and that are free to bind
+        """
+        if gpus is None:
+            try:
+                from dualgpuopt.gpu import get_gpu_count
+
+                gpus = list(range(get_gpu_count() or 1))
+            except Exception:
+                gpus = [0]
+
+        self.model_path = model_path
+        self.gpus = list(gpus)
+        self.base_port = kwargs.pop("port", DEFAULT_BASE_PORT)
+        self.kwargs = kwargs
+        self._replicas: list[_Replica] = []
+        self._lock = threading.Lock()
+        self._scale_lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """Number of replicas accepting requests"""
+        with self._lock:
+            return sum(1 for r in self._replicas if not r.draining)
+
+    def scale(self, replicas: int) -> None:
+        """
+        Change the number of replicas at runtime
+
+        New replicas are loaded before they receive traffic. Removed replicas
+        stop receiving requests at once and are unloaded when their last active
+        request finishes.
+
+        Args:
+        ----
+            replicas: Desired number of replicas (at least 1)
+        """
+        if replicas < 1:
+            raise ValueError("A replica group needs at least one replica")
+
+        # Serialize scaling so concurrent calls do not overshoot
+        with self._scale_lock:
+            with self._lock:
+                live = [r for r in self._replicas if not r.draining]
+                to_drain = live[replicas:]
+                for replica in to_drain:
+                    replica.draining = True
+                idle = [r for r in to_drain if r.active == 0]
+                for replica in idle:
+                    self._replicas.remove(replica)
+                missing = replicas - len(live)
+
+            for replica in idle:
+                self._unload(replica)
+
+            for _ in range(max(0, missing)):
+                self._add_replica()
+
+        logger.info(f"{self.model_path}: {replicas} replica(s)")
+
+    def _add_replica(self) -> None:
+        """Load one more replica on the least used GPU and a free port"""
+        with self._lock:
+            per_gpu = {gpu: 0 for gpu in self.gpus}
+            for replica in self._replicas:
+                if replica.gpu in per_gpu:
+                    per_gpu[replica.gpu] += 1
+            gpu = min(self.gpus, key=lambda g: per_gpu[g])
+            # The port stays reserved, also against other groups, until unload
+            port = _reserve_port(self.base_port)
+            placeholder = _Replica(engine=Engine(), gpu=gpu, port=port, draining=True)
+            self._replicas.append(placeholder)
+
+        try:
+            placeholder.engine.load(
+                self.model_path, **{**self.kwargs, "port": port, "cuda_devices": str(gpu)}
+            )
+        except BaseException:
+            with self._lock:
+                self._replicas.remove(placeholder)
+            self._unload(placeholder)
+            raise
+
+        with self._lock:
+            placeholder.draining = False
+        logger.info(f"Loaded replica of {self.model_path} on GPU {gpu}, port {port}")
+
+    def _acquire(self, cost: int) -> _Replica:
+        """Pick the replica with the fewest outstanding tokens and charge it"""
+        with self._lock:
+            candidates = [r for r in self._replicas if not r.draining]
+            if not candidates:
+                raise RuntimeError(f"No replicas of {self.model_path} are running")
+            replica = min(candidates, key=lambda r: (r.outstanding_tokens, r.active, r.served))
+            replica.outstanding_tokens += cost
+            replica.active += 1
+            replica.served += 1
+            return replica
+
+    def _release(self, replica: _Replica, remaining: int) -> None:
+        """Return a finished request's unused charge; unload drained replicas"""
+        with self._lock:
+            replica.outstanding_tokens -= remaining
+            replica.active -= 1
+            finished = replica.draining and replica.active == 0 and replica in self._replicas
+            if finished:
+                self._replicas.remove(replica)
+        if finished:
+            self._unload(replica)
+
+    def stream(self, prompt: str, **kw) -> Iterator[str]:
+        """
+        Stream a completion from the least loaded replica
+
+        Args:
+        ----
+            prompt: Prompt text
+            **kw: Generation arguments, as for :meth:`Engine.stream`
+
+        Yields:
+        ------
+            Generated tokens
+        """
+        max_tokens = kw.get("max_tokens", DEFAULT_MAX_TOKENS)
+        remaining = len(prompt.split()) + max_tokens
+        replica = self._acquire(remaining)
+        try:
+            for tok in replica.engine.stream(prompt, **kw):
+                if remaining > 0:
+                    with self._lock:
+                        replica.outstanding_tokens -= 1
+                    remaining -= 1
+                yield tok
+        finally:
+            self._release(replica, remaining)
+
+    def health(self) -> bool:
+        """Whether at least one replica is healthy"""
+        with self._lock:
+            replicas = [r for r in self._replicas if not r.draining]
+        return any(_replica_healthy(r) for r in replicas)
+
+    def unload(self) -> None:
+        """Unload every replica"""
+        with self._lock:
+            replicas, self._replicas = self._replicas, []
+        for replica in replicas:
+            self._unload(replica)
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Routing counters of every replica"""
+        with self._lock:
+            return [
+                {
+                    "gpu": r.gpu,
+                    "port": r.port,
+                    "outstanding_tokens": r.outstanding_tokens,
+                    "active": r.active,
+                    "served": r.served,
+                    "draining": r.draining,
+                }
+                for r in self._replicas
+            ]
+
+    @staticmethod
+    def _unload(replica: _Replica) -> None:
+        with contextlib.suppress(Exception):
+            replica.engine.unload()
+        _release_port(replica.port)
+
+
+def _replica_healthy(replica: _Replica) -> bool:
+    try:
+        return bool(replica.engine.health())
+    except Exception:
+        return False
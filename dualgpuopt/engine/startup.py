@@ -0,0 +1,229 @@
+"""
+dualgpuopt.engine.startup
+Readiness-driven startup of inference server processes.
+
+Spawns a server, watches its output for readiness markers and falls back to
+probing its HTTP health endpoints with backoff. A load deadline bounds the
+wait; on timeout or early exit the process is killed and the tail of its log is
+attached to the error. Phase timings (spawn, weights loaded, ready) are kept for
+the benchmark database.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import subprocess
+import threading
+import time
+import urllib.request
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+logger = logging.getLogger("DualGPUOpt.Startup")
+
+STARTUP_TIMEOUT = float(os.environ.get("DUALGPUOPT_STARTUP_TIMEOUT", "600"))  # seconds
+LOG_TAIL_LINES = 200
+PROBE_BACKOFF_START = 0.25  # seconds
+PROBE_BACKOFF_MAX = 2.0  # seconds
+PROBE_TIMEOUT = 1.0  # seconds per health request
+
+# Case-insensitive output fragments marking startup phases
+LLAMACPP_WEIGHTS_MARKERS = ("model loaded", "llama_new_context_with_model")
+LLAMACPP_READY_MARKERS = ("server is listening", "http server listening", "all slots are idle")
+VLLM_WEIGHTS_MARKERS = ("loading weights took", "model loading took")
+VLLM_READY_MARKERS = ("application startup complete", "uvicorn running on")
+
+
+def http_ok(port: int, path: str, timeout: float = PROBE_TIMEOUT) -> bool:
+    """Check that a local HTTP endpoint answers with a 2xx status"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=timeout) as resp:
+            return 200 <= resp.status < 300
+    except Exception:
+        return False
+
+
+class StartupError(RuntimeError):
+    """Raised when a server exits or misses its deadline during startup"""
+
+    def __init__(self, message: str, log_tail: str = ""):
+        super().__init__(f"{message}\n--- last output ---\n{log_tail}" if log_tail else message)
+        self.log_tail = log_tail
+
+
+@dataclass
+class StartupTimings:
+    """Seconds from launch to the end of each startup phase"""
+
+    spawn_s: float = 0.0
+    weights_s: Optional[float] = None  # None if no weights marker was seen
+    ready_s: float = 0.0
+    ready_via: str = ""  # "marker" or "probe"
+
+
+class ServerStartup:
+    """Launch a server process and wait until it is ready to serve"""
+
+    def __init__(
+        self,
+        cmd: Sequence[str],
+        port: int,
+        ready_markers: Sequence[str] = (),
+        weights_markers: Sequence[str] = (),
+        health_paths: Sequence[str] = ("/health",),
+        timeout: float = STARTUP_TIMEOUT,
+        env: Optional[dict[str, str]] = None,
+        name: str = "server",
+    ):
+        """
+        Initialize the startup orchestrator
+
+        Args:
+        ----
+            cmd: Command line of the server
+            port: Port the server listens on
+            ready_markers: Output fragments meaning the server accepts requests
+            weights_markers: Output fragments meaning the weights are loaded
+            health_paths: HTTP paths probed when no ready marker shows up
+            timeout: Load deadline in seconds
+            env: Environment of the child process (defaults to ours)
+            name: Name used in log messages
+        """
+        self.cmd = list(cmd)
+        self.port = port
+        self.ready_markers = tuple(m.lower() for m in ready_markers)
+        self.weights_markers = tuple(m.lower() for m in weights_markers)
+        self.health_paths = tuple(health_paths)
+        self.timeout = timeout
+        self.env = env
+        self.name = name
+
+        self.proc: Optional[subprocess.Popen] = None
+        self.timings = StartupTimings()
+        self._tail: deque[str] = deque(maxlen=LOG_TAIL_LINES)
+        self._tail_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._reader: Optional[threading.Thread] = None
+        self._t0 = 0.0
+
+    def log_tail(self) -> str:
+        """Return the last lines of the server output"""
+        with self._tail_lock:
+            return "\n".join(self._tail)
+
+    def start(self) -> subprocess.Popen:
+        """
+        Spawn the server and block until it is ready
+
+        Returns
+        -------
+            The running server process
+
+        Raises
+        ------
+            StartupError: If the process exits or the deadline passes first
+        """
+        self._t0 = time.monotonic()
+        self.proc = subprocess.Popen(
+            self.cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            env=self.env,
+            text=True,
+            errors="replace",
+            bufsize=1,
+        )
+        self.timings.spawn_s = time.monotonic() - self._t0
+
+        # The reader keeps draining output for the server's whole life so the
+        # pipe never fills up and blocks it
+        self._reader = threading.Thread(
+            target=self._read_output, daemon=True, name=f"{self.name}-output"
+        )
+        self._reader.start()
+
+        deadline = self._t0 + self.timeout
+        backoff = PROBE_BACKOFF_START
+        while True:
+            remaining = deadline - time.monotonic()
+            if self._ready.wait(min(backoff, max(remaining, 0.0))):
+                self._mark_ready("marker")
+                break
+            if self.proc.poll() is not None:
+                self._join_reader()
+                raise StartupError(
+                    f"{self.name} exited with code {self.proc.returncode} during startup",
+                    self.log_tail(),
+                )
+            if any(http_ok(self.port, path) for path in self.health_paths):
+                self._mark_ready("probe")
+                break
+            if time.monotonic() >= deadline:
+                self.kill()
+                raise StartupError(
+                    f"{self.name} not ready after {self.timeout:.0f}s, killed", self.log_tail()
+                )
+            backoff = min(backoff * 2, PROBE_BACKOFF_MAX)
+
+        logger.info(
+            f"{self.name} ready via {self.timings.ready_via} in {self.timings.ready_s:.1f}s"
+            + (
+                f" (weights loaded at {self.timings.weights_s:.1f}s)"
+                if self.timings.weights_s is not None
+                else ""
+            )
+        )
+        return self.proc
+
+    def kill(self) -> None:
+        """Kill the server process and wait for it to exit"""
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{self.name} did not exit after kill")
+        self._join_reader()
+
+    def _mark_ready(self, via: str) -> None:
+        self.timings.ready_s = time.monotonic() - self._t0
+        self.timings.ready_via = via
+
+    def _join_reader(self) -> None:
+        if self._reader is not None:
+            self._reader.join(timeout=1.0)
+
+    def _read_output(self) -> None:
+        """Collect output lines and flag startup phases as their markers appear"""
+        for line in self.proc.stdout:
+            line = line.rstrip()
+            with self._tail_lock:
+                self._tail.append(line)
+            if self._ready.is_set():
+                continue
+            lowered = line.lower()
+            if self.timings.weights_s is None and any(m in lowered for m in self.weights_markers):
+                self.timings.weights_s = time.monotonic() - self._t0
+            if any(m in lowered for m in self.ready_markers):
+                self._ready.set()
+
+
+def record_startup(model_path: str, backend: str, timings: StartupTimings) -> None:
+    """Store startup phase timings in the benchmark database, if available"""
+    try:
+        from dualgpuopt.engine.benchmark import benchmark_db
+
+        benchmark_db.add_startup(
+            model_path,
+            backend,
+            spawn_s=timings.spawn_s,
+            weights_s=timings.weights_s,
+            ready_s=timings.ready_s,
+            ready_via=timings.ready_via,
+        )
+    except Exception as e:
+        logger.debug(f"Could not record startup timings: {e}")
@@ -5,26 +5,24 @@ Provides GPU information and monitoring functionality.
 """
 from __future__ import annotations
 
-# Import public functions from submodules
-from dualgpuopt.gpu.info import get_gpu_count, get_gpu_names, query
-from dualgpuopt.gpu.mock import generate_mock_gpus, get_mock_mode, set_mock_mode
-from dualgpuopt.gpu.monitor import (
-    get_memory_info,
-    get_power_usage,
-    get_temperature,
-    get_utilization,
-)
+from dualgpuopt import _lazy
+
+# Public API, imported from the submodules on first access (pynvml is only
+# loaded when a GPU function is actually needed)
+_EXPORTS = {
+    "query": "dualgpuopt.gpu.info",
+    "get_gpu_count": "dualgpuopt.gpu.info",
+    "get_gpu_names": "dualgpuopt.gpu.info",
+    "set_mock_mode": "dualgpuopt.gpu.mock",
+    "get_mock_mode": "dualgpuopt.gpu.mock",
+    "generate_mock_gpus": "dualgpuopt.gpu.mock",
+    "get_memory_info": "dualgpuopt.gpu.monitor",
+    "get_utilization": "dualgpuopt.gpu.monitor",
+    "get_temperature": "dualgpuopt.gpu.monitor",
+    "get_power_usage": "dualgpuopt.gpu.monitor",
+}
 
-# Public API
-__all__ = [
-    "query",
-    "get_gpu_count",
-    "get_gpu_names",
-    "set_mock_mode",
-    "get_mock_mode",
-    "generate_mock_gpus",
-    "get_memory_info",
-    "get_utilization",
-    "get_temperature",
-    "get_power_usage",
-]
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = _lazy.attach(
+    __name__, submodules=("common", "compat", "info", "mock", "monitor"), exports=_EXPORTS
+)
@@ -0,0 +1,231 @@
+"""
+dualgpuopt.importtime
+Import-time report and startup guard for the command line.
+
+Runs a Python command under ``-X importtime``, parses the per-module timings
+Python writes to stderr and reports the slowest imports. With a budget or
+forbidden modules it exits non-zero, so CI can keep ``python -m dualgpuopt
+--cli`` from regressing into importing the GUI, NVML or NumPy stacks.
+
+Usage
+-----
+python -m dualgpuopt.importtime                      # report on the CLI start
+python -m dualgpuopt.importtime --budget-ms 150 --forbid-heavy
+python -m dualgpuopt.importtime -- -c "import dualgpuopt.memory"
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Command measured by default
+CLI_COMMAND = ("-m", "dualgpuopt", "--cli")
+# Packages the CLI start must not import; they are loaded where they are used
+HEAVY_MODULES = (
+    "numpy",
+    "pynvml",
+    "PySide6",
+    "tkinter",
+    "torch",
+    "sqlite3",
+    "prometheus_client",
+    "dualgpuopt.dependency_manager",
+)
+# Budget for importing dualgpuopt during the CLI start, in milliseconds
+CLI_BUDGET_MS = float(os.environ.get("DUALGPUOPT_CLI_IMPORT_BUDGET_MS", "150"))
+
+_PREFIX = "import time:"
+
+
+@dataclass
+class ImportRecord:
+    """Timing of one module import"""
+
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int  # nesting level; 0 for imports not triggered by another module
+
+
+@dataclass
+class ImportReport:
+    """Parsed ``-X importtime`` output of one run"""
+
+    records: List[ImportRecord] = field(default_factory=list)
+    wall_s: float = 0.0
+    returncode: int = 0
+
+    @property
+    def modules(self) -> Dict[str, ImportRecord]:
+        return {r.name: r for r in self.records}
+
+    @property
+    def total_us(self) -> int:
+        """Time spent importing, counting nested imports once"""
+        return sum(r.cumulative_us for r in self.records if r.depth == 0)
+
+    def cumulative_us(self, package: str) -> int:
+        """Time spent importing ``package`` and its submodules at the top of their chains"""
+        return sum(
+            r.cumulative_us
+            for r in self.records
+            if (r.name == package or r.name.startswith(package + "."))
+            and not self._nested_in(r, package)
+        )
+
+    def _nested_in(self, record: ImportRecord, package: str) -> bool:
+        """Whether ``record`` was imported by an enclosing module of ``package``"""
+        # -X importtime writes children before their parent, so the enclosing
+        # import is the first later record at a smaller depth
+        index = self.records.index(record)
+        depth = record.depth
+        for later in self.records[index + 1 :]:
+            if later.depth < depth:
+                if later.name == package or later.name.startswith(package + "."):
+                    return True
+                depth = later.depth
+        return False
+
+    def imported(self, names: Iterable[str]) -> List[str]:
+        """Which of ``names`` were imported, including as the parent of a submodule"""
+        modules = self.modules
+        return [
+            name
+            for name in names
+            if name in modules or any(m.startswith(name + ".") for m in modules)
+        ]
+
+    def slowest(self, n: int = 20) -> List[ImportRecord]:
+        return sorted(self.records, key=lambda r: r.cumulative_us, reverse=True)[:n]
+
+    def format(self, n: int = 20) -> str:
+        lines = [
+            f"{len(self.records)} modules imported in {self.total_us / 1000:.1f} ms "
+            f"(process ran {self.wall_s * 1000:.1f} ms)",
+            f"{'cumulative ms':>14} {'self ms':>9}  module",
+        ]
+        for r in self.slowest(n):
+            indent = "  " * r.depth
+            lines.append(
+                f"{r.cumulative_us / 1000:14.1f} {r.self_us / 1000:9.1f}  {indent}{r.name}"
+            )
+        return "\n".join(lines)
+
+
+def parse_importtime(text: str) -> List[ImportRecord]:
+    """
+    Parse the ``-X importtime`` lines of a process' stderr
+
+    Args:
+    ----
+        text: stderr of the process; other lines are ignored
+
+    Returns:
+    -------
+        Records in the order Python wrote them (children before parents)
+    """
+    records = []
+    for line in text.splitlines():
+        if not line.startswith(_PREFIX):
+            continue
+        parts = line[len(_PREFIX) :].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # the header line
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        # The module name is indented by two spaces per level after one space
+        depth = (len(name) - len(stripped) - 1) // 2
+        records.append(ImportRecord(stripped, self_us, cumulative_us, max(depth, 0)))
+    return records
+
+
+def measure(
+    command: Sequence[str] = CLI_COMMAND,
+    cwd: Optional[str] = None,
+    timeout: float = 120.0,
+) -> ImportReport:
+    """
+    Run ``python -X importtime <command>`` and parse its imports
+
+    Args:
+    ----
+        command: Arguments after the interpreter, e.g. ("-m", "dualgpuopt", "--cli")
+        cwd: Working directory of the process (files it creates land there)
+        timeout: Seconds before the process is killed
+
+    Returns:
+    -------
+        The parsed report
+    """
+    env = dict(os.environ)
+    # Make the package importable from any working directory
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (root, env.get("PYTHONPATH")) if p)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *command],
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        timeout=timeout,
+    )
+    wall = time.perf_counter() - start
+    return ImportReport(parse_importtime(proc.stderr), wall, proc.returncode)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report and guard import time")
+    parser.add_argument(
+        "command", nargs="*", help="Python arguments to run (default: -m dualgpuopt --cli)"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="runs; the median is reported")
+    parser.add_argument("--top", type=int, default=20, help="slowest imports to list")
+    parser.add_argument(
+        "--budget-ms", type=float, help=f"fail if dualgpuopt takes longer (CLI: {CLI_BUDGET_MS})"
+    )
+    parser.add_argument("--forbid", action="append", default=[], help="fail if imported")
+    parser.add_argument(
+        "--forbid-heavy", action="store_true", help="forbid " + ", ".join(HEAVY_MODULES)
+    )
+    args = parser.parse_args(argv)
+
+    command = args.command or list(CLI_COMMAND)
+    # Run in a scratch directory so files the command writes (logs) do not pile up
+    with tempfile.TemporaryDirectory() as scratch:
+        reports = [measure(command, cwd=scratch) for _ in range(max(1, args.runs))]
+    report = sorted(reports, key=lambda r: r.total_us)[len(reports) // 2]
+    package_ms = statistics.median(r.cumulative_us("dualgpuopt") for r in reports) / 1000
+
+    print(f"$ python -X importtime {' '.join(command)}")
+    print(report.format(args.top))
+    print(f"dualgpuopt: {package_ms:.1f} ms (median of {len(reports)} runs)")
+
+    failed = False
+    if args.budget_ms is not None and package_ms > args.budget_ms:
+        print(f"FAIL: dualgpuopt imports took {package_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        failed = True
+    forbidden = list(args.forbid) + (list(HEAVY_MODULES) if args.forbid_heavy else [])
+    found = report.imported(forbidden)
+    if found:
+        print(f"FAIL: imported {', '.join(found)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,15 +3,20 @@ Layer balancing module for distributing model layers across multiple GPUs
 """
 from __future__ import annotations
 
+import copy
 import json
 import logging
 import math
 import os
 import pathlib
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Optional
 
+from dualgpuopt.layer_cost import LayerCostModel, LayerShape, spec_for_device
+from dualgpuopt.profile_cache import DEFAULT_MAX_AGE_S, ProfileCache, fingerprint
+
 logger = logging.getLogger("DualGPUOpt.LayerBalance")
 
 
@@ -19,7 +24,11 @@ class LayerProfiler:
     """Profiles transformer layer performance across multiple GPUs"""
 
     def __init__(
-        self, use_cache: bool = True, cache_dir: Optional[str] = None, profile_runs: int = 5
+        self,
+        use_cache: bool = True,
+        cache_dir: Optional[str] = None,
+        profile_runs: int = 5,
+        max_cache_age_s: float = DEFAULT_MAX_AGE_S,
     ):
         """
         Initialize profiler
@@ -29,12 +38,24 @@ class LayerProfiler:
             use_cache: Whether to use cached profiling results
             cache_dir: Directory to store profiling cache
             profile_runs: Number of profiling runs to average (more runs = more stability)
+            max_cache_age_s: Age in seconds after which cached profiles are evicted
         """
         self.use_cache = use_cache
         self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".dualgpuopt")
         self.profile_runs = max(3, profile_runs)  # Ensure at least 3 runs
+        self.max_cache_age_s = max_cache_age_s
         os.makedirs(self.cache_dir, exist_ok=True)
 
+        # Profile database, opened on first use
+        self._cache: Optional[ProfileCache] = None
+        self._cache_lock = threading.Lock()
+
+        # Analytical fallback, created on first use
+        self._cost_model: Optional[LayerCostModel] = None
+
+        # One CUDA stream per device for concurrent sampled profiling
+        self._streams: dict[int, Any] = {}
+
         # Thread pool for parallel profiling
         self._executor = None
 
@@ -69,41 +90,137 @@ class LayerProfiler:
         Returns:
         -------
             Average execution time in seconds
-        """
-        try:
-            import torch
 
-            # Get the layer to profile
-            blk = model.model.layers[layer_idx]
+        Raises:
+        ------
+            Exception: Whatever running the layer raised; no timing is made up
+        """
+        import torch
 
-            # Warmup runs
-            if warmup:
-                for _ in range(2):
-                    blk(test_ids)
-                return 0.0
+        # Get the layer to profile
+        blk = model.model.layers[layer_idx]
 
-            # Multiple measurement runs
-            layer_times = []
-            for _ in range(self.profile_runs):
-                torch.cuda.synchronize(dev)
-                t0 = time.perf_counter()
+        # Warmup runs
+        if warmup:
+            for _ in range(2):
                 blk(test_ids)
-                torch.cuda.synchronize(dev)
-                layer_times.append(time.perf_counter() - t0)
+            return 0.0
 
-            # Discard highest and lowest if we have enough samples
-            if len(layer_times) >= 4:
-                layer_times.sort()
-                avg_time = sum(layer_times[1:-1]) / len(layer_times[1:-1])
-            else:
-                avg_time = sum(layer_times) / len(layer_times)
+        # Multiple measurement runs
+        layer_times = []
+        for _ in range(self.profile_runs):
+            torch.cuda.synchronize(dev)
+            t0 = time.perf_counter()
+            blk(test_ids)
+            torch.cuda.synchronize(dev)
+            layer_times.append(time.perf_counter() - t0)
+
+        return _trimmed_mean(layer_times)
+
+    def _resize_input(self, dummy_ids: Any, seq_len: int) -> Any:
+        """Repeat or slice the dummy input to the requested sequence length"""
+        import torch
+
+        if seq_len == dummy_ids.shape[1]:
+            return dummy_ids
+        if seq_len > dummy_ids.shape[1]:
+            # Repeat the existing tensor to reach required length
+            repeats = math.ceil(seq_len / dummy_ids.shape[1])
+            return torch.cat([dummy_ids] * repeats, dim=1)[:, :seq_len]
+        # Slice the existing tensor
+        return dummy_ids[:, :seq_len]
+
+    def _measure_layers(
+        self, model: Any, dummy_ids: Any, dev: int, seq_len: int, layer_indices: list[int]
+    ) -> dict[int, float]:
+        """
+        Measure a subset of layers for a specific sequence length
+
+        Args:
+        ----
+            model: The transformer model
+            dummy_ids: Base input tensor
+            dev: Device ID
+            seq_len: Sequence length to profile
+            layer_indices: Indices of the layers to measure
+
+        Returns:
+        -------
+            Mapping of layer index to execution time; layers that failed to run
+            are left out
+        """
+        test_ids = self._resize_input(dummy_ids, seq_len).to(dev)
+
+        # Warm up the layers first to avoid cold start effects
+        working = []
+        for layer_idx in layer_indices:
+            try:
+                self.profile_layer(model, layer_idx, test_ids, dev, warmup=True)
+                working.append(layer_idx)
+            except Exception as e:
+                logger.error(f"Error profiling layer {layer_idx}: {e}")
+
+        measured = {}
+        for layer_idx in working:
+            try:
+                measured[layer_idx] = self.profile_layer(model, layer_idx, test_ids, dev)
+            except Exception as e:
+                logger.error(f"Error profiling layer {layer_idx}: {e}")
+        return measured
+
+    def _get_cost_model(self) -> LayerCostModel:
+        """Get the analytical cost model, calibrated from the profile cache"""
+        if self._cost_model is None:
+            store = None
+            if self.use_cache:
+                try:
+                    store = self._get_cache()
+                except Exception as e:
+                    logger.warning(f"Failed to open profile cache for calibration: {e}")
+            self._cost_model = LayerCostModel(store)
+        return self._cost_model
+
+    def estimate(
+        self, model: Any, dev: int, seq_lengths: list[int] = None
+    ) -> dict[int, list[float]]:
+        """
+        Estimate layer timings analytically without running the model
 
-            return avg_time
+        Used for planning on machines without a GPU or PyTorch; the result is
+        deterministic for a given model config and GPU.
 
+        Args:
+        ----
+            model: The transformer model (only its config is read)
+            dev: Device ID whose spec is resolved through GPU telemetry
+            seq_lengths: List of sequence lengths to estimate
+
+        Returns:
+        -------
+            Dictionary mapping sequence length to list of execution times per layer
+        """
+        if seq_lengths is None:
+            seq_lengths = [64, 1024]
+        return self._get_cost_model().estimate_profile(
+            LayerShape.from_model(model),
+            spec_for_device(dev),
+            seq_lengths,
+            _layer_count(model) or _config_layer_count(model) or 32,
+        )
+
+    def _calibrate(self, model: Any, dev: int, measured: dict[int, dict[int, float]]) -> None:
+        """
+        Feed real measurements back into the cost model
+
+        ``measured`` must hold measured timings only, never analytical
+        fallbacks, and the spec comes from the same telemetry as
+        :meth:`estimate` so the calibrated factor applies to its estimates.
+        """
+        try:
+            spec = spec_for_device(dev)
+            self._get_cost_model().calibrate(LayerShape.from_model(model), spec, measured)
         except Exception as e:
-            logger.error(f"Error profiling layer {layer_idx}: {e}")
-            # Return estimated time on error
-            return 0.003 * (1 + 0.05 * layer_idx)  # Slight increase for later layers
+            logger.warning(f"Failed to calibrate layer cost model: {e}")
 
     def _profile_sequence_length(
         self, model: Any, dummy_ids: Any, dev: int, seq_len: int
@@ -122,63 +239,205 @@ class LayerProfiler:
         -------
             List of layer execution times
         """
+        try:
+            n_layers = len(model.model.layers)
+            measured = self._measure_layers(model, dummy_ids, dev, seq_len, list(range(n_layers)))
+            if len(measured) < n_layers:
+                estimated = self.estimate(model, dev, [seq_len])[seq_len]
+                return [measured.get(i, estimated[i]) for i in range(n_layers)]
+            return [measured[i] for i in range(n_layers)]
+
+        except Exception as e:
+            logger.error(f"Error profiling sequence length {seq_len}: {e}")
+            return self.estimate(model, dev, [seq_len])[seq_len]
+
+    def _get_cache(self) -> ProfileCache:
+        """Get or open the profile cache database"""
+        with self._cache_lock:
+            if self._cache is None:
+                self._cache = ProfileCache(self.cache_dir, max_age_s=self.max_cache_age_s)
+            return self._cache
+
+    def _get_stream(self, torch: Any, dev: int) -> Any:
+        """Get or create the profiling stream for a device"""
+        if dev not in self._streams:
+            self._streams[dev] = torch.cuda.Stream(device=dev)
+        return self._streams[dev]
+
+    def _block_inputs(self, model: Any, dummy_ids: Any, seq_len: int) -> Any:
+        """
+        Build the input for a single detached block
+
+        Uses random hidden states when the hidden size is known, otherwise the
+        resized dummy token IDs as in full-model profiling.
+        """
         try:
             import torch
+        except ImportError:
+            return dummy_ids
 
-            # Resize input tensor to required sequence length
-            if seq_len != dummy_ids.shape[1]:
-                if seq_len > dummy_ids.shape[1]:
-                    # Repeat the existing tensor to reach required length
-                    repeats = math.ceil(seq_len / dummy_ids.shape[1])
-                    test_ids = torch.cat([dummy_ids] * repeats, dim=1)[:, :seq_len]
-                else:
-                    # Slice the existing tensor
-                    test_ids = dummy_ids[:, :seq_len]
-            else:
-                test_ids = dummy_ids
+        hidden_size = getattr(getattr(model, "config", None), "hidden_size", None)
+        if hidden_size:
+            dtype = getattr(model, "dtype", None)
+            if not isinstance(dtype, torch.dtype):
+                dtype = torch.float32
+            return torch.randn(1, seq_len, hidden_size, dtype=dtype)
+        return self._resize_input(dummy_ids, seq_len)
 
-            # Move to the target device
-            test_ids = test_ids.to(dev)
+    def _time_block(self, block: Any, inputs: Any, dev: int) -> float:
+        """
+        Time a single block, moving only that block to the device
 
-            # Get layer count
-            n_layers = len(model.model.layers)
+        The block is copied to ``dev`` and executed on the device's own stream so
+        several devices can be profiled concurrently from different threads.
+        Without CUDA (or with a negative device ID) the block is timed in place
+        on the CPU.
 
-            # Warm up all layers first to avoid cold start effects
-            for layer_idx in range(n_layers):
-                self.profile_layer(model, layer_idx, test_ids, dev, warmup=True)
+        Args:
+        ----
+            block: Layer module or callable
+            inputs: Input for the block
+            dev: Device ID, negative for CPU
 
-            # Profile each layer
-            layer_times = []
-            for layer_idx in range(n_layers):
-                avg_time = self.profile_layer(model, layer_idx, test_ids, dev, warmup=False)
-                layer_times.append(avg_time)
+        Returns:
+        -------
+            Trimmed mean execution time in seconds
+        """
+        try:
+            import torch
 
-            return layer_times
+            use_cuda = dev >= 0 and torch.cuda.is_available()
+        except ImportError:
+            use_cuda = False
 
-        except Exception as e:
-            logger.error(f"Error profiling sequence length {seq_len}: {e}")
-            # Generate mock data with a sensible pattern
-            n_layers = (
-                len(model.model.layers)
-                if hasattr(model, "model") and hasattr(model.model, "layers")
-                else 32
-            )
+        if not use_cuda:
+            for _ in range(2):
+                block(inputs)
+            times = []
+            for _ in range(self.profile_runs):
+                t0 = time.perf_counter()
+                block(inputs)
+                times.append(time.perf_counter() - t0)
+            return _trimmed_mean(times)
+
+        stream = self._get_stream(torch, dev)
+        local_block = copy.deepcopy(block).to(dev)
+        try:
+            with torch.no_grad(), torch.cuda.stream(stream):
+                x = inputs.to(dev, non_blocking=True)
+                for _ in range(2):
+                    local_block(x)
+
+                events = []
+                for _ in range(self.profile_runs):
+                    start = torch.cuda.Event(enable_timing=True)
+                    end = torch.cuda.Event(enable_timing=True)
+                    start.record(stream)
+                    local_block(x)
+                    end.record(stream)
+                    events.append((start, end))
+            stream.synchronize()
+            return _trimmed_mean([start.elapsed_time(end) / 1000.0 for start, end in events])
+        finally:
+            del local_block
+            torch.cuda.empty_cache()
+
+    def profile_sampled(
+        self,
+        model: Any,
+        dummy_ids: Any,
+        dev: int,
+        seq_lengths: list[int] = None,
+        samples_per_type: int = 2,
+    ) -> dict[int, list[float]]:
+        """
+        Profile a representative subset of layers and extrapolate the rest
 
-            # Create realistic mock data where later layers tend to be slower
-            import random
+        Unlike :meth:`profile`, the model is never moved as a whole: each sampled
+        block is copied to the device on its own, timed on a per-device stream
+        and released. Per-layer cost is extrapolated from the mean of the sampled
+        layers of the same type. This method is safe to call for several
+        devices concurrently from different threads. Timings are cached apart
+        from :meth:`profile` results, and a sequence length whose blocks fail
+        to run falls back to uncached analytical estimates.
 
-            base_time = 0.001  # Base time in seconds
-            seq_factor = seq_len / 64.0  # Scaling factor for sequence length
+        Args:
+        ----
+            model: The transformer model
+            dummy_ids: Tensor with dummy token IDs for profiling
+            dev: Device ID to profile on (negative for CPU)
+            seq_lengths: List of sequence lengths to profile with
+            samples_per_type: Number of layers to sample for each layer type
 
-            times = []
-            for i in range(n_layers):
-                # Apply a gradual increase for later layers
-                layer_factor = 1.0 + (i / n_layers) * 0.5
-                # Add random variation (±15%)
-                random_factor = random.uniform(0.85, 1.15)
-                times.append(base_time * seq_factor * layer_factor * random_factor)
+        Returns:
+        -------
+            Dictionary mapping sequence length to list of execution times per layer
+        """
+        if seq_lengths is None:
+            seq_lengths = [64, 1024]
 
-            return times
+        layers = model.model.layers
+        n_layers = len(layers)
+        groups = select_representative_layers(layers, samples_per_type)
+
+        key = None
+        measured: dict[int, dict[int, float]] = {}
+        if self.use_cache:
+            try:
+                key = fingerprint(model, dev, mode="sampled")
+                measured = self._get_cache().lookup(key, seq_lengths)
+            except Exception as e:
+                logger.warning(f"Failed to load profiling cache: {e}")
+                key = None
+
+        sampled = sorted({i for indices in groups.values() for i in indices})
+        new_results: dict[int, dict[int, float]] = {}
+        for seq_len in seq_lengths:
+            missing = [i for i in sampled if i not in measured.get(seq_len, {})]
+            if not missing:
+                continue
+            try:
+                inputs = self._block_inputs(model, dummy_ids, seq_len)
+                new_results[seq_len] = {
+                    i: self._time_block(layers[i], inputs, dev) for i in missing
+                }
+            except Exception as e:
+                logger.error(f"Error sampling sequence length {seq_len} on device {dev}: {e}")
+                estimated = self.estimate(model, dev, [seq_len])[seq_len]
+                # Estimated timings are returned but never cached
+                measured.setdefault(seq_len, {}).update({i: estimated[i] for i in missing})
+
+        if key is not None and new_results:
+            try:
+                self._get_cache().store(
+                    key, new_results, meta={"model": model.__class__.__name__, "dev": dev}
+                )
+            except Exception as e:
+                logger.warning(f"Failed to save profiling cache: {e}")
+
+        if new_results:
+            self._calibrate(model, dev, new_results)
+
+        for seq_len, times in new_results.items():
+            measured.setdefault(seq_len, {}).update(times)
+
+        # Extrapolate each layer from the sampled layers of its type
+        results = {}
+        for seq_len in seq_lengths:
+            seq_times = measured.get(seq_len, {})
+            type_cost = {
+                layer_type: sum(seq_times[i] for i in indices) / len(indices)
+                for layer_type, indices in groups.items()
+            }
+            results[seq_len] = [
+                seq_times.get(i, type_cost[type(layers[i]).__name__]) for i in range(n_layers)
+            ]
+
+        logger.info(
+            f"Sampled {len(sampled)}/{n_layers} layers on device {dev} "
+            f"across {len(groups)} layer type(s)"
+        )
+        return results
 
     def profile(
         self, model: Any, dummy_ids: Any, dev: int, seq_lengths: list[int] = None
@@ -186,6 +445,10 @@ class LayerProfiler:
         """
         Profile execution time of each transformer layer on a specific GPU with multiple sequence lengths
 
+        Results are cached per layer under a hash of the model config, dtype, GPU
+        name and driver version, so only layers and sequence lengths that have not
+        been measured before are profiled.
+
         Args:
         ----
             model: The transformer model
@@ -201,22 +464,34 @@ class LayerProfiler:
             seq_lengths = [64, 1024]
 
         try:
-            # Check for cached results
-            cache_file = os.path.join(
-                self.cache_dir, f"profile_gpu{dev}_{model.__class__.__name__}.json"
-            )
-            if self.use_cache and os.path.exists(cache_file):
-                try:
-                    with open(cache_file) as f:
-                        cached_data = json.load(f)
+            n_layers = _layer_count(model)
 
-                    # Convert string keys back to integers
-                    results = {int(k): v for k, v in cached_data.items()}
-
-                    logger.info(f"Using cached profiling results from {cache_file}")
-                    return results
+            # Look up whatever has already been measured for this model/GPU
+            key = None
+            measured: dict[int, dict[int, float]] = {}
+            if self.use_cache and n_layers is not None:
+                try:
+                    key = fingerprint(model, dev)
+                    measured = self._get_cache().lookup(key, seq_lengths)
                 except Exception as e:
                     logger.warning(f"Failed to load profiling cache: {e}")
+                    key = None
+
+            if n_layers is not None:
+                missing = {
+                    seq_len: [i for i in range(n_layers) if i not in measured.get(seq_len, {})]
+                    for seq_len in seq_lengths
+                }
+                missing = {seq_len: layers for seq_len, layers in missing.items() if layers}
+                if not missing:
+                    logger.info(f"Using cached profiling results for GPU {dev}")
+                    return {
+                        seq_len: [measured[seq_len][i] for i in range(n_layers)]
+                        for seq_len in seq_lengths
+                    }
+                hits = sum(len(v) for v in measured.values())
+                if hits:
+                    logger.info(f"Reusing {hits} cached layer timings for GPU {dev}")
 
             # Import torch inside function
             import torch
@@ -224,87 +499,124 @@ class LayerProfiler:
             # Move model to the target device
             model.to(dev)
 
-            # Profile each sequence length in parallel (if available)
-            try:
-                # Results container
-                results = {}
-
-                # Run profiling for sequence lengths
-                for seq_len in seq_lengths:
-                    # Profile directly
-                    layer_times = self._profile_sequence_length(model, dummy_ids, dev, seq_len)
-                    results[seq_len] = layer_times
-
-            except Exception as e:
-                logger.error(f"Error during parallel profiling: {e}")
-                # Fall back to sequential profiling
-                results = {}
-                for seq_len in seq_lengths:
-                    results[seq_len] = self._profile_sequence_length(model, dummy_ids, dev, seq_len)
+            if n_layers is None:
+                return {
+                    seq_len: self._profile_sequence_length(model, dummy_ids, dev, seq_len)
+                    for seq_len in seq_lengths
+                }
 
-            # Cache the results
-            if self.use_cache:
+            # Profile only what the cache could not provide
+            new_results: dict[int, dict[int, float]] = {}
+            for seq_len, layer_indices in missing.items():
                 try:
-                    with open(cache_file, "w") as f:
-                        json.dump(results, f, indent=2)
-                    logger.info(f"Saved profiling results to {cache_file}")
+                    new_results[seq_len] = self._measure_layers(
+                        model, dummy_ids, dev, seq_len, layer_indices
+                    )
+                except Exception as e:
+                    logger.error(f"Error profiling sequence length {seq_len}: {e}")
+                    new_results[seq_len] = {}
+                failed = [i for i in layer_indices if i not in new_results[seq_len]]
+                if failed:
+                    estimated = self.estimate(model, dev, [seq_len])[seq_len]
+                    # Estimated timings are returned but never cached
+                    measured.setdefault(seq_len, {}).update({i: estimated[i] for i in failed})
+            new_results = {seq_len: times for seq_len, times in new_results.items() if times}
+
+            # Cache the newly measured layers
+            if key is not None and new_results:
+                try:
+                    self._get_cache().store(
+                        key, new_results, meta={"model": model.__class__.__name__, "dev": dev}
+                    )
+                    logger.info(f"Saved profiling results for GPU {dev} to {self._cache.db_path}")
                 except Exception as e:
                     logger.warning(f"Failed to save profiling cache: {e}")
 
-            return results
+            if new_results:
+                self._calibrate(model, dev, new_results)
 
-        except ImportError:
-            logger.warning("PyTorch not available for profiling, using mock data")
-            # Generate mock profiling data with a sensible pattern
-            results = {}
-            for seq_len in seq_lengths:
-                import random
-
-                # Create realistic mock data where:
-                # - Later layers tend to be slower than earlier layers
-                # - Longer sequences take more time proportionally
-                n_layers = 32  # Assume 32 layers as default
-                base_time = 0.001  # Base time in seconds
-                seq_factor = seq_len / 64.0  # Scaling factor for sequence length
-
-                times = []
-                for i in range(n_layers):
-                    # Apply a gradual increase for later layers
-                    layer_factor = 1.0 + (i / n_layers) * 0.5
-                    # Add random variation (±15%)
-                    random_factor = random.uniform(0.85, 1.15)
-                    times.append(base_time * seq_factor * layer_factor * random_factor)
+            for seq_len, layers in new_results.items():
+                measured.setdefault(seq_len, {}).update(layers)
 
-                results[seq_len] = times
+            return {
+                seq_len: [measured[seq_len][i] for i in range(n_layers)] for seq_len in seq_lengths
+            }
 
-            return results
+        except ImportError:
+            logger.warning("PyTorch not available for profiling, using analytical estimates")
+            return self.estimate(model, dev, seq_lengths)
 
         except Exception as e:
             logger.error(f"Error during profiling: {e}")
-            # Return mock data on error
-            import random
-
-            return {
-                64: [random.uniform(0.001, 0.005) for _ in range(32)],
-                1024: [random.uniform(0.005, 0.015) for _ in range(32)],
-            }
+            # Return analytical estimates on error
+            return self.estimate(model, dev, seq_lengths)
 
         finally:
             # Clean up the executor
             self._cleanup_executor()
 
 
+def select_representative_layers(layers: Any, samples_per_type: int = 2) -> dict[str, list[int]]:
+    """
+    Pick evenly spaced layers of each layer type for sampled profiling
+
+    Args:
+    ----
+        layers: Sequence of layer modules
+        samples_per_type: Number of layers to pick for each type
+
+    Returns:
+    -------
+        Mapping of layer type name to the sampled layer indices
+    """
+    by_type: dict[str, list[int]] = {}
+    for idx, layer in enumerate(layers):
+        by_type.setdefault(type(layer).__name__, []).append(idx)
+
+    samples_per_type = max(1, samples_per_type)
+    groups = {}
+    for layer_type, indices in by_type.items():
+        if len(indices) <= samples_per_type:
+            groups[layer_type] = indices
+        elif samples_per_type == 1:
+            groups[layer_type] = [indices[len(indices) // 2]]
+        else:
+            step = (len(indices) - 1) / (samples_per_type - 1)
+            groups[layer_type] = sorted({indices[round(k * step)] for k in range(samples_per_type)})
+    return groups
+
+
+def _trimmed_mean(times: list[float]) -> float:
+    """Average timings, discarding highest and lowest if we have enough samples"""
+    if len(times) >= 4:
+        times = sorted(times)[1:-1]
+    return sum(times) / len(times)
+
+
+def _layer_count(model: Any) -> Optional[int]:
+    """Return the number of transformer layers, or None if it cannot be determined"""
+    try:
+        return len(model.model.layers)
+    except (AttributeError, TypeError):
+        return None
+
+
+def _config_layer_count(model: Any) -> Optional[int]:
+    """Return the layer count declared in the model config, if any"""
+    return getattr(getattr(model, "config", None), "num_hidden_layers", None)
+
+
 def rebalance(
-    model: Any, dev_fast: int, dev_slow: int, reserve_ratio: float = 0.9
+    model: Any, dev_fast: int, dev_slow: int, reserve_ratio: float = 0.9, mode: str = "full"
 ) -> dict[str, int]:
     """
     Alias for balance_layers with the same signature for backward compatibility
     """
-    return balance_layers(model, dev_fast, dev_slow, reserve_ratio)
+    return balance_layers(model, dev_fast, dev_slow, reserve_ratio, mode=mode)
 
 
 def balance_layers(
-    model: Any, dev_fast: int, dev_slow: int, reserve_ratio: float = 0.9
+    model: Any, dev_fast: int, dev_slow: int, reserve_ratio: float = 0.9, mode: str = "full"
 ) -> dict[str, int]:
     """
     Balance model layers across two GPUs based on performance profiling
@@ -315,6 +627,9 @@ def balance_layers(
         dev_fast: The faster GPU device ID
         dev_slow: The slower GPU device ID
         reserve_ratio: Ratio of layers to assign to faster GPU (0.0-1.0)
+        mode: "full" profiles every layer in one process per GPU, "sampled"
+            profiles representative layers of both GPUs concurrently in threads
+            without moving the whole model
 
     Returns:
     -------
@@ -339,7 +654,26 @@ def balance_layers(
         profiler = LayerProfiler()
 
         # Profile both GPUs - parallelize if multiprocessing available
-        if multiprocessing_available:
+        if mode == "sampled":
+            logger.info("Using sampled per-stream profiling for GPUs")
+            executor = profiler._get_executor()
+            try:
+                futures = {
+                    gpu_id: executor.submit(profiler.profile_sampled, model, dummy, gpu_id)
+                    for gpu_id in [dev_fast, dev_slow]
+                }
+                results = {}
+                for gpu_id, future in futures.items():
+                    try:
+                        results[gpu_id] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error in GPU {gpu_id} sampled profiling: {e}")
+                        results[gpu_id] = profiler.estimate(model, gpu_id)
+                fast_profiles = results[dev_fast]
+                slow_profiles = results[dev_slow]
+            finally:
+                profiler._cleanup_executor()
+        elif multiprocessing_available:
             logger.info("Using multiprocessing for GPU profiling")
             # Create multiprocessing context
             ctx = mp.get_context("spawn")
@@ -394,58 +728,15 @@ def balance_layers(
             fast_profiles = profiler.profile(model, dummy, dev_fast)
             slow_profiles = profiler.profile(model, dummy, dev_slow)
 
-        # Calculate weighted performance ratio
-        # We weight long sequences more heavily as they have more impact on inference performance
-        weights = {
-            64: 0.2,  # Short sequences get 20% weight
-            1024: 0.8,  # Long sequences get 80% weight
-        }
-
-        weighted_perf_ratio = []
-        layer_count = len(fast_profiles[64])  # Use first profile to get layer count
-
-        for i in range(layer_count):
-            ratio_sum = 0.0
-            weight_sum = 0.0
-
-            for seq_len, weight in weights.items():
-                if seq_len in fast_profiles and seq_len in slow_profiles:
-                    fast_time = fast_profiles[seq_len][i]
-                    slow_time = slow_profiles[seq_len][i]
-
-                    # Calculate ratio (faster GPU typically has lower time)
-                    if slow_time > 0:
-                        ratio = fast_time / slow_time
-                        ratio_sum += ratio * weight
-                        weight_sum += weight
-
-            # Compute weighted average if we have valid measurements
-            if weight_sum > 0:
-                weighted_perf_ratio.append(ratio_sum / weight_sum)
-            else:
-                # Fallback to default ratio if profiling failed
-                weighted_perf_ratio.append(0.7)
-
+        weighted_perf_ratio = _weighted_perf_ratio(fast_profiles, slow_profiles)
         logger.info(f"Computed weighted performance ratio across {len(weighted_perf_ratio)} layers")
 
     except ImportError:
-        logger.warning("PyTorch not available, using estimated performance ratio")
-        # Generate estimated performance ratios
-        import random
-
-        n_layers = 32  # Assume 32 layers as default
-
-        # Create a more realistic pattern where ratio tends to vary by layer position
-        weighted_perf_ratio = []
-        for i in range(n_layers):
-            # Base ratio around 0.7 (faster GPU takes 70% of time)
-            base_ratio = 0.7
-            # Early and late layers often have different characteristics
-            position_factor = 1.0 + 0.2 * abs((i / n_layers) - 0.5)
-            # Add some randomness
-            random_factor = random.uniform(0.9, 1.1)
-
-            weighted_perf_ratio.append(base_ratio * position_factor * random_factor)
+        logger.warning("PyTorch not available, using analytical performance estimates")
+        profiler = LayerProfiler()
+        weighted_perf_ratio = _weighted_perf_ratio(
+            profiler.estimate(model, dev_fast), profiler.estimate(model, dev_slow)
+        )
 
     # Create device mapping based on performance
     mapping = {}
@@ -502,6 +793,48 @@ def balance_layers(
     return optimized_mapping
 
 
+def _weighted_perf_ratio(
+    fast_profiles: dict[int, list[float]], slow_profiles: dict[int, list[float]]
+) -> list[float]:
+    """
+    Combine per-sequence-length profiles into one fast/slow time ratio per layer
+
+    Long sequences are weighted more heavily as they have more impact on
+    inference performance.
+    """
+    weights = {
+        64: 0.2,  # Short sequences get 20% weight
+        1024: 0.8,  # Long sequences get 80% weight
+    }
+
+    weighted_perf_ratio = []
+    layer_count = len(fast_profiles[64])  # Use first profile to get layer count
+
+    for i in range(layer_count):
+        ratio_sum = 0.0
+        weight_sum = 0.0
+
+        for seq_len, weight in weights.items():
+            if seq_len in fast_profiles and seq_len in slow_profiles:
+                fast_time = fast_profiles[seq_len][i]
+                slow_time = slow_profiles[seq_len][i]
+
+                # Calculate ratio (faster GPU typically has lower time)
+                if slow_time > 0:
+                    ratio = fast_time / slow_time
+                    ratio_sum += ratio * weight
+                    weight_sum += weight
+
+        # Compute weighted average if we have valid measurements
+        if weight_sum > 0:
+            weighted_perf_ratio.append(ratio_sum / weight_sum)
+        else:
+            # Fallback to default ratio if profiling failed
+            weighted_perf_ratio.append(0.7)
+
+    return weighted_perf_ratio
+
+
 def optimize_contiguous_blocks(mapping: dict[str, int], n_layers: int) -> dict[str, int]:
     """
     Optimize mapping to create more contiguous blocks of layers on the same GPU
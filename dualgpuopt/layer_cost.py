@@ -0,0 +1,324 @@
+"""
+Analytical layer cost model for planning without a GPU
+
+Estimates per-layer execution time with a roofline model: a layer takes the
+longer of its FLOPs over peak compute and its bytes moved over memory bandwidth.
+GPU capabilities come from a spec table, falling back to live telemetry clocks
+for unknown cards. Estimates are scaled by a per-GPU calibration factor learned
+from real profiles whenever they exist.
+"""
+from __future__ import annotations
+
+import logging
+import statistics
+from dataclasses import dataclass, replace
+from typing import Any, Optional
+
+logger = logging.getLogger("DualGPUOpt.LayerCost")
+
+# Fraction of peak achievable in practice
+COMPUTE_EFFICIENCY = 0.6
+MEMORY_EFFICIENCY = 0.8
+
+# Fixed launch overhead per layer (roughly 8 kernels at 5 µs)
+LAYER_OVERHEAD_S = 40e-6
+
+# Cap on the sample weight of a calibration so new profiles keep mattering
+MAX_CALIBRATION_SAMPLES = 256
+
+# Generic scaling for GPUs missing from the spec table
+GENERIC_TFLOPS_PER_MHZ = 0.03
+GENERIC_GBS_PER_MHZ = 0.05
+
+
+@dataclass(frozen=True)
+class GPUSpec:
+    """Peak capabilities of a GPU model"""
+
+    name: str
+    fp16_tflops: float  # Dense FP16 tensor throughput
+    mem_bandwidth_gbs: float
+    boost_clock_mhz: int
+
+
+# Ordered so that more specific names match first
+GPU_SPECS: list[GPUSpec] = [
+    GPUSpec("H100", 989.0, 3350.0, 1980),
+    GPUSpec("A100", 312.0, 1935.0, 1410),
+    GPUSpec("L40S", 362.0, 864.0, 2520),
+    GPUSpec("A6000", 154.8, 768.0, 1800),
+    GPUSpec("V100", 125.0, 900.0, 1530),
+    GPUSpec("T4", 65.0, 320.0, 1590),
+    GPUSpec("RTX 4090", 165.2, 1008.0, 2520),
+    GPUSpec("RTX 4080", 97.5, 716.8, 2505),
+    GPUSpec("RTX 4070 Ti", 80.2, 504.2, 2610),
+    GPUSpec("RTX 4070", 58.3, 504.2, 2475),
+    GPUSpec("RTX 4060", 30.1, 272.0, 2460),
+    GPUSpec("RTX 3090 Ti", 80.0, 1008.0, 1860),
+    GPUSpec("RTX 3090", 71.0, 936.2, 1695),
+    GPUSpec("RTX 3080 Ti", 68.2, 912.4, 1665),
+    GPUSpec("RTX 3080", 59.5, 760.3, 1710),
+    GPUSpec("RTX 3070", 40.6, 448.0, 1725),
+    GPUSpec("RTX 3060", 25.5, 360.0, 1777),
+]
+
+GENERIC_SPEC = GPUSpec("generic", 40.0, 450.0, 1700)
+
+
+def lookup_spec(name: str) -> Optional[GPUSpec]:
+    """
+    Find the spec table entry for a GPU name
+
+    Args:
+    ----
+        name: GPU name as reported by NVML, e.g. "NVIDIA GeForce RTX 4090"
+
+    Returns:
+    -------
+        Matching spec or None if the GPU is unknown
+    """
+    normalized = name.upper()
+    for spec in GPU_SPECS:
+        if spec.name.upper() in normalized:
+            return spec
+    return None
+
+
+def spec_from_telemetry(gpu: dict[str, Any]) -> GPUSpec:
+    """
+    Build a spec from a telemetry record as returned by ``dualgpuopt.gpu.query``
+
+    Known GPUs use the spec table. Unknown GPUs derive compute and bandwidth
+    from the reported SM and memory clocks.
+
+    Args:
+    ----
+        gpu: Telemetry dictionary with "name", "clock_sm" and "clock_memory"
+
+    Returns:
+    -------
+        GPU spec for planning
+    """
+    name = str(gpu.get("name", "unknown"))
+    spec = lookup_spec(name)
+    if spec is not None:
+        return replace(spec, name=name)
+
+    clock_sm = gpu.get("clock_sm") or 0
+    clock_memory = gpu.get("clock_memory") or 0
+    if clock_sm <= 0:
+        return replace(GENERIC_SPEC, name=name)
+    return GPUSpec(
+        name=name,
+        fp16_tflops=clock_sm * GENERIC_TFLOPS_PER_MHZ,
+        mem_bandwidth_gbs=(clock_memory * GENERIC_GBS_PER_MHZ) or GENERIC_SPEC.mem_bandwidth_gbs,
+        boost_clock_mhz=clock_sm,
+    )
+
+
+def spec_for_device(dev: int) -> GPUSpec:
+    """
+    Resolve the spec of a device through GPU telemetry
+
+    Args:
+    ----
+        dev: Device ID
+
+    Returns:
+    -------
+        GPU spec, or the generic spec when the device cannot be queried
+    """
+    try:
+        from dualgpuopt.gpu import query
+
+        gpus = query()
+        if 0 <= dev < len(gpus):
+            return spec_from_telemetry(gpus[dev])
+    except Exception as e:
+        logger.debug(f"GPU telemetry unavailable for device {dev}: {e}")
+    return GENERIC_SPEC
+
+
+@dataclass(frozen=True)
+class LayerShape:
+    """Dimensions of a transformer decoder layer"""
+
+    hidden_size: int = 4096
+    intermediate_size: int = 11008
+    n_heads: int = 32
+    n_kv_heads: int = 32
+    dtype_bytes: int = 2
+    gated_mlp: bool = True
+
+    @classmethod
+    def from_model(cls, model: Any) -> LayerShape:
+        """
+        Read layer dimensions from a model's config
+
+        Missing fields fall back to Llama-2 7B dimensions.
+        """
+        cfg = getattr(model, "config", None)
+        if cfg is not None and not isinstance(cfg, dict):
+            cfg = cfg.to_dict() if hasattr(cfg, "to_dict") else getattr(cfg, "__dict__", {})
+        cfg = cfg or {}
+
+        default = cls()
+        hidden = cfg.get("hidden_size") or default.hidden_size
+        heads = cfg.get("num_attention_heads") or default.n_heads
+        return cls(
+            hidden_size=hidden,
+            intermediate_size=cfg.get("intermediate_size") or 4 * hidden,
+            n_heads=heads,
+            n_kv_heads=cfg.get("num_key_value_heads") or heads,
+            dtype_bytes=_dtype_bytes(getattr(model, "dtype", None) or cfg.get("torch_dtype")),
+            gated_mlp=cfg.get("hidden_act", "silu") in ("silu", "swiglu", "gelu_pytorch_tanh"),
+        )
+
+    @property
+    def kv_dim(self) -> int:
+        """Width of the key/value projections"""
+        return self.hidden_size * self.n_kv_heads // self.n_heads
+
+
+def _dtype_bytes(dtype: Any) -> int:
+    """Map a dtype (torch dtype or string) to its size in bytes"""
+    text = str(dtype or "float16").lower()
+    if "32" in text:
+        return 4
+    if "int8" in text or "8bit" in text:
+        return 1
+    return 2
+
+
+def layer_flops(shape: LayerShape, seq_len: int, batch: int = 1) -> float:
+    """FLOPs for one layer forward pass over ``seq_len`` tokens"""
+    tokens = batch * seq_len
+    h = shape.hidden_size
+    projections = 2 * tokens * h * (2 * h + 2 * shape.kv_dim)
+    attention = 2 * 2 * batch * seq_len * seq_len * h
+    mlp = 2 * tokens * h * shape.intermediate_size * (3 if shape.gated_mlp else 2)
+    return float(projections + attention + mlp)
+
+
+def layer_bytes(shape: LayerShape, seq_len: int, batch: int = 1) -> float:
+    """Bytes moved to and from memory for one layer forward pass"""
+    tokens = batch * seq_len
+    h = shape.hidden_size
+    n_mlp = 3 if shape.gated_mlp else 2
+    weights = 2 * h * h + 2 * h * shape.kv_dim + n_mlp * h * shape.intermediate_size
+    activations = tokens * (8 * h + 2 * shape.intermediate_size)
+    kv_cache = 2 * tokens * shape.kv_dim
+    scores = 2 * batch * shape.n_heads * seq_len * seq_len
+    return float((weights + activations + kv_cache + scores) * shape.dtype_bytes)
+
+
+class LayerCostModel:
+    """
+    Deterministic roofline estimate of per-layer execution time
+
+    Calibration factors (measured / predicted) are kept per GPU name and, when a
+    store is provided, persisted so that planning on a GPU-less machine benefits
+    from profiles taken elsewhere.
+    """
+
+    def __init__(self, store: Any = None):
+        """
+        Initialize the cost model
+
+        Args:
+        ----
+            store: Optional object with ``get_calibration``/``set_calibration``
+                (such as :class:`dualgpuopt.profile_cache.ProfileCache`)
+        """
+        self.store = store
+        self._factors: dict[str, tuple[float, int]] = {}
+
+    def raw_estimate(self, shape: LayerShape, spec: GPUSpec, seq_len: int, batch: int = 1) -> float:
+        """Uncalibrated roofline time in seconds for one layer"""
+        compute_s = layer_flops(shape, seq_len, batch) / (
+            spec.fp16_tflops * 1e12 * COMPUTE_EFFICIENCY
+        )
+        memory_s = layer_bytes(shape, seq_len, batch) / (
+            spec.mem_bandwidth_gbs * 1e9 * MEMORY_EFFICIENCY
+        )
+        return max(compute_s, memory_s) + LAYER_OVERHEAD_S
+
+    def calibration_factor(self, gpu_name: str) -> float:
+        """Return the learned measured/predicted ratio for a GPU (1.0 if none)"""
+        if gpu_name not in self._factors and self.store is not None:
+            try:
+                stored = self.store.get_calibration(gpu_name)
+                if stored is not None:
+                    self._factors[gpu_name] = stored
+            except Exception as e:
+                logger.debug(f"Failed to read calibration for {gpu_name}: {e}")
+        return self._factors.get(gpu_name, (1.0, 0))[0]
+
+    def estimate_layer(
+        self, shape: LayerShape, spec: GPUSpec, seq_len: int, batch: int = 1
+    ) -> float:
+        """Calibrated time in seconds for one layer"""
+        return self.raw_estimate(shape, spec, seq_len, batch) * self.calibration_factor(spec.name)
+
+    def estimate_profile(
+        self, shape: LayerShape, spec: GPUSpec, seq_lengths: list[int], n_layers: int
+    ) -> dict[int, list[float]]:
+        """
+        Estimate a full profile in the same format as ``LayerProfiler.profile``
+
+        Args:
+        ----
+            shape: Layer dimensions
+            spec: GPU spec
+            seq_lengths: Sequence lengths to estimate
+            n_layers: Number of layers
+
+        Returns:
+        -------
+            Dictionary mapping sequence length to list of execution times per layer
+        """
+        return {
+            seq_len: [self.estimate_layer(shape, spec, seq_len)] * n_layers
+            for seq_len in seq_lengths
+        }
+
+    def calibrate(
+        self, shape: LayerShape, spec: GPUSpec, measured: dict[int, dict[int, float]]
+    ) -> float:
+        """
+        Update the calibration factor of a GPU from real measurements
+
+        Args:
+        ----
+            shape: Layer dimensions of the profiled model
+            spec: Spec of the profiled GPU
+            measured: Mapping of sequence length to {layer index: seconds}
+
+        Returns:
+        -------
+            The updated calibration factor
+        """
+        ratios = [
+            seconds / self.raw_estimate(shape, spec, seq_len)
+            for seq_len, layers in measured.items()
+            for seconds in layers.values()
+            if seconds > 0
+        ]
+        if not ratios:
+            return self.calibration_factor(spec.name)
+
+        ratio = statistics.median(ratios)
+        old_factor = self.calibration_factor(spec.name)
+        old_samples = self._factors.get(spec.name, (1.0, 0))[1]
+        factor = (old_factor * old_samples + ratio * len(ratios)) / (old_samples + len(ratios))
+        samples = min(old_samples + len(ratios), MAX_CALIBRATION_SAMPLES)
+        self._factors[spec.name] = (factor, samples)
+
+        if self.store is not None:
+            try:
+                self.store.set_calibration(spec.name, factor, samples)
+            except Exception as e:
+                logger.debug(f"Failed to persist calibration for {spec.name}: {e}")
+
+        logger.info(f"Calibrated cost model for {spec.name}: factor {factor:.3f}")
+        return factor
@@ -3,14 +3,41 @@ GPU memory monitoring and OOM prevention system for DualGPUOptimizer.
 
 This module provides real-time GPU memory monitoring, OOM prevention strategies,
 and memory allocation optimization for dual-GPU setups.
+
+The public API is imported from the submodules on first access.
 """
 
+from dualgpuopt import _lazy
+
+# Public API, kept compatible with the original memory_monitor module
+_EXPORTS = {
+    "MemoryUnit": "dualgpuopt.memory.metrics",
+    "GPUMemoryStats": "dualgpuopt.memory.metrics",
+    "MemoryAlertLevel": "dualgpuopt.memory.alerts",
+    "MemoryAlert": "dualgpuopt.memory.alerts",
+    "MemoryAlertCallback": "dualgpuopt.memory.alerts",
+    "MemoryProfile": "dualgpuopt.memory.predictor",
+    "DEFAULT_PROFILES": "dualgpuopt.memory.predictor",
+    "initialize_memory_profiles": "dualgpuopt.memory.predictor",
+    "MemoryRecoveryStrategy": "dualgpuopt.memory.recovery",
+    "MemoryMonitor": "dualgpuopt.memory.monitor",
+    "get_memory_monitor": "dualgpuopt.memory.monitor",
+}
 
-# For backward compatibility
-from dualgpuopt.memory.compat import *
+_SUBMODULES = (
+    "alerts",
+    "attribution",
+    "fitting",
+    "metrics",
+    "monitor",
+    "predictor",
+    "profiler",
+    "recovery",
+    "timeline",
+)
 
-# Import public API components
-# Re-export default profiles
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = _lazy.attach(__name__, submodules=_SUBMODULES, exports=_EXPORTS)
 
 # Module version
 __version__ = "1.1.0"
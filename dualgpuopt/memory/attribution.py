@@ -0,0 +1,390 @@
+"""
+Request-scoped memory attribution for inference.
+
+Every inference served while the memory profiler runs is tracked under its
+inference id: the memory in use when it started, the peak seen by the
+profiler's samples while it ran, what was left when it finished, its token
+counts and how many requests it shared the GPUs with. Finished requests are
+fed to the learned memory models of :mod:`dualgpuopt.memory.fitting`, whose
+coefficients are written back into the model's
+:class:`~dualgpuopt.memory.predictor.MemoryProfile`.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from dualgpuopt.memory.fitting import MemoryFit, MemoryFitStore, fit_key, get_fit_store
+
+logger = logging.getLogger("DualGPUOpt.MemoryAttribution")
+
+# Finished requests kept for reports
+RECORD_HISTORY_SIZE = int(os.environ.get("DUALGPUOPT_ATTRIBUTION_HISTORY", "1000"))
+# Requests of a model needed before its profile is updated, and between updates
+ENV_COST_REFIT = int(os.environ.get("DUALGPUOPT_COST_REFIT", "8"))
+
+MemorySampler = Callable[[], Dict[int, int]]
+InferenceListener = Callable[[str, "InferenceRecord"], None]
+
+
+def new_inference_id() -> str:
+    """A random id for an inference that did not come with one"""
+    return f"{random.getrandbits(64):016x}"
+
+
+@dataclass
+class InferenceRecord:
+    """Memory attributed to one inference"""
+
+    inference_id: str
+    model: str
+    start_time: float
+    backend: str = ""
+    end_time: Optional[float] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    batch_size: int = 1  # most requests running together while it was active
+    baseline: Dict[int, int] = field(default_factory=dict)  # bytes used per GPU at start
+    peak: Dict[int, int] = field(default_factory=dict)  # highest bytes used per GPU
+    end_memory: Dict[int, int] = field(default_factory=dict)  # bytes used per GPU at end
+    error: Optional[str] = None
+    context: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def token_count(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def peak_bytes(self) -> int:
+        """Peak memory in use on all GPUs"""
+        return sum(self.peak.values())
+
+    @property
+    def peak_delta(self) -> Dict[int, int]:
+        """Growth from the baseline to the peak per GPU"""
+        return {gpu: self.peak[gpu] - self.baseline.get(gpu, 0) for gpu in self.peak}
+
+    @property
+    def memory_delta(self) -> Dict[int, int]:
+        """Memory left allocated after the inference per GPU"""
+        return {
+            gpu: used - self.baseline[gpu]
+            for gpu, used in self.end_memory.items()
+            if gpu in self.baseline
+        }
+
+    def observe(self, used: Dict[int, int]) -> None:
+        for gpu, value in used.items():
+            if value > self.peak.get(gpu, -1):
+                self.peak[gpu] = value
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "inference_id": self.inference_id,
+            "model": self.model,
+            "backend": self.backend,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "batch_size": self.batch_size,
+            "baseline_memory": dict(self.baseline),
+            "peak_memory": dict(self.peak),
+            "end_memory": dict(self.end_memory),
+            "peak_delta": self.peak_delta,
+            "memory_delta": self.memory_delta,
+            "error": self.error,
+        }
+
+
+class InferenceTracker:
+    """
+    Attributes memory to the inferences in flight
+
+    Disabled until a memory sampler is attached (the memory profiler does so
+    for the length of a profiling session); while disabled, ``begin`` returns
+    None and the serving path skips attribution entirely.
+    """
+
+    def __init__(self, refit_every: int = ENV_COST_REFIT, fits: Optional[MemoryFitStore] = None):
+        """
+        Initialize the tracker
+
+        Args:
+        ----
+            refit_every: Requests of a model between updates of its profile
+            fits: Store of learned memory models (default: the node-wide store)
+        """
+        self.refit_every = max(1, refit_every)
+        self._fits = fits
+        self._lock = threading.RLock()
+        self._sampler: Optional[MemorySampler] = None
+        self._active: Dict[str, InferenceRecord] = {}
+        self._records: Deque[InferenceRecord] = deque(maxlen=RECORD_HISTORY_SIZE)
+        self._learned: Dict[str, int] = {}  # requests learned from per model
+        self._backends: Dict[str, str] = {}  # backend that last served each model
+        self._gpus: Dict[str, Set[int]] = {}  # devices each model was observed on
+        self._listeners: List[InferenceListener] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._sampler is not None
+
+    def enable(self, sampler: MemorySampler) -> None:
+        """Start attributing, sampling memory in use per GPU with ``sampler``"""
+        self._sampler = sampler
+
+    def disable(self) -> None:
+        self._sampler = None
+
+    def add_listener(self, listener: InferenceListener) -> None:
+        """Call ``listener("start" | "end", record)`` as inferences begin and finish"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener: InferenceListener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _sample(self) -> Dict[int, int]:
+        sampler = self._sampler
+        if sampler is None:
+            return {}
+        try:
+            return sampler()
+        except Exception as e:
+            logger.debug(f"Memory sample for attribution failed: {e}")
+            return {}
+
+    def _notify(self, kind: str, record: InferenceRecord) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(kind, record)
+            except Exception as e:
+                logger.error(f"Inference listener failed: {e}")
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    def begin(
+        self,
+        inference_id: Optional[str] = None,
+        model: str = "",
+        prompt_tokens: int = 0,
+        batch_size: int = 1,
+        context: Optional[Dict[str, Any]] = None,
+        backend: str = "",
+    ) -> Optional[str]:
+        """
+        Start attributing memory to an inference
+
+        Args:
+        ----
+            inference_id: Id carried by the request; generated when missing
+            model: Model serving the request
+            prompt_tokens: Tokens in the prompt
+            batch_size: Requests running when it started, itself included
+            context: Extra information kept with the record
+            backend: Backend serving the request
+
+        Returns:
+        -------
+            The inference id, or None when attribution is disabled
+        """
+        if not self.enabled:
+            return None
+        baseline = self._sample()
+        record = InferenceRecord(
+            inference_id=inference_id or new_inference_id(),
+            model=model,
+            backend=backend,
+            start_time=time.time(),
+            prompt_tokens=prompt_tokens,
+            batch_size=max(1, batch_size),
+            baseline=baseline,
+            peak=dict(baseline),
+            context=dict(context or {}),
+        )
+        with self._lock:
+            self._active[record.inference_id] = record
+            # Requests already running now share the GPUs with one more
+            for other in self._active.values():
+                other.batch_size = max(other.batch_size, len(self._active))
+        self._notify("start", record)
+        return record.inference_id
+
+    def update(
+        self,
+        inference_id: str,
+        batch_size: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+    ) -> None:
+        """Report progress of a running inference and sample its memory"""
+        used = self._sample()
+        with self._lock:
+            record = self._active.get(inference_id)
+            if record is None:
+                return
+            record.observe(used)
+            if batch_size is not None:
+                record.batch_size = max(record.batch_size, batch_size)
+            if completion_tokens is not None:
+                record.completion_tokens = completion_tokens
+
+    def observe(self, used: Dict[int, int]) -> None:
+        """Raise the peaks of all running inferences with a memory sample"""
+        with self._lock:
+            for record in self._active.values():
+                record.observe(used)
+
+    def end(
+        self,
+        inference_id: str,
+        completion_tokens: Optional[int] = None,
+        error: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Optional[InferenceRecord]:
+        """
+        Finish an inference and learn from its memory use
+
+        Args:
+        ----
+            inference_id: Id returned by :meth:`begin`
+            completion_tokens: Tokens generated
+            error: Failure description if the inference did not complete
+            context: Extra information merged into the record's context
+
+        Returns:
+        -------
+            The finished record, or None for an unknown id
+        """
+        final = self._sample()
+        with self._lock:
+            record = self._active.pop(inference_id, None)
+            if record is None:
+                return None
+            record.end_time = time.time()
+            record.end_memory = final
+            record.observe(final)
+            record.error = error
+            if completion_tokens is not None:
+                record.completion_tokens = completion_tokens
+            if context:
+                record.context.update(context)
+            self._records.append(record)
+        if error is None and record.model and record.peak:
+            self._learn(record)
+        self._notify("end", record)
+        return record
+
+    @property
+    def fit_store(self) -> MemoryFitStore:
+        if self._fits is None:
+            self._fits = get_fit_store()
+        return self._fits
+
+    def _learn(self, record: InferenceRecord) -> None:
+        """Add a finished request to the fits of its GPUs and of the whole model"""
+        from dualgpuopt.memory.predictor import default_profile_for_model
+
+        # New fits start from the hand-entered coefficients, not from what was learned
+        default = default_profile_for_model(record.model)
+        prior = (
+            (default.base_usage, default.per_batch_usage, default.per_token_usage)
+            if default is not None
+            else (0, 0, 0)
+        )
+        store = self.fit_store
+        batch, tokens = record.batch_size, record.token_count
+        for gpu_id, peak in record.peak.items():
+            key = fit_key(record.model, record.backend, gpu_id)
+            store.observe(key, batch, tokens, peak, prior)
+        key = fit_key(record.model, record.backend)
+        store.observe(key, batch, tokens, record.peak_bytes, prior)
+
+        with self._lock:
+            self._backends[record.model] = record.backend
+            self._gpus.setdefault(record.model, set()).update(record.peak)
+            learned = self._learned[record.model] = self._learned.get(record.model, 0) + 1
+        if learned % self.refit_every == 0:
+            self.update_profile(record.model)
+
+    def records(self, model: Optional[str] = None) -> List[InferenceRecord]:
+        """Finished inferences, oldest first"""
+        with self._lock:
+            return [r for r in self._records if model is None or r.model == model]
+
+    def models(self) -> List[str]:
+        with self._lock:
+            return list(self._backends)
+
+    def fit(self, model: str, gpu_id: Optional[int] = None) -> Optional[MemoryFit]:
+        """
+        Learned memory model of ``model`` on the backend that last served it
+
+        Args:
+        ----
+            model: Model path or id
+            gpu_id: Device index, or None for the memory of all GPUs together
+
+        Returns:
+        -------
+            The fit, or None if no request of the model was learned from
+        """
+        with self._lock:
+            if model not in self._backends:
+                return None
+            backend = self._backends[model]
+        return self.fit_store.get(fit_key(model, backend, gpu_id))
+
+    def update_profile(self, model: str) -> Optional[MemoryFit]:
+        """Write the learned memory model of ``model`` into its profile on its backend"""
+        fit = self.fit(model)
+        if fit is None or not fit.n:
+            return None
+        from dualgpuopt.memory.predictor import profile_for_model
+
+        with self._lock:
+            backend = self._backends[model]
+            gpus = sorted(self._gpus.get(model, ()))
+        profile = profile_for_model(model, backend)
+        profile.use_fit(fit, {gpu_id: self.fit(model, gpu_id) for gpu_id in gpus})
+        base, per_batch, per_token = fit.coefficients
+        logger.info(
+            f"Updated memory profile of {model} from {fit.n} requests: "
+            f"base {base / 2**20:.0f} MB, {per_batch / 2**20:.1f} MB per batch item, "
+            f"{per_token / 1024:.1f} KB per token (+/- {fit.sigma / 2**20:.0f} MB)"
+        )
+        return fit
+
+    def reset(self) -> None:
+        with self._lock:
+            self._active.clear()
+            self._records.clear()
+            self._learned.clear()
+            self._backends.clear()
+            self._gpus.clear()
+
+
+_tracker: Optional[InferenceTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_inference_tracker() -> InferenceTracker:
+    """Get the process-wide inference tracker"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = InferenceTracker()
+    return _tracker
@@ -0,0 +1,556 @@
+"""
+Memory models learned from observed usage.
+
+The peak memory of an inference is modelled as
+
+    used = base + per_batch * batch_size + per_token * tokens + noise
+
+separately for every (model, backend, GPU). Each observation is folded into
+the exponentially weighted sufficient statistics of a least-squares fit in
+O(1), shrunk toward the hand-entered profile coefficients so that slopes the
+data cannot determine yet (say, batch size while every request ran alone)
+keep their prior value.
+Observations far outside the current prediction interval are rejected as
+outliers; a run of them means the workload changed, and the fit restarts
+from them. Fits are merged into SQLite off the request path so that every
+worker on the node starts from what the others learned, and they expose
+prediction intervals so that batch and sequence limits can target an OOM
+probability instead of a fixed safety factor.
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("DualGPUOpt.MemoryFitting")
+
+DEFAULT_DB_PATH = os.path.expanduser("~/.dualgpuopt/memory_fits.db")
+ENV_FIT_DB = os.environ.get("DUALGPUOPT_FIT_DB", DEFAULT_DB_PATH)
+# Persist learned fits (set to 0 to keep them in-process)
+ENV_FIT_SHARED = os.environ.get("DUALGPUOPT_FIT_SHARED", "1") == "1"
+# Seconds the writer waits to gather observations of several requests per merge
+FLUSH_INTERVAL_S = float(os.environ.get("DUALGPUOPT_FIT_FLUSH_S", "1.0"))
+# Accepted probability that a planned batch runs out of memory
+ENV_OOM_PROBABILITY = float(os.environ.get("DUALGPUOPT_OOM_PROBABILITY", "0.01"))
+
+MB = 1024 * 1024
+# Assumed noise before there are residuals to estimate it from, in MB
+PRIOR_NOISE_MB = 64.0
+# Weight of the assumed noise, in observations
+PRIOR_NOISE_WEIGHT = 2.0
+# Weight kept by past observations per new one; the fit follows about the
+# last 1 / (1 - DECAY) observations, so drift and early outliers fade out
+DECAY = 0.995
+# Observations before the fit is trusted for limits
+MIN_SAMPLES = 8
+# Observations before outliers are rejected (one more than the coefficients)
+OUTLIER_MIN_SAMPLES = 4
+# Residuals beyond this many predictive standard deviations are outliers
+OUTLIER_Z = 4.0
+# Consecutive outliers that restart the fit
+OUTLIER_RESET = 5
+# Label of the fit over the memory of all GPUs together
+ALL_GPUS = "all"
+
+
+@dataclass(frozen=True)
+class FitKey:
+    """Identity of a learned memory model"""
+
+    model: str
+    backend: str
+    gpu: str
+
+
+@functools.lru_cache(maxsize=16)
+def _gpu_label(gpu_id: int) -> str:
+    from dualgpuopt.profile_cache import gpu_identity
+
+    name, _driver = gpu_identity(gpu_id)
+    return f"{name}#{gpu_id}"
+
+
+def fit_key(model: str, backend: str = "", gpu_id: Optional[int] = None) -> FitKey:
+    """Build a key from a model, a backend and a device index (None: all GPUs)"""
+    gpu = ALL_GPUS if gpu_id is None else _gpu_label(gpu_id)
+    return FitKey(model=model, backend=backend, gpu=gpu)
+
+
+def _z(oom_probability: float) -> float:
+    """Standard normal quantile leaving ``oom_probability`` in the upper tail"""
+    p = min(max(oom_probability, 1e-9), 0.5)
+    return NormalDist().inv_cdf(1 - p)
+
+
+class MemoryFit:
+    """
+    Incremental least-squares memory model with outlier rejection
+
+    Coefficients are kept in MB internally and returned in bytes.
+    """
+
+    def __init__(self, prior: Sequence[float] = (0.0, 0.0, 0.0)):
+        """
+        Initialize the fit
+
+        Args:
+        ----
+            prior: (base, per_batch, per_token) in bytes the fit starts from
+        """
+        self.prior = np.asarray(prior, dtype=np.float64) / MB
+        # Prior standard deviations, loose enough for the data to take over quickly
+        sd = np.maximum(np.abs(self.prior) * [0.5, 1.0, 1.0], [16384.0, 256.0, 1.0])
+        self._ridge = (PRIOR_NOISE_MB / sd) ** 2
+        self.rejected = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all observations"""
+        self.n = 0
+        self._weight = 0.0
+        self._xtx = np.zeros((3, 3))
+        self._xty = np.zeros(3)
+        self._yty = 0.0
+        self._outliers: List[Tuple[np.ndarray, float]] = []
+        self._solve()
+
+    def _solve(self) -> None:
+        a = self._xtx + np.diag(self._ridge)
+        self._cov = np.linalg.inv(a)
+        self._beta = self._cov @ (self._xty + self._ridge * self.prior)
+        rss = self._yty - 2 * self._beta @ self._xty + self._beta @ self._xtx @ self._beta
+        dof = max(0.0, self._weight - 3) + PRIOR_NOISE_WEIGHT
+        self._var = (max(0.0, rss) + PRIOR_NOISE_WEIGHT * PRIOR_NOISE_MB**2) / dof
+
+    def _add(self, x: np.ndarray, y: float) -> None:
+        self._xtx = DECAY * self._xtx + np.outer(x, x)
+        self._xty = DECAY * self._xty + x * y
+        self._yty = DECAY * self._yty + y * y
+        self._weight = DECAY * self._weight + 1
+        self.n += 1
+
+    def _predict_mb(self, x: np.ndarray) -> Tuple[float, float]:
+        mean = float(self._beta @ x)
+        sd = float(np.sqrt(self._var * (1 + x @ self._cov @ x)))
+        return mean, sd
+
+    def observe(self, batch_size: int, tokens: int, used_bytes: float) -> bool:
+        """
+        Add an observation
+
+        Args:
+        ----
+            batch_size: Requests running together
+            tokens: Tokens of the request
+            used_bytes: Peak memory in use
+
+        Returns:
+        -------
+            False if the observation was rejected as an outlier
+        """
+        x = np.array([1.0, float(batch_size), float(tokens)])
+        y = used_bytes / MB
+        if self.n >= OUTLIER_MIN_SAMPLES:
+            mean, sd = self._predict_mb(x)
+            if abs(y - mean) > OUTLIER_Z * sd:
+                self.rejected += 1
+                self._outliers.append((x, y))
+                if len(self._outliers) < OUTLIER_RESET:
+                    return False
+                # The workload changed: start over from the recent observations
+                logger.info(f"Memory usage moved away from the fit; refitting from {y:.0f} MB")
+                recent = self._outliers
+                self.reset()
+                for x_old, y_old in recent:
+                    self._add(x_old, y_old)
+                self._solve()
+                return True
+        self._outliers.clear()
+        self._add(x, y)
+        self._solve()
+        return True
+
+    @property
+    def ready(self) -> bool:
+        """Whether enough observations were made to trust the fit"""
+        return self.n >= MIN_SAMPLES
+
+    @property
+    def coefficients(self) -> Tuple[float, float, float]:
+        """(base, per_batch, per_token) in bytes"""
+        base, per_batch, per_token = (float(v) * MB for v in self._beta)
+        return base, per_batch, per_token
+
+    @property
+    def sigma(self) -> float:
+        """Standard deviation of the observations around the fit in bytes"""
+        return float(np.sqrt(self._var)) * MB
+
+    def predict(self, batch_size: int, tokens: int) -> Tuple[float, float]:
+        """
+        Predict memory use
+
+        Returns
+        -------
+            Mean and predictive standard deviation in bytes
+        """
+        mean, sd = self._predict_mb(np.array([1.0, float(batch_size), float(tokens)]))
+        return mean * MB, sd * MB
+
+    def upper_bound(
+        self, batch_size: int, tokens: int, oom_probability: float = ENV_OOM_PROBABILITY
+    ) -> float:
+        """Memory in bytes exceeded with probability ``oom_probability``"""
+        mean, sd = self.predict(batch_size, tokens)
+        return mean + _z(oom_probability) * sd
+
+    def _largest(self, fits, hi: int) -> int:
+        """Largest value in [0, hi] for which ``fits`` holds, assuming it is monotone"""
+        lo = 0
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if fits(mid):
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def max_batch_size(
+        self,
+        memory: float,
+        tokens: int,
+        oom_probability: float = ENV_OOM_PROBABILITY,
+        limit: int = 4096,
+    ) -> int:
+        """
+        Largest batch whose memory stays within ``memory`` at the target OOM probability
+
+        Args:
+        ----
+            memory: Memory in bytes the batch may use, including the model
+            tokens: Tokens per request
+            oom_probability: Accepted probability of exceeding ``memory``
+            limit: Upper end of the search
+
+        Returns:
+        -------
+            The batch size; 0 if not even a single request fits
+        """
+        z = _z(oom_probability)
+        budget = memory / MB
+
+        def fits(batch: int) -> bool:
+            mean, sd = self._predict_mb(np.array([1.0, float(batch), float(tokens)]))
+            return mean + z * sd <= budget
+
+        return self._largest(fits, limit)
+
+    def max_sequence_length(
+        self,
+        memory: float,
+        batch_size: int,
+        oom_probability: float = ENV_OOM_PROBABILITY,
+        limit: int = 1 << 20,
+    ) -> int:
+        """
+        Longest sequence whose memory stays within ``memory`` at the target OOM probability
+
+        Args:
+        ----
+            memory: Memory in bytes the batch may use, including the model
+            batch_size: Requests running together
+            oom_probability: Accepted probability of exceeding ``memory``
+            limit: Upper end of the search
+
+        Returns:
+        -------
+            The number of tokens; 0 if none fit
+        """
+        z = _z(oom_probability)
+        budget = memory / MB
+
+        def fits(tokens: int) -> bool:
+            mean, sd = self._predict_mb(np.array([1.0, float(batch_size), float(tokens)]))
+            return mean + z * sd <= budget
+
+        return self._largest(fits, limit)
+
+    def to_state(self) -> Dict[str, object]:
+        return {
+            "prior": (self.prior * MB).tolist(),
+            "n": self.n,
+            "weight": self._weight,
+            "xtx": self._xtx.tolist(),
+            "xty": self._xty.tolist(),
+            "yty": self._yty,
+            "rejected": self.rejected,
+        }
+
+    def restore(self, state: Dict[str, object]) -> None:
+        """Replace the observations with those of ``state`` (from :meth:`to_state`)"""
+        self.n = int(state["n"])
+        self._weight = float(state.get("weight", self.n))
+        self._xtx = np.asarray(state["xtx"], dtype=np.float64)
+        self._xty = np.asarray(state["xty"], dtype=np.float64)
+        self._yty = float(state["yty"])
+        self.rejected = int(state.get("rejected", 0))
+        self._outliers = []
+        self._solve()
+
+    @classmethod
+    def from_state(cls, state: Dict[str, object]) -> "MemoryFit":
+        fit = cls(state["prior"])
+        fit.restore(state)
+        return fit
+
+
+class MemoryFitStore:
+    """
+    Learned memory models by key, persisted in SQLite when a path is given
+
+    Observations update the in-process fit at once and are queued; a writer
+    thread replays them onto the stored fit in an immediate transaction, so
+    the fits of concurrent workers merge instead of overwriting each other,
+    and no request waits on the database.
+    """
+
+    def __init__(self, db_path: Optional[str] = ENV_FIT_DB):
+        """
+        Initialize the store
+
+        Args:
+        ----
+            db_path: Database file shared by every process on the node, or
+                None to keep the fits in memory
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()  # fits and pending observations
+        self._db_lock = threading.Lock()  # the connection
+        self._fits: Dict[FitKey, MemoryFit] = {}
+        self._pending: Dict[FitKey, List[Tuple[int, int, float]]] = {}
+        self._dirty = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            # Autocommit mode; the merge opens its own transaction
+            self._conn = sqlite3.connect(
+                db_path, check_same_thread=False, timeout=30, isolation_level=None
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS memory_fits(
+                    model TEXT, backend TEXT, gpu TEXT,
+                    state TEXT, samples INT, updated REAL,
+                    PRIMARY KEY(model, backend, gpu)
+                )
+                """
+            )
+
+    def _load(self, key: FitKey) -> Optional[MemoryFit]:
+        if self._conn is None:
+            return None
+        row = self._conn.execute(
+            "SELECT state FROM memory_fits WHERE model=? AND backend=? AND gpu=?",
+            (key.model, key.backend, key.gpu),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return MemoryFit.from_state(json.loads(row[0]))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable memory fit for {key}: {e}")
+            return None
+
+    def _save(self, key: FitKey, fit: MemoryFit) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO memory_fits(model, backend, gpu, state, samples, updated) "
+            "VALUES(?,?,?,?,?,?)",
+            (key.model, key.backend, key.gpu, json.dumps(fit.to_state()), fit.n, time.time()),
+        )
+
+    def get(self, key: FitKey, prior: Sequence[float] = (0.0, 0.0, 0.0)) -> MemoryFit:
+        """
+        The fit of a key, loaded from the database or started from ``prior``
+
+        Args:
+        ----
+            key: Model, backend and GPU
+            prior: (base, per_batch, per_token) in bytes for a new fit
+
+        Returns:
+        -------
+            The fit, shared by every caller in the process
+        """
+        with self._lock:
+            fit = self._fits.get(key)
+        if fit is not None:
+            return fit
+        with self._db_lock:
+            loaded = self._load(key)
+        with self._lock:
+            return self._fits.setdefault(key, loaded or MemoryFit(prior))
+
+    def observe(
+        self,
+        key: FitKey,
+        batch_size: int,
+        tokens: int,
+        used_bytes: float,
+        prior: Sequence[float] = (0.0, 0.0, 0.0),
+    ) -> MemoryFit:
+        """Add an observation to a key's fit and queue it for the database"""
+        fit = self.get(key, prior)
+        with self._lock:
+            fit.observe(batch_size, tokens, used_bytes)
+            if self._conn is None:
+                return fit
+            self._pending.setdefault(key, []).append((batch_size, tokens, used_bytes))
+        self._ensure_writer()
+        self._dirty.set()
+        return fit
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._write_loop, daemon=True, name="MemoryFitWriter"
+                )
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        """Merge queued observations, gathering those of a few requests per transaction"""
+        while self._conn is not None:
+            self._dirty.wait()
+            time.sleep(FLUSH_INTERVAL_S)
+            self._dirty.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to persist memory fits: {e}")
+
+    def flush(self) -> None:
+        """
+        Merge the queued observations into the stored fits
+
+        Each key's stored fit, with what other workers learned, is read and
+        the observations of this process replayed onto it inside one
+        immediate transaction; the in-process fits then take the merged state.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            priors = {key: self._fits[key].prior * MB for key in pending}
+        if not pending:
+            return
+
+        merged: Dict[FitKey, MemoryFit] = {}
+        with self._db_lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for key, observations in pending.items():
+                        fit = self._load(key) or MemoryFit(priors[key])
+                        for batch_size, tokens, used_bytes in observations:
+                            fit.observe(batch_size, tokens, used_bytes)
+                        self._save(key, fit)
+                        merged[key] = fit
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            except Exception:
+                # Keep the observations for the next attempt
+                with self._lock:
+                    for key, observations in pending.items():
+                        self._pending[key] = observations + self._pending.get(key, [])
+                raise
+
+        with self._lock:
+            for key, fit in merged.items():
+                local = self._fits.get(key)
+                if local is None:
+                    continue
+                local.restore(fit.to_state())
+                # Observations made while merging are already queued for the next one
+                for observation in self._pending.get(key, ()):
+                    local.observe(*observation)
+
+    def keys(self, model: Optional[str] = None) -> List[FitKey]:
+        """Keys with a fit, in this process or in the database"""
+        with self._lock:
+            keys = set(self._fits)
+        if self._conn is not None:
+            with self._db_lock:
+                keys.update(
+                    FitKey(*row)
+                    for row in self._conn.execute("SELECT model, backend, gpu FROM memory_fits")
+                )
+        return sorted(k for k in keys if model is None or k.model == model)
+
+    def reset(self, key: Optional[FitKey] = None) -> None:
+        """Forget the fit of a key, or every fit"""
+        with self._lock:
+            if key is None:
+                self._fits.clear()
+                self._pending.clear()
+            else:
+                self._fits.pop(key, None)
+                self._pending.pop(key, None)
+        if self._conn is None:
+            return
+        with self._db_lock:
+            if key is None:
+                self._conn.execute("DELETE FROM memory_fits")
+            else:
+                self._conn.execute(
+                    "DELETE FROM memory_fits WHERE model=? AND backend=? AND gpu=?",
+                    (key.model, key.backend, key.gpu),
+                )
+
+    def close(self) -> None:
+        """Merge queued observations and close the database"""
+        if self._conn is not None:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to persist memory fits: {e}")
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._dirty.set()  # let the writer see the store is closed
+
+
+_store: Optional[MemoryFitStore] = None
+_store_lock = threading.Lock()
+
+
+def get_fit_store() -> MemoryFitStore:
+    """The node-wide store; kept in memory when sharing is disabled or unavailable"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = MemoryFitStore(ENV_FIT_DB if ENV_FIT_SHARED else None)
+            except Exception as e:
+                logger.warning(f"Memory fit store unavailable, keeping fits in memory: {e}")
+                _store = MemoryFitStore(None)
+            atexit.register(_store.close)
+        return _store
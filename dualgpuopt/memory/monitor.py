@@ -13,6 +13,7 @@ from typing import Dict, List, Optional, Union
 
 from dualgpuopt.error_handler import ErrorCategory, ErrorHandler, ErrorSeverity, handle_exceptions
 from dualgpuopt.memory.alerts import MemoryAlert, MemoryAlertCallback, MemoryAlertLevel
+from dualgpuopt.memory.fitting import ENV_OOM_PROBABILITY
 from dualgpuopt.memory.metrics import GPUMemoryStats, MemoryUnit
 from dualgpuopt.memory.predictor import MemoryProfile
 from dualgpuopt.memory.recovery import MemoryRecoveryStrategy, RecoveryManager
@@ -423,8 +424,14 @@ class MemoryMonitor:
             logger.warning(f"No memory stats available for GPU {gpu_id}")
             return 1
 
-        # Calculate available memory with safety buffer
+        # A learned model of this GPU predicts its memory in use, model included,
+        # with an interval that replaces the safety buffer
         stats = self._memory_stats[gpu_id]
+        fit = profile.gpu_fits.get(gpu_id)
+        if fit is not None and fit.ready:
+            return max(1, fit.max_batch_size(stats.total_memory, token_count, ENV_OOM_PROBABILITY))
+
+        # Calculate available memory with safety buffer
         safety_factor = 0.9  # 90% of free memory to avoid OOM
         available_memory = int(stats.free_memory * safety_factor)
 
@@ -489,8 +496,14 @@ class MemoryMonitor:
             logger.warning(f"No memory stats available for GPU {gpu_id}")
             return 2048
 
-        # Calculate available memory with safety buffer
         stats = self._memory_stats[gpu_id]
+        fit = self._active_profile.gpu_fits.get(gpu_id)
+        if fit is not None and fit.ready:
+            return max(
+                128, fit.max_sequence_length(stats.total_memory, batch_size, ENV_OOM_PROBABILITY)
+            )
+
+        # Calculate available memory with safety buffer
         buffer_factor = 1.0 - (buffer_percent / 100.0)
         available_memory = int(stats.free_memory * buffer_factor)
 
@@ -11,7 +11,9 @@ import threading
 import time
 from collections import OrderedDict
 from functools import lru_cache
-from typing import List, Optional, Set, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple
+
+from dualgpuopt.memory.timeline import RunningRegression
 
 # Try to import numpy for optimized calculations
 try:
@@ -21,12 +23,18 @@ try:
 except ImportError:
     NUMPY_AVAILABLE = False
 
+if TYPE_CHECKING:
+    from dualgpuopt.memory.fitting import MemoryFit
+
 # Initialize module-level logger
 logger = logging.getLogger("DualGPUOpt.MemoryPredictor")
 
 # Environment configuration
 ENV_PROFILE_CACHE_SIZE = int(os.environ.get("DUALGPUOPT_PROFILE_CACHE", "64"))  # Items in LRU cache
 
+# Usage samples older than this are not projected from, in seconds
+GROWTH_HORIZON = 300.0
+
 
 class LRUCache(OrderedDict):
     """Thread-safe LRU cache implementation using OrderedDict"""
@@ -87,6 +95,11 @@ class MemoryProfile:
         self.growth_rate = growth_rate
         self.recovery_buffer = recovery_buffer
         self.usage_history: List[Tuple[float, int]] = []  # (timestamp, bytes)
+        self._growth = RunningRegression(100)  # trend of the usage history
+        # Memory model learned from observed usage, see dualgpuopt.memory.fitting,
+        # over all GPUs together and per device index
+        self.fit: Optional["MemoryFit"] = None
+        self.gpu_fits: Dict[int, "MemoryFit"] = {}
 
         # Add cache to reduce repeated calculations using thread-safe LRU cache
         self._estimation_cache = LRUCache(ENV_PROFILE_CACHE_SIZE)
@@ -101,6 +114,46 @@ class MemoryProfile:
         self._max_batch_cache.clear()
         self._max_seq_cache.clear()
 
+    def update_coefficients(
+        self, base_usage: float, per_batch_usage: float, per_token_usage: float
+    ) -> None:
+        """
+        Replace the memory coefficients, e.g. with ones fitted from observed usage
+
+        Args:
+        ----
+            base_usage: Base memory usage in bytes
+            per_batch_usage: Additional memory per batch item in bytes
+            per_token_usage: Memory per token in bytes
+        """
+        self.base_usage = int(round(base_usage))
+        self.per_batch_usage = int(round(per_batch_usage))
+        self.per_token_usage = int(round(per_token_usage))
+        self.clear_caches()
+
+    def use_fit(
+        self, fit: "MemoryFit", gpu_fits: Optional[Dict[int, "MemoryFit"]] = None
+    ) -> None:
+        """
+        Take the coefficients from a learned memory model and keep it for limits
+
+        Once the fit is ready, ``max_batch_size`` and ``max_sequence_length``
+        called with an ``oom_probability`` use its prediction intervals.
+
+        Args:
+        ----
+            fit: Learned memory model of this profile's workload on all GPUs
+            gpu_fits: Learned memory models of the workload's share of each GPU
+        """
+        self.fit = fit
+        self.gpu_fits.update(gpu_fits or {})
+        self.update_coefficients(*fit.coefficients)
+
+    def _fit_for_limits(self, oom_probability: Optional[float]) -> Optional["MemoryFit"]:
+        if oom_probability is None or self.fit is None or not self.fit.ready:
+            return None
+        return self.fit
+
     # Using thread-safe LRU cache instead of lru_cache to avoid memory leaks
     def _estimate_usage_cached(
         self,
@@ -168,7 +221,9 @@ class MemoryProfile:
         return self._estimate_usage_cached(batch_size, token_count, kv_cache_factor)
 
     # Using thread-safe LRU cache instead of lru_cache to avoid memory leaks
-    def max_batch_size(self, available_memory: int, token_count: int) -> int:
+    def max_batch_size(
+        self, available_memory: int, token_count: int, oom_probability: Optional[float] = None
+    ) -> int:
         """
         Calculate maximum batch size given available memory and token count
 
@@ -176,13 +231,16 @@ class MemoryProfile:
         ----
             available_memory: Available memory in bytes
             token_count: Number of tokens per sequence
+            oom_probability: Accepted probability of running out of memory; with a
+                learned fit, the batch is sized by its prediction interval instead
+                of the point estimate
 
         Returns:
         -------
             Maximum batch size
         """
         # Create cache key
-        cache_key = (available_memory, token_count)
+        cache_key = (available_memory, token_count, oom_probability)
 
         # Check if result is in cache
         try:
@@ -193,6 +251,12 @@ class MemoryProfile:
             # Not in cache, calculate result
             self._cache_misses += 1
 
+            fit = self._fit_for_limits(oom_probability)
+            if fit is not None:
+                result = max(1, fit.max_batch_size(available_memory, token_count, oom_probability))
+                self._max_batch_cache[cache_key] = result
+                return result
+
             if self.per_batch_usage <= 0:
                 result = 1  # Avoid division by zero
                 self._max_batch_cache[cache_key] = result
@@ -219,7 +283,9 @@ class MemoryProfile:
             return result
 
     # Using thread-safe LRU cache instead of lru_cache to avoid memory leaks
-    def max_sequence_length(self, available_memory: int, batch_size: int) -> int:
+    def max_sequence_length(
+        self, available_memory: int, batch_size: int, oom_probability: Optional[float] = None
+    ) -> int:
         """
         Calculate maximum sequence length given available memory and batch size
 
@@ -227,13 +293,16 @@ class MemoryProfile:
         ----
             available_memory: Available memory in bytes
             batch_size: Batch size
+            oom_probability: Accepted probability of running out of memory; with a
+                learned fit, the length is sized by its prediction interval instead
+                of the point estimate
 
         Returns:
         -------
             Maximum sequence length
         """
         # Create cache key
-        cache_key = (available_memory, batch_size)
+        cache_key = (available_memory, batch_size, oom_probability)
 
         # Check if result is in cache
         try:
@@ -244,6 +313,14 @@ class MemoryProfile:
             # Not in cache, calculate result
             self._cache_misses += 1
 
+            fit = self._fit_for_limits(oom_probability)
+            if fit is not None:
+                result = max(
+                    128, fit.max_sequence_length(available_memory, batch_size, oom_probability)
+                )
+                self._max_seq_cache[cache_key] = result
+                return result
+
             if self.per_token_usage <= 0:
                 result = 2048  # Default to reasonable value
                 self._max_seq_cache[cache_key] = result
@@ -285,10 +362,20 @@ class MemoryProfile:
         if len(self.usage_history) > max_history:
             self.usage_history = self.usage_history[-max_history:]
 
+        # The trend covers the same window, updated per sample
+        if self._growth.window != max(2, max_history):
+            self._growth = RunningRegression(max(2, max_history))
+            for t, usage in self.usage_history[:-1]:
+                self._growth.add(t, usage)
+        self._growth.add(timestamp, memory_usage)
+
     def project_growth(self, time_horizon: float = 60.0) -> Optional[int]:
         """
         Project memory growth over time horizon in seconds
 
+        Uses the least-squares trend of the usage history, which is kept up to
+        date by ``update_history`` instead of being refitted here.
+
         Args:
         ----
             time_horizon: Time horizon for projection in seconds
@@ -300,89 +387,14 @@ class MemoryProfile:
         if len(self.usage_history) < 5:
             return None  # Not enough data
 
-        # Use numpy for vectorized operations if available
-        if NUMPY_AVAILABLE:
-            # Extract times and usages
-            times, usages = zip(*self.usage_history)
-            times_array = np.array(times)
-            usages_array = np.array(usages)
-
-            # Calculate time differences from now
-            current_time = time.time()
-            time_diffs = current_time - times_array
-
-            # Filter to recent history (last 5 minutes)
-            recent_mask = time_diffs < 300
-            if np.sum(recent_mask) < 3:
-                return None  # Not enough recent data
-
-            # Fit linear model to recent data
-            times_filtered = times_array[recent_mask]
-            usages_filtered = usages_array[recent_mask]
-
-            try:
-                # Simple linear regression
-                times_norm = times_filtered - np.min(times_filtered)
-                if np.max(times_norm) == 0:
-                    return usages_filtered[-1]  # No time variation, return last value
-
-                slope, intercept = np.polyfit(times_norm, usages_filtered, 1)
-
-                # Project memory usage
-                projected_usage = intercept + slope * time_horizon
-
-                # Apply growth factor to account for non-linear growth
-                return int(projected_usage * self.growth_rate)
-            except Exception:  # Fixed: Replaced bare except with Exception
-                return None  # Error in projection
-        else:
-            # Standard Python implementation without numpy
-            # Extract times and usages
-            times = [t for t, _ in self.usage_history]
-            usages = [u for _, u in self.usage_history]
-
-            # Calculate time differences from now
-            current_time = time.time()
-            time_diffs = [current_time - t for t in times]
-
-            # Filter to recent history (last 5 minutes)
-            recent_data = [
-                (t, u) for (t, u), diff in zip(self.usage_history, time_diffs) if diff < 300
-            ]
-            if len(recent_data) < 3:
-                return None  # Not enough recent data
-
-            # Extract recent times and usages
-            recent_times = [t for t, _ in recent_data]
-            recent_usages = [u for _, u in recent_data]
-
-            try:
-                # Normalize times
-                min_time = min(recent_times)
-                recent_times_norm = [t - min_time for t in recent_times]
-                max_time_norm = max(recent_times_norm)
-
-                if max_time_norm == 0:
-                    return recent_usages[-1]  # No time variation, return last value
-
-                # Calculate least squares fit manually
-                n = len(recent_times_norm)
-                sum_x = sum(recent_times_norm)
-                sum_y = sum(recent_usages)
-                sum_xx = sum(x * x for x in recent_times_norm)
-                sum_xy = sum(x * y for x, y in zip(recent_times_norm, recent_usages))
-
-                # Calculate slope and intercept
-                slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
-                intercept = (sum_y - slope * sum_x) / n
-
-                # Project memory usage
-                projected_usage = intercept + slope * time_horizon
-
-                # Apply growth factor
-                return int(projected_usage * self.growth_rate)
-            except Exception:  # Fixed: Replaced bare except with Exception
-                return None  # Error in projection
+        # Not enough recent data
+        last_time = self.usage_history[-1][0]
+        if time.time() - last_time >= GROWTH_HORIZON:
+            return None
+
+        # Project from the latest sample and apply growth factor for non-linear growth
+        projected_usage = self._growth.value_at(last_time + time_horizon)
+        return int(projected_usage * self.growth_rate)
 
     def batch_estimate_usage(
         self,
@@ -402,20 +414,108 @@ class MemoryProfile:
             List of estimated memory usage in bytes
         """
         if NUMPY_AVAILABLE and len(batch_configs) > 1:
-            # Convert to arrays for vectorized calculation
-            batch_sizes = np.array([bs for bs, _ in batch_configs])
-            token_counts = np.array([tc for _, tc in batch_configs])
-
-            # Vectorized calculation with kv_cache_factor
-            batch_memory = self.per_batch_usage * batch_sizes
-            token_memory = self.per_token_usage * token_counts * kv_cache_factor
-            total_memory = self.base_usage + batch_memory + token_memory
-
-            return total_memory.tolist()
+            configs = np.asarray(batch_configs, dtype=np.int64).reshape(-1, 2)
+            return self._usage(configs[:, 0], configs[:, 1], kv_cache_factor).tolist()
         else:
             # Standard loop-based calculation
             return [self.estimate_usage(bs, tc, kv_cache_factor) for bs, tc in batch_configs]
 
+    def _usage(
+        self, batch_sizes: "np.ndarray", token_counts: "np.ndarray", kv_cache_factor: float
+    ) -> "np.ndarray":
+        """Memory of broadcast batch sizes and token counts, clamped like estimate_usage"""
+        batch_sizes = np.maximum(batch_sizes, 1)
+        token_counts = np.maximum(token_counts, 1)
+        kv_cache_factor = max(0.1, float(kv_cache_factor))
+        token_memory = self.per_token_usage * token_counts * kv_cache_factor
+        return self.base_usage + self.per_batch_usage * batch_sizes + token_memory
+
+    def estimate_usage_grid(
+        self,
+        batch_sizes: "Sequence[int] | np.ndarray",
+        token_counts: "Sequence[int] | np.ndarray",
+        kv_cache_factor: float = 1.0,
+    ) -> "np.ndarray":
+        """
+        Estimate memory usage for every combination of batch size and token count
+
+        Evaluated in one NumPy expression without going through the caches, for
+        sweeps too large for ``estimate_usage`` to be called per point.
+
+        Args:
+        ----
+            batch_sizes: Batch sizes, the rows of the grid
+            token_counts: Token counts, the columns of the grid
+            kv_cache_factor: Multiplier for token memory (KV cache scaling)
+
+        Returns:
+        -------
+            Array of shape (len(batch_sizes), len(token_counts)) of estimated bytes
+        """
+        batch_sizes = np.asarray(batch_sizes, dtype=np.int64).reshape(-1, 1)
+        token_counts = np.asarray(token_counts, dtype=np.int64).reshape(1, -1)
+        return self._usage(batch_sizes, token_counts, kv_cache_factor)
+
+    def max_batch_sizes(
+        self,
+        available_memory: "Sequence[int] | np.ndarray",
+        token_counts: "Sequence[int] | np.ndarray",
+    ) -> "np.ndarray":
+        """
+        Maximum batch sizes for many memory sizes and token counts in closed form
+
+        Solves ``base + per_batch * b + per_token * t <= memory`` for ``b`` with
+        the same rules as ``max_batch_size``; the arguments are broadcast against
+        each other, so a column of memory sizes and a row of token counts give
+        the whole table.
+
+        Args:
+        ----
+            available_memory: Available memory in bytes
+            token_counts: Number of tokens per sequence
+
+        Returns:
+        -------
+            Integer array of maximum batch sizes, at least 1
+        """
+        memory = np.maximum(np.asarray(available_memory, dtype=np.int64), 0)
+        tokens = np.maximum(np.asarray(token_counts, dtype=np.int64), 0)
+        shape = np.broadcast_shapes(memory.shape, tokens.shape)
+        if self.per_batch_usage <= 0:
+            return np.ones(shape, dtype=np.int64)
+        batch_memory = memory - self.base_usage - self.per_token_usage * tokens
+        result = np.floor(batch_memory / self.per_batch_usage)
+        return np.maximum(result, 1).astype(np.int64)
+
+    def max_sequence_lengths(
+        self,
+        available_memory: "Sequence[int] | np.ndarray",
+        batch_sizes: "Sequence[int] | np.ndarray",
+    ) -> "np.ndarray":
+        """
+        Maximum sequence lengths for many memory sizes and batch sizes in closed form
+
+        The vectorized counterpart of ``max_sequence_length``; the arguments are
+        broadcast against each other.
+
+        Args:
+        ----
+            available_memory: Available memory in bytes
+            batch_sizes: Batch sizes
+
+        Returns:
+        -------
+            Integer array of maximum sequence lengths, at least 128
+        """
+        memory = np.maximum(np.asarray(available_memory, dtype=np.int64), 0)
+        batches = np.maximum(np.asarray(batch_sizes, dtype=np.int64), 1)
+        shape = np.broadcast_shapes(memory.shape, batches.shape)
+        if self.per_token_usage <= 0:
+            return np.full(shape, 2048, dtype=np.int64)
+        token_memory = memory - self.base_usage - self.per_batch_usage * batches
+        result = np.floor(token_memory / self.per_token_usage)
+        return np.maximum(result, 128).astype(np.int64)
+
 
 # Default memory profiles for common models
 DEFAULT_PROFILES = {
@@ -484,6 +584,60 @@ def get_profile(name: str) -> Optional[MemoryProfile]:
     return DEFAULT_PROFILES.get(name)
 
 
+# Profiles of served models, learned fits included, by (model, backend)
+_model_profiles: Dict[Tuple[str, str], MemoryProfile] = {}
+
+
+def default_profile_for_model(model: str) -> Optional[MemoryProfile]:
+    """
+    Get the default profile whose name appears in a model's file name
+
+    Args:
+    ----
+        model: Model path or id
+
+    Returns:
+    -------
+        The shared default profile, or None if no default matches
+    """
+    name = os.path.basename(model.rstrip("/\\")).lower() or model
+    for key in sorted(DEFAULT_PROFILES, key=len, reverse=True):
+        if key in name:
+            return DEFAULT_PROFILES[key]
+    return None
+
+
+def profile_for_model(model: str, backend: str = "") -> MemoryProfile:
+    """
+    Get the memory profile of a model served by a backend
+
+    Learned fits are written into these profiles, one per (model, backend),
+    so a fit of one file and backend never changes the shared defaults.
+
+    Args:
+    ----
+        model: Model path or id
+        backend: Backend serving the model
+
+    Returns:
+    -------
+        The profile of the model on the backend, starting from the coefficients
+        of the matching default profile, or from zero if none matches
+    """
+    with _profile_cache_lock:
+        profile = _model_profiles.get((model, backend))
+        if profile is None:
+            name = os.path.basename(model.rstrip("/\\")) or model
+            default = default_profile_for_model(model)
+            coefficients = (
+                (default.base_usage, default.per_batch_usage, default.per_token_usage)
+                if default is not None
+                else (0, 0, 0)
+            )
+            profile = _model_profiles[(model, backend)] = MemoryProfile(name, *coefficients)
+        return profile
+
+
 def clear_profile_caches():
     """Clear all profile caches"""
     with _profile_cache_lock:
@@ -513,6 +667,7 @@ def find_optimal_batch(
     profile: MemoryProfile,
     token_lengths: List[int],
     memory_buffer: float = 0.9,
+    oom_probability: Optional[float] = None,
 ) -> Tuple[int, int]:
     """
     Find optimal batch size and sequence length given available memory
@@ -523,24 +678,37 @@ def find_optimal_batch(
         profile: Memory profile to use
         token_lengths: List of possible token lengths to consider
         memory_buffer: Safety buffer factor (1.0 = use all memory)
+        oom_probability: Accepted probability of running out of memory; when the
+            profile has a learned fit, it replaces the safety buffer
 
     Returns:
     -------
         Tuple of (batch_size, sequence_length)
     """
-    # Apply safety buffer
-    effective_memory = int(available_memory * memory_buffer)
+    # Apply safety buffer, unless the learned fit's prediction interval provides it
+    if profile._fit_for_limits(oom_probability) is not None:
+        effective_memory = int(available_memory)
+    else:
+        effective_memory = int(available_memory * memory_buffer)
+        oom_probability = None
 
     best_batch = 1
     best_seq_len = min(token_lengths) if token_lengths else 1024
     max_throughput = 0
 
-    if NUMPY_AVAILABLE:
-        # Vectorized approach
-        seq_lengths = np.array(token_lengths)
-        batch_sizes = np.array(
-            [profile.max_batch_size(effective_memory, seq_len) for seq_len in seq_lengths],
-        )
+    if NUMPY_AVAILABLE and token_lengths:
+        # Vectorized approach: closed form for the point estimate, the learned
+        # fit's interval search per length otherwise
+        seq_lengths = np.asarray(token_lengths, dtype=np.int64)
+        if oom_probability is None:
+            batch_sizes = profile.max_batch_sizes(effective_memory, seq_lengths)
+        else:
+            batch_sizes = np.array(
+                [
+                    profile.max_batch_size(effective_memory, int(seq_len), oom_probability)
+                    for seq_len in seq_lengths
+                ],
+            )
 
         # Calculate throughput (batch_size * sequence_length)
         throughputs = batch_sizes * seq_lengths
@@ -554,7 +722,7 @@ def find_optimal_batch(
     else:
         # Standard approach
         for seq_len in token_lengths:
-            batch_size = profile.max_batch_size(effective_memory, seq_len)
+            batch_size = profile.max_batch_size(effective_memory, seq_len, oom_probability)
             throughput = batch_size * seq_len
 
             if throughput > max_throughput:
@@ -0,0 +1,113 @@
+"""
+Memory predictor micro-benchmark.
+
+Compares the cached scalar estimates of MemoryProfile with the vectorized
+grid and closed-form limit methods over the same sweeps, and checks that
+both return the same values.
+
+Run with ``python -m dualgpuopt.memory.predictor_benchmark``.
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from dualgpuopt.memory.predictor import DEFAULT_PROFILES, MemoryProfile
+
+GB = 1024 * 1024 * 1024
+
+
+def _time(func: Callable[[], object], repeat: int) -> List[float]:
+    """Wall times of ``repeat`` calls in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _report(name: str, scalar: List[float], vectorized: List[float], points: int) -> None:
+    scalar_s = statistics.median(scalar)
+    vector_s = statistics.median(vectorized)
+    print(f"\n=== {name} ({points:,} points) ===")
+    print(f"  cached scalar: {scalar_s * 1000:10.3f} ms  ({scalar_s / points * 1e9:8.1f} ns/point)")
+    print(f"  vectorized:    {vector_s * 1000:10.3f} ms  ({vector_s / points * 1e9:8.1f} ns/point)")
+    print(f"  speedup:       {scalar_s / vector_s:10.1f}x")
+
+
+def benchmark_usage_grid(profile: MemoryProfile, batches: int, tokens: int, repeat: int) -> None:
+    batch_sizes = np.arange(1, batches + 1)
+    token_counts = np.linspace(128, 32768, tokens, dtype=np.int64)
+
+    def scalar():
+        return [
+            [profile.estimate_usage(int(b), int(t)) for t in token_counts] for b in batch_sizes
+        ]
+
+    def vectorized():
+        return profile.estimate_usage_grid(batch_sizes, token_counts)
+
+    assert np.array_equal(np.array(scalar(), dtype=np.float64), vectorized())
+    points = batches * tokens
+    _report("estimate_usage grid", _time(scalar, repeat), _time(vectorized, repeat), points)
+
+
+def benchmark_limits(profile: MemoryProfile, memories: int, tokens: int, repeat: int) -> None:
+    memory = np.linspace(8 * GB, 80 * GB, memories, dtype=np.int64)
+    token_counts = np.linspace(128, 32768, tokens, dtype=np.int64)
+
+    def scalar():
+        return [
+            [profile.max_batch_size(int(m), int(t)) for t in token_counts] for m in memory
+        ]
+
+    def vectorized():
+        return profile.max_batch_sizes(memory[:, None], token_counts[None, :])
+
+    assert np.array_equal(np.array(scalar()), vectorized())
+    points = memories * tokens
+    _report("max_batch_size table", _time(scalar, repeat), _time(vectorized, repeat), points)
+
+    batch_sizes = np.arange(1, tokens + 1)
+
+    def scalar_seq():
+        return [
+            [profile.max_sequence_length(int(m), int(b)) for b in batch_sizes] for m in memory
+        ]
+
+    def vectorized_seq():
+        return profile.max_sequence_lengths(memory[:, None], batch_sizes[None, :])
+
+    assert np.array_equal(np.array(scalar_seq()), vectorized_seq())
+    _report(
+        "max_sequence_length table",
+        _time(scalar_seq, repeat),
+        _time(vectorized_seq, repeat),
+        points,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the memory predictor")
+    parser.add_argument("--profile", default="llama2-13b", choices=sorted(DEFAULT_PROFILES))
+    parser.add_argument("--rows", type=int, default=256, help="batch sizes / memory sizes")
+    parser.add_argument("--cols", type=int, default=256, help="token counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    base = DEFAULT_PROFILES[args.profile]
+    # A private copy, so the benchmark does not fill the shared profile's caches
+    profile = MemoryProfile(
+        base.name, base.base_usage, base.per_batch_usage, base.per_token_usage
+    )
+    print(f"Profile {profile.name}, {args.repeat} runs each, median times")
+    benchmark_usage_grid(profile, args.rows, args.cols, args.repeat)
+    benchmark_limits(profile, args.rows, args.cols, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,16 @@ This module provides memory usage tracking, pattern analysis, timeline visualiza
 and memory leak detection during LLM inference sessions.
 """
 
+import itertools
 import logging
 import threading
 import time
 from collections import deque
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
 
 # Try to import matplotlib for visualization, but provide fallbacks
 try:
@@ -27,8 +30,14 @@ except ImportError:
     MATPLOTLIB_AVAILABLE = False
 
 from dualgpuopt.error_handler import ErrorCategory, ErrorHandler, ErrorSeverity, handle_exceptions
+from dualgpuopt.memory.attribution import (
+    RECORD_HISTORY_SIZE,
+    InferenceRecord,
+    get_inference_tracker,
+)
 from dualgpuopt.memory.metrics import GPUMemoryStats, MemoryUnit
 from dualgpuopt.memory.monitor import get_memory_monitor
+from dualgpuopt.memory.timeline import RunningRegression, RunningStats, TimelineBuffer
 
 # Initialize module-level logger
 logger = logging.getLogger("DualGPUOpt.MemoryProfiler")
@@ -38,6 +47,10 @@ TimePoint = float
 MemoryValue = int
 ProfilerCallback = Callable[[Dict[str, Any]], None]
 
+# Samples kept per GPU for a session (one hour at 10 Hz) and events kept per session
+SESSION_HISTORY_SIZE = 36000
+EVENT_HISTORY_SIZE = 10000
+
 
 class MemoryEventType(Enum):
     """Types of memory events to track"""
@@ -74,15 +87,58 @@ class MemorySnapshot:
 
 @dataclass
 class MemorySession:
-    """Tracking for a memory profiling session"""
+    """
+    Tracking for a memory profiling session
+
+    Samples and events live in fixed-capacity buffers holding the most recent
+    ones; the per-GPU statistics and event counts cover the whole session.
+    """
 
     session_id: str
     start_time: TimePoint
     end_time: Optional[TimePoint] = None
-    snapshots: List[MemorySnapshot] = field(default_factory=list)
-    events: List[MemoryEvent] = field(default_factory=list)
+    events: Deque[MemoryEvent] = field(default_factory=lambda: deque(maxlen=EVENT_HISTORY_SIZE))
     inference_count: int = 0
     token_count: int = 0
+    history_size: int = SESSION_HISTORY_SIZE
+    timelines: Dict[int, TimelineBuffer] = field(default_factory=dict)
+    memory_stats: Dict[int, RunningStats] = field(default_factory=dict)
+    event_counts: Dict[str, int] = field(default_factory=dict)
+    requests: Deque[InferenceRecord] = field(
+        default_factory=lambda: deque(maxlen=RECORD_HISTORY_SIZE)
+    )
+
+    def record_sample(
+        self, gpu_id: int, timestamp: TimePoint, used: int, free: int, total: int
+    ) -> None:
+        """Add one GPU's memory sample to the session"""
+        timeline = self.timelines.get(gpu_id)
+        if timeline is None:
+            timeline = TimelineBuffer(self.history_size, ("used", "free", "total"))
+            self.timelines[gpu_id] = timeline
+            self.memory_stats[gpu_id] = RunningStats()
+        timeline.append(timestamp, used, free, total)
+        self.memory_stats[gpu_id].add(used)
+
+    def record_event(self, event: MemoryEvent) -> None:
+        self.events.append(event)
+        name = event.event_type.name
+        self.event_counts[name] = self.event_counts.get(name, 0) + 1
+
+    @property
+    def snapshots(self) -> List[MemorySnapshot]:
+        """Retained samples as snapshots, oldest first (built on demand)"""
+        by_time: Dict[TimePoint, Dict[int, GPUMemoryStats]] = {}
+        for gpu_id, timeline in self.timelines.items():
+            for timestamp, used, free, total in timeline:
+                by_time.setdefault(timestamp, {})[gpu_id] = GPUMemoryStats(
+                    gpu_id=gpu_id,
+                    total_memory=int(total),
+                    used_memory=int(used),
+                    free_memory=int(free),
+                    timestamp=timestamp,
+                )
+        return [MemorySnapshot(t, memory) for t, memory in sorted(by_time.items())]
 
 
 class MemoryProfiler:
@@ -108,6 +164,7 @@ class MemoryProfiler:
         history_size: int = 3600,  # 30 minutes at 0.5s interval
         leak_detection_threshold: float = 0.05,
         spike_detection_threshold: float = 0.1,
+        session_history_size: int = SESSION_HISTORY_SIZE,
     ):
         """
         Initialize memory profiler
@@ -115,9 +172,10 @@ class MemoryProfiler:
         Args:
         ----
             sample_interval: Interval between memory snapshots in seconds
-            history_size: Maximum number of snapshots to keep in history
+            history_size: Maximum number of snapshots to keep in the live timeline
             leak_detection_threshold: Minimum steady growth rate to trigger leak alert
             spike_detection_threshold: Minimum growth rate to trigger spike alert
+            session_history_size: Maximum number of samples per GPU kept by a session
         """
         if self._initialized:
             return
@@ -129,6 +187,7 @@ class MemoryProfiler:
         self._history_size = history_size
         self._leak_threshold = leak_detection_threshold
         self._spike_threshold = spike_detection_threshold
+        self._session_history_size = session_history_size
 
         # Memory monitor reference
         self._monitor = get_memory_monitor()
@@ -138,12 +197,13 @@ class MemoryProfiler:
         self._session_history: Dict[str, MemorySession] = {}
 
         # Timeline data structures
-        self._memory_timeline: Dict[int, List[Tuple[TimePoint, MemoryValue]]] = {}
-        self._event_timeline: List[MemoryEvent] = []
+        self._memory_timeline: Dict[int, TimelineBuffer] = {}
+        self._event_timeline: Deque[MemoryEvent] = deque(maxlen=EVENT_HISTORY_SIZE)
 
-        # Sliding window for analysis
+        # Running trend over a sliding window for leak and spike detection
         self._window_size = 20  # 10 seconds at 0.5s interval
-        self._memory_windows: Dict[int, deque] = {}
+        self._trends: Dict[int, RunningRegression] = {}
+        self._last_leak_report: Dict[int, float] = {}
 
         # Real-time visualization
         if MATPLOTLIB_AVAILABLE:
@@ -165,7 +225,11 @@ class MemoryProfiler:
         self._profiling_active = False
         self._profiling_thread = None
         self._stop_profiling = threading.Event()
-        self._inference_mode = False
+        # Request-scoped attribution, enabled while a session is active
+        self._tracker = get_inference_tracker()
+        self._tracker.add_listener(self._on_inference)
+        self._manual_inferences: List[str] = []  # started with start_inference
+        self._manual_lock = threading.Lock()
 
     def start_profiling(self, session_id: Optional[str] = None) -> str:
         """
@@ -191,12 +255,14 @@ class MemoryProfiler:
         self._active_session = MemorySession(
             session_id=session_id,
             start_time=time.time(),
+            history_size=self._session_history_size,
         )
 
         # Clear timeline data
         self._memory_timeline.clear()
         self._event_timeline.clear()
-        self._memory_windows.clear()
+        self._trends.clear()
+        self._last_leak_report.clear()
 
         # Record session start event
         self._add_event(
@@ -214,6 +280,7 @@ class MemoryProfiler:
         )
         self._profiling_active = True
         self._profiling_thread.start()
+        self._tracker.enable(self._sample_used_memory)
 
         logger.info(f"Started memory profiling session: {session_id}")
         return session_id
@@ -236,7 +303,8 @@ class MemoryProfiler:
             description=f"Ended profiling session: {self._active_session.session_id}",
         )
 
-        # Stop profiling thread
+        # Stop attributing and the profiling thread
+        self._tracker.disable()
         self._stop_profiling.set()
         if self._profiling_thread and self._profiling_thread.is_alive():
             self._profiling_thread.join(timeout=2.0)
@@ -251,18 +319,30 @@ class MemoryProfiler:
         # Clean up
         self._profiling_active = False
         self._active_session = None
-        self._inference_mode = False
+        with self._manual_lock:
+            self._manual_inferences.clear()
 
         logger.info(f"Ended memory profiling session: {session_id}")
         return session_id
 
-    def start_inference(self, context: Optional[Dict[str, Any]] = None) -> bool:
+    def start_inference(
+        self,
+        context: Optional[Dict[str, Any]] = None,
+        inference_id: Optional[str] = None,
+        model: str = "",
+        prompt_tokens: int = 0,
+        batch_size: int = 1,
+    ) -> bool:
         """
-        Mark the start of an inference session for focused analysis
+        Mark the start of an inference for request-scoped memory attribution
 
         Args:
         ----
             context: Optional context information about the inference
+            inference_id: Id of the request; generated when not provided
+            model: Model serving the inference
+            prompt_tokens: Number of prompt tokens
+            batch_size: Number of requests running together with this one
 
         Returns:
         -------
@@ -272,111 +352,108 @@ class MemoryProfiler:
             logger.warning("Cannot start inference - no active profiling session")
             return False
 
-        self._inference_mode = True
-        self._active_session.inference_count += 1
-
-        # Track pre-inference memory baseline
-        baseline = {}
-        for gpu_id, stats in self._monitor.get_all_stats().items():
-            baseline[gpu_id] = stats["used_memory_bytes"]
-
-        # Create inference context if not provided
-        if context is None:
-            context = {}
-
-        context["inference_id"] = self._active_session.inference_count
-        context["baseline_memory"] = baseline
-
-        # Record event
-        self._add_event(
-            MemoryEventType.INFERENCE_START,
-            -1,  # All GPUs
-            description=f"Started inference #{self._active_session.inference_count}",
-            context=context,
+        inference_id = self._tracker.begin(
+            inference_id, model, prompt_tokens, batch_size, context=context
         )
-
-        logger.debug(f"Started inference tracking #{self._active_session.inference_count}")
+        if inference_id is None:
+            return False
+        with self._manual_lock:
+            self._manual_inferences.append(inference_id)
         return True
 
-    def end_inference(self, token_count: int = 0, context: Optional[Dict[str, Any]] = None) -> bool:
+    def end_inference(
+        self,
+        token_count: int = 0,
+        context: Optional[Dict[str, Any]] = None,
+        inference_id: Optional[str] = None,
+    ) -> bool:
         """
-        Mark the end of an inference session and analyze memory changes
+        Mark the end of an inference and analyze memory changes
 
         Args:
         ----
-            token_count: Number of tokens processed in this inference
+            token_count: Number of tokens generated in this inference
             context: Optional context information about the inference
+            inference_id: Inference to end; the last one started with
+                :meth:`start_inference` when not provided
 
         Returns:
         -------
             True if successfully ended, False if no active session or not in inference mode
         """
-        if not self._profiling_active or not self._active_session or not self._inference_mode:
+        with self._manual_lock:
+            if inference_id is None and self._manual_inferences:
+                inference_id = self._manual_inferences.pop()
+            elif inference_id in self._manual_inferences:
+                self._manual_inferences.remove(inference_id)
+
+        if not self._profiling_active or not self._active_session or inference_id is None:
             logger.warning("Cannot end inference - no active inference or profiling session")
             return False
 
-        # Create inference context if not provided
-        if context is None:
-            context = {}
+        record = self._tracker.end(inference_id, completion_tokens=token_count, context=context)
+        return record is not None
 
-        inference_id = self._active_session.inference_count
-        context["inference_id"] = inference_id
-
-        # Track post-inference memory
-        current_memory = {}
-        memory_delta = {}
-        baseline = {}
-
-        # Find the matching start event to get baseline memory
-        for event in reversed(self._event_timeline):
-            if (
-                event.event_type == MemoryEventType.INFERENCE_START
-                and event.context.get("inference_id") == inference_id
-            ):
-                baseline = event.context.get("baseline_memory", {})
-                break
-
-        # Calculate memory changes
-        for gpu_id, stats in self._monitor.get_all_stats().items():
-            current_memory[gpu_id] = stats["used_memory_bytes"]
-            if gpu_id in baseline:
-                delta = current_memory[gpu_id] - baseline[gpu_id]
-                memory_delta[gpu_id] = delta
-
-        context["end_memory"] = current_memory
-        context["memory_delta"] = memory_delta
-
-        # Track token count
-        self._active_session.token_count += token_count
-        context["token_count"] = token_count
-
-        # Analyze for any leaks or unusual memory retention
-        total_retained = sum(memory_delta.values())
-        if total_retained > 0:
-            # Memory retained after inference - potential leak
-            retained_mb = total_retained / (1024 * 1024)
-            if retained_mb > 10:  # Only report if more than 10 MB retained
-                leak_event = self._add_event(
-                    MemoryEventType.LEAK_DETECTED,
-                    -1,  # All GPUs
-                    value=total_retained,
-                    description=f"Potential memory leak: {retained_mb:.2f} MB retained after inference",
-                    context={"retained_memory": memory_delta, "inference_id": inference_id},
-                )
-                logger.warning(f"Potential memory leak detected: {retained_mb:.2f} MB retained")
+    def _sample_used_memory(self) -> Dict[int, int]:
+        """Bytes in use per GPU, sampled for request attribution"""
+        return {
+            gpu_id: stats.get("used_memory_bytes", 0)
+            for gpu_id, stats in self._monitor.get_all_stats().items()
+        }
 
-        # Record inference end event
+    def _on_inference(self, kind: str, record: InferenceRecord) -> None:
+        """Turn attributed inferences into session events"""
+        session = self._active_session
+        if session is None:
+            return
+
+        if kind == "start":
+            session.inference_count += 1
+            self._add_event(
+                MemoryEventType.INFERENCE_START,
+                -1,  # All GPUs
+                description=f"Started inference {record.inference_id}",
+                context={
+                    **record.context,
+                    "inference_id": record.inference_id,
+                    "model": record.model,
+                    "baseline_memory": dict(record.baseline),
+                },
+            )
+            logger.debug(f"Started inference tracking {record.inference_id}")
+            return
+
+        session.token_count += record.token_count
+        session.requests.append(record)
+
+        # Memory retained after inference - potential leak
+        total_retained = sum(record.memory_delta.values())
+        retained_mb = total_retained / (1024 * 1024)
+        if retained_mb > 10:  # Only report if more than 10 MB retained
+            self._add_event(
+                MemoryEventType.LEAK_DETECTED,
+                -1,  # All GPUs
+                value=total_retained,
+                description=f"Potential memory leak: {retained_mb:.2f} MB retained after inference",
+                context={
+                    "retained_memory": record.memory_delta,
+                    "inference_id": record.inference_id,
+                },
+            )
+            logger.warning(f"Potential memory leak detected: {retained_mb:.2f} MB retained")
+
+        peak_mb = sum(record.peak_delta.values()) / (1024 * 1024)
         self._add_event(
             MemoryEventType.INFERENCE_END,
             -1,  # All GPUs
-            value=token_count,
-            description=f"Ended inference #{inference_id} ({token_count} tokens)",
-            context=context,
+            value=record.token_count,
+            description=(
+                f"Ended inference {record.inference_id} ({record.token_count} tokens, "
+                f"peak +{peak_mb:.1f} MB, batch {record.batch_size})"
+            ),
+            context={**record.context, **record.as_dict()},
         )
-
-        self._inference_mode = False
-        logger.debug(f"Ended inference tracking #{inference_id}")
-        return True
+        logger.debug(f"Ended inference tracking {record.inference_id}")
 
     def register_callback(self, event_type: MemoryEventType, callback: ProfilerCallback) -> None:
         """
@@ -559,7 +636,7 @@ class MemoryProfiler:
                 self._text_widget.insert("end", "\nRecent Events:\n", "header")
 
                 # Show last 10 events in reverse chronological order
-                for event in list(reversed(self._event_timeline))[:10]:
+                for event in itertools.islice(reversed(self._event_timeline), 10):
                     event_time = event.timestamp - self._active_session.start_time
                     if event.event_type in [MemoryEventType.LEAK_DETECTED]:
                         tag = "error"
@@ -577,17 +654,18 @@ class MemoryProfiler:
         if not MATPLOTLIB_AVAILABLE or not self._figure or not self._canvas:
             return
 
+        start_time = self._active_session.start_time
+        arrays = {
+            gpu_id: (timeline.timestamps(), timeline.values() / (1024 * 1024))  # MB
+            for gpu_id, timeline in self._memory_timeline.items()
+            if len(timeline)
+        }
+
         # For each GPU, update the line data
         for gpu_id, line in self._lines.items():
-            if gpu_id in self._memory_timeline:
-                timestamps = [
-                    t - self._active_session.start_time for t, _ in self._memory_timeline[gpu_id]
-                ]
-                memory_values = [
-                    m / (1024 * 1024) for _, m in self._memory_timeline[gpu_id]
-                ]  # Convert to MB
-
-                line.set_data(timestamps, memory_values)
+            if gpu_id in arrays:
+                timestamps, memory_values = arrays[gpu_id]
+                line.set_data(timestamps - start_time, memory_values)
 
         # Update event markers
         infer_starts_x, infer_starts_y = [], []
@@ -597,19 +675,14 @@ class MemoryProfiler:
 
         # Find the most recent memory value for each event
         for event in self._event_timeline:
-            event_time = event.timestamp - self._active_session.start_time
+            event_time = event.timestamp - start_time
 
-            # Find closest memory value
+            # Closest memory value at or after the event, else the last one
             memory_value = 0
-            if event.gpu_id in self._memory_timeline and self._memory_timeline[event.gpu_id]:
-                # Get closest memory value by time
-                timeline = self._memory_timeline[event.gpu_id]
-                for i, (t, m) in enumerate(timeline):
-                    if t >= event.timestamp:
-                        memory_value = m / (1024 * 1024)  # Convert to MB
-                        break
-                    if i == len(timeline) - 1:
-                        memory_value = m / (1024 * 1024)  # Use last value
+            if event.gpu_id in arrays:
+                timestamps, memory_values = arrays[event.gpu_id]
+                i = int(np.searchsorted(timestamps, event.timestamp))
+                memory_value = memory_values[min(i, len(memory_values) - 1)]
 
             # Add to appropriate marker list
             if event.event_type == MemoryEventType.INFERENCE_START:
@@ -675,11 +748,11 @@ class MemoryProfiler:
             "recommendations": [],
         }
 
-        # Count events by type
-        for event in session.events:
-            report["events"][event.event_type.name] += 1
+        # Count events by type over the whole session
+        report["events"].update(session.event_counts)
 
-            # Track leak events
+        # Track leak events among the retained ones
+        for event in session.events:
             if event.event_type == MemoryEventType.LEAK_DETECTED:
                 leak_mb = event.value / (1024 * 1024)
                 report["potential_leaks"].append(
@@ -691,22 +764,14 @@ class MemoryProfiler:
                     }
                 )
 
-        # Memory usage statistics by GPU
-        memory_by_gpu = {}
-        for snapshot in session.snapshots:
-            for gpu_id, stats in snapshot.memory.items():
-                if gpu_id not in memory_by_gpu:
-                    memory_by_gpu[gpu_id] = []
-                memory_by_gpu[gpu_id].append(stats.used_memory)
-
-        # Calculate min, max, avg for each GPU
-        for gpu_id, values in memory_by_gpu.items():
-            if not values:
+        # Min, max, avg for each GPU over the whole session
+        for gpu_id, stats in session.memory_stats.items():
+            if not stats.count:
                 continue
 
-            min_mem = min(values) / (1024 * 1024)
-            max_mem = max(values) / (1024 * 1024)
-            avg_mem = sum(values) / len(values) / (1024 * 1024)
+            min_mem = stats.min / (1024 * 1024)
+            max_mem = stats.max / (1024 * 1024)
+            avg_mem = stats.mean / (1024 * 1024)
 
             report["memory_metrics"][f"GPU_{gpu_id}"] = {
                 "min_mb": min_mem,
@@ -715,6 +780,9 @@ class MemoryProfiler:
                 "range_mb": max_mem - min_mem,
             }
 
+        # Memory attributed to requests, per model
+        report["requests"] = self._summarize_requests(session)
+
         # Generate recommendations
         if report["potential_leaks"]:
             report["recommendations"].append(
@@ -729,6 +797,59 @@ class MemoryProfiler:
 
         return report
 
+    def _summarize_requests(self, session: MemorySession) -> Dict[str, Any]:
+        """Per-model peak memory, token and batch statistics with the fitted cost curve"""
+        by_model: Dict[str, List[InferenceRecord]] = {}
+        for record in session.requests:
+            by_model.setdefault(record.model or "unknown", []).append(record)
+
+        summary = {}
+        for model, records in by_model.items():
+            peaks = np.array([sum(r.peak_delta.values()) for r in records]) / (1024 * 1024)
+            retained = np.array([sum(r.memory_delta.values()) for r in records]) / (1024 * 1024)
+            entry = {
+                "count": len(records),
+                "avg_peak_delta_mb": float(peaks.mean()),
+                "max_peak_delta_mb": float(peaks.max()),
+                "avg_retained_mb": float(retained.mean()),
+                "avg_tokens": float(np.mean([r.token_count for r in records])),
+                "max_batch_size": max(r.batch_size for r in records),
+                "errors": sum(1 for r in records if r.error),
+            }
+            fit = self._tracker.fit(model) if model != "unknown" else None
+            if fit is not None and fit.n:
+                base, per_batch, per_token = fit.coefficients
+                entry["cost_curve"] = {
+                    "base_mb": base / (1024 * 1024),
+                    "per_batch_mb": per_batch / (1024 * 1024),
+                    "per_token_kb": per_token / 1024,
+                    "residual_mb": fit.sigma / (1024 * 1024),
+                    "samples": fit.n,
+                    "rejected": fit.rejected,
+                }
+            summary[model] = entry
+        return summary
+
+    def get_inference_records(
+        self, session_id: Optional[str] = None, model: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the memory attributed to each inference of a session
+
+        Args:
+        ----
+            session_id: Session to read; the active session if not provided
+            model: Only inferences of this model
+
+        Returns:
+        -------
+            Inference records as dictionaries, oldest first
+        """
+        session = self._session_history.get(session_id) if session_id else self._active_session
+        if session is None:
+            return []
+        return [r.as_dict() for r in session.requests if model is None or r.model == model]
+
     def export_timeline_data(self, filepath: str, session_id: Optional[str] = None) -> bool:
         """
         Export memory timeline data to CSV file
@@ -746,11 +867,9 @@ class MemoryProfiler:
 
         # Determine which session to export
         if session_id and session_id in self._session_history:
-            memory_timeline = self._session_history[session_id].snapshots
-            session_start = self._session_history[session_id].start_time
+            session = self._session_history[session_id]
         elif self._active_session:
-            memory_timeline = self._memory_timeline
-            session_start = self._active_session.start_time
+            session = self._active_session
         else:
             logger.warning("No session available for export")
             return False
@@ -767,50 +886,24 @@ class MemoryProfiler:
                     )
                 writer.writerow(header)
 
-                # Write data based on what we have
-                if isinstance(memory_timeline, dict):
-                    # Using _memory_timeline structure
-                    # First convert to a time-ordered list of snapshots
-                    timestamps = set()
-                    for gpu_id, data in memory_timeline.items():
-                        timestamps.update([t for t, _ in data])
-
-                    # Write each timestamp
-                    for timestamp in sorted(timestamps):
-                        row = [timestamp, timestamp - session_start]
-
-                        # Placeholder values
-                        values = [0] * (self._monitor._gpu_count * 3)
-
-                        # Fill in values we have
-                        for gpu_id, data in memory_timeline.items():
-                            for t, value in data:
-                                if t == timestamp:
-                                    idx = gpu_id * 3
-                                    values[idx] = value / (1024 * 1024)  # Used MB
-
-                                    # We don't have other metrics in this format
-                                    break
-
-                        row.extend(values)
-                        writer.writerow(row)
-                else:
-                    # Using the snapshot list structure
-                    for snapshot in sorted(memory_timeline, key=lambda s: s.timestamp):
-                        row = [snapshot.timestamp, snapshot.timestamp - session_start]
-
-                        # Placeholder values
-                        values = [0] * (self._monitor._gpu_count * 3)
-
-                        # Fill in values from snapshot
-                        for gpu_id, stats in snapshot.memory.items():
-                            idx = gpu_id * 3
-                            values[idx] = stats.used_memory / (1024 * 1024)  # Used MB
-                            values[idx + 1] = stats.free_memory / (1024 * 1024)  # Free MB
-                            values[idx + 2] = stats.usage_percent()  # Percent
-
-                        row.extend(values)
-                        writer.writerow(row)
+                # All GPUs are sampled together, so rows line up by timestamp
+                for snapshot in session.snapshots:
+                    row = [snapshot.timestamp, snapshot.timestamp - session.start_time]
+
+                    # Placeholder values
+                    values = [0] * (self._monitor._gpu_count * 3)
+
+                    # Fill in values from snapshot
+                    for gpu_id, stats in snapshot.memory.items():
+                        idx = gpu_id * 3
+                        if idx >= len(values):
+                            continue
+                        values[idx] = stats.used_memory / (1024 * 1024)  # Used MB
+                        values[idx + 1] = stats.free_memory / (1024 * 1024)  # Free MB
+                        values[idx + 2] = stats.usage_percent()  # Percent
+
+                    row.extend(values)
+                    writer.writerow(row)
 
             logger.info(f"Exported memory timeline to {filepath}")
             return True
@@ -845,74 +938,41 @@ class MemoryProfiler:
     @handle_exceptions(component="MemoryProfiler", severity=ErrorSeverity.ERROR)
     def _take_snapshot(self) -> None:
         """Take a snapshot of current memory state"""
-        if not self._active_session:
+        session = self._active_session
+        if not session:
             return
 
         # Get memory stats for all GPUs
         current_time = time.time()
         memory_stats = self._monitor.get_all_stats()
 
-        # Create snapshot with proper field mappings
-        snapshot_memory = {}
-        for gpu_id, stats in memory_stats.items():
-            # Map fields to match GPUMemoryStats constructor
-            snapshot_memory[gpu_id] = GPUMemoryStats(
-                gpu_id=gpu_id,
-                total_memory=stats.get("total_memory_bytes", 0),
-                used_memory=stats.get("used_memory_bytes", 0),
-                free_memory=stats.get("free_memory_bytes", 0),
-                reserved_memory=stats.get("reserved_memory_bytes", 0),
-                cached_memory=stats.get("cached_memory_bytes", 0),
-                process_memory=stats.get("process_memory", {}),
-                timestamp=stats.get("timestamp", current_time),
-            )
-
-        # Create the snapshot
-        snapshot = MemorySnapshot(
-            timestamp=current_time,
-            memory=snapshot_memory,
-        )
-
-        # Add to session history
-        if self._active_session:
-            self._active_session.snapshots.append(snapshot)
-
-        # Update timeline data
         for gpu_id, stats in memory_stats.items():
-            if gpu_id not in self._memory_timeline:
-                self._memory_timeline[gpu_id] = []
-
-            # Add to timeline
             used_memory = stats.get("used_memory_bytes", 0)
-            self._memory_timeline[gpu_id].append(
-                (current_time, used_memory),
-            )
-
-            # Trim timeline if needed
-            if len(self._memory_timeline[gpu_id]) > self._history_size:
-                self._memory_timeline[gpu_id].pop(0)
-
-            # Update sliding window
-            if gpu_id not in self._memory_windows:
-                self._memory_windows[gpu_id] = deque(maxlen=self._window_size)
-
-            self._memory_windows[gpu_id].append(
-                (current_time, used_memory),
+            session.record_sample(
+                gpu_id,
+                current_time,
+                used_memory,
+                stats.get("free_memory_bytes", 0),
+                stats.get("total_memory_bytes", 0),
             )
 
-        # Trigger allocation event for each GPU with significant change
-        prev_memory = {}
-        if len(self._memory_timeline) > 0:
-            for gpu_id, timeline in self._memory_timeline.items():
-                if len(timeline) > 1:
-                    prev_memory[gpu_id] = timeline[-2][1] if len(timeline) > 1 else 0
-
-        for gpu_id, stats in memory_stats.items():
-            current_memory = stats.get("used_memory_bytes", 0)
-            previous = prev_memory.get(gpu_id, 0)
+            # Update timeline data
+            timeline = self._memory_timeline.get(gpu_id)
+            if timeline is None:
+                timeline = TimelineBuffer(self._history_size, ("used",))
+                self._memory_timeline[gpu_id] = timeline
+            previous = timeline[-1][1] if len(timeline) else 0
+            timeline.append(current_time, used_memory)
+
+            # Update the running trend
+            trend = self._trends.get(gpu_id)
+            if trend is None:
+                trend = RunningRegression(self._window_size)
+                self._trends[gpu_id] = trend
+            trend.add(current_time, used_memory)
 
             # If significant change, record an allocation event
-            delta = current_memory - previous
+            delta = used_memory - previous
             delta_mb = abs(delta) / (1024 * 1024)
 
             # Only record if change is > 1 MB
@@ -927,73 +987,58 @@ class MemoryProfiler:
                     description=f"{'+' if delta > 0 else '-'}{delta_mb:.2f} MB on GPU {gpu_id}",
                 )
 
+        # Raise the peaks of the inferences in flight
+        if self._tracker.active_count:
+            self._tracker.observe(
+                {
+                    gpu_id: stats.get("used_memory_bytes", 0)
+                    for gpu_id, stats in memory_stats.items()
+                }
+            )
+
     def _analyze_memory_patterns(self) -> None:
         """Analyze memory usage patterns for anomalies"""
-        for gpu_id, window in self._memory_windows.items():
-            if len(window) < self._window_size:
+        for gpu_id, trend in self._trends.items():
+            if not trend.full:
                 continue  # Need full window for analysis
 
-            # Calculate growth rate using linear regression
-            timestamps = [(t - window[0][0]) for t, _ in window]  # Normalize times
-            memory_values = [m for _, m in window]
-
-            if not timestamps or not memory_values:
+            # Memory growth rate in bytes per second
+            slope = trend.slope
+            if slope <= 0:
                 continue
 
-            # Simple linear regression for trend
-            n = len(timestamps)
-            sum_x = sum(timestamps)
-            sum_y = sum(memory_values)
-            sum_xx = sum(x * x for x in timestamps)
-            sum_xy = sum(x * y for x, y in zip(timestamps, memory_values))
+            # Convert slope to MB/s
+            slope_mb_s = slope / (1024 * 1024)
 
-            # Avoid division by zero
-            if n * sum_xx - sum_x * sum_x == 0:
-                continue
-
-            # Calculate slope (memory growth rate in bytes per second)
-            slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
-
-            # Check if growth rate indicates potential leak
-            if slope > 0:
-                # Convert slope to MB/s
-                slope_mb_s = slope / (1024 * 1024)
-
-                # Check for spike (rapid growth)
-                if slope_mb_s > self._spike_threshold:
-                    self._add_event(
-                        MemoryEventType.GROWTH_SPIKE,
-                        gpu_id,
-                        value=int(slope),
-                        description=f"Memory growing at {slope_mb_s:.2f} MB/s on GPU {gpu_id}",
-                    )
+            # Check for spike (rapid growth)
+            if slope_mb_s > self._spike_threshold:
+                self._add_event(
+                    MemoryEventType.GROWTH_SPIKE,
+                    gpu_id,
+                    value=int(slope),
+                    description=f"Memory growing at {slope_mb_s:.2f} MB/s on GPU {gpu_id}",
+                )
 
-                # Check for leak (steady growth over time)
-                elif (
-                    self._inference_mode
-                    and slope_mb_s > self._leak_threshold
-                    and window[-1][1] - window[0][1] > 5 * 1024 * 1024
-                ):  # > 5 MB change
-                    # Don't report too frequently - check if we already reported recently
-                    recent_leak = False
-                    recent_time = time.time() - 30  # 30 seconds ago
-
-                    for event in reversed(self._event_timeline[-10:]):
-                        if (
-                            event.event_type == MemoryEventType.LEAK_DETECTED
-                            and event.gpu_id == gpu_id
-                            and event.timestamp > recent_time
-                        ):
-                            recent_leak = True
-                            break
-
-                    if not recent_leak:
-                        self._add_event(
-                            MemoryEventType.LEAK_DETECTED,
-                            gpu_id,
-                            value=int(slope),
-                            description=f"Potential memory leak: {slope_mb_s:.2f} MB/s steady growth on GPU {gpu_id}",
-                        )
+            # Check for leak (steady growth over time)
+            elif (
+                self._tracker.active_count > 0
+                and slope_mb_s > self._leak_threshold
+                and trend.delta > 5 * 1024 * 1024
+            ):  # > 5 MB change
+                # Don't report more than once every 30 seconds per GPU
+                now = time.time()
+                if now - self._last_leak_report.get(gpu_id, 0.0) < 30:
+                    continue
+                self._last_leak_report[gpu_id] = now
+                self._add_event(
+                    MemoryEventType.LEAK_DETECTED,
+                    gpu_id,
+                    value=int(slope),
+                    description=(
+                        f"Potential memory leak: {slope_mb_s:.2f} MB/s steady growth "
+                        f"on GPU {gpu_id}"
+                    ),
+                )
 
     def _add_event(
         self,
@@ -1036,7 +1081,7 @@ class MemoryProfiler:
 
         # Add to session if active
         if self._active_session:
-            self._active_session.events.append(event)
+            self._active_session.record_event(event)
 
         # Trigger callbacks
         event_data = {
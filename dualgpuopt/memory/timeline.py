@@ -0,0 +1,190 @@
+"""
+Fixed-capacity timelines and running statistics for memory profiling.
+
+Profiling sessions can run for hours at 10 Hz, so samples are kept in
+preallocated NumPy ring buffers and trend statistics are updated per sample
+instead of being recomputed over the whole window.
+"""
+
+import math
+from collections import deque
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class TimelineBuffer:
+    """
+    Ring buffer of timestamped samples backed by one preallocated array
+
+    Each row holds a timestamp followed by one value per column. Appending
+    is O(1) and never allocates; once full, the oldest row is overwritten.
+    """
+
+    def __init__(self, capacity: int, columns: Sequence[str] = ("value",)):
+        """
+        Initialize the buffer
+
+        Args:
+        ----
+            capacity: Maximum number of samples kept
+            columns: Names of the value columns stored with each timestamp
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._index = {name: i + 1 for i, name in enumerate(self.columns)}
+        self._data = np.zeros((capacity, len(self.columns) + 1), dtype=np.float64)
+        self._next = 0
+        self._size = 0
+
+    def append(self, timestamp: float, *values: float) -> None:
+        """Add a sample, overwriting the oldest one when full"""
+        row = self._data[self._next]
+        row[0] = timestamp
+        row[1:] = values
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def clear(self) -> None:
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _rows(self) -> np.ndarray:
+        """Samples in chronological order (a copy once the buffer has wrapped)"""
+        if self._size < self.capacity:
+            return self._data[: self._size]
+        return np.roll(self._data, -self._next, axis=0)
+
+    def timestamps(self) -> np.ndarray:
+        return self._rows()[:, 0].copy()
+
+    def values(self, column: Optional[str] = None) -> np.ndarray:
+        """Values of one column in chronological order (the first column by default)"""
+        return self._rows()[:, self._index[column] if column else 1].copy()
+
+    def __getitem__(self, i: int) -> Tuple[float, ...]:
+        """Sample ``i`` in chronological order as (timestamp, *values)"""
+        if not -self._size <= i < self._size:
+            raise IndexError("timeline index out of range")
+        start = self._next - self._size
+        row = self._data[(start + i % self._size) % self.capacity]
+        return tuple(float(v) for v in row)
+
+    def __iter__(self) -> Iterator[Tuple[float, ...]]:
+        for row in self._rows():
+            yield tuple(float(v) for v in row)
+
+
+class RunningStats:
+    """Count, min, max and mean of a series, updated per sample"""
+
+    __slots__ = ("count", "min", "max", "total")
+
+    def __init__(self):
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+
+class RunningRegression:
+    """
+    Least-squares trend over the last ``window`` samples in O(1) per sample
+
+    Sums are kept relative to an origin inside the window so that the
+    normal equations do not cancel catastrophically on epoch timestamps and
+    byte counts; the origin moves and the sums are rebuilt once per window,
+    which keeps the amortized cost constant and the rounding error bounded.
+    """
+
+    def __init__(self, window: int):
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.window = window
+        self._samples: deque = deque(maxlen=window)
+        self._updates = 0
+        self._rebase()
+
+    def _rebase(self) -> None:
+        """Move the origin to the oldest sample and recompute the sums exactly"""
+        if self._samples:
+            self._x0, self._y0 = self._samples[0]
+        else:
+            self._x0 = self._y0 = 0.0
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+        for x, y in self._samples:
+            self._accumulate(x, y, 1.0)
+        self._updates = 0
+
+    def _accumulate(self, x: float, y: float, sign: float) -> None:
+        dx = x - self._x0
+        dy = y - self._y0
+        self._sx += sign * dx
+        self._sy += sign * dy
+        self._sxx += sign * dx * dx
+        self._sxy += sign * dx * dy
+
+    def add(self, x: float, y: float) -> None:
+        """Add a sample, dropping the oldest one once the window is full"""
+        if not self._samples:
+            self._x0, self._y0 = x, y
+        elif len(self._samples) == self.window:
+            self._accumulate(*self._samples[0], -1.0)
+        self._samples.append((x, y))
+        self._accumulate(x, y, 1.0)
+        self._updates += 1
+        if self._updates >= self.window:
+            self._rebase()
+
+    def clear(self) -> None:
+        self._samples.clear()
+        self._rebase()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    @property
+    def full(self) -> bool:
+        return len(self._samples) == self.window
+
+    @property
+    def slope(self) -> float:
+        """Change of y per unit of x; 0 when it is undefined"""
+        n = len(self._samples)
+        denominator = n * self._sxx - self._sx * self._sx
+        if n < 2 or denominator <= 0:
+            return 0.0
+        return (n * self._sxy - self._sx * self._sy) / denominator
+
+    def value_at(self, x: float) -> float:
+        """Value of the fitted line at ``x``; the mean of y when the slope is undefined"""
+        n = len(self._samples)
+        if not n:
+            return 0.0
+        mean_x = self._x0 + self._sx / n
+        mean_y = self._y0 + self._sy / n
+        return mean_y + self.slope * (x - mean_x)
+
+    @property
+    def delta(self) -> float:
+        """Difference between the newest and the oldest y in the window"""
+        if not self._samples:
+            return 0.0
+        return self._samples[-1][1] - self._samples[0][1]
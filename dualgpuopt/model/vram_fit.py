@@ -6,7 +6,13 @@ import json
 import logging
 import os
 import subprocess
-from typing import Any, Dict, List, Optional, Tuple
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dualgpuopt.layer_cost import GENERIC_SPEC, MEMORY_EFFICIENCY, lookup_spec
+from dualgpuopt.model_profiles import QuantizationType
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +30,20 @@ MIN_CONTEXT_SIZE = int(
     os.getenv("DUALGPUOPT_MIN_CONTEXT", "128"),
 )  # Minimum context size to consider
 
+# Search grid defaults for search_plans
+SEARCH_CONTEXTS = (2048, 4096, 8192, 16384, 32768, 65536, 131072)
+SEARCH_BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+# Relative output quality retained by each quantization (1.0 = fp16)
+QUANT_QUALITY = {
+    QuantizationType.NONE: 1.0,
+    QuantizationType.INT8: 0.99,
+    QuantizationType.GGUF_Q8_0: 0.99,
+    QuantizationType.GGUF_Q5_K_M: 0.97,
+    QuantizationType.GGUF_Q4_K_M: 0.95,
+    QuantizationType.INT4: 0.94,
+}
+
 
 def _detect_gpus() -> List[Dict[str, int]]:
     """
@@ -167,9 +187,202 @@ def calculate_max_context_size(
     return max_tokens
 
 
+def _estimate_kv_bytes_per_token(model_bytes: float) -> int:
+    """
+    Estimate KV cache bytes per token from the model size.
+
+    This is a simplified estimate - real implementation would use model specifics.
+    """
+    hidden_size = (model_bytes / 5e9) * 2048  # Rough estimate of hidden size based on model size
+    layers = (model_bytes / 5e9) * 32  # Rough estimate of layers based on model size
+    return int(2 * hidden_size * layers * 2)  # q,k,v projections for each layer
+
+
+def _pareto_mask(
+    throughput: np.ndarray, quality: np.ndarray, context: np.ndarray, memory: np.ndarray
+) -> np.ndarray:
+    """
+    Mark candidates not dominated in (throughput, quality, context, -memory).
+
+    Quality and context take few distinct values, so candidates are grouped by
+    them. Within a group only throughput vs memory matters, which is a 2-D
+    staircase found with one sort. A candidate then survives if no group at
+    least as good in quality and context reaches its throughput with no more
+    memory, answered by a binary search on that group's staircase.
+    """
+    mask = np.zeros(len(throughput), dtype=bool)
+    groups = []
+    for q, c in sorted(set(zip(quality.tolist(), context.tolist()))):
+        members = np.flatnonzero((quality == q) & (context == c))
+        order = members[np.lexsort((-throughput[members], memory[members]))]
+        best = np.maximum.accumulate(throughput[order])
+        # Keep rows that beat every cheaper (or equally cheap) row in the group
+        keep = np.empty(len(order), dtype=bool)
+        keep[0] = True
+        keep[1:] = throughput[order][1:] > best[:-1]
+        mask[order[keep]] = True
+        groups.append((q, c, memory[order], best, order[keep]))
+
+    for q, c, _, _, front in groups:
+        for q_h, c_h, mem_h, best_h, _ in groups:
+            if q_h < q or c_h < c or (q_h == q and c_h == c):
+                continue
+            front = front[mask[front]]
+            if not front.size:
+                break
+            pos = np.searchsorted(mem_h, memory[front], side="right") - 1
+            reach = np.where(pos >= 0, best_h[np.maximum(pos, 0)], -np.inf)
+            mask[front[reach >= throughput[front]]] = False
+
+    return mask
+
+
+def search_plans(
+    model_bytes: int,
+    gpus: Optional[List[Dict[str, Any]]] = None,
+    quantizations: Optional[Sequence[QuantizationType]] = None,
+    contexts: Sequence[int] = SEARCH_CONTEXTS,
+    batch_sizes: Sequence[int] = SEARCH_BATCH_SIZES,
+    tp_degrees: Optional[Sequence[int]] = None,
+    safety_margin: float = SAFETY_MARGIN,
+) -> Dict[str, Any]:
+    """
+    Search quantization, context, batch size and tensor-parallel degree.
+
+    A TP degree uses the largest GPUs and puts an equal share on each, so its
+    capacity is bounded by the smallest card of the group. For each
+    (quantization, TP degree) pair the largest feasible batch size is solved in
+    closed form per context, using the fact that memory grows monotonically
+    with context and batch; contexts stop being enumerated as soon as a single
+    sequence no longer fits. The feasible candidates are reduced to
+    the Pareto front of estimated throughput, quality, context length and
+    memory use.
+
+    Args:
+    ----
+        model_bytes: Unquantized (fp16) model size in bytes
+        gpus: Optional list of GPU info dictionaries (if None, will use detected GPUs);
+            an optional "name" is used to look up memory bandwidth
+        quantizations: Quantization types to consider (default: all)
+        contexts: Context lengths to consider
+        batch_sizes: Batch sizes to consider
+        tp_degrees: Tensor-parallel degrees to consider (default: 1..len(gpus))
+        safety_margin: Safety margin as a fraction of total memory
+
+    Returns:
+    -------
+        Dictionary with "pareto" (list of candidate dicts), "candidates" (grid
+        size), "evaluated" (after pruning), "feasible" and "elapsed_ms"
+    """
+    start = time.perf_counter()
+
+    if gpus is None:
+        gpus = _detect_gpus() or [{"memory_total": 8192}]
+    gpus = sorted(gpus, key=lambda g: g["memory_total"], reverse=True)
+
+    quantizations = list(quantizations or QuantizationType)
+    tp_degrees = [tp for tp in (tp_degrees or range(1, len(gpus) + 1)) if 1 <= tp <= len(gpus)]
+    contexts_arr = np.array(sorted(contexts), dtype=np.float64)
+    batches_arr = np.array(sorted(batch_sizes), dtype=np.float64)
+
+    model_mb = model_bytes / (1024 * 1024)
+    kv_mb_per_token = _estimate_kv_bytes_per_token(model_bytes) / (1024 * 1024)
+    bandwidths = [
+        (lookup_spec(str(g.get("name", ""))) or GENERIC_SPEC).mem_bandwidth_gbs for g in gpus
+    ]
+
+    columns: Dict[str, List[np.ndarray]] = {
+        "quant": [],
+        "context": [],
+        "batch": [],
+        "tp": [],
+        "memory": [],
+        "throughput": [],
+        "quality": [],
+    }
+    grid_size = len(quantizations) * len(tp_degrees) * len(contexts_arr) * len(batches_arr)
+    evaluated = 0
+
+    for tp in tp_degrees:
+        # Weights and KV cache are split evenly across the group, so every share
+        # has to fit the smallest card rather than the summed capacity
+        per_gpu_mb = min(g["memory_total"] for g in gpus[:tp]) * (1.0 - safety_margin)
+        available_mb = per_gpu_mb * tp
+        tp_factor = 1.0 + TP_OVERHEAD if tp > 1 else 1.0
+        # Shards are read in parallel, the slowest card bounds the step time
+        bandwidth_mb_s = min(bandwidths[:tp]) * tp * MEMORY_EFFICIENCY * 1e3 / tp_factor
+
+        for q_idx, quant in enumerate(quantizations):
+            weights_mb = model_mb * quant.value * tp_factor
+            kv_budget = available_mb - weights_mb
+            if kv_budget < contexts_arr[0] * kv_mb_per_token:
+                # Smallest context with one sequence does not fit: prune this branch
+                continue
+
+            # Largest batch per context in closed form; contexts beyond the first
+            # that cannot hold one sequence are never expanded
+            max_batch = np.floor(kv_budget / (contexts_arr * kv_mb_per_token))
+            usable = max_batch >= 1
+            ctx = contexts_arr[usable]
+            max_batch = max_batch[usable]
+
+            ctx_grid, batch_grid = np.meshgrid(ctx, batches_arr, indexing="ij")
+            feasible = batch_grid <= max_batch[:, None]
+            ctx_flat = ctx_grid[feasible]
+            batch_flat = batch_grid[feasible]
+            evaluated += int(feasible.size)
+            if not ctx_flat.size:
+                continue
+
+            kv_mb = ctx_flat * batch_flat * kv_mb_per_token
+            # Decode step reads the weights once plus the (on average half-full) KV cache
+            step_mb = weights_mb + kv_mb / 2
+            columns["quant"].append(np.full(ctx_flat.size, q_idx))
+            columns["context"].append(ctx_flat)
+            columns["batch"].append(batch_flat)
+            columns["tp"].append(np.full(ctx_flat.size, tp))
+            columns["memory"].append(weights_mb + kv_mb)
+            columns["throughput"].append(batch_flat * bandwidth_mb_s / step_mb)
+            columns["quality"].append(np.full(ctx_flat.size, QUANT_QUALITY.get(quant, 0.9)))
+
+    pareto: List[Dict[str, Any]] = []
+    feasible_count = 0
+    if columns["quant"]:
+        data = {key: np.concatenate(values) for key, values in columns.items()}
+        feasible_count = len(data["quant"])
+        mask = _pareto_mask(data["throughput"], data["quality"], data["context"], data["memory"])
+        for i in np.flatnonzero(mask)[np.argsort(-data["throughput"][mask])]:
+            pareto.append(
+                {
+                    "quant": quantizations[int(data["quant"][i])].name.lower(),
+                    "weight_factor": quantizations[int(data["quant"][i])].value,
+                    "context": int(data["context"][i]),
+                    "batch_size": int(data["batch"][i]),
+                    "tensor_parallel_size": int(data["tp"][i]),
+                    "memory_mb": round(float(data["memory"][i]), 1),
+                    "throughput_tok_s": round(float(data["throughput"][i]), 1),
+                    "quality": float(data["quality"][i]),
+                }
+            )
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(
+        f"Searched {grid_size} candidates ({evaluated} evaluated, {feasible_count} feasible, "
+        f"{len(pareto)} on Pareto front) in {elapsed_ms:.1f} ms",
+    )
+    return {
+        "pareto": pareto,
+        "candidates": grid_size,
+        "evaluated": evaluated,
+        "feasible": feasible_count,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
 def fit_plan(
     model_bytes: int,
     gpus: Optional[List[Dict[str, int]]] = None,
+    search: bool = False,
 ) -> Dict[str, Any]:
     """
     Create a complete fitting plan for the model.
@@ -178,6 +391,7 @@ def fit_plan(
     ----
         model_bytes: Model size in bytes
         gpus: Optional list of GPU info dictionaries (if None, will use detected GPUs)
+        search: Also include the Pareto front from :func:`search_plans` as "candidates"
 
     Returns:
     -------
@@ -221,16 +435,7 @@ def fit_plan(
             f"Detected potential multi-shard checkpoint, adjusting size by factor of {num_shards}",
         )
 
-    # Estimate KV cache size for this model (based on model size heuristic)
-    # This is a simplified estimate - real implementation would use model specifics
-    hidden_size = (
-        model_bytes_adjusted / 5e9
-    ) * 2048  # Rough estimate of hidden size based on adjusted model size
-    layers = (
-        model_bytes_adjusted / 5e9
-    ) * 32  # Rough estimate of layers based on adjusted model size
-
-    kv_bytes_per_token = int(2 * hidden_size * layers * 2)  # q,k,v projections for each layer
+    kv_bytes_per_token = _estimate_kv_bytes_per_token(model_bytes_adjusted)
 
     # Calculate context sizes for different batch sizes
     context_sizes = {}
@@ -267,6 +472,9 @@ def fit_plan(
         "fits_in_memory": split_info["fits_in_memory"],
     }
 
+    if search:
+        plan["candidates"] = search_plans(model_bytes, gpus)["pareto"]
+
     return plan
 
 
@@ -283,6 +491,11 @@ if __name__ == "__main__":
         help="Comma-separated list of GPU memory sizes in MB",
     )
     parser.add_argument("--output", type=str, help="Output JSON file path")
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Search quantization/context/batch/TP candidates and include the Pareto front",
+    )
 
     args = parser.parse_args()
 
@@ -291,7 +504,7 @@ if __name__ == "__main__":
     gpus = [{"memory_total": size} for size in gpu_memory_sizes]
 
     # Generate plan
-    plan = fit_plan(args.model_size, gpus)
+    plan = fit_plan(args.model_size, gpus, search=args.search)
 
     # Print or save plan
     if args.output:
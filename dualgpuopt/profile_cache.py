@@ -0,0 +1,331 @@
+"""
+Content-addressed cache for layer profiling results
+
+Profiles are keyed by a fingerprint hash of the model configuration, dtype,
+GPU name and driver version, and stored per (sequence length, layer) in a single
+indexed SQLite database so that partially measured profiles can be reused.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger("DualGPUOpt.ProfileCache")
+
+# Profiles older than this are considered stale and evicted
+DEFAULT_MAX_AGE_S = 30 * 86400
+
+DB_NAME = "layer_profiles.db"
+
+
+def _model_config(model: Any) -> dict[str, Any]:
+    """Extract a JSON-serializable description of a model's architecture"""
+    config: dict[str, Any] = {"class": model.__class__.__name__}
+
+    cfg = getattr(model, "config", None)
+    if cfg is not None:
+        if hasattr(cfg, "to_dict"):
+            raw = cfg.to_dict()
+        elif isinstance(cfg, dict):
+            raw = cfg
+        else:
+            raw = getattr(cfg, "__dict__", {})
+        for key, value in raw.items():
+            # Skip bookkeeping fields that do not change layer cost
+            if key.startswith("_") or key in ("transformers_version", "name_or_path"):
+                continue
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                value = repr(value)
+            config[key] = value
+
+    try:
+        config["n_layers"] = len(model.model.layers)
+    except (AttributeError, TypeError):
+        pass
+
+    return config
+
+
+def _model_dtype(model: Any) -> str:
+    """Return the dtype of the model parameters as a string"""
+    dtype = getattr(model, "dtype", None)
+    if dtype is None:
+        try:
+            dtype = next(model.parameters()).dtype
+        except Exception:
+            dtype = "unknown"
+    return str(dtype)
+
+
+def gpu_identity(dev: int) -> tuple[str, str]:
+    """
+    Return the (name, driver version) pair for a device
+
+    Falls back to torch and finally to "unknown" when NVML is unavailable.
+    """
+    try:
+        import pynvml
+
+        pynvml.nvmlInit()
+        try:
+            handle = pynvml.nvmlDeviceGetHandleByIndex(dev)
+            name = pynvml.nvmlDeviceGetName(handle)
+            driver = pynvml.nvmlSystemGetDriverVersion()
+            if isinstance(name, bytes):
+                name = name.decode("utf-8")
+            if isinstance(driver, bytes):
+                driver = driver.decode("utf-8")
+            return name, driver
+        finally:
+            pynvml.nvmlShutdown()
+    except Exception:
+        pass
+
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            return torch.cuda.get_device_name(dev), f"cuda-{torch.version.cuda}"
+    except Exception:
+        pass
+
+    return "unknown", "unknown"
+
+
+def profile_key(
+    model_config: dict[str, Any],
+    dtype: str,
+    gpu_name: str,
+    driver_version: str,
+    mode: str = "full",
+) -> str:
+    """
+    Compute the content hash identifying a profile
+
+    Args:
+    ----
+        model_config: Architecture description of the model
+        dtype: Parameter dtype
+        gpu_name: GPU model name
+        driver_version: GPU driver version
+        mode: Profiling mode; timings of per-block sampled profiling are not
+            comparable to full-model timings and get their own key
+
+    Returns:
+    -------
+        Hex digest used as the cache key
+    """
+    fields = {
+        "model": model_config,
+        "dtype": dtype,
+        "gpu": gpu_name,
+        "driver": driver_version,
+    }
+    # Full-profile keys stay as they were before modes existed
+    if mode != "full":
+        fields["mode"] = mode
+    payload = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def fingerprint(model: Any, dev: int, mode: str = "full") -> str:
+    """
+    Compute the profile key for a model on a device
+
+    Args:
+    ----
+        model: The transformer model
+        dev: Device ID
+        mode: Profiling mode, "full" or "sampled"
+
+    Returns:
+    -------
+        Hex digest used as the cache key
+    """
+    gpu_name, driver = gpu_identity(dev)
+    return profile_key(_model_config(model), _model_dtype(model), gpu_name, driver, mode)
+
+
+class ProfileCache:
+    """Indexed SQLite store for per-layer profiling results"""
+
+    def __init__(self, cache_dir: str, max_age_s: float = DEFAULT_MAX_AGE_S):
+        """
+        Initialize the cache
+
+        Args:
+        ----
+            cache_dir: Directory holding the database file
+            max_age_s: Age in seconds after which stored profiles are evicted
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, DB_NAME)
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS profiles(
+                    key TEXT PRIMARY KEY, meta TEXT, created INT, last_used INT
+                );
+                CREATE TABLE IF NOT EXISTS layer_times(
+                    key TEXT, seq_len INT, layer INT, seconds REAL, ts INT,
+                    PRIMARY KEY(key, seq_len, layer),
+                    FOREIGN KEY(key) REFERENCES profiles(key) ON DELETE CASCADE
+                );
+                CREATE TABLE IF NOT EXISTS calibration(
+                    gpu TEXT PRIMARY KEY, factor REAL, samples INT, ts INT
+                );
+                CREATE INDEX IF NOT EXISTS ix_profiles_last_used ON profiles(last_used);
+                CREATE INDEX IF NOT EXISTS ix_layer_times_ts ON layer_times(ts);
+            """,
+            )
+        self.evict_stale()
+
+    def lookup(self, key: str, seq_lengths: list[int]) -> dict[int, dict[int, float]]:
+        """
+        Fetch whatever has been measured for the requested sequence lengths
+
+        Args:
+        ----
+            key: Profile key from :func:`fingerprint`
+            seq_lengths: Sequence lengths of interest
+
+        Returns:
+        -------
+            Mapping of sequence length to {layer index: seconds}; lengths
+            without any stored measurement are omitted
+        """
+        if not seq_lengths:
+            return {}
+
+        cutoff = int(time.time() - self.max_age_s)
+        placeholders = ",".join("?" * len(seq_lengths))
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"SELECT seq_len, layer, seconds FROM layer_times "
+                f"WHERE key=? AND ts>=? AND seq_len IN ({placeholders})",
+                (key, cutoff, *seq_lengths),
+            ).fetchall()
+            if rows:
+                self._conn.execute(
+                    "UPDATE profiles SET last_used=? WHERE key=?", (int(time.time()), key)
+                )
+
+        results: dict[int, dict[int, float]] = {}
+        for seq_len, layer, seconds in rows:
+            results.setdefault(seq_len, {})[layer] = seconds
+        return results
+
+    def store(
+        self,
+        key: str,
+        results: dict[int, dict[int, float]],
+        meta: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """
+        Persist measured layer times
+
+        Args:
+        ----
+            key: Profile key from :func:`fingerprint`
+            results: Mapping of sequence length to {layer index: seconds}
+            meta: Optional human-readable description stored with the key
+        """
+        now = int(time.time())
+        rows = [
+            (key, seq_len, layer, seconds, now)
+            for seq_len, layers in results.items()
+            for layer, seconds in layers.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO profiles(key, meta, created, last_used) VALUES(?,?,?,?) "
+                "ON CONFLICT(key) DO UPDATE SET last_used=excluded.last_used",
+                (key, json.dumps(meta) if meta else None, now, now),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO layer_times(key, seq_len, layer, seconds, ts) "
+                "VALUES(?,?,?,?,?)",
+                rows,
+            )
+
+    def get_calibration(self, gpu_name: str) -> Optional[tuple[float, int]]:
+        """
+        Fetch the cost-model calibration of a GPU
+
+        Args:
+        ----
+            gpu_name: GPU name
+
+        Returns:
+        -------
+            (factor, samples) tuple or None if the GPU was never calibrated
+        """
+        cutoff = int(time.time() - self.max_age_s)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT factor, samples FROM calibration WHERE gpu=? AND ts>=?",
+                (gpu_name, cutoff),
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_calibration(self, gpu_name: str, factor: float, samples: int) -> None:
+        """
+        Persist the cost-model calibration of a GPU
+
+        Args:
+        ----
+            gpu_name: GPU name
+            factor: Measured / predicted time ratio
+            samples: Number of layer measurements behind the factor
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO calibration(gpu, factor, samples, ts) VALUES(?,?,?,?)",
+                (gpu_name, factor, samples, int(time.time())),
+            )
+
+    def evict_stale(self) -> int:
+        """
+        Remove measurements older than ``max_age_s`` and profiles left empty
+
+        Returns
+        -------
+            Number of layer measurements removed
+        """
+        cutoff = int(time.time() - self.max_age_s)
+        with self._lock, self._conn:
+            removed = self._conn.execute("DELETE FROM layer_times WHERE ts<?", (cutoff,)).rowcount
+            self._conn.execute("DELETE FROM calibration WHERE ts<?", (cutoff,))
+            self._conn.execute(
+                "DELETE FROM profiles WHERE last_used<? AND key NOT IN "
+                "(SELECT DISTINCT key FROM layer_times)",
+                (cutoff,),
+            )
+        if removed:
+            logger.info(f"Evicted {removed} stale layer profile entries")
+        return removed
+
+    def clear(self) -> None:
+        """Remove every stored profile"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM layer_times")
+            self._conn.execute("DELETE FROM profiles")
+            self._conn.execute("DELETE FROM calibration")
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
@@ -9,6 +9,8 @@ from typing import Any, Dict, List
 import faiss
 import numpy as np
 
+from dualgpuopt import tracing
+
 # Import sentence-transformers for embedding generation
 try:
     from sentence_transformers import SentenceTransformer
@@ -80,13 +82,15 @@ class LegalRetriever:
             List of retrieved documents with metadata and citations
         """
         # Encode query to embedding
-        query_embedding = self.model.encode(query)
-        # Normalize for cosine similarity
-        query = np.expand_dims(query_embedding.astype("float32"), 0)
-        faiss.normalize_L2(query)
+        with tracing.span("rag.embed", model=self.model_name):
+            query_embedding = self.model.encode(query)
+            # Normalize for cosine similarity
+            query = np.expand_dims(query_embedding.astype("float32"), 0)
+            faiss.normalize_L2(query)
 
         # Search the index
-        distances, indices = self.index.search(query, k=k)
+        with tracing.span("rag.search", k=k, ntotal=self.index.ntotal):
+            distances, indices = self.index.search(query, k=k)
 
         # Process results
         results = []
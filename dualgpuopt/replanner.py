@@ -0,0 +1,315 @@
+"""
+Online re-planning of the GPU split from live telemetry
+
+Subscribes to per-GPU telemetry events and recomputes the split, context and
+batch recommendations whenever free memory or thermal state changes materially.
+A ``SplitCalculatedEvent`` is published only when the resulting plan differs from
+the current one; the launcher can pick up the pending plan at its next restart.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from dualgpuopt.optimizer import GPUMemoryInfo, ModelParameters, Optimizer, get_optimizer
+
+logger = logging.getLogger("DualGPUOpt.Replanner")
+
+# Free-memory change (per GPU) that triggers a re-plan
+ENV_REPLAN_MEMORY_MB = int(os.environ.get("DUALGPUOPT_REPLAN_MEMORY_MB", "512"))
+ENV_REPLAN_MEMORY_FRACTION = float(os.environ.get("DUALGPUOPT_REPLAN_MEMORY_FRACTION", "0.05"))
+# Thermal hysteresis band in Celsius: hot above the first, cool again below the second
+ENV_REPLAN_TEMP_HOT = float(os.environ.get("DUALGPUOPT_REPLAN_TEMP_HOT", "83"))
+ENV_REPLAN_TEMP_COOL = float(os.environ.get("DUALGPUOPT_REPLAN_TEMP_COOL", "75"))
+# Minimum seconds between two re-plans
+ENV_REPLAN_MIN_INTERVAL = float(os.environ.get("DUALGPUOPT_REPLAN_MIN_INTERVAL", "5.0"))
+
+# Delay that coalesces the burst of per-GPU events from one telemetry poll
+SETTLE_S = 0.05
+
+# Share of available memory a hot GPU is credited with when splitting
+THERMAL_DERATE = 0.8
+MAX_BATCH_SIZE = 64
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Split, context and batch recommendation for the current GPU state"""
+
+    gpu_indexes: tuple[int, ...]
+    split_ratio: tuple[float, ...]
+    context_length: int
+    batch_size: int
+    tensor_parallel_size: int
+    timestamp: float = 0.0
+
+    def same_as(self, other: Optional[Plan]) -> bool:
+        """Compare plans ignoring timestamps and sub-percent split jitter"""
+        if other is None:
+            return False
+        return (
+            self.gpu_indexes == other.gpu_indexes
+            and tuple(round(r, 2) for r in self.split_ratio)
+            == tuple(round(r, 2) for r in other.split_ratio)
+            and self.context_length == other.context_length
+            and self.batch_size == other.batch_size
+            and self.tensor_parallel_size == other.tensor_parallel_size
+        )
+
+
+@dataclass
+class _GPUState:
+    memory_used: int
+    memory_total: int
+    temperature: float
+
+    @property
+    def free(self) -> int:
+        return max(0, self.memory_total - self.memory_used)
+
+
+class SplitReplanner:
+    """
+    Background re-planner driven by ``GPUMetricsEvent`` telemetry
+
+    Telemetry callbacks only record state and decide whether a change is
+    material; the plan itself is computed on a worker thread, rate limited by
+    ``min_interval``.
+    """
+
+    def __init__(
+        self,
+        model: ModelParameters,
+        optimizer: Optional[Optimizer] = None,
+        bus: Any = None,
+        memory_threshold_mb: int = ENV_REPLAN_MEMORY_MB,
+        memory_threshold_fraction: float = ENV_REPLAN_MEMORY_FRACTION,
+        temp_hot: float = ENV_REPLAN_TEMP_HOT,
+        temp_cool: float = ENV_REPLAN_TEMP_COOL,
+        min_interval: float = ENV_REPLAN_MIN_INTERVAL,
+    ):
+        """
+        Initialize the re-planner
+
+        Args:
+        ----
+            model: Model to plan for
+            optimizer: Optimizer instance (defaults to the global optimizer)
+            bus: Event bus (defaults to the global event bus)
+            memory_threshold_mb: Absolute free-memory change that is material
+            memory_threshold_fraction: Free-memory change relative to total memory
+                that is material (the larger of the two thresholds applies)
+            temp_hot: Temperature at which a GPU is considered hot
+            temp_cool: Temperature below which a hot GPU is considered cool again
+            min_interval: Minimum seconds between two re-plans
+        """
+        if bus is None:
+            from dualgpuopt.services.event_bus import event_bus as bus
+
+        self.model = model
+        self.optimizer = optimizer or get_optimizer()
+        self.bus = bus
+        self.memory_threshold_mb = memory_threshold_mb
+        self.memory_threshold_fraction = memory_threshold_fraction
+        self.temp_hot = temp_hot
+        self.temp_cool = min(temp_cool, temp_hot)
+        self.min_interval = min_interval
+
+        self._lock = threading.Lock()
+        self._state: dict[int, _GPUState] = {}
+        self._hot: set[int] = set()
+        self._planned_free: dict[int, int] = {}
+        self._planned_hot: set[int] = set()
+        self._plan: Optional[Plan] = None
+        self._pending: Optional[Plan] = None
+        self._last_replan = 0.0
+
+        self._dirty = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.replan_count = 0
+
+    def start(self) -> None:
+        """Subscribe to telemetry and start the re-planning thread"""
+        if self._thread is not None:
+            return
+
+        from dualgpuopt.services.event_bus import GPUMetricsEvent
+
+        self.bus.subscribe_typed(GPUMetricsEvent, self._on_metrics)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="SplitReplanner")
+        self._thread.start()
+        logger.info(f"Started split re-planner for {self.model.name}")
+
+    def stop(self) -> None:
+        """Unsubscribe from telemetry and stop the re-planning thread"""
+        if self._thread is None:
+            return
+
+        from dualgpuopt.services.event_bus import GPUMetricsEvent
+
+        self.bus.unsubscribe_typed(GPUMetricsEvent, self._on_metrics)
+        self._stop_event.set()
+        self._dirty.set()
+        self._thread.join(timeout=2.0)
+        self._thread = None
+        logger.info("Stopped split re-planner")
+
+    @property
+    def current_plan(self) -> Optional[Plan]:
+        """The most recently computed plan"""
+        with self._lock:
+            return self._plan
+
+    def pop_pending_plan(self) -> Optional[Plan]:
+        """
+        Take the plan that changed since the last call, if any
+
+        Intended for the launcher to apply at its next restart window.
+        """
+        with self._lock:
+            plan, self._pending = self._pending, None
+            return plan
+
+    def _on_metrics(self, event: Any) -> None:
+        """Record a per-GPU telemetry sample and flag material changes"""
+        memory_total = getattr(event, "memory_total", 0)
+        if not memory_total:
+            return
+
+        gpu = event.gpu_index
+        with self._lock:
+            self._state[gpu] = _GPUState(
+                memory_used=event.memory_used,
+                memory_total=memory_total,
+                temperature=event.temperature,
+            )
+            if event.temperature >= self.temp_hot:
+                self._hot.add(gpu)
+            elif event.temperature <= self.temp_cool:
+                self._hot.discard(gpu)
+
+            material = self._is_material_locked()
+
+        if material:
+            self._dirty.set()
+
+    def _is_material_locked(self) -> bool:
+        """Whether the recorded state differs materially from the last plan"""
+        if self._plan is None or set(self._state) != set(self._planned_free):
+            return True
+        if self._hot != self._planned_hot:
+            return True
+        for gpu, state in self._state.items():
+            threshold = max(
+                self.memory_threshold_mb, state.memory_total * self.memory_threshold_fraction
+            )
+            if abs(state.free - self._planned_free[gpu]) >= threshold:
+                return True
+        return False
+
+    def _run(self) -> None:
+        """Worker loop: re-plan when flagged, at most once per ``min_interval``"""
+        while not self._stop_event.is_set():
+            self._dirty.wait()
+            if self._stop_event.is_set():
+                break
+
+            wait = max(SETTLE_S, self._last_replan + self.min_interval - time.monotonic())
+            if self._stop_event.wait(wait):
+                break
+
+            self._dirty.clear()
+            try:
+                self.replan()
+            except Exception as e:
+                logger.error(f"Error re-planning GPU split: {e}")
+
+    def replan(self) -> Optional[Plan]:
+        """
+        Recompute the plan from the latest telemetry
+
+        Returns
+        -------
+            The new plan if it changed, otherwise None
+        """
+        with self._lock:
+            states = dict(sorted(self._state.items()))
+            hot = set(self._hot)
+        if not states:
+            return None
+
+        self._last_replan = time.monotonic()
+        plan = self.compute_plan(states, hot)
+
+        with self._lock:
+            self._planned_free = {gpu: state.free for gpu, state in states.items()}
+            self._planned_hot = hot
+            if plan.same_as(self._plan):
+                return None
+            self._plan = plan
+            self._pending = plan
+            self.replan_count += 1
+
+        logger.info(
+            f"GPU plan changed: split {list(plan.split_ratio)}, "
+            f"context {plan.context_length}, batch {plan.batch_size}"
+        )
+        self._publish(plan)
+        return plan
+
+    def compute_plan(self, states: dict[int, _GPUState], hot: set[int]) -> Plan:
+        """
+        Build a plan for the given GPU states
+
+        Hot GPUs are credited with only part of their free memory so that the
+        split shifts load away from them.
+        """
+        gpus = [
+            GPUMemoryInfo(
+                gpu_id=gpu,
+                name=f"GPU {gpu}",
+                total_memory=state.memory_total,
+                available_memory=max(
+                    1, int(state.free * (THERMAL_DERATE if gpu in hot else 1.0))
+                ),
+                is_primary=gpu == 0,
+            )
+            for gpu, state in states.items()
+        ]
+        config = self.optimizer.optimize_gpu_split(self.model, gpus)
+
+        # Whatever KV memory remains after one full context goes to extra sequences
+        per_token_mb = self.optimizer.calculate_per_token_memory(self.model)
+        effective = sum(config.memory_per_gpu) * (
+            1 - self.optimizer.memory_overhead["safety_margin"]
+        )
+        batch = int(effective / max(per_token_mb * config.recommended_context_length, 1e-6))
+
+        return Plan(
+            gpu_indexes=tuple(gpu.gpu_id for gpu in gpus),
+            split_ratio=tuple(config.gpu_split),
+            context_length=config.recommended_context_length,
+            batch_size=max(1, min(MAX_BATCH_SIZE, batch)),
+            tensor_parallel_size=config.tensor_parallel_size,
+            timestamp=time.time(),
+        )
+
+    def _publish(self, plan: Plan) -> None:
+        """Publish a changed plan on the event bus"""
+        from dualgpuopt.services.event_bus import SplitCalculatedEvent
+
+        self.bus.publish_typed(
+            SplitCalculatedEvent(
+                source="replanner",
+                split_ratio=list(plan.split_ratio),
+                gpu_indexes=list(plan.gpu_indexes),
+                context_length=plan.context_length,
+                batch_size=plan.batch_size,
+            )
+        )
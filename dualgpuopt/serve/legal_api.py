@@ -8,6 +8,7 @@ import os
 import secrets
 import time
 import json
+import uuid
 import faiss
 from functools import lru_cache
 from typing import Any, Dict, Generator, List, Optional
@@ -17,6 +18,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
+from dualgpuopt import tracing
+
 # DualGPUOptimizer imports
 try:
     from dualgpuopt.engine.pool.core import EnginePool
@@ -183,9 +186,11 @@ def rag(prompt: str, k=3) -> str:
     try:
         # very simple cosine search
         import sentence_transformers
-        embedder = sentence_transformers.SentenceTransformer("all-MiniLM-L6-v2")
-        v = embedder.encode([prompt])
-        D, I = IDX.search(v, k)
+        with tracing.span("rag.embed", model="all-MiniLM-L6-v2"):
+            embedder = sentence_transformers.SentenceTransformer("all-MiniLM-L6-v2")
+            v = embedder.encode([prompt])
+        with tracing.span("rag.search", k=k):
+            D, I = IDX.search(v, k)
         cites = "\n".join(f"[{i}] {DOCS[i]['url']} – {DOCS[i]['excerpt']}" for i in I[0])
         return f"{cites}\n\nQuestion: {prompt}"
     except Exception as e:
@@ -296,31 +301,60 @@ async def chat(request: ChatRequest):
     # Log request
     logger.info(f"Received chat request: {request.prompt[:50]}...")
 
+    # The id follows the request through the engine for tracing and memory attribution
+    inference_id = uuid.uuid4().hex
+
+    # The request span outlives this handler: it ends when streaming finishes
+    span = tracing.span(
+        "chat",
+        prompt_chars=len(request.prompt),
+        use_rag=request.use_rag,
+        inference_id=inference_id,
+    )
     try:
-        # Get context from RAG if enabled
-        context = None
-        if request.use_rag and ENABLE_RAG:
-            context = rag(request.prompt)
-            if context:
-                logger.info("Retrieved context from FAISS")
-        
-        # Format the prompt with context
-        prompt = format_prompt(request.prompt, context and [context])
-        
+        with tracing.activate(span):
+            # Get context from RAG if enabled
+            context = None
+            if request.use_rag and ENABLE_RAG:
+                with tracing.span("rag"):
+                    context = rag(request.prompt)
+                if context:
+                    logger.info("Retrieved context from FAISS")
+
+            # Format the prompt with context
+            with tracing.span("format_prompt"):
+                prompt = format_prompt(request.prompt, context and [context])
+
         # Set max tokens
         max_tokens = min(request.max_tokens or MAX_TOKENS, MAX_TOKENS)
         
         # Create streaming response with SSE format
         async def _gen():
-            for tok in engine.stream(prompt, max_tokens=max_tokens, 
-                                    temperature=request.temperature or 0.7):
-                yield f"data: {tok}\n\n"
-                await asyncio.sleep(0.005)
+            tokens = 0
+            try:
+                with tracing.activate(span):
+                    stream = engine.stream(
+                        prompt,
+                        max_tokens=max_tokens,
+                        temperature=request.temperature or 0.7,
+                        inference_id=inference_id,
+                    )
+                for tok in stream:
+                    tokens += 1
+                    yield f"data: {tok}\n\n"
+                    await asyncio.sleep(0.005)
+            finally:
+                span.set(tokens=tokens)
+                span.end()
                 
-        return StreamingResponse(_gen(), media_type="text/event-stream")
+        return StreamingResponse(
+            _gen(), media_type="text/event-stream", headers={"X-Inference-ID": inference_id}
+        )
 
     except Exception as e:
         logger.error(f"Error processing chat request: {e}")
+        span.set(error=str(e))
+        span.end()
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
@@ -1 +1,6 @@
-from dualgpuopt.services.telemetry import GPUMetrics
+from dualgpuopt import _lazy
+
+# GPUMetrics needs Qt, so it is only imported when asked for
+__getattr__, __dir__ = _lazy.attach(
+    __name__, exports={"GPUMetrics": "dualgpuopt.services.telemetry"}
+)
@@ -68,6 +68,7 @@ class SplitCalculatedEvent(Event):
     split_ratio: list[float] = dataclasses.field(default_factory=list)
     gpu_indexes: list[int] = dataclasses.field(default_factory=list)
     context_length: int = 0
+    batch_size: int = 0
 
 
 @dataclasses.dataclass
@@ -0,0 +1,393 @@
+"""
+Lightweight request tracing for the serving path
+
+Spans are kept in a ``contextvars`` context, so nested ``with span(...)``
+blocks form a tree per request without passing anything around. Timestamps
+come from the monotonic clock and are converted to Unix time only on export.
+Finished spans go to an in-memory ring buffer and, when configured, to a
+JSONL file and an OTLP/HTTP collector.
+
+Only root spans are sampled (``DUALGPUOPT_TRACE_SAMPLE``, 0 by default);
+their children follow the root's decision. With sampling off, ``span()``
+costs one context variable lookup and returns a shared no-op span.
+
+Typical use::
+
+    with tracing.span("rag.search", k=3):
+        hits = index.search(query, k)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import Any, Iterator, Optional, Union
+
+logger = logging.getLogger("DualGPUOpt.Tracing")
+
+# Fraction of root spans that are recorded
+ENV_TRACE_SAMPLE = float(os.environ.get("DUALGPUOPT_TRACE_SAMPLE", "0"))
+# Append finished spans to this JSONL file
+ENV_TRACE_FILE = os.environ.get("DUALGPUOPT_TRACE_FILE", "")
+# OTLP/HTTP JSON traces endpoint, e.g. http://localhost:4318/v1/traces
+ENV_TRACE_OTLP = os.environ.get("DUALGPUOPT_TRACE_OTLP", "")
+# Finished spans kept in memory
+ENV_TRACE_BUFFER = int(os.environ.get("DUALGPUOPT_TRACE_BUFFER", "2048"))
+
+OTLP_BATCH_SIZE = 256
+OTLP_FLUSH_INTERVAL = 2.0  # seconds
+OTLP_QUEUE_MAX = 10_000
+
+# Offset from the monotonic clock to Unix time, fixed at import
+_EPOCH_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+_current: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar(
+    "dualgpuopt_span", default=None
+)
+
+
+class Span:
+    """A timed operation within a trace; entering it makes it the current span"""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "_tracer",
+        "_token",
+    )
+    recording = True
+
+    def __init__(
+        self,
+        tracer: Tracer,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        start_ns: Optional[int] = None,
+        attributes: Optional[dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.monotonic_ns() if start_ns is None else start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self._tracer = tracer
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes to the span"""
+        self.attributes.update(attributes)
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        """Finish the span and export it; later calls are ignored"""
+        if self.end_ns is None:
+            self.end_ns = time.monotonic_ns() if end_ns is None else end_ns
+            self._tracer.export(self)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_unix_ns": self.start_ns + _EPOCH_OFFSET_NS,
+            "end_unix_ns": None if self.end_ns is None else self.end_ns + _EPOCH_OFFSET_NS,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, _tb) -> None:
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        self.end()
+
+
+class _NoopSpan:
+    """Stand-in for spans that are not recorded"""
+
+    __slots__ = ()
+    recording = False
+    trace_id = span_id = parent_id = None
+
+    def set(self, **_attributes: Any) -> None: ...
+
+    def end(self, end_ns: Optional[int] = None) -> None: ...
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, *_exc) -> None: ...
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _UnsampledSpan(_NoopSpan):
+    """Root of an unsampled trace; keeps its children from being sampled anew"""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self) -> _UnsampledSpan:
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        _current.reset(self._token)
+
+
+AnySpan = Union[Span, _NoopSpan]
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list[Span], service_name: str = "dualgpuopt") -> dict[str, Any]:
+    """Encode finished spans as an OTLP/HTTP JSON ``ExportTraceServiceRequest``"""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": service_name}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "dualgpuopt.tracing"},
+                        "spans": [
+                            {
+                                "traceId": s.trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_id or "",
+                                "name": s.name,
+                                "kind": 1,  # SPAN_KIND_INTERNAL
+                                "startTimeUnixNano": str(s.start_ns + _EPOCH_OFFSET_NS),
+                                "endTimeUnixNano": str(s.end_ns + _EPOCH_OFFSET_NS),
+                                "attributes": [
+                                    {"key": k, "value": _otlp_value(v)}
+                                    for k, v in s.attributes.items()
+                                ],
+                                "status": {"code": 2 if "error" in s.attributes else 1},
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class OTLPExporter:
+    """Posts finished spans to an OTLP/HTTP JSON endpoint from a background thread"""
+
+    def __init__(self, endpoint: str, service_name: str = "dualgpuopt", timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=OTLP_QUEUE_MAX)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="OTLPExporter")
+        self._thread.start()
+
+    def submit(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            spans = [self._queue.get()]
+            deadline = time.monotonic() + OTLP_FLUSH_INTERVAL
+            while len(spans) < OTLP_BATCH_SIZE:
+                try:
+                    spans.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            body = json.dumps(to_otlp(spans, self.service_name)).encode()
+            request = urllib.request.Request(
+                self.endpoint, data=body, headers={"Content-Type": "application/json"}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+            except Exception as e:
+                self.dropped += len(spans)
+                logger.debug(f"OTLP export of {len(spans)} spans failed: {e}")
+
+
+class Tracer:
+    """Creates spans, makes the sampling decision and fans finished spans out"""
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        buffer_size: int = 2048,
+        jsonl_path: Optional[str] = None,
+        otlp_endpoint: Optional[str] = None,
+    ):
+        """
+        Initialize the tracer
+
+        Args:
+        ----
+            sample_rate: Fraction of root spans to record (0 disables tracing)
+            buffer_size: Finished spans kept in the in-memory ring buffer
+            jsonl_path: Optional file that finished spans are appended to
+            otlp_endpoint: Optional OTLP/HTTP JSON traces endpoint
+        """
+        self._lock = threading.Lock()
+        self.sample_rate = 0.0
+        self.buffer: deque = deque(maxlen=buffer_size)
+        self._jsonl_path: Optional[str] = None
+        self._jsonl = None
+        self._otlp: Optional[OTLPExporter] = None
+        self.configure(sample_rate, jsonl_path=jsonl_path, otlp_endpoint=otlp_endpoint)
+
+    def configure(
+        self,
+        sample_rate: Optional[float] = None,
+        buffer_size: Optional[int] = None,
+        jsonl_path: Optional[str] = None,
+        otlp_endpoint: Optional[str] = None,
+    ) -> None:
+        """Change settings at runtime; arguments left as None keep their value"""
+        with self._lock:
+            if sample_rate is not None:
+                self.sample_rate = min(1.0, max(0.0, sample_rate))
+            if buffer_size is not None:
+                self.buffer = deque(self.buffer, maxlen=buffer_size)
+            if jsonl_path is not None and jsonl_path != self._jsonl_path:
+                if self._jsonl is not None:
+                    self._jsonl.close()
+                    self._jsonl = None
+                self._jsonl_path = jsonl_path or None
+            if otlp_endpoint and (self._otlp is None or self._otlp.endpoint != otlp_endpoint):
+                self._otlp = OTLPExporter(otlp_endpoint)
+
+    def span(
+        self,
+        name: str,
+        parent: Optional[AnySpan] = None,
+        start_ns: Optional[int] = None,
+        **attributes: Any,
+    ) -> AnySpan:
+        """
+        Create a span under ``parent`` (the current span by default)
+
+        Use it as a context manager to make it current for the block, or
+        call :meth:`Span.end` explicitly when it has to outlive the block,
+        e.g. around a token stream.
+
+        Args:
+        ----
+            name: Operation name, dotted by component ("rag.search")
+            parent: Explicit parent, for spans recorded on another thread
+            start_ns: Monotonic start time, for spans recorded after the fact
+            **attributes: Span attributes
+
+        Returns:
+        -------
+            A recording span, or a no-op span when the trace is not sampled
+        """
+        if parent is None:
+            parent = _current.get()
+        if parent is None:
+            if self.sample_rate <= 0.0:
+                return NOOP_SPAN
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _UnsampledSpan()
+            trace_id = f"{random.getrandbits(128):032x}"
+            return Span(self, name, trace_id, None, start_ns, attributes)
+        if not parent.recording:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, start_ns, attributes)
+
+    def export(self, span: Span) -> None:
+        """Hand a finished span to the ring buffer and the configured exporters"""
+        self.buffer.append(span)
+        if self._jsonl_path is not None:
+            line = json.dumps(span.as_dict(), default=str)
+            with self._lock:
+                try:
+                    if self._jsonl is None:
+                        os.makedirs(os.path.dirname(self._jsonl_path) or ".", exist_ok=True)
+                        self._jsonl = open(self._jsonl_path, "a", encoding="utf-8", buffering=1)
+                    self._jsonl.write(line + "\n")
+                except OSError as e:
+                    logger.warning(f"Disabling JSONL trace output: {e}")
+                    self._jsonl_path = None
+        if self._otlp is not None:
+            self._otlp.submit(span)
+
+    def recent(self, trace_id: Optional[str] = None) -> list[dict[str, Any]]:
+        """Finished spans in the ring buffer, optionally of one trace"""
+        return [s.as_dict() for s in list(self.buffer) if trace_id in (None, s.trace_id)]
+
+
+tracer = Tracer(
+    ENV_TRACE_SAMPLE,
+    buffer_size=ENV_TRACE_BUFFER,
+    jsonl_path=ENV_TRACE_FILE or None,
+    otlp_endpoint=ENV_TRACE_OTLP or None,
+)
+
+
+def span(
+    name: str,
+    parent: Optional[AnySpan] = None,
+    start_ns: Optional[int] = None,
+    **attributes: Any,
+) -> AnySpan:
+    """Create a span with the global tracer; see :meth:`Tracer.span`"""
+    # Fast path for the common case of tracing being off
+    if tracer.sample_rate <= 0.0 and parent is None and _current.get() is None:
+        return NOOP_SPAN
+    return tracer.span(name, parent, start_ns, **attributes)
+
+
+def current_span() -> Optional[AnySpan]:
+    """The span of the running context, if any"""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def activate(active: Optional[AnySpan]) -> Iterator[Optional[AnySpan]]:
+    """Make an already started span current without ending it on exit"""
+    token = _current.set(active)
+    try:
+        yield active
+    finally:
+        _current.reset(token)
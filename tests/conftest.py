@@ -29,6 +29,9 @@ class FastMockBackend:
         return self._healthy
 
 
+FAST = FastMockBackend()
+
+
 @pytest.fixture(autouse=True)
 def patch_backend(monkeypatch):
     """
@@ -42,6 +45,7 @@ def patch_backend(monkeypatch):
         self.backend = FAST
 
     monkeypatch.setattr(Engine, "load", mock_load)
+    FAST._healthy = True
 
     # Patch CHECK_INT for faster watchdog tests
     try:
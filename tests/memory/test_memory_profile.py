@@ -1,7 +1,9 @@
 import concurrent.futures
 import unittest
 
-from dualgpuopt.memory.predictor import MemoryProfile
+import numpy as np
+
+from dualgpuopt.memory.predictor import MemoryProfile, find_optimal_batch
 
 
 class TestMemoryProfile(unittest.TestCase):
@@ -200,5 +202,57 @@ class TestMemoryProfile(unittest.TestCase):
         self.assertEqual(diff, expected_diff)
 
 
+class TestVectorizedEstimates(unittest.TestCase):
+    """Test suite for the vectorized grid and closed-form limit methods"""
+
+    def setUp(self):
+        """Set up a memory profile for testing"""
+        self.profile = MemoryProfile(
+            name="grid_profile",
+            base_usage=6 * 1024 * 1024 * 1024,
+            per_batch_usage=48 * 1024 * 1024,
+            per_token_usage=3 * 1024,
+        )
+        self.memory = np.linspace(4, 48, 23, dtype=np.int64) * 1024 * 1024 * 1024
+        self.tokens = np.array([0, 1, 128, 1000, 4096, 32768, 200_000])
+
+    def test_usage_grid_matches_scalar(self):
+        """Test that each grid cell equals estimate_usage"""
+        batches = [0, 1, 3, 16, 64]
+        grid = self.profile.estimate_usage_grid(batches, self.tokens, 1.5)
+        self.assertEqual(grid.shape, (len(batches), len(self.tokens)))
+        for i, batch in enumerate(batches):
+            for j, tokens in enumerate(self.tokens):
+                self.assertEqual(grid[i, j], self.profile.estimate_usage(batch, tokens, 1.5))
+
+    def test_limits_match_scalar(self):
+        """Test the closed-form limits against the cached scalar methods"""
+        batches = self.profile.max_batch_sizes(self.memory[:, None], self.tokens[None, :])
+        lengths = self.profile.max_sequence_lengths(self.memory[:, None], [[1, 8, 64]])
+        self.assertEqual(batches.shape, (len(self.memory), len(self.tokens)))
+        for i, memory in enumerate(self.memory):
+            for j, tokens in enumerate(self.tokens):
+                self.assertEqual(batches[i, j], self.profile.max_batch_size(memory, tokens))
+            for j, batch in enumerate([1, 8, 64]):
+                self.assertEqual(lengths[i, j], self.profile.max_sequence_length(memory, batch))
+
+    def test_degenerate_profile(self):
+        """Test the defaults of a profile without batch or token cost"""
+        profile = MemoryProfile("empty", 0, 0, 0)
+        np.testing.assert_array_equal(profile.max_batch_sizes(self.memory, 512), 1)
+        np.testing.assert_array_equal(profile.max_sequence_lengths(self.memory, 4), 2048)
+
+    def test_find_optimal_batch_unchanged(self):
+        """Test that the optimal batch search agrees with the scalar limits"""
+        lengths = [512, 1024, 2048, 4096]
+        memory = 24 * 1024 * 1024 * 1024
+        batch, seq_len = find_optimal_batch(memory, self.profile, lengths)
+        effective = int(memory * 0.9)
+        expected = max(lengths, key=lambda t: self.profile.max_batch_size(effective, t) * t)
+        self.assertEqual(seq_len, expected)
+        self.assertEqual(batch, self.profile.max_batch_size(effective, expected))
+        self.assertEqual(find_optimal_batch(memory, self.profile, []), (1, 1024))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,112 @@
+import time
+import unittest
+
+import numpy as np
+
+from dualgpuopt.memory.profiler import MemoryEvent, MemoryEventType, MemorySession
+from dualgpuopt.memory.timeline import RunningRegression, RunningStats, TimelineBuffer
+
+
+class TestTimelineBuffer(unittest.TestCase):
+    """Test suite for the fixed-capacity timeline ring buffer"""
+
+    def test_wraps_in_order(self):
+        """Test that the oldest samples are dropped and order is kept"""
+        buf = TimelineBuffer(4, ("used", "free"))
+        for i in range(10):
+            buf.append(float(i), i * 10, -i)
+
+        self.assertEqual(len(buf), 4)
+        np.testing.assert_array_equal(buf.timestamps(), [6, 7, 8, 9])
+        np.testing.assert_array_equal(buf.values(), [60, 70, 80, 90])
+        np.testing.assert_array_equal(buf.values("free"), [-6, -7, -8, -9])
+        self.assertEqual(buf[0], (6.0, 60.0, -6.0))
+        self.assertEqual(buf[-1], (9.0, 90.0, -9.0))
+        self.assertEqual([row[0] for row in buf], [6.0, 7.0, 8.0, 9.0])
+        with self.assertRaises(IndexError):
+            buf[4]
+
+    def test_partial_and_clear(self):
+        """Test a buffer that has not wrapped yet and clearing it"""
+        buf = TimelineBuffer(8)
+        buf.append(1.0, 5)
+        buf.append(2.0, 6)
+        self.assertEqual(buf[-1], (2.0, 6.0))
+        np.testing.assert_array_equal(buf.values(), [5, 6])
+        buf.clear()
+        self.assertEqual(len(buf), 0)
+        self.assertEqual(list(buf), [])
+
+
+class TestRunningStatistics(unittest.TestCase):
+    """Test suite for the per-sample statistics"""
+
+    def test_running_stats(self):
+        """Test count, min, max and mean"""
+        stats = RunningStats()
+        for value in [3, 1, 4, 1, 5]:
+            stats.add(value)
+        self.assertEqual((stats.count, stats.min, stats.max), (5, 1, 5))
+        self.assertAlmostEqual(stats.mean, 2.8)
+
+    def test_regression_matches_polyfit(self):
+        """Test the sliding slope against a full refit on epoch timestamps"""
+        rng = np.random.default_rng(0)
+        window = 20
+        trend = RunningRegression(window)
+        start = time.time()
+        xs, ys = [], []
+        for i in range(1000):
+            x = start + 0.5 * i
+            y = 8e9 + 3e5 * i + rng.normal(0, 1e6)
+            xs.append(x)
+            ys.append(y)
+            trend.add(x, y)
+            if i >= window - 1 and i % 37 == 0:
+                expected = np.polyfit(np.array(xs[-window:]) - start, ys[-window:], 1)[0]
+                self.assertAlmostEqual(trend.slope / expected, 1.0, places=6)
+
+        self.assertTrue(trend.full)
+        self.assertEqual(trend.delta, ys[-1] - ys[-window])
+
+    def test_regression_degenerate(self):
+        """Test that an undefined slope is reported as zero"""
+        trend = RunningRegression(5)
+        self.assertEqual(trend.slope, 0.0)
+        trend.add(1.0, 10.0)
+        trend.add(1.0, 20.0)
+        self.assertEqual(trend.slope, 0.0)
+
+
+class TestMemorySession(unittest.TestCase):
+    """Test suite for bounded profiling sessions"""
+
+    def test_bounded_history_full_stats(self):
+        """Test that retained samples are capped while statistics cover everything"""
+        session = MemorySession(session_id="s", start_time=0.0, history_size=50)
+        for i in range(500):
+            for gpu_id in (0, 1):
+                session.record_sample(gpu_id, float(i), 1000 + i, 9000 - i, 10000)
+
+        self.assertEqual(len(session.timelines[0]), 50)
+        self.assertEqual(session.memory_stats[0].count, 500)
+        self.assertEqual(session.memory_stats[1].min, 1000)
+        self.assertEqual(session.memory_stats[1].max, 1499)
+
+        snapshots = session.snapshots
+        self.assertEqual(len(snapshots), 50)
+        self.assertEqual(snapshots[0].timestamp, 450.0)
+        self.assertEqual(snapshots[-1].memory[1].used_memory, 1499)
+
+    def test_event_counts_outlive_event_buffer(self):
+        """Test that event counts include events dropped from the buffer"""
+        session = MemorySession(session_id="s", start_time=0.0)
+        session.events = type(session.events)(maxlen=3)
+        for i in range(10):
+            session.record_event(MemoryEvent(float(i), MemoryEventType.ALLOCATION, 0, 1))
+        self.assertEqual(len(session.events), 3)
+        self.assertEqual(session.event_counts["ALLOCATION"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import csv
+import json
+import struct
+import time
+
+from dualgpuopt.commands.plan import (
+    ManifestEntry,
+    load_gpus,
+    main,
+    parse_manifest,
+    plan_manifest,
+    read_gguf_metadata,
+    read_model_info,
+)
+
+GPUS = [
+    {"name": "RTX 4090", "memory_total": 24576},
+    {"name": "RTX 4080", "memory_total": 16384},
+]
+
+
+def _string(text):
+    data = text.encode()
+    return struct.pack("<Q", len(data)) + data
+
+
+def _write_gguf(path, padding=1024):
+    u32 = lambda v: struct.pack("<I", 4) + struct.pack("<I", v)  # noqa: E731
+    kvs = [
+        ("general.architecture", struct.pack("<I", 8) + _string("llama")),
+        ("general.file_type", u32(15)),
+        ("llama.block_count", u32(32)),
+        ("llama.attention.head_count", u32(32)),
+        ("llama.attention.head_count_kv", u32(8)),
+        ("llama.embedding_length", u32(4096)),
+        ("llama.context_length", u32(8192)),
+        ("tokenizer.ggml.tokens", struct.pack("<IIQ", 9, 8, 1) + _string("a")),
+    ]
+    with open(path, "wb") as f:
+        f.write(b"GGUF" + struct.pack("<IQQ", 3, 0, len(kvs)))
+        for key, value in kvs:
+            f.write(_string(key) + value)
+        f.write(b"\0" * padding)
+
+
+def test_parse_manifest_expands_quant_variants():
+    text = "meta-llama/Llama-2-7b-hf q4_k_m Q8_0  # two variants\n\nmistral-7b.Q5_K_M.gguf\n"
+    entries = parse_manifest(text)
+    assert [(e.model, e.quant) for e in entries] == [
+        ("meta-llama/Llama-2-7b-hf", "q4_k_m"),
+        ("meta-llama/Llama-2-7b-hf", "Q8_0"),
+        ("mistral-7b.Q5_K_M.gguf", None),
+    ]
+    rows = parse_manifest("model,quant,size_gb\nx/custom,awq;gptq,3.5\n", "csv")
+    assert [(e.quant, e.size_gb) for e in rows] == [("awq", 3.5), ("gptq", 3.5)]
+
+
+def test_gguf_metadata_drives_the_plan(tmp_path):
+    path = tmp_path / "Meta-Llama-3-8B.gguf"
+    _write_gguf(path)
+    metadata = read_gguf_metadata(str(path))
+    assert metadata["llama.block_count"] == 32
+    assert not any(key.startswith("tokenizer.") for key in metadata)
+
+    info = read_model_info(ManifestEntry(str(path), size_gb=4.6))
+    assert (info.format, info.source, info.quant, info.n_ctx_train) == (
+        "gguf",
+        "gguf",
+        "q4_k_m",
+        8192,
+    )
+    # 2 (K and V) x 32 layers x 8 KV heads x 128 head dim x 2 bytes
+    assert info.kv_bytes_per_token == 131072
+
+    (row,) = plan_manifest([ManifestEntry(str(path), size_gb=4.6)], GPUS)
+    assert row.error is None and row.backend == "llama.cpp"
+    assert row.llama_fits and row.llama_ctx_size == 8192  # capped at the trained context
+    assert "--tensor-split 0.60,0.40" in row.llama_command
+    assert row.vllm_max_model_len == 8192
+
+
+def test_plan_500_entries_in_seconds():
+    ids = [
+        "meta-llama/Llama-2-7b-hf",
+        "meta-llama/Llama-2-70b-hf",
+        "mistralai/Mixtral-8x7B-v0.1",
+        "TheBloke/Llama-2-13B-AWQ",
+    ]
+    quants = ("q4_k_m", None)
+    entries = [ManifestEntry(ids[i % 4], quants[i // 4 % 2]) for i in range(500)]
+
+    start = time.perf_counter()
+    rows = plan_manifest(entries, load_gpus("mock"))
+    assert time.perf_counter() - start < 5.0
+
+    assert [row.model for row in rows] == [e.model for e in entries]
+    assert not [row.error for row in rows if row.error]
+    by_key = {(row.model, row.quant): row for row in rows}
+    awq = by_key[("TheBloke/Llama-2-13B-AWQ", "awq")]
+    assert awq.backend == "vllm" and awq.vllm_quantization == "awq"
+    assert "--quantization awq" in awq.vllm_command
+    # A 70B model does not fit 40 GB in fp16, nor in 4-bit GGUF
+    big = by_key[("meta-llama/Llama-2-70b-hf", "f16")]
+    assert big.vllm_fits is False and big.vllm_command is None
+    gguf = by_key[("meta-llama/Llama-2-70b-hf", "q4_k_m")]
+    assert gguf.llama_fits is False and gguf.llama_command is None
+
+
+def test_cli_json_inventory_and_csv_output(tmp_path):
+    manifest = tmp_path / "models.json"
+    manifest.write_text(
+        json.dumps({"models": ["mistral-7b-instruct", {"model": "no-size-here"}]})
+    )
+    inventory = tmp_path / "gpus.json"
+    inventory.write_text(json.dumps({"gpus": [{"memory_gb": 24}, {"memory_gb": 24}]}))
+    out = tmp_path / "plans.csv"
+
+    assert main([str(manifest), "--gpus", str(inventory), "-o", str(out)]) == 1
+    rows = list(csv.DictReader(out.open()))
+    assert [row["model"] for row in rows] == ["mistral-7b-instruct", "no-size-here"]
+    assert rows[0]["vllm_tensor_parallel_size"] == "2" and not rows[0]["error"]
+    assert "set size_gb or params_b" in rows[1]["error"]
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import numpy as np
+
+from dualgpuopt.engine import bench_report
+from dualgpuopt.engine.bench_report import analyze_series, change_points, compare_samples
+from dualgpuopt.engine.benchmark import BenchmarkDB
+
+
+def _noisy(level, n, rng):
+    return list(level + rng.normal(0, 1.0, n))
+
+
+def test_regression_is_found_beyond_noise():
+    rng = np.random.default_rng(1)
+    values = _noisy(100, 60, rng) + _noisy(88, 30, rng)
+    analysis = analyze_series(values, timestamps=list(range(1000, 1090)))
+
+    assert analysis.regression is not None
+    assert abs(analysis.regression.index - 60) <= 1
+    assert 10 < analysis.regression.drop_pct < 14
+    assert analysis.regression.timestamp == 1000 + analysis.regression.index
+    assert abs(analysis.latest_median - 88) < 2
+
+    # Pure noise and improvements are not regressions
+    assert change_points(_noisy(100, 200, rng)) == []
+    improved = analyze_series(_noisy(100, 40, rng) + _noisy(120, 40, rng))
+    assert improved.change_points and improved.regression is None
+
+
+def test_compare_samples_significance():
+    rng = np.random.default_rng(2)
+    base = _noisy(100, 20, rng)
+    faster = compare_samples(base, _noisy(104, 20, rng))
+    assert faster.significant and faster.p_value < 0.01
+    assert 2 < faster.delta_pct < 6
+
+    same = compare_samples(base, _noisy(100, 20, rng))
+    assert not same.significant
+
+
+def test_report_uses_covering_series_index(tmp_path, capsys):
+    db = BenchmarkDB(str(tmp_path / "bench.db"))
+    rng = np.random.default_rng(3)
+    stable = {"batch_size": 8}
+    regressed = _noisy(50, 20, rng) + _noisy(40, 20, rng)
+    for a, b in zip(_noisy(100, 40, rng), regressed):
+        db.submit_benchmark("m.gguf", "llama.cpp", a, config=stable)
+        db.submit_benchmark("m.gguf", "llama.cpp", b)
+    db.flush()
+    conn = db._connect()
+    conn.execute("UPDATE benchmarks SET timestamp = id")
+    conn.commit()
+
+    plan = " ".join(
+        row[3]
+        for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT timestamp, tokens_per_second FROM benchmarks "
+            "WHERE model_id = 1 AND timestamp >= 0 ORDER BY timestamp DESC, id DESC LIMIT 10"
+        )
+    )
+    assert "COVERING INDEX idx_benchmarks_series" in plan and "TEMP B-TREE" not in plan
+
+    series = db.get_series("m.gguf", "llama.cpp", stable, limit=5)
+    assert len(series) == 5 and series == sorted(series)
+
+    rows = bench_report.report(db)
+    assert [r["config"] for r in rows] == [None, stable]
+    assert rows[0]["analysis"].regression is not None
+    assert rows[1]["analysis"].regression is None
+
+    assert bench_report.main(["--db", db.db_path, "report"]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    compare = ["compare", "m.gguf", "llama.cpp", "--b", '{"batch_size": 8}']
+    assert bench_report.main(["--db", db.db_path, *compare]) == 0
+    assert "significant" in capsys.readouterr().out
+    db.close()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import math
+
+from dualgpuopt.engine.backend import Engine
+from dualgpuopt.engine.bench_runner import BenchmarkRunner, StubBackend, confidence_halfwidth
+from dualgpuopt.engine.benchmark import BenchmarkDB
+
+
+def test_stub_sweep_is_stored_and_converges(tmp_path):
+    engine = Engine()
+    engine.backend = StubBackend(ttft_s=0.01, itl_s=0.002, slots=4)
+    db = BenchmarkDB(str(tmp_path / "bench.db"))
+    runner = BenchmarkRunner(
+        engine,
+        "stub",
+        warmup=1,
+        min_trials=3,
+        max_trials=12,
+        rel_ci=0.25,
+        memory_fn=engine.backend.memory_used_mb,
+        db=db,
+    )
+
+    single, concurrent = runner.sweep([64], [16], concurrency=[1, 4], batch_sizes=[4])
+    engine.unload()
+
+    for result in (single, concurrent):
+        assert result.converged and 3 <= result.trials <= 12
+        assert result.ttft_ms >= 10
+        assert 2 <= result.itl_p50_ms <= result.itl_p90_ms <= result.itl_p99_ms
+        assert result.memory_peak_mb > 4000
+    # Four concurrent streams fit the stub's slots and overlap
+    assert concurrent.tokens_per_second > 2 * single.tokens_per_second
+
+    rows = db.get_model_benchmarks("stub")
+    assert {r["concurrency"] for r in rows} == {1, 4}
+    stored = next(r for r in rows if r["concurrency"] == 4)
+    assert stored["trials"] == concurrent.trials
+    assert stored["itl_p99_ms"] == concurrent.itl_p99_ms
+    assert stored["batch_size"] == 4
+    db.close()
+
+
+def test_confidence_halfwidth():
+    assert math.isinf(confidence_halfwidth([1.0]))
+    assert confidence_halfwidth([10.0, 10.0, 10.0]) == 0.0
+    # t(1) = 12.706, stdev = sqrt(2)
+    assert math.isclose(confidence_halfwidth([1.0, 3.0]), 12.706)
+
+
+def test_batch_size_override_lasts_one_config():
+    engine = Engine()
+    engine.backend = StubBackend(ttft_s=0.001, itl_s=0.001, slots=4)
+    scheduler = engine.get_scheduler()
+    default = scheduler.max_batch_size
+    runner = BenchmarkRunner(engine, "stub", warmup=0, min_trials=2, max_trials=2)
+    limits = []
+    trial = runner._trial
+
+    def recording_trial(config):
+        limits.append((config.batch_size, scheduler.max_batch_size))
+        return trial(config)
+
+    runner._trial = recording_trial
+    runner.sweep([8], [4], concurrency=[2], batch_sizes=[1, None])
+    engine.unload()
+
+    assert default != 1
+    assert limits == [(1, 1), (1, 1), (None, default), (None, default)]
+    assert scheduler.max_batch_size == scheduler.batcher.max_batch_size == default
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+from dualgpuopt.engine.benchmark import MIGRATIONS, BenchmarkDB
+
+
+_OLD_BENCHMARKS = """
+    CREATE TABLE IF NOT EXISTS benchmarks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        model_id INTEGER NOT NULL, timestamp INTEGER NOT NULL,
+        tokens_per_second REAL NOT NULL, gpu_utilization REAL, memory_used REAL,
+        latency_ms REAL, prompt_tokens INTEGER, output_tokens INTEGER,
+        temperature REAL, batch_size INTEGER, context_size INTEGER,
+        FOREIGN KEY (model_id) REFERENCES models(id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_benchmarks_model_id ON benchmarks(model_id);
+    CREATE INDEX IF NOT EXISTS idx_benchmarks_timestamp ON benchmarks(timestamp);
+"""
+
+
+def _legacy_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE models(
+            id INTEGER PRIMARY KEY, model TEXT, backend TEXT, cfg TEXT,
+            UNIQUE(model,backend,cfg)
+        );
+        CREATE TABLE bench(
+            id INTEGER PRIMARY KEY, mid INT, ts INT, tok REAL, util REAL, mem REAL
+        );
+        INSERT INTO models VALUES (7, 'old.gguf', 'llama.cpp', NULL);
+        INSERT INTO bench(mid, ts, tok, util, mem) VALUES (7, 1000, 42.0, 80.0, 5000.0);
+        INSERT INTO bench(mid, ts, tok, util, mem) VALUES (7, 2000, 44.0, 81.0, 5100.0);
+        """
+    )
+    # The former BenchmarkDB then added its own table next to the legacy ones
+    conn.executescript(_OLD_BENCHMARKS)
+    conn.commit()
+    conn.close()
+
+
+def test_legacy_schema_is_migrated(tmp_path):
+    path = str(tmp_path / "bench.db")
+    _legacy_db(path)
+
+    db = BenchmarkDB(path)
+    rows = db.get_model_benchmarks("old.gguf")
+    assert [r["tokens_per_second"] for r in rows] == [44.0, 42.0]
+    assert rows[0]["memory_used"] == 5100.0
+    assert db.schema_version == len(MIGRATIONS)
+
+    # New records land next to the migrated ones under the same model
+    db.add_benchmark("old.gguf", "llama.cpp", 50.0)
+    db.add_benchmark("old.gguf", "llama.cpp", 51.0)
+    conn = db._connect()
+    assert conn.execute("SELECT COUNT(*) FROM models").fetchone()[0] == 1
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert "bench" not in tables and "legacy_models" not in tables
+    # The foreign key still resolves once it is enforced
+    conn.execute("PRAGMA foreign_keys=ON")
+    db.add_benchmark("old.gguf", "llama.cpp", 52.0)
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    db.close()
+
+    # Reopening does not migrate again
+    assert BenchmarkDB(path).get_latest_benchmark("old.gguf")["tokens_per_second"] == 52.0
+
+
+def _assert_folded(db, expected_tps):
+    rows = db.get_model_benchmarks("old.gguf")
+    assert sorted(r["tokens_per_second"] for r in rows) == expected_tps
+    conn = db._connect()
+    models = conn.execute("SELECT id, config FROM models").fetchall()
+    assert [tuple(m) for m in models] == [(3, "")]
+    assert conn.execute("SELECT COUNT(*) FROM benchmarks WHERE model_id != 3").fetchone()[0] == 0
+    db.add_benchmark("old.gguf", "llama.cpp", 50.0)
+    assert conn.execute("SELECT COUNT(*) FROM models").fetchone()[0] == 1
+
+
+def test_legacy_duplicate_null_cfg_models_are_folded(tmp_path):
+    path = str(tmp_path / "bench.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE models(
+            id INTEGER PRIMARY KEY, model TEXT, backend TEXT, cfg TEXT,
+            UNIQUE(model,backend,cfg)
+        );
+        CREATE TABLE bench(
+            id INTEGER PRIMARY KEY, mid INT, ts INT, tok REAL, util REAL, mem REAL
+        );
+        INSERT INTO models VALUES (3, 'old.gguf', 'llama.cpp', NULL);
+        INSERT INTO models VALUES (4, 'old.gguf', 'llama.cpp', NULL);
+        INSERT INTO models VALUES (5, 'old.gguf', 'llama.cpp', NULL);
+        INSERT INTO bench(mid, ts, tok, util, mem) VALUES (3, 1000, 40.0, 80.0, 5000.0);
+        INSERT INTO bench(mid, ts, tok, util, mem) VALUES (4, 2000, 41.0, 80.0, 5000.0);
+        INSERT INTO bench(mid, ts, tok, util, mem) VALUES (5, 3000, 42.0, 80.0, 5000.0);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    db = BenchmarkDB(path)
+    _assert_folded(db, [40.0, 41.0, 42.0])
+    assert db.schema_version == len(MIGRATIONS)
+    db.close()
+
+
+def test_old_benchmark_db_duplicate_null_configs_are_folded(tmp_path):
+    path = str(tmp_path / "bench.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE models (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model_path TEXT NOT NULL, backend TEXT NOT NULL, config TEXT,
+            UNIQUE(model_path, backend, config)
+        );
+        CREATE TABLE benchmarks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model_id INTEGER NOT NULL, timestamp INTEGER NOT NULL,
+            tokens_per_second REAL NOT NULL, gpu_utilization REAL, memory_used REAL,
+            latency_ms REAL, prompt_tokens INTEGER, output_tokens INTEGER,
+            temperature REAL, batch_size INTEGER, context_size INTEGER
+        );
+        INSERT INTO models VALUES (3, 'old.gguf', 'llama.cpp', NULL);
+        INSERT INTO models VALUES (4, 'old.gguf', 'llama.cpp', NULL);
+        INSERT INTO benchmarks (model_id, timestamp, tokens_per_second) VALUES (3, 1000, 40.0);
+        INSERT INTO benchmarks (model_id, timestamp, tokens_per_second) VALUES (4, 2000, 41.0);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    db = BenchmarkDB(path)
+    _assert_folded(db, [40.0, 41.0])
+    db.close()
+
+
+def test_migrated_configs_match_new_records(tmp_path):
+    path = str(tmp_path / "bench.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE models(
+            id INTEGER PRIMARY KEY, model TEXT, backend TEXT, cfg TEXT,
+            UNIQUE(model,backend,cfg)
+        );
+        CREATE TABLE bench(
+            id INTEGER PRIMARY KEY, mid INT, ts INT, tok REAL, util REAL, mem REAL
+        );
+        INSERT INTO models VALUES (3, 'old.gguf', 'llama.cpp', '{"ctx": 4096, "batch": 8}');
+        INSERT INTO models VALUES (4, 'old.gguf', 'llama.cpp', '{"batch": 8, "ctx": 4096}');
+        INSERT INTO bench(mid, ts, tok, util, mem) VALUES (3, 1000, 40.0, 80.0, 5000.0);
+        INSERT INTO bench(mid, ts, tok, util, mem) VALUES (4, 2000, 41.0, 80.0, 5000.0);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    db = BenchmarkDB(path)
+    db.add_benchmark("old.gguf", "llama.cpp", 50.0, config={"ctx": 4096, "batch": 8})
+    conn = db._connect()
+    assert [tuple(r) for r in conn.execute("SELECT id FROM models")] == [(3,)]
+    assert conn.execute("SELECT COUNT(*) FROM benchmarks WHERE model_id = 3").fetchone()[0] == 3
+    db.close()
+
+
+def test_background_writer_batches_off_the_caller_thread(tmp_path):
+    db = BenchmarkDB(str(tmp_path / "bench.db"))
+
+    def submit(worker):
+        for i in range(100):
+            db.submit_benchmark(f"m{worker}", "hf", float(i), batch_size=4)
+
+    threads = [threading.Thread(target=submit, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Submitting never opened a connection in the calling thread
+    assert getattr(db._local, "conn", None) is None
+    assert db.flush()
+    conn = db._connect()
+    assert conn is db._connect()
+    assert conn.execute("SELECT COUNT(*) FROM benchmarks").fetchone()[0] == 400
+    assert db.get_fastest_models(1)[0]["max_tokens_per_second"] == 99.0
+    db.close()
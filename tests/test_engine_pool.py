@@ -26,3 +26,226 @@ def test_auto_restart():
         e.backend._healthy = False
         time.sleep(0.11)  # > CHECK_INT stubbed = 0.1 s
     assert EnginePool.get_stats()["auto_restarts"] >= 1
+
+
+def test_single_flight_load(monkeypatch):
+    import threading
+
+    from dualgpuopt.engine import pool
+    from dualgpuopt.engine.backend import Engine
+
+    delays = {"slow": 0.5, "fast": 0.0}
+    loads = []
+
+    class DelayedBackend:
+        def __init__(self, name):
+            time.sleep(delays[name])
+            loads.append(name)
+
+        def health(self):
+            return True
+
+        def unload(self): ...
+
+    def delayed_load(self, path_or_id, **_kw):
+        self.backend = DelayedBackend(path_or_id)
+
+    monkeypatch.setattr(Engine, "load", delayed_load)
+    monkeypatch.setattr(pool, "_ping_backend", lambda eng: eng.backend.health())
+    EnginePool.clear()
+
+    EnginePool.get("fast")
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(EnginePool.get("slow"))) for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+
+    # A cached model is served while another model is loading
+    start = time.perf_counter()
+    EnginePool.get("fast")
+    assert time.perf_counter() - start < 0.1
+
+    for t in threads:
+        t.join()
+    assert loads == ["fast", "slow"]
+    assert len(results) == 5 and all(eng is results[0] for eng in results)
+    assert EnginePool.get_stats()["coalesced_loads"] >= 4
+
+
+def test_cost_aware_eviction_and_admission(monkeypatch, tmp_path):
+    import pytest
+
+    from dualgpuopt.engine import pool
+    from dualgpuopt.engine.backend import Engine
+
+    # Sparse model files: the file size is the footprint, the name sets the load time
+    sizes_mb = {"big": 16000, "small1": 4000, "small2": 4000, "medium": 8000, "huge": 30000}
+    load_s = {"big": 0.2, "small1": 0.01, "small2": 0.01, "medium": 0.01, "huge": 0.01}
+    paths = {}
+    for name, mb in sizes_mb.items():
+        path = tmp_path / f"{name}.gguf"
+        with open(path, "wb") as f:
+            f.truncate(mb * 1024 * 1024)
+        paths[name] = str(path)
+
+    used = {"mb": 0}
+
+    class SizedBackend:
+        def __init__(self, name):
+            time.sleep(load_s[name])
+            self.mb = sizes_mb[name]
+            used["mb"] += self.mb
+
+        def health(self):
+            return True
+
+        def unload(self):
+            used["mb"] -= self.mb
+
+    def sized_load(self, path_or_id, **_kw):
+        self.backend = SizedBackend(path_or_id.rsplit("/", 1)[-1][: -len(".gguf")])
+
+    monkeypatch.setattr(Engine, "load", sized_load)
+    monkeypatch.setattr(pool, "_ping_backend", lambda eng: eng.backend.health())
+    monkeypatch.setattr(pool, "_gpu_memory", lambda: {0: (used["mb"], 24000)})
+    monkeypatch.setattr(pool, "VRAM_RESERVE_MB", 0)
+    monkeypatch.setattr(pool, "_footprints", {})
+    EnginePool.clear()
+    EnginePool.set_max_size(4)
+    time.sleep(0.05)
+    used["mb"] = 0
+
+    for name in ("big", "small1", "small2"):
+        EnginePool.get(paths[name])
+    assert EnginePool.get_stats()["vram_mb"] == {0: 24000}
+
+    # The slow-to-reload big model survives although it is the oldest
+    EnginePool.get(paths["medium"])
+    models = EnginePool.get_stats()["models"]
+    assert paths["big"] in models and paths["medium"] in models
+    assert paths["small1"] not in models and paths["small2"] not in models
+
+    # A model larger than the GPU is rejected without evicting anything
+    with pytest.raises(MemoryError):
+        EnginePool.get(paths["huge"])
+    assert EnginePool.get_stats()["models"] == models
+    assert EnginePool.get_stats()["rejected_loads"] >= 1
+
+    EnginePool.set_max_size(2)
+
+
+def test_hot_path_uses_cached_health(monkeypatch):
+    from dualgpuopt.engine import pool
+    from dualgpuopt.engine.backend import Engine, LlamaCppBackend
+
+    ping_backend = pool._ping_backend
+    pings = []
+    monkeypatch.setattr(pool, "_ping_backend", lambda eng: pings.append(eng) or True)
+    EnginePool.clear()
+
+    EnginePool.get("cached")
+    EnginePool.get("cached")
+    assert pings == []
+
+    # A stale verdict is re-probed once, then cached again
+    ent = EnginePool._cache.peek("cached")
+    ent.health.checked -= pool.HEALTH_TTL + 1
+    EnginePool.get("cached")
+    EnginePool.get("cached")
+    assert len(pings) == 1
+
+    # An open breaker fails fast without probing
+    for _ in range(pool.MAX_FAIL):
+        ent.health.record(False)
+    assert not EnginePool._healthy(ent)
+    assert len(pings) == 1
+
+    # Server backends are probed on their own port at the application level
+    probes = []
+    monkeypatch.setattr(pool, "_http_ok", lambda port, path: probes.append((port, path)) or True)
+    eng = Engine()
+    eng.backend = LlamaCppBackend()
+    eng.backend.port = 8001
+    assert ping_backend(eng)
+    assert probes == [(8001, "/health")]
+
+
+def test_failed_half_open_probe_reopens_the_breaker(monkeypatch):
+    from dualgpuopt.engine import pool
+
+    class LockedHealth(pool._Health):
+        def record(self, ok):
+            assert pool._pool_lock.locked()
+            super().record(ok)
+
+    monkeypatch.setattr(pool, "_ping_backend", lambda eng: False)
+    ent = pool._Entry(engine=None, model_path="flaky", kwargs={}, health=LockedHealth())
+    for _ in range(pool.MAX_FAIL):
+        EnginePool._probe(ent)
+    assert ent.health.is_open()
+
+    # The cooldown passes and the half-open probe fails again
+    ent.health.opened -= pool.BREAKER_COOLDOWN + 1
+    assert not ent.health.is_open()
+    assert not EnginePool._healthy(ent)
+    assert ent.health.is_open()
+    assert time.monotonic() - ent.health.opened < 1.0
+
+
+def test_supervised_restarts_run_outside_the_lock(monkeypatch):
+    import pytest
+
+    from dualgpuopt.engine import pool
+    from dualgpuopt.engine.backend import Engine
+
+    fail = {"on": False}
+
+    class SlowBackend:
+        def __init__(self):
+            time.sleep(0.3)
+            if fail["on"]:
+                raise RuntimeError("backend crashed on start")
+
+        def health(self):
+            return True
+
+        def unload(self): ...
+
+    def slow_load(self, path_or_id, **_kw):
+        self.backend = SlowBackend()
+
+    monkeypatch.setattr(Engine, "load", slow_load)
+    monkeypatch.setattr(pool, "RESTART_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(pool, "MAX_RESTARTS", 2)
+    EnginePool.clear()
+    EnginePool.get("m1")
+    EnginePool.get("m2")
+
+    start = time.perf_counter()
+    with pool._pool_lock:
+        for path in ("m1", "m2"):
+            EnginePool._schedule_restart(EnginePool._cache.peek(path))
+    assert EnginePool.get_stats()["engine_states"] == {"m1": "restarting", "m2": "restarting"}
+
+    # Fail fast, or wait for the restart
+    monkeypatch.setattr(pool, "RESTART_WAIT", 0)
+    with pytest.raises(pool.EngineUnavailableError):
+        EnginePool.get("m1")
+    monkeypatch.setattr(pool, "RESTART_WAIT", 5.0)
+    EnginePool.get("m1")
+    EnginePool.get("m2")
+    # Independent models restart concurrently
+    assert time.perf_counter() - start < 0.55
+    assert EnginePool.get_stats()["engine_states"] == {"m1": "healthy", "m2": "healthy"}
+
+    # Restarts that keep failing end in FAILED after backoff
+    fail["on"] = True
+    ent = EnginePool._cache.peek("m1")
+    with pool._pool_lock:
+        EnginePool._schedule_restart(ent)
+    assert ent.ready.wait(5.0)
+    assert ent.state is pool.EngineState.FAILED
+    assert EnginePool.get_stats()["failed_restarts"] >= 1
@@ -1,4 +1,4 @@
-from dualgpuopt.model.vram_fit import fit_plan
+from dualgpuopt.model.vram_fit import fit_plan, search_plans
 
 
 def test_hetero_split():
@@ -10,3 +10,43 @@ def test_hetero_split():
     assert ratios[0] > ratios[1]
     # context sizes dictionary present
     assert "context_sizes" in plan
+
+
+def _dominates(a, b):
+    keys = ("throughput_tok_s", "quality", "context")
+    at_least = all(a[k] >= b[k] for k in keys) and a["memory_mb"] <= b["memory_mb"]
+    strictly = any(a[k] > b[k] for k in keys) or a["memory_mb"] < b["memory_mb"]
+    return at_least and strictly
+
+
+def test_search_returns_pruned_pareto_front():
+    gpus = [
+        {"memory_total": 24576, "name": "RTX 4090"},
+        {"memory_total": 16384, "name": "RTX 4080"},
+    ]
+    result = search_plans(14_000_000_000, gpus)
+
+    assert result["evaluated"] < result["candidates"]
+    front = result["pareto"]
+    assert front
+    for cand in front:
+        assert not any(_dominates(other, cand) for other in front)
+        assert cand["memory_mb"] <= 40960 * 0.9
+
+    plan = fit_plan(14_000_000_000, gpus, search=True)
+    assert plan["candidates"] == front
+
+
+def test_search_bounds_tensor_parallel_shares_by_the_smallest_gpu():
+    gpus = [
+        {"memory_total": 24576, "name": "RTX 4090"},
+        {"memory_total": 8192, "name": "RTX 4060"},
+    ]
+    result = search_plans(14_000_000_000, gpus)
+
+    tp2 = [c for c in result["pareto"] if c["tensor_parallel_size"] == 2]
+    # Each GPU holds half of the footprint, which must fit the 8 GB card
+    assert all(c["memory_mb"] / 2 <= 8192 * 0.9 for c in tp2)
+    assert not any(c["quant"] == "none" for c in tp2)
+    # A single 24 GB card still fits the fp16 model
+    assert any(c["quant"] == "none" and c["tensor_parallel_size"] == 1 for c in result["pareto"])
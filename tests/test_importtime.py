@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from dualgpuopt.importtime import (
+    CLI_COMMAND,
+    HEAVY_MODULES,
+    ImportReport,
+    measure,
+    parse_importtime,
+)
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _heapq
+import time:       300 |        420 |   heapq
+import time:      1000 |       1420 | dualgpuopt.memory
+2026-01-01 00:00:00 - DualGPUOpt.Main - INFO - not an import line
+import time:        50 |         50 | dualgpuopt.memory.timeline
+"""
+
+
+def test_parse_importtime():
+    records = parse_importtime(SAMPLE)
+    assert [(r.name, r.depth) for r in records] == [
+        ("_heapq", 2),
+        ("heapq", 1),
+        ("dualgpuopt.memory", 0),
+        ("dualgpuopt.memory.timeline", 0),
+    ]
+    assert records[1].self_us == 300 and records[1].cumulative_us == 420
+
+
+def test_package_time_counts_nested_imports_once():
+    report = ImportReport(parse_importtime(SAMPLE))
+    assert report.total_us == 1470
+    assert report.cumulative_us("dualgpuopt") == 1470
+    assert report.cumulative_us("heapq") == 420
+    assert report.imported(["heapq", "dualgpuopt", "numpy"]) == ["heapq", "dualgpuopt"]
+
+
+def test_cli_start_stays_light(tmp_path):
+    report = measure(CLI_COMMAND, cwd=str(tmp_path))
+    assert report.records, "no -X importtime output"
+    assert report.imported(HEAVY_MODULES) == []
+    # What is imported is deterministic, unlike how long it takes on a busy runner
+    assert sorted(name for name in report.modules if name.startswith("dualgpuopt")) == [
+        "dualgpuopt",
+        "dualgpuopt._lazy",
+        "dualgpuopt.llm_launcher",
+    ]
+
+
+def test_packages_load_their_api_lazily(tmp_path):
+    packages = "dualgpuopt.memory, dualgpuopt.gpu, dualgpuopt.services, dualgpuopt.telemetry"
+    report = measure(["-c", f"import {packages}"], cwd=str(tmp_path))
+    assert report.imported(["numpy", "pynvml", "PySide6", "dualgpuopt.telemetry_history"]) == []
+
+    report = measure(["-c", "from dualgpuopt.memory import MemoryProfile"], cwd=str(tmp_path))
+    assert report.imported(["numpy", "dualgpuopt.memory.predictor"]) == [
+        "numpy",
+        "dualgpuopt.memory.predictor",
+    ]
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from dualgpuopt.layer_balance import LayerProfiler, select_representative_layers
+from dualgpuopt.profile_cache import fingerprint
+
+
+class DecoderBlock:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, _x):
+        self.calls += 1
+
+
+class MoEBlock(DecoderBlock):
+    pass
+
+
+def _model(layers):
+    return types.SimpleNamespace(model=types.SimpleNamespace(layers=layers))
+
+
+def test_representative_layers_cover_each_type():
+    layers = [DecoderBlock() for _ in range(10)] + [MoEBlock() for _ in range(3)]
+    groups = select_representative_layers(layers, samples_per_type=3)
+    assert groups == {"DecoderBlock": [0, 4, 9], "MoEBlock": [10, 11, 12]}
+
+
+def test_sampled_profiling_on_cpu_runs_only_sampled_blocks():
+    layers = [DecoderBlock() for _ in range(8)] + [MoEBlock() for _ in range(4)]
+    model = _model(layers)
+    profiler = LayerProfiler(use_cache=False, profile_runs=3)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [
+            pool.submit(profiler.profile_sampled, model, None, dev, [64], 2) for dev in (-1, -2)
+        ]
+        results = [f.result() for f in futures]
+
+    sampled = {0, 7, 8, 11}
+    for idx, layer in enumerate(layers):
+        # 2 warmup + 3 timed runs per device
+        assert layer.calls == (10 if idx in sampled else 0)
+
+    for result in results:
+        times = result[64]
+        assert len(times) == len(layers)
+        decoder_mean = (times[0] + times[7]) / 2
+        assert all(t == decoder_mean for t in times[1:7])
+        moe_mean = (times[8] + times[11]) / 2
+        assert times[9] == times[10] == moe_mean
+
+
+class BrokenBlock(DecoderBlock):
+    def __call__(self, _x):
+        raise RuntimeError("CUDA out of memory")
+
+
+def test_sampled_failures_fall_back_to_uncached_estimates(tmp_path):
+    model = _model([DecoderBlock(), BrokenBlock(), DecoderBlock()])
+    profiler = LayerProfiler(cache_dir=str(tmp_path), profile_runs=3)
+
+    result = profiler.profile_sampled(model, None, -1, [64], 1)
+
+    assert result == profiler.estimate(model, -1, [64])
+    assert profiler._get_cache().lookup(fingerprint(model, -1, mode="sampled"), [64]) == {}
+
+
+def test_sampled_timings_are_cached_apart_from_full_profiles(tmp_path):
+    layers = [DecoderBlock() for _ in range(4)]
+    model = _model(layers)
+    profiler = LayerProfiler(cache_dir=str(tmp_path), profile_runs=3)
+    full_key = fingerprint(model, -1)
+    profiler._get_cache().store(full_key, {64: {i: 1.0 for i in range(4)}})
+
+    result = profiler.profile_sampled(model, None, -1, [64], 2)
+
+    # The full-profile timings were neither reused nor overwritten
+    assert result[64] != [1.0] * 4 and layers[0].calls == 5
+    assert profiler._get_cache().lookup(full_key, [64]) == {64: {i: 1.0 for i in range(4)}}
+    sampled = profiler._get_cache().lookup(fingerprint(model, -1, mode="sampled"), [64])
+    assert set(sampled[64]) == {0, 3}
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import sys
+import types
+
+import pytest
+
+from dualgpuopt import layer_balance
+from dualgpuopt.layer_cost import LayerCostModel, LayerShape, lookup_spec, spec_from_telemetry
+from dualgpuopt.profile_cache import ProfileCache
+
+
+def _model(hidden_size=4096, n_layers=32):
+    config = types.SimpleNamespace(
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 11 // 4,
+        num_attention_heads=32,
+        num_key_value_heads=8,
+        num_hidden_layers=n_layers,
+    )
+    return types.SimpleNamespace(config=config)
+
+
+def test_spec_lookup_prefers_specific_names():
+    assert lookup_spec("NVIDIA GeForce RTX 4070 Ti").name == "RTX 4070 Ti"
+    assert lookup_spec("NVIDIA GeForce RTX 4070").name == "RTX 4070"
+    assert lookup_spec("Mystery GPU") is None
+
+    unknown = spec_from_telemetry({"name": "Mystery GPU", "clock_sm": 2000, "clock_memory": 0})
+    assert unknown.fp16_tflops > 0 and unknown.mem_bandwidth_gbs > 0
+
+
+def test_estimates_scale_with_sequence_length_and_gpu():
+    model = LayerCostModel()
+    shape = LayerShape.from_model(_model())
+    fast = lookup_spec("RTX 4090")
+    slow = lookup_spec("RTX 3070")
+
+    assert model.estimate_layer(shape, fast, 1024) > model.estimate_layer(shape, fast, 64)
+    assert model.estimate_layer(shape, slow, 1024) > model.estimate_layer(shape, fast, 1024)
+
+
+def test_calibration_is_persisted(tmp_path):
+    store = ProfileCache(str(tmp_path))
+    shape = LayerShape()
+    spec = lookup_spec("RTX 4090")
+
+    model = LayerCostModel(store)
+    raw = model.raw_estimate(shape, spec, 64)
+    assert model.calibrate(shape, spec, {64: {0: raw * 2, 1: raw * 2}}) == pytest.approx(2.0)
+
+    # Later profiles are blended with earlier ones by sample count
+    assert model.calibrate(shape, spec, {64: {0: raw, 1: raw}}) == pytest.approx(1.5)
+
+    # A fresh model reads the factor back from the store
+    assert LayerCostModel(store).estimate_layer(shape, spec, 64) == pytest.approx(raw * 1.5)
+
+
+def test_balance_without_torch_is_deterministic(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(sys.modules, "torch", None)
+    specs = [lookup_spec("RTX 4090"), lookup_spec("RTX 3070")]
+    monkeypatch.setattr(layer_balance, "spec_for_device", lambda dev: specs[dev])
+    monkeypatch.setattr(layer_balance.LayerProfiler, "__init__", _no_cache_init)
+
+    first = layer_balance.balance_layers(_model(n_layers=40), 0, 1)
+    second = layer_balance.balance_layers(_model(n_layers=40), 0, 1)
+    assert first == second
+    assert sum(1 for k in first if k.startswith("model.layers.")) == 40
+
+
+_original_init = layer_balance.LayerProfiler.__init__
+
+
+def _no_cache_init(self, *args, **kwargs):
+    kwargs["use_cache"] = False
+    _original_init(self, *args, **kwargs)
+
+
+def test_profiling_calibrates_with_measured_timings_and_the_estimate_spec(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "torch", types.ModuleType("torch"))
+    spec = lookup_spec("RTX 3070")
+    monkeypatch.setattr(layer_balance, "spec_for_device", lambda dev: spec)
+    monkeypatch.setattr(
+        layer_balance.LayerProfiler,
+        "_measure_layers",
+        lambda self, model, ids, dev, seq_len, layer_indices: {0: 0.5, 1: 0.5},
+    )
+    calls = []
+    monkeypatch.setattr(
+        LayerCostModel,
+        "calibrate",
+        lambda self, shape, spec, measured: calls.append((spec, measured)),
+    )
+
+    model = _model(n_layers=4)
+    model.model = types.SimpleNamespace(layers=[None] * 4)
+    model.to = lambda dev: model
+    profiler = layer_balance.LayerProfiler(use_cache=False)
+    profiler.profile(model, None, 0, seq_lengths=[64])
+
+    # Layers 2 and 3 failed and were estimated; only real timings calibrate
+    assert calls == [(spec, {64: {0: 0.5, 1: 0.5}})]
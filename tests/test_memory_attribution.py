@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import pytest
+
+from dualgpuopt.engine.backend import Engine
+from dualgpuopt.engine.bench_runner import StubBackend
+from dualgpuopt.memory.attribution import InferenceTracker, get_inference_tracker
+from dualgpuopt.memory.fitting import MemoryFitStore
+from dualgpuopt.memory.predictor import DEFAULT_PROFILES, profile_for_model
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    t = get_inference_tracker()
+    t.reset()
+    monkeypatch.setattr(t, "_fits", MemoryFitStore(None))
+    yield t
+    t.disable()
+    t.reset()
+
+
+def test_engine_stream_is_attributed_to_its_inference_id(tracker):
+    engine = Engine()
+    engine.backend = StubBackend(ttft_s=0.005, itl_s=0.001, base_memory_mb=1000, per_token_mb=2)
+    engine.model_path = "/models/attribution-test.gguf"
+    tracker.enable(lambda: {0: int(engine.backend.memory_used_mb() * MB)})
+
+    tokens = list(engine.stream("a b c d", max_tokens=16, inference_id="req-1"))
+
+    (record,) = tracker.records()
+    assert record.inference_id == "req-1"
+    assert record.model == engine.model_path
+    assert (record.prompt_tokens, record.completion_tokens) == (4, len(tokens))
+    assert record.baseline[0] == 1000 * MB
+    assert record.peak_delta[0] > 0
+    assert record.memory_delta[0] == 0
+    assert tracker.fit(engine.model_path).n == 1
+
+
+def test_disabled_tracker_leaves_stream_untouched():
+    tracker = get_inference_tracker()
+    tracker.disable()
+    engine = Engine()
+    engine.backend = StubBackend(ttft_s=0.001, itl_s=0.0)
+    assert list(engine.stream("x", max_tokens=3))
+    assert tracker.begin("unused") is None
+
+
+def test_learned_fit_feeds_memory_profile():
+    base, per_batch, per_token = 6000 * MB, 40 * MB, 16 * 1024
+    tracker = InferenceTracker(refit_every=4, fits=MemoryFitStore(None))
+    tracker.enable(lambda: {0: base})
+
+    model = "/m/learned-model.gguf"
+    for batch in (1, 2, 4, 8):
+        for tokens in (128, 2048):
+            inference_id = tracker.begin(model=model, prompt_tokens=tokens, backend="Stub")
+            tracker.update(inference_id, batch_size=batch)
+            tracker.observe({0: base + per_batch * batch + per_token * tokens})
+            tracker.end(inference_id)
+
+    fit = tracker.fit(model)
+    assert fit.n == 8 and fit.ready
+    profile = profile_for_model(model, "Stub")
+    assert profile.fit is fit
+    assert profile.base_usage == pytest.approx(base, rel=1e-2)
+    assert profile.per_batch_usage == pytest.approx(per_batch, rel=1e-2)
+    assert profile.per_token_usage == pytest.approx(per_token, rel=1e-2)
+    # Each GPU has its own fit next to the one over all GPUs
+    assert tracker.fit(model, gpu_id=0).n == 8
+
+
+def test_monitor_limits_use_the_gpus_own_fit_and_capacity():
+    from dualgpuopt.memory.metrics import GPUMemoryStats
+    from dualgpuopt.memory.monitor import MemoryMonitor
+
+    tracker = InferenceTracker(refit_every=1, fits=MemoryFitStore(None))
+    usage = {0: 20000 * MB, 1: 0}
+    tracker.enable(lambda: dict(usage))
+    model = "/m/per-gpu-model.gguf"
+    base, per_batch = 4000 * MB, 500 * MB
+    for batch in (1, 2, 4, 8) * 3:
+        usage[1] = 0
+        inference_id = tracker.begin(model=model, prompt_tokens=512, backend="Stub")
+        tracker.update(inference_id, batch_size=batch)
+        usage[1] = base + per_batch * batch
+        tracker.observe(dict(usage))
+        tracker.end(inference_id)
+
+    profile = profile_for_model(model, "Stub")
+    assert profile.fit.ready and profile.gpu_fits[1] is tracker.fit(model, gpu_id=1)
+
+    # A bare monitor: no NVML, just the stats of a 24 GB and an 8 GB card
+    monitor = object.__new__(MemoryMonitor)
+    monitor._active_profile = profile
+    monitor._profiles = {}
+    monitor._memory_stats = {
+        gpu_id: GPUMemoryStats(
+            gpu_id=gpu_id, total_memory=total * MB, used_memory=0, free_memory=total * MB
+        )
+        for gpu_id, total in ((0, 24576), (1, 8192))
+    }
+    batch = monitor.estimate_max_batch(1, 512)
+    # (8192 - 4000) / 500 = 8.4 at most; the other GPU's memory does not count
+    assert 1 <= batch <= 8
+    assert monitor.estimate_safe_context_size(1, 16) == 128
+
+
+def test_learned_fit_leaves_default_profiles_alone():
+    default = DEFAULT_PROFILES["llama2-7b"]
+    coefficients = (default.base_usage, default.per_batch_usage, default.per_token_usage)
+    tracker = InferenceTracker(refit_every=1, fits=MemoryFitStore(None))
+    tracker.enable(lambda: {0: 3000 * MB})
+
+    model = "/m/llama2-7b.Q4_K_M.gguf"
+    for batch in (1, 2, 4, 8):
+        inference_id = tracker.begin(model=model, prompt_tokens=256, backend="LlamaCppBackend")
+        tracker.update(inference_id, batch_size=batch)
+        tracker.end(inference_id)
+
+    learned = profile_for_model(model, "LlamaCppBackend")
+    assert learned is not default and learned.fit is tracker.fit(model)
+    assert learned.base_usage != default.base_usage
+    assert (default.base_usage, default.per_batch_usage, default.per_token_usage) == coefficients
+    assert default.fit is None and not default.gpu_fits
+    # The same file on another backend starts from the default again
+    other = profile_for_model(model, "VLLMBackend")
+    assert other.fit is None and other.base_usage == default.base_usage
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import pytest
+
+from dualgpuopt.memory.fitting import FitKey, MemoryFit, MemoryFitStore
+from dualgpuopt.memory.predictor import MemoryProfile, find_optimal_batch
+
+MB = 1024 * 1024
+GB = 1024 * MB
+BASE, PER_BATCH, PER_TOKEN = 9000 * MB, 120 * MB, 40 * 1024
+
+
+def _observe(fit, rng, n, noise_mb=30.0, shift=0.0):
+    for _ in range(n):
+        batch = int(rng.integers(1, 17))
+        tokens = int(rng.integers(64, 4096))
+        used = BASE + shift + PER_BATCH * batch + PER_TOKEN * tokens
+        fit.observe(batch, tokens, used + rng.normal(0, noise_mb * MB))
+
+
+def test_fit_learns_coefficients_and_rejects_outliers():
+    rng = np.random.default_rng(0)
+    fit = MemoryFit((7 * GB, 50 * MB, 3 * 1024))
+    for i in range(300):
+        _observe(fit, rng, 1)
+        if i % 50 == 7:
+            assert not fit.observe(4, 1024, BASE + 4 * GB)
+
+    base, per_batch, per_token = fit.coefficients
+    assert base == pytest.approx(BASE, rel=0.01)
+    assert per_batch == pytest.approx(PER_BATCH, rel=0.05)
+    assert per_token == pytest.approx(PER_TOKEN, rel=0.1)
+    assert fit.sigma == pytest.approx(30 * MB, rel=0.2)
+    assert fit.rejected == 6
+
+    # A lasting change of the workload restarts the fit instead of being rejected
+    _observe(fit, rng, 20, shift=2 * GB)
+    assert fit.coefficients[0] == pytest.approx(BASE + 2 * GB, rel=0.02)
+
+
+def test_unobserved_slope_keeps_prior():
+    fit = MemoryFit((7 * GB, 50 * MB, 3 * 1024))
+    for tokens in range(100, 2000, 100):
+        fit.observe(1, tokens, 7000 * MB + 50 * MB + 3 * 1024 * tokens)
+    base, per_batch, per_token = fit.coefficients
+    assert per_batch == pytest.approx(50 * MB, rel=0.05)
+    assert base + per_batch == pytest.approx(7050 * MB, rel=1e-3)
+    assert per_token == pytest.approx(3 * 1024, rel=0.05)
+
+
+def test_limits_follow_oom_probability():
+    rng = np.random.default_rng(1)
+    fit = MemoryFit()
+    _observe(fit, rng, 200, noise_mb=200.0)
+    memory = 24 * GB
+
+    risky = fit.max_batch_size(memory, 2048, oom_probability=0.3)
+    safe = fit.max_batch_size(memory, 2048, oom_probability=0.001)
+    assert 1 <= safe < risky
+    assert fit.upper_bound(safe, 2048, 0.001) <= memory < fit.upper_bound(safe + 1, 2048, 0.001)
+
+    # Simulated usage at the chosen batch rarely exceeds the memory
+    used = BASE + PER_BATCH * safe + PER_TOKEN * 2048 + rng.normal(0, 200 * MB, 10_000)
+    assert np.mean(used > memory) < 0.01
+
+    seq = fit.max_sequence_length(memory, safe, oom_probability=0.001)
+    assert fit.upper_bound(safe, seq, 0.001) <= memory < fit.upper_bound(safe, seq + 1, 0.001)
+
+
+def test_store_persists_fits(tmp_path):
+    key = FitKey("model.gguf", "LlamaCppBackend", "GPU#0")
+    store = MemoryFitStore(str(tmp_path / "fits.db"))
+    for batch in range(1, 11):
+        store.observe(key, batch, 100 * batch, BASE + PER_BATCH * batch + PER_TOKEN * 100 * batch)
+    expected = store.get(key).coefficients
+    store.close()
+
+    reopened = MemoryFitStore(str(tmp_path / "fits.db"))
+    fit = reopened.get(key)
+    assert fit.n == 10
+    assert fit.coefficients == pytest.approx(expected)
+    assert reopened.keys("model.gguf") == [key]
+    reopened.reset(key)
+    assert reopened.keys() == []
+
+
+def test_concurrent_stores_merge_instead_of_overwriting(tmp_path, monkeypatch):
+    monkeypatch.setattr("dualgpuopt.memory.fitting.FLUSH_INTERVAL_S", 60.0)
+    key = FitKey("model.gguf", "LlamaCppBackend", "GPU#0")
+    path = str(tmp_path / "fits.db")
+    workers = [MemoryFitStore(path), MemoryFitStore(path)]
+    for batch in range(1, 11):
+        for store in workers:
+            store.observe(key, batch, 100 * batch, BASE + PER_BATCH * batch)
+    # Nothing is written on the request path
+    assert MemoryFitStore(path).keys() == []
+
+    for store in workers:
+        store.flush()
+    # The second merge read the first worker's observations back
+    assert workers[1].get(key).n == 20
+    for store in workers:
+        store.close()
+    assert MemoryFitStore(path).get(key).n == 20
+
+
+def test_profile_limits_use_fit_with_oom_probability():
+    rng = np.random.default_rng(2)
+    fit = MemoryFit()
+    _observe(fit, rng, 50)
+    profile = MemoryProfile("learned", 0, 0, 0)
+    profile.use_fit(fit)
+    assert profile.base_usage == pytest.approx(BASE, rel=0.01)
+
+    memory = 24 * GB
+    assert profile.max_batch_size(memory, 2048, oom_probability=0.01) == fit.max_batch_size(
+        memory, 2048, 0.01
+    )
+    # Without a target probability the point estimate is used as before
+    free = memory - profile.base_usage - profile.per_token_usage * 2048
+    point = int(free / profile.per_batch_usage)
+    assert profile.max_batch_size(memory, 2048) == point
+
+    batch, seq = find_optimal_batch(memory, profile, [512, 2048], oom_probability=0.01)
+    assert batch == fit.max_batch_size(memory, seq, 0.01)
+
+
+def test_project_growth_uses_running_trend():
+    profile = MemoryProfile("growth", 0, 0, 0, growth_rate=1.0)
+    for _ in range(20):
+        profile.update_history(1 * GB)
+    assert profile.project_growth(60) == pytest.approx(1 * GB)
+
+    # A steady 1 MB/s growth is projected from the latest sample
+    profile = MemoryProfile("growth", 0, 0, 0, growth_rate=1.0)
+    now = time.time()
+    for i in range(30):
+        profile._growth.add(now - 30 + i, GB + i * MB)
+        profile.usage_history.append((now - 30 + i, GB + i * MB))
+    assert profile.project_growth(60) == pytest.approx(GB + 89 * MB, rel=1e-6)
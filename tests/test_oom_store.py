@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import pytest
+
+from dualgpuopt.batch import oom_store
+from dualgpuopt.batch.oom_store import OOMKey, OOMLimitStore
+from dualgpuopt.batch.smart_batch import BatchStats, SmartBatcher
+
+KEY = OOMKey(model="llama-7b.gguf", gpu="RTX 4090#0", context=4096)
+
+
+def test_oom_in_one_worker_limits_the_others(tmp_path):
+    path = str(tmp_path / "oom.db")
+    # Two connections stand in for two worker processes
+    first = SmartBatcher(max_batch_size=32, oom_store=OOMLimitStore(path), oom_key=KEY)
+    second = SmartBatcher(max_batch_size=32, oom_store=OOMLimitStore(path), oom_key=KEY)
+
+    first.record_batch_stats(
+        BatchStats(100, 0, 1.0, oom_events=1, batch_size=32, batch_tokens=8000)
+    )
+    assert first.current_scale_factor == pytest.approx(0.75)
+
+    second.refresh_shared_limits(force=True)
+    assert second.backpressure_active
+    assert second.current_scale_factor == pytest.approx(0.75)
+    assert second.shared_max_batch == 24
+    assert second.shared_max_tokens == 6000
+    assert second.token_budget_fn()(1) == 6000
+
+    # A new worker starts with what the fleet already learned
+    fresh = SmartBatcher(max_batch_size=32, oom_store=OOMLimitStore(path), oom_key=KEY)
+    assert fresh.current_scale_factor == pytest.approx(0.75)
+
+    # Other contexts are independent
+    other = OOMKey(model=KEY.model, gpu=KEY.gpu, context=8192)
+    assert OOMLimitStore(path).get(other).scale == 1.0
+
+
+def test_limits_decay_toward_optimistic(tmp_path, monkeypatch):
+    store = OOMLimitStore(str(tmp_path / "oom.db"), half_life_s=100)
+    now = oom_store.time.time()
+    monkeypatch.setattr(oom_store.time, "time", lambda: now)
+    store.record_oom(KEY, batch_size=16, tokens=4000)
+    store.record_oom(KEY, batch_size=16, tokens=4000)
+
+    limits = store.get(KEY)
+    assert limits.scale == pytest.approx(0.5625)
+    assert limits.max_batch == 12
+    assert limits.oom_count == 2
+
+    monkeypatch.setattr(oom_store.time, "time", lambda: now + 100)
+    limits = store.get(KEY)
+    assert limits.scale == pytest.approx(1 - 0.4375 / 2)
+    assert limits.max_batch == 24
+    assert limits.max_tokens == 6000
+
+    # A new OOM tightens from the decayed value, not the old one
+    limits = store.record_oom(KEY, batch_size=20)
+    assert limits.scale == pytest.approx((1 - 0.4375 / 2) * 0.75)
+    assert limits.max_batch == 15
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import time
+
+from dualgpuopt.engine.pool import EnginePool
+from dualgpuopt.engine.prewarm import Prewarmer
+
+
+def test_predicts_transitions_and_time_of_day():
+    prewarmer = Prewarmer(lambda *_: False)
+    morning = time.mktime((2024, 1, 1, 9, 0, 0, 0, 0, -1))
+    evening = time.mktime((2024, 1, 1, 20, 0, 0, 0, 0, -1))
+
+    for _ in range(3):
+        prewarmer.record("chat", {}, when=morning)
+        prewarmer.record("code", {}, when=morning)
+    prewarmer.record("summarize", {}, when=evening)
+
+    ranked = prewarmer.predict(current="chat", when=morning)
+    assert ranked[0][0] == "code"
+    assert ranked[0][1] > 0.9
+
+    # With no transitions from a model, time of day decides
+    ranked = prewarmer.predict(current="unknown", when=evening)
+    assert ranked == [("summarize", 1.0)]
+
+
+def test_prewarm_hit_is_counted_and_never_evicts(monkeypatch):
+    from dualgpuopt.engine import pool
+
+    monkeypatch.setattr(pool, "_ping_backend", lambda eng: eng.backend.health())
+    monkeypatch.setattr(pool, "_gpu_memory", lambda: {0: (0, 24000)})
+    monkeypatch.setattr(pool, "_footprints", {"B": {0: 4000.0}})
+    EnginePool.clear()
+    EnginePool.set_max_size(2)
+    prewarmer = EnginePool._get_prewarmer()
+    for _ in range(3):
+        prewarmer.record("A", {})
+        prewarmer.record("B", {})
+
+    EnginePool.get("A")
+    assert prewarmer.prewarm_once() == "B"
+    assert EnginePool.get_stats()["prewarm_loads"] >= 1
+
+    EnginePool.get("B")
+    stats = EnginePool.get_stats()
+    assert stats["prewarm_hits"] >= 1
+    assert stats["prewarm_hit_rate"] > 0
+
+    # A full cache is never made room for speculatively
+    assert not EnginePool.prewarm("C")
+    assert set(EnginePool.get_stats()["models"]) == {"A", "B"}
+
+
+def test_prewarm_needs_telemetry_and_a_known_footprint(monkeypatch):
+    from dualgpuopt.engine import pool
+
+    monkeypatch.setattr(pool, "_footprints", {"known": {0: 4000.0}})
+    EnginePool.clear()
+    EnginePool.set_max_size(2)
+
+    # Without live telemetry nothing says the model fits
+    monkeypatch.setattr(pool, "_gpu_memory", lambda: {})
+    assert not EnginePool.prewarm("known")
+
+    # Nor without a measured footprint or a model file to size it by
+    monkeypatch.setattr(pool, "_gpu_memory", lambda: {0: (0, 24000)})
+    assert not EnginePool.prewarm("unknown")
+    assert EnginePool.get_stats()["models"] == []
+
+    assert EnginePool.prewarm("known")
+    assert EnginePool.get_stats()["models"] == ["known"]
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import sys
+import types
+
+import pytest
+
+from dualgpuopt import profile_cache
+from dualgpuopt.layer_balance import LayerProfiler
+from dualgpuopt.profile_cache import ProfileCache, fingerprint, profile_key
+
+
+class _Config:
+    def __init__(self, hidden_size: int, n_layers: int):
+        self.hidden_size = hidden_size
+        self.num_hidden_layers = n_layers
+
+
+class _FakeModel:
+    dtype = "torch.float16"
+
+    def __init__(self, hidden_size: int = 4096, n_layers: int = 4):
+        self.config = _Config(hidden_size, n_layers)
+        self.model = types.SimpleNamespace(layers=[object()] * n_layers)
+
+    def to(self, _dev):
+        return self
+
+
+class _Ids:
+    def to(self, _dev):
+        return self
+
+
+def test_key_depends_on_config_and_hardware():
+    small = profile_key({"hidden_size": 4096}, "fp16", "RTX 4090", "550.1")
+    assert small != profile_key({"hidden_size": 8192}, "fp16", "RTX 4090", "550.1")
+    assert small != profile_key({"hidden_size": 4096}, "bf16", "RTX 4090", "550.1")
+    assert small != profile_key({"hidden_size": 4096}, "fp16", "RTX 3090", "550.1")
+    assert small != profile_key({"hidden_size": 4096}, "fp16", "RTX 4090", "555.0")
+
+
+def test_partial_lookup_and_eviction(tmp_path, monkeypatch):
+    cache = ProfileCache(str(tmp_path))
+    cache.store("k", {64: {0: 0.1, 1: 0.2}})
+
+    assert cache.lookup("k", [64, 1024]) == {64: {0: 0.1, 1: 0.2}}
+    assert cache.lookup("other", [64]) == {}
+
+    now = profile_cache.time.time()
+    monkeypatch.setattr(profile_cache.time, "time", lambda: now + cache.max_age_s + 10)
+    assert cache.evict_stale() == 2
+    assert cache.lookup("k", [64]) == {}
+
+
+def test_profile_only_measures_missing_layers(tmp_path, monkeypatch):
+    monkeypatch.setattr(profile_cache, "gpu_identity", lambda _dev: ("Mock GPU", "1.0"))
+    monkeypatch.setitem(sys.modules, "torch", types.ModuleType("torch"))
+
+    measured_calls = []
+
+    def fake_measure(self, model, dummy_ids, dev, seq_len, layer_indices):
+        measured_calls.append((seq_len, list(layer_indices)))
+        return {i: seq_len * 0.001 for i in layer_indices}
+
+    monkeypatch.setattr(LayerProfiler, "_measure_layers", fake_measure)
+
+    profiler = LayerProfiler(cache_dir=str(tmp_path))
+    model = _FakeModel()
+    first = profiler.profile(model, None, 0, seq_lengths=[64])
+    assert measured_calls == [(64, [0, 1, 2, 3])]
+
+    # Cached length is reused, only the new length is measured
+    second = profiler.profile(model, None, 0, seq_lengths=[64, 1024])
+    assert measured_calls[1:] == [(1024, [0, 1, 2, 3])]
+    assert second[64] == first[64]
+
+    # A different architecture does not share the cache entry
+    profiler.profile(_FakeModel(hidden_size=8192), None, 0, seq_lengths=[64])
+    assert measured_calls[2:] == [(64, [0, 1, 2, 3])]
+
+
+def test_failed_layers_are_estimated_but_never_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(profile_cache, "gpu_identity", lambda _dev: ("Mock GPU", "1.0"))
+    fake_torch = types.ModuleType("torch")
+    fake_torch.cuda = types.SimpleNamespace(synchronize=lambda _dev: None)
+    monkeypatch.setitem(sys.modules, "torch", fake_torch)
+
+    def broken(_x):
+        raise RuntimeError("CUDA out of memory")
+
+    profiler = LayerProfiler(cache_dir=str(tmp_path))
+    model = _FakeModel()
+    model.model.layers = [lambda _x: None, lambda _x: None, broken, lambda _x: None]
+    with pytest.raises(RuntimeError):
+        profiler.profile_layer(model, 2, None, 0)
+
+    monkeypatch.setattr(LayerProfiler, "_resize_input", lambda self, ids, seq_len: _Ids())
+    # Estimated before the measured layers recalibrate the cost model
+    estimated = profiler.estimate(model, 0, [64])[64][2]
+    result = profiler.profile(model, None, 0, seq_lengths=[64])
+
+    assert result[64][2] == estimated
+    cached = profiler._get_cache().lookup(fingerprint(model, 0), [64])
+    assert sorted(cached[64]) == [0, 1, 3]
+    assert cached[64][0] == result[64][0]
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import time
+
+from dualgpuopt.optimizer import ModelParameters, Optimizer
+from dualgpuopt.replanner import SplitReplanner
+from dualgpuopt.services.event_bus import EventBus, GPUMetricsEvent, SplitCalculatedEvent
+
+
+def _model():
+    return ModelParameters(
+        name="test-7b", context_length=8192, hidden_size=4096, num_layers=32, num_heads=32
+    )
+
+
+def _publish(bus, used, temps=(60.0, 60.0)):
+    for gpu, (mem_used, temp) in enumerate(zip(used, temps)):
+        bus.publish_typed(
+            GPUMetricsEvent(
+                gpu_index=gpu, memory_used=mem_used, memory_total=24576, temperature=temp
+            )
+        )
+
+
+def _replanner(bus):
+    published = []
+    bus.subscribe_typed(SplitCalculatedEvent, published.append)
+    replanner = SplitReplanner(_model(), optimizer=Optimizer(), bus=bus, min_interval=0.0)
+    return replanner, published
+
+
+def test_publishes_only_on_material_change():
+    bus = EventBus()
+    replanner, published = _replanner(bus)
+    replanner.start()
+    try:
+        _publish(bus, (4096, 8192))
+        deadline = time.time() + 2
+        while not published and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(published) == 1
+        assert published[0].gpu_indexes == [0, 1]
+        assert published[0].batch_size >= 1
+
+        # Small drift stays within hysteresis
+        _publish(bus, (4196, 8092))
+        time.sleep(0.1)
+        assert len(published) == 1
+
+        # Another tenant takes 8 GB on GPU 0
+        _publish(bus, (12288, 8192))
+        deadline = time.time() + 2
+        while len(published) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(published) == 2
+        assert published[1].split_ratio[0] < published[0].split_ratio[0]
+        assert replanner.pop_pending_plan().split_ratio == tuple(published[1].split_ratio)
+        assert replanner.pop_pending_plan() is None
+    finally:
+        replanner.stop()
+
+
+def test_thermal_hysteresis():
+    bus = EventBus()
+    replanner, published = _replanner(bus)
+    bus.subscribe_typed(GPUMetricsEvent, replanner._on_metrics)
+
+    _publish(bus, (4096, 4096))
+    baseline = replanner.replan()
+    assert baseline.split_ratio[0] == 0.5
+
+    # GPU 0 overheats: load shifts to GPU 1
+    _publish(bus, (4096, 4096), temps=(85.0, 60.0))
+    hot = replanner.replan()
+    assert hot.split_ratio[0] < 0.5
+
+    # Cooling inside the band does not flip the state back
+    _publish(bus, (4096, 4096), temps=(80.0, 60.0))
+    assert replanner.replan() is None
+
+    _publish(bus, (4096, 4096), temps=(70.0, 60.0))
+    assert replanner.replan().split_ratio[0] == 0.5
+    assert len(published) == 3
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import socket
+import threading
+import time
+
+from dualgpuopt.engine.backend import Engine
+from dualgpuopt.engine.pool import EnginePool
+
+TOKEN_S = 0.02
+
+
+class ReplicaBackend:
+    """Single-slot server: one request generates at a time"""
+
+    loaded: list[dict] = []
+
+    def __init__(self, **kw):
+        self.kw = kw
+        self.unloaded = False
+        self.slot = threading.Lock()
+        ReplicaBackend.loaded.append(kw)
+
+    def stream(self, _prompt, max_tokens=8, **_):
+        with self.slot:
+            for i in range(max_tokens):
+                time.sleep(TOKEN_S)
+                yield f"{self.kw['cuda_devices']}:{i} "
+
+    def health(self):
+        return not self.unloaded
+
+    def unload(self):
+        self.unloaded = True
+
+
+def _patch(monkeypatch):
+    ReplicaBackend.loaded = []
+
+    def replica_load(self, path_or_id, **kw):
+        self.backend = ReplicaBackend(**kw)
+
+    monkeypatch.setattr(Engine, "load", replica_load)
+
+
+def _run(group, n_requests, max_tokens=8):
+    threads = [
+        threading.Thread(target=lambda: list(group.stream("hello there", max_tokens=max_tokens)))
+        for _ in range(n_requests)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def test_replicas_are_pinned_and_share_load_fairly(monkeypatch):
+    _patch(monkeypatch)
+    EnginePool.clear()
+    group = EnginePool.get_replicas("small.gguf", gpus=[0, 1], port=9000)
+
+    assert sorted((kw["cuda_devices"], kw["port"]) for kw in ReplicaBackend.loaded) == [
+        ("0", 9000),
+        ("1", 9001),
+    ]
+
+    elapsed_two = _run(group, 8)
+    served = [r["served"] for r in group.stats()]
+    assert served == [4, 4]
+    assert all(r["outstanding_tokens"] == 0 and r["active"] == 0 for r in group.stats())
+
+    EnginePool.set_replicas("small.gguf", 1)
+    assert group.size == 1
+    elapsed_one = _run(group, 8)
+    # Two replicas serve the same burst in roughly half the time
+    assert elapsed_two < elapsed_one * 0.75
+
+
+def test_routes_by_outstanding_tokens(monkeypatch):
+    _patch(monkeypatch)
+    EnginePool.clear()
+    group = EnginePool.get_replicas("route.gguf", replicas=2, gpus=[0, 1])
+
+    # One long request occupies a replica; short requests go to the other one
+    long_request = threading.Thread(target=lambda: list(group.stream("x", max_tokens=50)))
+    long_request.start()
+    time.sleep(0.05)
+    _run(group, 3, max_tokens=4)
+    long_request.join()
+
+    served = sorted(r["served"] for r in group.stats())
+    assert served == [1, 3]
+    assert "route.gguf" in EnginePool.get_stats()["replica_groups"]
+
+
+def test_groups_never_share_ports(monkeypatch):
+    _patch(monkeypatch)
+    EnginePool.clear()
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        busy = taken.getsockname()[1]
+        # A port bound outside the pool is skipped as well
+        EnginePool.get_replicas("a.gguf", gpus=[0, 1], port=busy)
+        EnginePool.get_replicas("b.gguf", gpus=[0, 1], port=busy)
+
+    ports = [kw["port"] for kw in ReplicaBackend.loaded]
+    assert len(ports) == len(set(ports)) == 4
+    assert busy not in ports
+
+    # Unloading gives the ports back
+    EnginePool.get_replicas("a.gguf").unload()
+    EnginePool.get_replicas("c.gguf", replicas=1, gpus=[0], port=min(ports))
+    assert ReplicaBackend.loaded[-1]["port"] == min(ports)
+    EnginePool.clear()
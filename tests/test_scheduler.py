@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from dualgpuopt.batch.scheduler import ContinuousBatchScheduler, Priority, Request
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def _consume(scheduler, request, gate, log):
+    def generate():
+        log.append(request.tenant if request.priority != Priority.INTERACTIVE else "vip")
+        gate.wait(2.0)
+        yield "x"
+
+    list(scheduler.stream(request, generate))
+
+
+def test_kv_budget_caps_admissions():
+    scheduler = ContinuousBatchScheduler(max_batch_size=8, kv_budget_mb=100, per_token_mb=1.0)
+    gate = threading.Event()
+    log: list[str] = []
+    threads = [
+        threading.Thread(
+            target=_consume,
+            args=(scheduler, Request("p", max_tokens=59, prompt_tokens=1), gate, log),
+        )
+        for _ in range(3)
+    ]
+    for t in threads:
+        t.start()
+
+    _wait_for(lambda: scheduler.get_stats()["waiting"] == 2)
+    # 60 MB each against a 100 MB budget: one at a time
+    assert scheduler.get_stats()["running"] == 1
+    gate.set()
+    for t in threads:
+        t.join(2.0)
+    assert scheduler.get_stats()["completed"] == 3
+
+
+def test_priority_then_tenant_fairness():
+    scheduler = ContinuousBatchScheduler(max_batch_size=1)
+    gates = {}
+    log: list[str] = []
+    threads = []
+
+    def submit(tenant, priority=Priority.NORMAL):
+        request = Request("p", max_tokens=1, tenant=tenant, priority=priority)
+        gates[request.id] = threading.Event()
+        waiting = scheduler.get_stats()["waiting"]
+        first = not threads
+        t = threading.Thread(target=_consume, args=(scheduler, request, gates[request.id], log))
+        t.start()
+        threads.append(t)
+        if first:
+            _wait_for(lambda: log)
+        else:  # slot taken: wait until this one is queued
+            _wait_for(lambda: scheduler.get_stats()["waiting"] == waiting + 1)
+
+    submit("blocker")
+    for _ in range(3):
+        submit("a")
+    submit("b")
+    submit("c", Priority.INTERACTIVE)
+
+    for gate in gates.values():
+        gate.set()
+    for t in threads:
+        t.join(2.0)
+
+    # Interactive first, then tenants alternate instead of draining "a" first
+    assert log[:3] == ["blocker", "vip", "a"]
+    assert log[3] == "b"
+    assert log[4:] == ["a", "a"]
+
+
+def test_iteration_mode_joins_between_steps():
+    scheduler = ContinuousBatchScheduler(max_batch_size=4)
+    steps: list[str] = []
+    started = threading.Event()
+
+    def decode(name, n):
+        for i in range(n):
+            steps.append(name)
+            if name == "long" and i == 0:
+                started.set()
+                time.sleep(0.05)  # the second request arrives mid-decode
+            yield f"{name}{i} "
+
+    long_out: list[str] = []
+    t = threading.Thread(
+        target=lambda: long_out.extend(scheduler.run(Request("long"), lambda: decode("long", 6)))
+    )
+    t.start()
+    started.wait(2.0)
+    short = list(scheduler.run(Request("short"), lambda: decode("short", 2)))
+    t.join(2.0)
+    scheduler.close()
+
+    assert short == ["short0 ", "short1 "]
+    assert len(long_out) == 6
+    # "short" ran while "long" was still decoding
+    first_short = steps.index("short")
+    assert "long" in steps[first_short:]
+
+
+def test_oom_activates_backpressure():
+    scheduler = ContinuousBatchScheduler(max_batch_size=8)
+
+    def decode():
+        yield "a"
+        raise RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB")
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        list(scheduler.run(Request("p"), decode))
+    scheduler.close()
+
+    stats = scheduler.get_stats()
+    assert stats["oom_events"] == 1
+    assert scheduler.batcher.backpressure_active
+    assert stats["slot_limit"] == 6
+
+
+def test_loop_failure_fails_pending_requests_and_stops():
+    scheduler = ContinuousBatchScheduler(max_batch_size=4)
+    started = threading.Event()
+
+    class Steps:
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            raise StopIteration
+
+        def close(self):
+            raise ValueError("engine state corrupted")
+
+    def decode():
+        started.set()
+        while True:
+            time.sleep(0.01)
+            yield "x"
+
+    errors: list[BaseException] = []
+
+    def consume():
+        try:
+            list(scheduler.run(Request("long"), decode))
+        except RuntimeError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=consume)
+    t.start()
+    started.wait(2.0)
+    # Finishing this request crashes the loop outside the per-request handling
+    with pytest.raises(RuntimeError, match="engine state corrupted"):
+        list(scheduler.run(Request("broken"), Steps))
+    t.join(2.0)
+
+    assert not t.is_alive()
+    assert "Scheduler loop failed" in str(errors[0])
+    assert scheduler.get_stats()["running"] == 0
+    with pytest.raises(RuntimeError, match="closed"):
+        list(scheduler.run(Request("late"), decode))
+
+
+class _FakeDecoder:
+    """Counts down each sequence; records which sequences share a step"""
+
+    def __init__(self, fail_batch=None):
+        self.calls: list[list[str]] = []
+        self.finished: list[str] = []
+        self.fail_batch = fail_batch
+        self.started = threading.Event()
+
+    def start(self, name, n):
+        return {"name": name, "left": n, "i": 0}
+
+    def step(self, sequences):
+        self.calls.append([seq["name"] for seq in sequences])
+        self.started.set()
+        if len(sequences) == self.fail_batch:
+            raise RuntimeError("forward pass failed")
+        time.sleep(0.01)
+        chunks = []
+        for seq in sequences:
+            if seq["left"] == 0:
+                chunks.append(None)
+                continue
+            seq["left"] -= 1
+            chunks.append(f"{seq['name']}{seq['i']} ")
+            seq["i"] += 1
+        return chunks
+
+    def finish(self, sequence):
+        self.finished.append(sequence["name"])
+
+
+def test_batch_decoder_steps_running_requests_together():
+    decoder = _FakeDecoder()
+    scheduler = ContinuousBatchScheduler(max_batch_size=4, decoder=decoder)
+
+    long_out: list[str] = []
+    t = threading.Thread(
+        target=lambda: long_out.extend(
+            scheduler.run(Request("long"), lambda: decoder.start("long", 8))
+        )
+    )
+    t.start()
+    decoder.started.wait(2.0)
+    short = list(scheduler.run(Request("short"), lambda: decoder.start("short", 2)))
+    t.join(2.0)
+    scheduler.close()
+
+    assert short == ["short0 ", "short1 "]
+    assert len(long_out) == 8
+    # The new request joined the running batch instead of taking turns
+    assert ["long", "short"] in decoder.calls
+    assert max(len(names) for names in decoder.calls) == 2
+    assert sorted(decoder.finished) == ["long", "short"]
+
+
+def test_batch_decoder_failure_fails_the_whole_batch():
+    decoder = _FakeDecoder(fail_batch=2)
+    scheduler = ContinuousBatchScheduler(max_batch_size=4, decoder=decoder)
+    errors: list[BaseException] = []
+
+    def consume(name):
+        try:
+            list(scheduler.run(Request(name), lambda: decoder.start(name, 50)))
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=consume, args=(name,)) for name in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(2.0)
+    scheduler.close()
+
+    # The step that failed carried both requests
+    assert sorted(decoder.calls[-1]) == ["a", "b"]
+    assert [str(e) for e in errors] == ["forward pass failed"] * 2
+    assert sorted(decoder.finished) == ["a", "b"]
+    assert scheduler.get_stats()["running"] == 0
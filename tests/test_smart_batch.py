@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from dualgpuopt.batch import batch_benchmark
+from dualgpuopt.batch.smart_batch import SmartBatcher, TokenLengthEstimator
+from dualgpuopt.memory.predictor import MemoryProfile
+
+
+class _CountingTokenizer:
+    """Two characters per token, counting calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=True):
+        self.calls += 1
+        return list(range(len(text) // 2))
+
+
+def test_estimator_calibrates_and_samples():
+    tok = _CountingTokenizer()
+    estimator = TokenLengthEstimator(tok, sample_every=10, min_samples=4)
+    texts = [("ab" * (10 + i)) for i in range(100)]
+
+    counts = estimator.counts(texts)
+    assert counts == [10 + i for i in range(100)]
+    assert estimator.chars_per_token == 2.0
+    # Only the calibration texts and every tenth one were tokenized
+    assert tok.calls < 20
+
+    # Exact counts are cached
+    calls = tok.calls
+    estimator.count(texts[0])
+    assert tok.calls == calls
+
+
+def test_batches_are_bounded_by_padded_tokens_from_memory_profile():
+    profile = MemoryProfile("test", base_usage=1000, per_batch_usage=0, per_token_usage=1)
+    batcher = SmartBatcher(
+        max_batch_size=64,
+        length_threshold=10_000,
+        tokenizer=lambda text: len(text.split()),
+        memory_profile=profile,
+        free_memory_fn=lambda: int((1000 + 400) / 0.9),
+    )
+    sequences = [(" ".join(["w"] * n), i) for i, n in enumerate([10, 20, 30, 40, 50, 100, 200])]
+    lengths = {i: n for i, n in enumerate([10, 20, 30, 40, 50, 100, 200])}
+
+    batches = batcher.optimize_batches(sequences)
+    assert sorted(i for b in batches for i in b) == list(range(7))
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 400
+
+    # Backpressure shrinks the budget
+    batcher.backpressure_active = True
+    batcher.current_scale_factor = 0.5
+    assert len(batcher.optimize_batches(sequences)) > len(batches)
+
+
+def test_benchmark_token_aware_reduces_batches_without_overflow():
+    results = batch_benchmark.run(n=300)
+    assert results["token_exact"]["over_budget"] == 0
+    assert results["token_exact"]["tokens_per_s"] > results["legacy"]["tokens_per_s"]
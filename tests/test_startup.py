@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import socket
+import sys
+import time
+
+import pytest
+
+from dualgpuopt.engine.benchmark import BenchmarkDB
+from dualgpuopt.engine.startup import ServerStartup, StartupError
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _script(code: str) -> list[str]:
+    return [sys.executable, "-u", "-c", code]
+
+
+def test_ready_marker_and_phase_timings(tmp_path):
+    startup = ServerStartup(
+        _script(
+            "import time; print('loading'); time.sleep(0.2); print('model loaded');"
+            "print('HTTP server listening'); time.sleep(30)"
+        ),
+        port=_free_port(),
+        ready_markers=("http server listening",),
+        weights_markers=("model loaded",),
+        timeout=10,
+    )
+    try:
+        startup.start()
+        timings = startup.timings
+        assert timings.ready_via == "marker"
+        assert timings.spawn_s <= timings.weights_s <= timings.ready_s < 5
+        assert "loading" in startup.log_tail()
+    finally:
+        startup.kill()
+
+    db = BenchmarkDB(str(tmp_path / "bench.db"))
+    db.add_startup("m.gguf", "llama.cpp", ready_s=timings.ready_s, weights_s=timings.weights_s)
+    assert db.get_startup_timings("m.gguf")[0]["ready_s"] == timings.ready_s
+
+
+def test_health_probe_fallback():
+    port = _free_port()
+    startup = ServerStartup(
+        [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1"],
+        port=port,
+        health_paths=("/",),
+        timeout=10,
+    )
+    try:
+        startup.start()
+        assert startup.timings.ready_via == "probe"
+    finally:
+        startup.kill()
+
+
+def test_timeout_kills_process_and_keeps_log_tail():
+    startup = ServerStartup(
+        _script("print('still loading weights'); import time; time.sleep(30)"),
+        port=_free_port(),
+        timeout=0.5,
+    )
+    start = time.monotonic()
+    with pytest.raises(StartupError) as err:
+        startup.start()
+    assert time.monotonic() - start < 5
+    assert startup.proc.poll() is not None
+    assert "still loading weights" in err.value.log_tail
+
+
+def test_early_exit_reports_output():
+    startup = ServerStartup(
+        _script("import sys; print('error: unknown model format'); sys.exit(3)"),
+        port=_free_port(),
+        timeout=10,
+    )
+    with pytest.raises(StartupError, match="exited with code 3") as err:
+        startup.start()
+    assert "unknown model format" in err.value.log_tail
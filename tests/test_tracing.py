@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import deque
+
+import pytest
+
+from dualgpuopt import tracing
+from dualgpuopt.engine.backend import Engine
+from dualgpuopt.engine.bench_runner import StubBackend
+
+
+@pytest.fixture
+def traced(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing.tracer, "buffer", deque(maxlen=100))
+    monkeypatch.setattr(tracing.tracer, "sample_rate", 1.0)
+    path = tmp_path / "spans.jsonl"
+    tracing.tracer.configure(jsonl_path=str(path))
+    yield path
+    tracing.tracer.configure(jsonl_path="")
+
+
+def test_nested_spans_form_a_tree(traced):
+    with tracing.span("chat", user="u1") as root:
+        with tracing.span("rag.search", k=3):
+            time.sleep(0.002)
+        with pytest.raises(ValueError), tracing.span("format_prompt"):
+            raise ValueError("bad template")
+    assert tracing.current_span() is None
+
+    spans = {s["name"]: s for s in tracing.tracer.recent(root.trace_id)}
+    assert set(spans) == {"chat", "rag.search", "format_prompt"}
+    assert spans["rag.search"]["parent_id"] == root.span_id
+    assert spans["rag.search"]["duration_ms"] >= 2
+    assert spans["chat"]["duration_ms"] >= spans["rag.search"]["duration_ms"]
+    assert spans["format_prompt"]["attributes"]["error"] == "ValueError: bad template"
+
+    lines = [json.loads(line) for line in traced.read_text().splitlines()]
+    assert [s["name"] for s in lines] == ["rag.search", "format_prompt", "chat"]
+
+    otlp = tracing.to_otlp(list(tracing.tracer.buffer))
+    exported = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {s["parentSpanId"] for s in exported} == {"", root.span_id}
+    assert {"key": "k", "value": {"intValue": "3"}} in exported[0]["attributes"]
+
+
+def test_unsampled_traces_record_nothing(monkeypatch):
+    monkeypatch.setattr(tracing.tracer, "buffer", deque(maxlen=100))
+    monkeypatch.setattr(tracing.tracer, "sample_rate", 0.0)
+    assert tracing.span("chat") is tracing.NOOP_SPAN
+
+    # An unsampled root keeps its children from starting traces of their own
+    monkeypatch.setattr(tracing.tracer, "sample_rate", 0.5)
+    monkeypatch.setattr(tracing.random, "random", lambda: 0.9)
+    with tracing.span("chat") as root:
+        assert not root.recording
+        monkeypatch.setattr(tracing.random, "random", lambda: 0.1)
+        assert tracing.span("rag") is tracing.NOOP_SPAN
+    assert not tracing.tracer.buffer
+
+
+def test_engine_stream_records_queue_prefill_and_decode(traced):
+    engine = Engine()
+    engine.backend = StubBackend(ttft_s=0.01, itl_s=0.001)
+    with tracing.span("chat") as root:
+        stream = engine.stream("a b c", max_tokens=5)
+    assert list(stream) == [f"t{i} " for i in range(5)]
+    engine.unload()
+
+    spans = {s["name"]: s for s in tracing.tracer.recent(root.trace_id)}
+    stream_span = spans["engine.stream"]
+    assert stream_span["parent_id"] == root.span_id
+    assert stream_span["attributes"]["tokens"] == 5
+    assert stream_span["attributes"]["ttft_ms"] >= 10
+    for child in ("scheduler.queue", "engine.prefill", "engine.decode"):
+        assert spans[child]["parent_id"] == stream_span["span_id"]
+    assert spans["engine.prefill"]["duration_ms"] >= 10